@@ -1,11 +1,303 @@
+"""
+The Admin Site
+
+The Booking, Passenger, Schedule, Transaction and SeatEvent tables run
+to millions of rows, so that the admin's defaults would make each page
+of a list slow or would time it out:
+- counting all the rows (twice) to number the pages
+  - EstimatedCountPaginator uses the database's estimate of the size of
+    a whole table and counts no further than MAXIMUM_COUNT rows of a
+    filtered or searched list, and 'show_full_result_count' is off
+- searching every row with LIKE '%term%'
+  - IndexedSearchMixin looks for the term exactly, in upper case as the
+    booking app stores the PNRs, flight numbers and names, so that the
+    indexes are used
+- finding the values of the filters with SELECT DISTINCT
+  - the filters take their values from the small Route and Flight
+    tables or are fixed
+- drop-downs of every Booking in the Passenger form
+  - the Bookings are chosen by their id (raw_id_fields)
+- the strftime() of __str__ and a query for each row's Booking
+  - the lists show the columns and select the related Booking
+The date hierarchies are on indexed date columns.
+"""
+
 from django.contrib import admin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
 
-# Register your models here.
-from .models import Flight, Schedule, Transaction
+from .models import Route, Flight, Schedule, Transaction
 from .models import Booking, Passenger
+from .models import Fare, FareRule
+from .models import SalesRollup
+from .models import DepartureLoad
+from .models import ArchivedBooking, ArchivedPassenger
+from .models import SeatEvent
+from .models import IdempotencyKey
+
+# Tables estimated to have fewer rows than this are counted exactly
+ESTIMATE_ABOVE = 100000
+
+# Filtered lists are counted no further than this (i.e. 100 pages)
+MAXIMUM_COUNT = 10000
+
+
+def estimated_rows(queryset):
+    """
+    The database's estimate of the number of rows in the queryset's table
+    None if the database does not keep one (e.g. SQLite)
+    """
+
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    if connection.vendor == "postgresql":
+        sql = "SELECT reltuples FROM pg_class WHERE oid = to_regclass(%s)"
+    elif connection.vendor == "mysql":
+        sql = ("SELECT table_rows FROM information_schema.tables "
+               "WHERE table_schema = DATABASE() AND table_name = %s")
+    else:
+        return None
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [table])
+        row = cursor.fetchone()
+    # PostgreSQL's estimate is -1 until the table is first analysed
+    if row is None or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Pages of a big table without counting every row
+    The number of pages is only approximate for a whole table,
+    and a filtered list shows at most MAXIMUM_COUNT rows
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_rows(queryset)
+            if estimate is not None and estimate >= ESTIMATE_ABOVE:
+                return estimate
+            return queryset.count()
+        return queryset[:MAXIMUM_COUNT].count()
+
+
+class BigTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class IndexedSearchMixin:
+    """ Search for the term exactly, in upper case, in the search_fields """
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip().upper()
+        if not term:
+            return queryset, False
+        condition = Q()
+        for field in self.search_fields:
+            condition |= Q(**{field: term})
+        return queryset.filter(condition), False
+
+
+class RouteFilter(admin.SimpleListFilter):
+    title = "route"
+    parameter_name = "route"
+
+    def lookups(self, request, model_admin):
+        return [(str(route), str(route)) for route in Route.objects.all()]
+
+    def queryset(self, request, queryset):
+        if not self.value():
+            return queryset
+        origin, _, destination = self.value().partition("-")
+        return queryset.filter(flight_from=origin, flight_to=destination)
+
+
+class FlightNumberFilter(admin.SimpleListFilter):
+    title = "flight number"
+    parameter_name = "flight"
+
+    def lookups(self, request, model_admin):
+        return [(number, number) for number
+                in Flight.objects.values_list("flight_number", flat=True)]
+
+    def queryset(self, request, queryset):
+        if not self.value():
+            return queryset
+        return queryset.filter(flight_number=self.value())
+
+
+class PaxTypeFilter(admin.SimpleListFilter):
+    title = "passenger type"
+    parameter_name = "pax_type"
+
+    def lookups(self, request, model_admin):
+        return [("A", "Adult"), ("C", "Child"), ("I", "Infant")]
+
+    def queryset(self, request, queryset):
+        if not self.value():
+            return queryset
+        return queryset.filter(pax_type=self.value())
+
+
+class WheelchairFilter(admin.SimpleListFilter):
+    title = "wheelchair"
+    parameter_name = "wheelchair"
+
+    def lookups(self, request, model_admin):
+        return [("R", "WCHR"), ("S", "WCHS"), ("C", "WCHC")]
+
+    def queryset(self, request, queryset):
+        if not self.value():
+            return queryset
+        return queryset.filter(wheelchair_ssr=self.value())
+
+
+BOOKING_LIST_DISPLAY = ("pnr", "flight_from", "flight_to",
+                        "outbound_flightno", "outbound_date",
+                        "inbound_flightno", "inbound_date",
+                        "number_of_adults", "number_of_children",
+                        "number_of_infants", "fare_quote")
+PASSENGER_LIST_DISPLAY = ("booking_pnr", "pax_number", "title",
+                          "first_name", "last_name", "pax_type", "status",
+                          "outbound_seat_number", "inbound_seat_number")
+PASSENGER_FIELDS = ("pax_number", "title", "first_name", "last_name",
+                    "pax_type", "date_of_birth", "status",
+                    "outbound_seat_number", "inbound_seat_number",
+                    "wheelchair_ssr", "wheelchair_type")
+
+
+class PassengerInline(admin.TabularInline):
+    model = Passenger
+    fields = PASSENGER_FIELDS
+    extra = 0
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("pnr")
+
+
+@admin.register(Booking)
+class BookingAdmin(IndexedSearchMixin, BigTableAdmin):
+    list_display = BOOKING_LIST_DISPLAY
+    list_filter = (RouteFilter, "return_flight")
+    search_fields = ("pnr",)
+    date_hierarchy = "outbound_date"
+    inlines = (PassengerInline,)
+
+
+class PassengerListAdmin(BigTableAdmin):
+    """ The Passengers or the ArchivedPassengers """
+    list_display = PASSENGER_LIST_DISPLAY
+    list_select_related = ("pnr",)
+    search_fields = ("last_name", "pnr__pnr")
+    raw_id_fields = ("pnr",)
+
+    @admin.display(description="PNR", ordering="pnr__pnr")
+    def booking_pnr(self, passenger):
+        return passenger.pnr.pnr
+
+    def get_search_results(self, request, queryset, search_term):
+        """ Search by the last name or by the PNR of the Booking """
+        term = search_term.strip().upper()
+        if not term:
+            return queryset, False
+        # The Bookings' ids first so that both conditions use an index
+        bookings = self.model._meta.get_field("pnr").related_model.objects
+        ids = list(bookings.filter(pnr=term).values_list("id", flat=True))
+        return queryset.filter(Q(last_name=term) | Q(pnr_id__in=ids)), False
+
+
+@admin.register(Passenger)
+class PassengerAdmin(PassengerListAdmin):
+    list_filter = (PaxTypeFilter, WheelchairFilter)
+
+
+@admin.register(Schedule)
+class ScheduleAdmin(IndexedSearchMixin, BigTableAdmin):
+    list_display = ("flight_date", "flight_number", "total_booked",
+                    "seatmap", "events_compacted_to")
+    list_filter = (FlightNumberFilter,)
+    search_fields = ("flight_number",)
+    date_hierarchy = "flight_date"
+
+
+@admin.register(Transaction)
+class TransactionAdmin(IndexedSearchMixin, BigTableAdmin):
+    list_display = ("pnr", "amount", "date_created", "username")
+    search_fields = ("pnr",)
+    date_hierarchy = "date_created"
+
+
+@admin.register(SeatEvent)
+class SeatEventAdmin(IndexedSearchMixin, BigTableAdmin):
+    list_display = ("id", "flight_date", "flight_number", "seat", "action",
+                    "pnr", "previous", "created_at")
+    list_filter = ("action", FlightNumberFilter)
+    search_fields = ("pnr",)
+    date_hierarchy = "flight_date"
+
+
+@admin.register(ArchivedBooking)
+class ArchivedBookingAdmin(IndexedSearchMixin, BigTableAdmin):
+    list_display = BOOKING_LIST_DISPLAY + ("archived_at",)
+    list_filter = (RouteFilter,)
+    search_fields = ("pnr",)
+    date_hierarchy = "outbound_date"
+
+
+@admin.register(ArchivedPassenger)
+class ArchivedPassengerAdmin(PassengerListAdmin):
+    list_filter = (PaxTypeFilter,)
+
+
+@admin.register(DepartureLoad)
+class DepartureLoadAdmin(BigTableAdmin):
+    list_display = ("flight_date", "flight_number", "booked", "adults",
+                    "children", "infants", "wheelchairs")
+    list_filter = (FlightNumberFilter,)
+    date_hierarchy = "flight_date"
+
+
+@admin.register(SalesRollup)
+class SalesRollupAdmin(BigTableAdmin):
+    list_display = ("day", "username", "transactions", "revenue")
+    date_hierarchy = "day"
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(BigTableAdmin):
+    list_display = ("key", "username", "purpose", "state", "status",
+                    "created_at")
+    list_filter = ("state",)
+    date_hierarchy = "created_at"
+
+
+@admin.register(Route)
+class RouteAdmin(admin.ModelAdmin):
+    list_display = ("origin", "destination")
+
+
+@admin.register(Flight)
+class FlightAdmin(admin.ModelAdmin):
+    list_display = ("flight_number", "route", "std_minutes", "sta_minutes",
+                    "outbound", "capacity", "days_of_operation",
+                    "effective_from", "effective_to")
+    list_select_related = ("route",)
+
+
+@admin.register(Fare)
+class FareAdmin(admin.ModelAdmin):
+    list_display = ("__str__", "flight_number", "valid_from", "valid_to")
+    search_fields = ("flight_number",)
+
 
-admin.site.register(Flight)
-admin.site.register(Schedule)
-admin.site.register(Transaction)
-admin.site.register(Booking)
-admin.site.register(Passenger)
+@admin.register(FareRule)
+class FareRuleAdmin(admin.ModelAdmin):
+    list_select_related = ("fare",)
+    autocomplete_fields = ("fare",)
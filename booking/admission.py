@@ -0,0 +1,320 @@
+"""
+Admission Control
+
+At peak a burst of searches for one or two letters, or of bookings
+each running the seat allocator, can swamp the database so that every
+request slows down. Rather than queue such requests they are turned
+away at once:
+
+- each expensive endpoint has token buckets (settings.RATE_LIMITS),
+  one for each user and one shared by everybody. A bucket holds up to
+  'burst' tokens and refills at 'rate' tokens a second, and each
+  request takes 'cost' tokens from both buckets or is refused with a
+  429 Too Many Requests. A request refused by the shared bucket gives
+  its user's tokens back
+- at most SEAT_ALLOCATION_CONCURRENCY requests may be allocating seats
+  at once. Any more are refused with a 503 Service Unavailable
+
+Both responses carry a Retry-After header.
+
+The buckets and the allocation slots are counted in a store
+(settings.RATE_LIMIT_STORE):
+    local   in this process's memory - exact, but each worker
+            process has its own buckets and slots
+    cache   in Django's cache so that all workers share them when the
+            cache is shared (e.g. memcached, Redis or the database).
+            The buckets are approximated by fixed windows of
+            'burst / rate' seconds holding at most 'burst' tokens
+    off     no limits, e.g. for comparison in a load test
+
+Users are identified by their username, that of their Basic
+Authentication for the API, or by their address when not logged in.
+'booking/misctests/admission_load_test.py' shows the effect.
+"""
+
+import math
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.http import JsonResponse
+from django.shortcuts import render
+
+from .logs import event, forms_log
+from logging import INFO
+
+# Queries shorter than this match so many Bookings
+# that they cost more tokens
+SHORT_QUERY_LENGTH = 3
+SHORT_QUERY_COST = 5
+
+# The local store forgets the buckets which have refilled
+# once it holds this many
+MAXIMUM_LOCAL_BUCKETS = 10000
+
+# Seconds after which the cache store forgets an allocation slot
+# which was never given back e.g. the worker was killed
+SLOT_TIMEOUT = 60
+
+ALLOCATION = "allocation"
+
+
+class LocalStore:
+    """ Token buckets and slots in this process's memory """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # key -> (tokens, updated, full again at)
+        self.buckets = {}
+        self.slots = {}
+
+    def take(self, key, rate, burst, cost):
+        """
+        Take 'cost' tokens from the bucket 'key'
+        Returns 0 if they were taken, otherwise the seconds
+        until there will be enough
+        """
+
+        now = time.monotonic()
+        with self.lock:
+            if len(self.buckets) >= MAXIMUM_LOCAL_BUCKETS:
+                self.buckets = {name: bucket for name, bucket
+                                in self.buckets.items() if bucket[2] > now}
+            tokens, updated, _ = self.buckets.get(key, (burst, now, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            wait = 0 if tokens >= cost else (cost - tokens) / rate
+            if not wait:
+                tokens -= cost
+            self.buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+            return wait
+
+    def give_back(self, key, rate, burst, cost):
+        """ Return 'cost' tokens taken from the bucket 'key' """
+
+        now = time.monotonic()
+        with self.lock:
+            if key not in self.buckets:
+                return
+            tokens, updated, _ = self.buckets[key]
+            tokens = min(burst, tokens + (now - updated) * rate + cost)
+            self.buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+
+    def acquire(self, name, limit):
+        """ Take one of the 'limit' slots 'name' if there is one free """
+        with self.lock:
+            if self.slots.get(name, 0) >= limit:
+                return False
+            self.slots[name] = self.slots.get(name, 0) + 1
+            return True
+
+    def release(self, name):
+        with self.lock:
+            self.slots[name] = max(self.slots.get(name, 0) - 1, 0)
+
+
+class CacheStore:
+    """ Token buckets and slots in Django's cache """
+
+    def count(self, key, amount, timeout):
+        """ Add 'amount' to the counter 'key' returning its new value """
+        cache.add(key, 0, timeout)
+        try:
+            return cache.incr(key, amount)
+        except ValueError:
+            # The key expired in the meantime
+            cache.add(key, amount, timeout)
+            return amount
+
+    def take(self, key, rate, burst, cost):
+        now = time.time()
+        window = burst / rate
+        start = math.floor(now / window)
+        used = self.count(f"booking:ratelimit:{key}:{start}", cost,
+                          math.ceil(window) + 1)
+        if used <= burst:
+            return 0
+        return (start + 1) * window - now
+
+    def give_back(self, key, rate, burst, cost):
+        # Only to the current window, so nothing if it has just ended
+        window = burst / rate
+        start = math.floor(time.time() / window)
+        try:
+            cache.decr(f"booking:ratelimit:{key}:{start}", cost)
+        except ValueError:
+            pass
+
+    def acquire(self, name, limit):
+        key = f"booking:slots:{name}"
+        if self.count(key, 1, SLOT_TIMEOUT) <= limit:
+            return True
+        self.release(name)
+        return False
+
+    def release(self, name):
+        try:
+            cache.decr(f"booking:slots:{name}")
+        except ValueError:
+            pass
+
+
+class NoStore:
+    """ No limits """
+
+    def take(self, key, rate, burst, cost):
+        return 0
+
+    def give_back(self, key, rate, burst, cost):
+        pass
+
+    def acquire(self, name, limit):
+        return True
+
+    def release(self, name):
+        pass
+
+
+STORES = {
+    "local": LocalStore,
+    "cache": CacheStore,
+    "off": NoStore,
+}
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def store():
+    """ The store named by settings.RATE_LIMIT_STORE """
+
+    global _store
+    with _store_lock:
+        name = settings.RATE_LIMIT_STORE
+        if _store is None or _store[0] != name:
+            if name not in STORES:
+                raise ImproperlyConfigured(
+                    f"RATE_LIMIT_STORE '{name}' is not one of "
+                    f"{', '.join(STORES)}")
+            _store = (name, STORES[name]())
+        return _store[1]
+
+
+def identity(request, api=False):
+    """
+    Who a request's bucket belongs to
+    'api' - an API request, whose user may be given by Basic Authentication
+    """
+    user = getattr(request, "user", None)
+    if api:
+        from .api import basic_auth_user
+        user = basic_auth_user(request) or user
+    if user is not None and user.is_authenticated:
+        return f"user:{user.username}"
+    return f"address:{request.META.get('REMOTE_ADDR', '')}"
+
+
+def search_cost(request):
+    """ Short queries match many Bookings so they cost more """
+    query = request.GET.get("query", "").strip()
+    if not query:
+        return 0
+    return SHORT_QUERY_COST if len(query) < SHORT_QUERY_LENGTH else 1
+
+
+def refusal(request, status, retry_after, message, api):
+    """ The response turning a request away """
+
+    event(forms_log, INFO, "request refused", path=request.path,
+          status=status, who=identity(request, api))
+    if api:
+        response = JsonResponse({"errors": [message]}, status=status)
+    else:
+        response = render(request, "includes/busy.html",
+                          {"message": message}, status=status)
+    response["Retry-After"] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def limit(request, endpoint, cost=1, api=False):
+    """
+    Take 'cost' tokens from the request's buckets of 'endpoint'
+    Returns None or, if there are not enough, the 429 response
+    """
+
+    if not cost:
+        return None
+    limits = settings.RATE_LIMITS.get(endpoint)
+    if limits is None:
+        return None
+
+    buckets = store()
+    taken = []
+    wait = 0
+    for scope, key in (("user", f"{endpoint}:{identity(request, api)}"),
+                       ("all", endpoint)):
+        if scope in limits:
+            rate, burst = limits[scope]
+            wait = buckets.take(key, rate, burst, cost)
+            if wait:
+                break
+            taken.append((key, rate, burst))
+    if not wait:
+        return None
+
+    # Refused by the shared bucket, so the user's tokens were not used
+    for key, rate, burst in taken:
+        buckets.give_back(key, rate, burst, cost)
+
+    return refusal(request, 429, wait,
+                   "Too many requests. Please try again shortly.", api)
+
+
+def rate_limited(endpoint, cost=None, methods=None, api=False):
+    """
+    Limit a view's requests with the token buckets of 'endpoint'
+    'cost' - a function of the request giving the tokens it takes
+    'methods' - only these HTTP methods are limited (default all)
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if methods is None or request.method in methods:
+                refused = limit(request, endpoint,
+                                cost(request) if cost else 1, api)
+                if refused is not None:
+                    return refused
+            return view(request, *args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def seat_allocation(api=False):
+    """
+    Limit the number of a view's POST requests, which allocate seats,
+    in progress at once to settings.SEAT_ALLOCATION_CONCURRENCY
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != "POST":
+                return view(request, *args, **kwargs)
+
+            slots = store()
+            if not slots.acquire(ALLOCATION,
+                                 settings.SEAT_ALLOCATION_CONCURRENCY):
+                return refusal(request, 503, 1,
+                               "The booking system is busy. "
+                               "Please try again shortly.", api)
+            try:
+                return view(request, *args, **kwargs)
+            finally:
+                slots.release(ALLOCATION)
+        return wrapper
+
+    return decorator
@@ -0,0 +1,233 @@
+"""
+Seat Allocators
+
+The ways of picking a party's seats on a flight. Each allocator is
+given the seats already taken (a 96-bit integer, bit N is seat N) and
+the number of seats needed, and returns the seat positions allocated
+(the first Passenger's first) or None if there is insufficient
+availability. They only pick the seats - taking them is up to the
+caller (see seatlog.py).
+
+    recursive   a row of N seats, else the longest row which
+                can be found and so on for the remainder
+                (the original algorithm, on a bitstring)
+    first_fit   the rearmost row of N seats, else the free seats
+                from the back of the aircraft
+    best_fit    the shortest row of free seats which holds the party,
+                else the longest rows which are left
+
+All of them seat passengers from the back of the aircraft.
+settings.SEAT_ALLOCATOR names the one used for Bookings
+and 'manage.py simulate_allocators' compares them (see simulation.py).
+"""
+
+from bitstring import BitArray
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from .seatlog import CAPACITY
+
+LEFT_BIT_POS = CAPACITY - 1  # I.E. 95
+
+
+def row_of_N_seats(number_needed, allocated, available):
+    """ Find a 'row' of 'number_needed' seats """
+    zeros = "0b" + "0"*number_needed
+    result = available.find(zeros)
+    if not result:
+        return (False, allocated, available)
+
+    # Set the bits to 1 to represent 'taken' seats
+    bitrange = range(result[0], result[0] + number_needed)
+    available.invert(bitrange)
+
+    """
+    Determine the range of seat positions
+    e.g. 6 seats at position 77
+    77-6+1 = 72
+    so range(72, 78) = 72, 73, 74, 75, 76, 77
+    Then add that range of seats to the 'allocated' list
+    """
+    end = LEFT_BIT_POS - result[0]
+    start = end - number_needed + 1
+    seat_range = range(start, end + 1)
+    allocated += [*seat_range]
+    return (True, allocated, available)
+
+
+def find_N_seats(number_needed, allocated, available):
+    """
+    Find 'N' number of seats
+    N being 'number_needed'
+    'allocated' are all the seats found so far
+    'available' is a bitstring depicting what is available
+    This is a recursive algorithm
+    'row_of_N_seats' adds each row found to 'allocated' and marks it
+    taken in 'available' so both are passed on to the remainder as is
+    """
+
+    result = row_of_N_seats(number_needed, allocated, available)
+    if result[0]:
+        # Successfully found a row of N seats - so allocation is done!
+        return result
+
+    # if N = 1 then no available seats i.e. the flight is full
+    if number_needed == 1:
+        return (False, allocated, available)
+
+    # Otherwise, starting with M=N-1,
+    # see if it is possible to find a row of M seats
+    # if so, allocate that row of seats
+    # then allocate the remainder
+    count = number_needed - 1
+    while count > 1:
+        result = row_of_N_seats(count, allocated, available)
+        if not result[0]:
+            # Try a smaller row allocation
+            count -= 1
+            continue
+
+        # The remainder can only fail to fit if the flight is full
+        return find_N_seats(number_needed - count, allocated, available)
+
+    # Not successful in finding any 'row' > 1
+    # Therefore, allocate one seat
+    # Then repeat 'find_N_seats' for the remainder
+    result = row_of_N_seats(1, allocated, available)
+    if not result[0]:
+        # Insufficient Availability!
+        return result
+
+    return find_N_seats(number_needed - 1, allocated, available)
+
+
+def free_seat_count(taken):
+    return CAPACITY - bin(taken).count("1")
+
+
+def free_runs(taken):
+    """
+    The rows of free seats from the back of the aircraft
+    as (rearmost seat, number of seats)
+    """
+
+    runs = []
+    seat = LEFT_BIT_POS
+    while seat >= 0:
+        if taken >> seat & 1:
+            seat -= 1
+            continue
+        rearmost = seat
+        while seat >= 0 and not taken >> seat & 1:
+            seat -= 1
+        runs.append((rearmost, rearmost - seat))
+    return runs
+
+
+def fragmentation(taken):
+    """
+    0 when the free seats are all together, towards 1 the more
+    they are split up (as in analytics.py)
+    """
+
+    free = free_seat_count(taken)
+    if not free:
+        return 0.0
+    return 1 - max(length for _, length in free_runs(taken)) / free
+
+
+def recursive(taken, number_needed):
+    available = BitArray(uint=taken, length=CAPACITY)
+    result = find_N_seats(number_needed, [], available)
+    if not result[0]:
+        return None
+
+    allocated = result[1]
+    allocated.reverse()  # Descending Order
+    return allocated
+
+
+def seats_from_runs(runs, number_needed):
+    """ The seats of 'runs' in turn, from the back of each """
+
+    seats = []
+    for rearmost, length in runs:
+        take = min(length, number_needed - len(seats))
+        seats += range(rearmost, rearmost - take, -1)
+        if len(seats) == number_needed:
+            break
+    return seats
+
+
+def first_fit(taken, number_needed):
+    if free_seat_count(taken) < number_needed:
+        return None
+
+    runs = free_runs(taken)
+    for rearmost, length in runs:
+        if length >= number_needed:
+            return list(range(rearmost, rearmost - number_needed, -1))
+    return seats_from_runs(runs, number_needed)
+
+
+def best_fit(taken, number_needed):
+    if free_seat_count(taken) < number_needed:
+        return None
+
+    runs = free_runs(taken)
+    fits = [run for run in runs if run[1] >= number_needed]
+    if fits:
+        # Ties go to the rearmost row as 'runs' starts at the back
+        rearmost, _ = min(fits, key=lambda run: run[1])
+        return list(range(rearmost, rearmost - number_needed, -1))
+    # Split the party over as few rows as possible
+    return seats_from_runs(sorted(runs, key=lambda run: -run[1]),
+                           number_needed)
+
+
+ALLOCATORS = {
+    "recursive": recursive,
+    "first_fit": first_fit,
+    "best_fit": best_fit,
+}
+
+
+def allocator(name=None):
+    """ The allocator 'name' (None - the one in settings.SEAT_ALLOCATOR) """
+
+    name = name or settings.SEAT_ALLOCATOR
+    if name not in ALLOCATORS:
+        raise ImproperlyConfigured(
+            f"SEAT_ALLOCATOR '{name}' is not one of "
+            f"{', '.join(ALLOCATORS)}")
+    return ALLOCATORS[name]
+
+
+def allocation_problems(taken, number_needed, seats):
+    """
+    What is wrong with the seats an allocator picked given the seats
+    'taken' - an empty list if they are right
+    Every allocator must turn a party down if and only if fewer than
+    'number_needed' seats are free, and otherwise allocate exactly
+    'number_needed' different free seats
+    """
+
+    free = free_seat_count(taken)
+    if seats is None:
+        if free >= number_needed:
+            return [f"turned down {number_needed} with {free} seats free"]
+        return []
+
+    problems = []
+    if free < number_needed:
+        problems.append(f"allocated {number_needed} with {free} seats free")
+    if len(seats) != number_needed:
+        problems.append(f"allocated {len(seats)} seats "
+                        f"for {number_needed}")
+    if len(set(seats)) != len(seats):
+        problems.append("allocated a seat twice")
+    if any(seat < 0 or seat > LEFT_BIT_POS for seat in seats):
+        problems.append("allocated an invalid seat")
+    elif any(taken >> seat & 1 for seat in seats):
+        problems.append("allocated a seat already taken")
+    return problems
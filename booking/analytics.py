@@ -0,0 +1,198 @@
+"""
+Seatmap Analytics
+
+For planning: which seats sell first, how full the flights are and how
+broken up their free seats are, across every departure of a season.
+
+The seatmaps of a range of dates (the snapshots with any tails applied,
+see seatlog.py) are decoded by one 'numpy.unpackbits' into a matrix
+with a row per departure and a column per seat, so that each figure
+is worked out for every departure at once rather than by decoding
+the departures' bit-strings one at a time.
+"""
+
+from datetime import timedelta
+
+import numpy
+
+from . import seatlog
+from .common import Common
+from .models import Schedule
+from .timetable import timetable
+
+# The load factors are counted in bands of this many percent
+LOAD_FACTOR_BAND = 10
+
+# Parties of these sizes are checked for whether they can sit together
+PARTY_SIZES = (2, 4, 6)
+
+SEAT_LETTERS = "ABCD"
+
+
+def departures(start, end, flight_numbers=None):
+    """
+    Every (flight_date, flight_number) from 'start' to 'end' inclusive
+    on which the flight operates (see timetable.py)
+    'flight_numbers' - only these flights (None - every flight)
+    """
+
+    if not Common.initialised:
+        Common.initialisation()
+
+    table = timetable()
+    flights = [flight_number for flight_number in table.flights
+               if not flight_numbers or flight_number in flight_numbers]
+    days = (end - start).days + 1
+    return [(flight_date, flight_number)
+            for flight_date in (start + timedelta(days=n)
+                                for n in range(max(days, 0)))
+            for flight_number in flights
+            if table.operates(flight_number, flight_date)]
+
+
+def seat_matrix(keys):
+    """
+    The seats taken on each of the departures 'keys' as a uint8 matrix
+    with a row per departure: column N is 1 if seat N is taken
+    Departures which nobody has booked are all zeros
+    """
+
+    if not keys:
+        return numpy.zeros((0, seatlog.CAPACITY), dtype=numpy.uint8)
+
+    start = min(flight_date for flight_date, _ in keys)
+    end = max(flight_date for flight_date, _ in keys)
+    snapshots = {(flight_date, flight_number): seatmap
+                 for flight_date, flight_number, seatmap in
+                 Schedule.objects.filter(flight_date__range=(start, end))
+                 .values_list("flight_date", "flight_number", "seatmap")}
+    tails = seatlog.tail_events(start, end)
+
+    seatmaps = []
+    for key in keys:
+        seatmap = snapshots.get(key) or seatlog.EMPTY_SEATMAP
+        if key in tails:
+            seatmap = seatlog.bits_seatmap(seatlog.apply_events(
+                          seatlog.seatmap_bits(seatmap), tails[key]))
+        seatmaps.append(seatmap)
+
+    packed = numpy.frombuffer(bytes.fromhex("".join(seatmaps)),
+                              dtype=numpy.uint8).reshape(len(keys), -1)
+    # The leftmost bit of a seatmap is seat 95 (see bookinghelper.py)
+    return numpy.unpackbits(packed, axis=1)[:, ::-1]
+
+
+def free_runs(matrix):
+    """
+    The number of runs of free seats on each departure
+    and the length of its longest run
+    """
+
+    rows = len(matrix)
+    padded = numpy.zeros((rows, matrix.shape[1] + 2), dtype=numpy.int8)
+    padded[:, 1:-1] = 1 - matrix
+    edges = numpy.diff(padded, axis=1)
+    # A run starts where a free seat follows a taken one and ends
+    # before the next taken seat - they pair up in order
+    run_rows, run_starts = numpy.nonzero(edges == 1)
+    _, run_ends = numpy.nonzero(edges == -1)
+
+    runs = numpy.bincount(run_rows, minlength=rows)
+    longest = numpy.zeros(rows, dtype=numpy.int64)
+    numpy.maximum.at(longest, run_rows, run_ends - run_starts)
+    return runs, longest
+
+
+def figures(values):
+    """ The mean, median and 90th percentile of 'values' """
+    if not len(values):
+        return {"mean": 0.0, "median": 0.0, "p90": 0.0}
+    median, p90 = numpy.percentile(values, [50, 90])
+    return {"mean": round(float(values.mean()), 1),
+            "median": round(float(median), 1),
+            "p90": round(float(p90), 1)}
+
+
+def season_analytics(start, end, flight_numbers=None):
+    """
+    The seat analytics of the departures from 'start' to 'end' inclusive
+    'flight_numbers' - only these flights (None - every flight)
+    Returns a dictionary which can be written as JSON
+    """
+
+    keys = departures(start, end, flight_numbers)
+    matrix = seat_matrix(keys)
+    count = len(keys)
+
+    flights = sorted({flight_number for _, flight_number in keys})
+    flight_index = numpy.array([flights.index(flight_number)
+                                for _, flight_number in keys],
+                               dtype=numpy.intp)
+    info = timetable().flights
+    capacity = numpy.array([info[flight_number]["capacity"]
+                            for _, flight_number in keys], dtype=numpy.int64)
+
+    booked = matrix.sum(axis=1, dtype=numpy.int64)
+    load_factor = booked * 100 / numpy.maximum(capacity, 1)
+    bands = numpy.arange(0, 100 + LOAD_FACTOR_BAND, LOAD_FACTOR_BAND)
+    histogram, _ = numpy.histogram(load_factor, bins=bands)
+
+    runs, longest = free_runs(matrix)
+    free = matrix.shape[1] - booked
+    # 0 when the free seats are all together, towards 1 the more
+    # they are split up
+    fragmentation = numpy.where(free > 0,
+                                1 - longest / numpy.maximum(free, 1), 0.0)
+
+    fill_rates = (matrix.mean(axis=0) if count
+                  else numpy.zeros(matrix.shape[1]))
+    seats = [{"row": row + 1,
+              **{letter: round(float(fill_rates[row * 4 + column]), 3)
+                 for column, letter in enumerate(SEAT_LETTERS)}}
+             for row in range(matrix.shape[1] // 4)]
+
+    per_flight = numpy.maximum(
+        numpy.bincount(flight_index, minlength=len(flights)), 1)
+
+    def flight_means(values):
+        return numpy.bincount(flight_index, values,
+                              len(flights)) / per_flight
+
+    flight_figures = [
+        {"flight_number": flight_number,
+         "departures": int(departures_of_flight),
+         "mean_load_factor": round(float(mean_load), 1),
+         "mean_free_runs": round(float(mean_runs), 1),
+         "mean_fragmentation": round(float(mean_fragmentation), 3)}
+        for (flight_number, departures_of_flight, mean_load, mean_runs,
+             mean_fragmentation) in zip(
+                flights, numpy.bincount(flight_index,
+                                        minlength=len(flights)),
+                flight_means(load_factor), flight_means(runs),
+                flight_means(fragmentation))]
+
+    return {
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "departures": count,
+        "seats_booked": int(booked.sum()),
+        "load_factor": {
+            **figures(load_factor),
+            "histogram": [{"from": int(low), "to": int(high),
+                           "departures": int(departures_in_band)}
+                          for low, high, departures_in_band in
+                          zip(bands[:-1], bands[1:], histogram)]},
+        "fragmentation": {
+            "mean_free_runs": (round(float(runs.mean()), 1)
+                               if count else 0.0),
+            "mean_longest_free_run": (round(float(longest.mean()), 1)
+                                      if count else 0.0),
+            "mean_index": (round(float(fragmentation.mean()), 3)
+                           if count else 0.0),
+            # Departures with room for the party but not all together
+            "parties_split": {str(size): int(((free >= size) &
+                                              (longest < size)).sum())
+                              for size in PARTY_SIZES}},
+        "flights": flight_figures,
+        "seats": seats,
+    }
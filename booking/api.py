@@ -0,0 +1,848 @@
+"""
+The JSON API of this App
+
+Unlike the HTML Booking Forms which take the user through
+create/ -> details/ -> confirm/ whilst storing the Booking in 'Common',
+these endpoints are stateless: everything needed is in the one request
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+from logging import DEBUG, INFO
+from datetime import datetime
+
+from django.conf import settings
+from django.contrib.auth import authenticate, get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.http import JsonResponse
+from django.middleware.csrf import CsrfViewMiddleware
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+
+from .forms import CreateBookingForm
+from .forms import AdultsForm, MinorsForm
+from .forms import BagsRemarks
+
+from . import admission
+from . import analytics
+from . import bookinghelper as m
+from . import fares
+from . import flexdates
+from . import idempotency
+from . import itineraries as itinerary_search
+from . import loads
+from . import metrics
+from . import sales as sales_reports
+from . import seatlog
+from .common import Common
+from .timetable import route_airports, timetable
+from .logs import event, allocation_log, persistence_log
+from manxairlines.routers import replica_read
+
+
+# The most Quotes priced by one request to 'api/quotes/'
+MAXIMUM_QUOTES = 10000
+
+# The most days covered by one request to 'api/seat-analytics/'
+MAXIMUM_ANALYTICS_DAYS = 731
+
+
+class BookingRejected(Exception):
+    """ Raised when a Booking cannot be made as requested """
+
+    def __init__(self, status, errors):
+        super().__init__(errors)
+        self.status = status
+        self.errors = errors
+
+
+def error_response(status, errors):
+    """ The JSON Response used for every error """
+    return JsonResponse({"errors": errors}, status=status)
+
+
+def basic_auth_user(request):
+    """
+    Authenticate the user using the HTTP Basic Authorization header
+    Returns None if the header is absent or the credentials are wrong
+    The user is kept on the request, as admission control has usually
+    authenticated it already to find its bucket
+    """
+
+    if not hasattr(request, "basic_auth_user"):
+        request.basic_auth_user = authenticate_basic(request)
+    return request.basic_auth_user
+
+
+def password_digest(user):
+    """ Changes whenever the user's password does """
+    return hashlib.sha256(user.password.encode()).hexdigest()
+
+
+def authenticate_basic(request):
+    """
+    The user of the Basic Authorization header, if any
+    Hashing the password is most of the cost of an API call, so a
+    successful check is remembered for API_AUTH_CACHE_SECONDS under a
+    keyed hash of the credentials (never the credentials themselves).
+    It is forgotten as soon as the user's password changes
+    """
+    header = request.META.get("HTTP_AUTHORIZATION", "")
+    scheme, _, credentials = header.partition(" ")
+    if scheme.lower() != "basic" or not credentials:
+        return None
+
+    key = "booking:api-auth:" + hmac.new(settings.SECRET_KEY.encode(),
+                                         credentials.encode(),
+                                         hashlib.sha256).hexdigest()
+    remembered = cache.get(key)
+    if remembered is not None:
+        user_id, password = remembered
+        user = get_user_model().objects.filter(pk=user_id,
+                                               is_active=True).first()
+        if user is not None and password_digest(user) == password:
+            return user
+        cache.delete(key)
+
+    try:
+        decoded = base64.b64decode(credentials).decode("utf-8")
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+    username, _, password = decoded.partition(":")
+    user = authenticate(request, username=username, password=password)
+    if user is not None and settings.API_AUTH_CACHE_SECONDS > 0:
+        cache.set(key, (user.pk, password_digest(user)),
+                  settings.API_AUTH_CACHE_SECONDS)
+    return user
+
+
+def api_user(request):
+    """
+    Integration partners use HTTP Basic Authentication
+    Logged-in agents use their session, in which case
+    the CSRF checks apply just as they do for the HTML forms
+    Returns (user, error_response)
+    """
+
+    user = basic_auth_user(request)
+    if user is not None:
+        return (user, None)
+
+    if not request.user.is_authenticated:
+        return (None, error_response(401, ["Authentication required."]))
+
+    reason = CsrfViewMiddleware(lambda req: None).process_view(
+                                        request, None, (), {})
+    if reason is not None:
+        return (None, error_response(403, ["CSRF verification failed."]))
+
+    return (request.user, None)
+
+
+def parse_payload(request):
+    """ Decode the JSON body of the request """
+    try:
+        payload = json.loads(request.body or b"{}")
+    except (ValueError, UnicodeDecodeError):
+        raise BookingRejected(400, ["The request body must be valid JSON."])
+
+    if not isinstance(payload, dict):
+        raise BookingRejected(400, ["The request body must be a JSON object."])
+    return payload
+
+
+def passenger_list(payload, key):
+    """ Fetch the list of passengers of one type from the payload """
+    passengers = payload.get(key, [])
+    if not isinstance(passengers, list):
+        raise BookingRejected(400, [f"'{key}' must be a list."])
+    if not all(isinstance(pax, dict) for pax in passengers):
+        raise BookingRejected(400, [f"Each entry of '{key}' "
+                                    f"must be an object."])
+    return passengers
+
+
+def validate_itinerary(payload):
+    """
+    Validate the itinerary using the same Create Booking Form
+    that the agents use
+    Returns the Form's cleaned data
+    """
+
+    adults = passenger_list(payload, "adults")
+    children = passenger_list(payload, "children")
+    infants = passenger_list(payload, "infants")
+
+    return_option = payload.get("return_option", "Y")
+    form_data = {"route": payload.get("route", Common.outbound_routes[0]),
+                 "return_option": return_option,
+                 "departing_date": payload.get("departing_date"),
+                 "departing_time": payload.get("departing_time"),
+                 "adults": len(adults),
+                 "children": len(children),
+                 "infants": len(infants)}
+    if return_option == "N":
+        # One-way: These fields are not used
+        # but need to be valid for the Form
+        form_data["returning_date"] = form_data["departing_date"]
+        form_data["returning_time"] = ""
+    else:
+        form_data["returning_date"] = payload.get("returning_date")
+        form_data["returning_time"] = payload.get("returning_time")
+
+    form = CreateBookingForm(form_data)
+    if not form.is_valid():
+        errors = [Common.format_error(f"{field} - {item}")
+                  for field in form.errors
+                  for item in form.errors[field]]
+        raise BookingRejected(400, errors)
+
+    cleaned_data = form.cleaned_data
+    error_message = m.journey_times_error(cleaned_data)
+    if error_message:
+        raise BookingRejected(400, [error_message])
+
+    return cleaned_data
+
+
+def validate_passengers(form_class, prefix, passengers):
+    """
+    Validate each passenger of one type using the Passenger Details Forms
+    Returns the cleaned data of each passenger
+    """
+
+    cleaned_list = []
+    errors_list = []
+    for pax in passengers:
+        form = form_class(pax)
+        if form.is_valid():
+            cleaned_list.append(form.cleaned_data)
+            errors_list.append({})
+        else:
+            cleaned_list.append({})
+            errors_list.append(form.errors)
+
+    errors = m.formset_error_messages(prefix, errors_list)
+    if errors:
+        raise BookingRejected(400, errors)
+    return cleaned_list
+
+
+def validate_all_passengers(payload, journey):
+    """
+    Validate the Adults, Children and Infants
+    together with the Bags/Remarks
+    in the same manner as the Passenger Details Form
+    """
+
+    adults_data = validate_passengers(AdultsForm, "Adult",
+                                      passenger_list(payload, "adults"))
+    children_data = validate_passengers(MinorsForm, "Child",
+                                        passenger_list(payload, "children"))
+    infants_data = validate_passengers(MinorsForm, "Infant",
+                                       passenger_list(payload, "infants"))
+
+    errors = []
+    errors_found, formset_errors = m.adults_formset_errors(adults_data)
+    if errors_found:
+        errors += m.formset_error_messages("Adult", formset_errors)
+
+    for (paxtype, is_child, cleaned_data) in (("Child", True, children_data),
+                                              ("Infant", False, infants_data)):
+        errors_found, formset_errors = m.minors_formset_errors(
+                                                cleaned_data, is_child,
+                                                journey)
+        if errors_found:
+            errors += m.formset_error_messages(paxtype, formset_errors)
+
+    bags_remarks_form = BagsRemarks({"bags": payload.get("bags", 0),
+                                     "remarks": payload.get("remarks", "")})
+    if not bags_remarks_form.is_valid():
+        errors += m.formset_error_messages("Bag/Remarks",
+                                           [bags_remarks_form.errors])
+
+    if errors:
+        raise BookingRejected(400, errors)
+
+    bags = bags_remarks_form.cleaned_data["bags"] or 0
+    remarks = bags_remarks_form.cleaned_data["remarks"] or ""
+    return (adults_data, children_data, infants_data, bags, remarks)
+
+
+def allocate_journey(flight_date, flight_number, thetime,
+                     direction, numberof_seats_needed, pnr):
+    """
+    Allocate the seats and take them in the seat log (see seatlog.py)
+    Returns the allocated seats
+    """
+
+    allocated = seatlog.take_seats(flight_date, flight_number, pnr,
+                                   m.seat_chooser(numberof_seats_needed))
+    if allocated is None:
+        event(allocation_log, INFO, "insufficient seats",
+              flight_number=flight_number, flight_date=flight_date,
+              seats_needed=numberof_seats_needed)
+        date_formatted = flight_date.strftime("%d/%m/%Y")
+        raise BookingRejected(409, [m.unavailability_message(
+                                        direction, date_formatted, thetime)])
+    event(allocation_log, DEBUG, "seats allocated",
+          flight_number=flight_number, flight_date=flight_date,
+          seats=allocated)
+    return allocated
+
+
+@metrics.timed("book_itinerary")
+def book_itinerary(user, itinerary, passengers):
+    """
+    Allocate the seats, create the Booking, Passenger and Transaction
+    records and update the Schedule Database as one atomic unit
+    Either everything is written or nothing is
+    """
+
+    adults_data, children_data, infants_data, bags, remarks = passengers
+    return_option = itinerary["return_option"]
+    outbound_time = itinerary["departing_time"]
+    outbound_flightno = itinerary["outbound_flightno"]
+    inbound_time = itinerary["returning_time"]
+    inbound_flightno = (itinerary["inbound_flightno"]
+                        if return_option == "Y" else "")
+
+    # Note: Infants sit on the laps of the Adults
+    # I.E. no seats for Infants!
+    numberof_seats_needed = len(adults_data) + len(children_data)
+
+    legs = [(outbound_flightno, itinerary["departing_date"])]
+    if return_option == "Y":
+        legs.append((inbound_flightno, itinerary["returning_date"]))
+    fees = m.price_booking(return_option, len(adults_data),
+                           len(children_data), len(infants_data), bags, legs)
+
+    with transaction.atomic():
+        pnr = m.unique_pnr()
+        outbound_seats = allocate_journey(itinerary["departing_date"],
+                                          outbound_flightno, outbound_time,
+                                          "Departing Flight",
+                                          numberof_seats_needed, pnr)
+        if return_option == "Y":
+            inbound_seats = allocate_journey(itinerary["returning_date"],
+                                             inbound_flightno, inbound_time,
+                                             "Returning Flight",
+                                             numberof_seats_needed, pnr)
+
+        booking, pax_records = m.create_booking_records(
+            pnr, itinerary, passengers,
+            (outbound_seats, inbound_seats if return_option == "Y" else []),
+            fees["total_price"], user)
+
+        mix = loads.passenger_mix((pax.pax_type, pax.wheelchair_ssr)
+                                  for pax in pax_records)
+        # Last, as the Schedule records stay locked until the end
+        outbound_schedule = seatlog.add_to_booked(itinerary["departing_date"],
+                                                  outbound_flightno,
+                                                  numberof_seats_needed)
+        m.schedule_saved(outbound_schedule, mix)
+        if return_option == "Y":
+            inbound_schedule = seatlog.add_to_booked(
+                                            itinerary["returning_date"],
+                                            inbound_flightno,
+                                            numberof_seats_needed)
+            m.schedule_saved(inbound_schedule, mix)
+
+    event(persistence_log, INFO, "booking created", pnr=booking.pnr,
+          source="api", username=str(user), amount=fees["total_price"])
+    return (booking, pax_records, fees)
+
+
+def booking_response(booking, pax_records, fees):
+    """ The JSON representation of a newly created Booking """
+
+    return {"pnr": booking.pnr,
+            "id": booking.id,
+            "total_price": f"{fees['total_price']:.2f}",
+            "fees": {key: value for (key, value) in fees.items()
+                     if key.endswith("_total")},
+            "passengers": [{"pax_number": pax.pax_number,
+                            "pax_type": pax.pax_type,
+                            "status": pax.status,
+                            "name": (f"{pax.title} {pax.first_name} "
+                                     f"{pax.last_name}"),
+                            "outbound_seat_number": pax.outbound_seat_number,
+                            "inbound_seat_number": pax.inbound_seat_number}
+                           for pax in pax_records]}
+
+
+@csrf_exempt
+@require_POST
+@admission.rate_limited("allocate", api=True)
+@admission.seat_allocation(api=True)
+def create_booking(request):
+    """
+    Create a Booking in one request
+    The JSON payload holds the complete itinerary e.g.
+
+    {"route": "LCY-IOM", "return_option": "Y",
+     "departing_date": "2024-02-01", "departing_time": "0800",
+     "returning_date": "2024-02-08", "returning_time": "2100",
+     "adults": [{"title": "MR", "first_name": "FRED",
+                 "last_name": "BLOGGS", "contact_number": "012345678",
+                 "contact_email": "", "wheelchair_ssr": "",
+                 "wheelchair_type": ""}],
+     "children": [], "infants": [],
+     "bags": 1, "remarks": ""}
+
+    'route' is optional (default the first route, see Common) and the
+    return flight flies it the other way
+    Children and Infants have a 'date_of_birth' instead of contact details
+    Responds with the PNR and the allocated seats
+
+    A request with an Idempotency-Key header is only carried out once:
+    sending it again with the same key and body gets the original
+    response (see idempotency.py)
+    """
+
+    user, response = api_user(request)
+    if response is not None:
+        return response
+
+    if not Common.initialised:
+        Common.initialisation()
+
+    key = request.headers.get(idempotency.HEADER)
+    if key is None:
+        status, result = attempt_booking(user, request)
+        return JsonResponse(result, status=status)
+
+    if not 0 < len(key) <= idempotency.MAXIMUM_KEY_LENGTH:
+        return error_response(400, [f"{idempotency.HEADER} must be from 1 "
+                                    f"to {idempotency.MAXIMUM_KEY_LENGTH} "
+                                    f"characters."])
+    request_fingerprint = idempotency.fingerprint(request.body)
+    with transaction.atomic():
+        claimed, record = idempotency.claim(key, user.username,
+                                            idempotency.API_BOOKING,
+                                            request_fingerprint,
+                                            issued=False)
+        if claimed:
+            status, result = attempt_booking(user, request)
+            idempotency.complete(record, result, status)
+            return JsonResponse(result, status=status)
+
+    return replayed_response(record, request_fingerprint)
+
+
+def attempt_booking(user, request):
+    """ Make the Booking, returning the HTTP status and JSON result """
+
+    try:
+        payload = parse_payload(request)
+        itinerary = validate_itinerary(payload)
+        passengers = validate_all_passengers(payload, {
+            "departing_date": itinerary["departing_date"],
+            "returning_date": itinerary["returning_date"],
+            "return_option": itinerary["return_option"]})
+        booking, pax_records, fees = book_itinerary(user, itinerary,
+                                                    passengers)
+    except BookingRejected as e:
+        return (e.status, {"errors": e.errors})
+
+    return (201, booking_response(booking, pax_records, fees))
+
+
+def replayed_response(record, request_fingerprint):
+    """ The response to a request whose Idempotency-Key has been used """
+
+    if record is None or record.fingerprint != request_fingerprint:
+        return error_response(422, [f"This {idempotency.HEADER} has been "
+                                    f"used for a different request."])
+    if record.state != record.DONE:
+        return error_response(409, [f"A request with this "
+                                    f"{idempotency.HEADER} is in progress."])
+
+    event(persistence_log, INFO, "api booking replayed", key=record.key,
+          username=record.username, status=record.status)
+    response = JsonResponse(idempotency.result(record), status=record.status)
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def availability_response(date_string):
+    """
+    The JSON Response listing the availability of every flight on a date
+    The date is in the format YYYY-MM-DD
+    """
+
+    try:
+        flight_date = datetime.strptime(date_string or "", "%Y-%m-%d").date()
+    except ValueError:
+        return error_response(400, ["Enter the date in the format "
+                                    "YYYY-MM-DD."])
+
+    if not Common.initialised:
+        Common.initialisation()
+
+    return JsonResponse({"date": flight_date.isoformat(),
+                         "flights": m.flight_availability(flight_date)})
+
+
+@replica_read
+@require_GET
+def availability(request):
+    """ The Availability of every flight on the date '?date=YYYY-MM-DD' """
+
+    user, response = api_user(request)
+    if response is not None:
+        return response
+
+    return availability_response(request.GET.get("date"))
+
+
+@replica_read
+@require_GET
+def flexible_dates(request):
+    """
+    The flights within a few days of a date which can seat a party e.g.
+    ?date=2024-02-01&seats=4&days=3&route=LCY-IOM
+    'seats' (default 1) is the number of Adults and Children
+    'days' (default 3) is the number of days either side of the date
+    'route' is optional (default the first route) and the inbound
+    flights fly it the other way
+    See booking/flexdates.py
+    """
+
+    user, response = api_user(request)
+    if response is not None:
+        return response
+
+    try:
+        flight_date = quote_date(request.GET.get("date"), "date")
+        counts = {}
+        for name, default, minimum, maximum in (
+                ("seats", "1", 1, Common.MAXIMUM_PAX),
+                ("days", str(flexdates.FLEXIBLE_DAYS), 0,
+                 flexdates.MAXIMUM_FLEXIBLE_DAYS)):
+            value = request.GET.get(name, default)
+            counts[name] = quote_count(int(value) if value.isdigit()
+                                       else None, name, maximum)
+            if counts[name] < minimum:
+                raise BookingRejected(400, [f"'{name}' must be a whole "
+                                            f"number from {minimum} to "
+                                            f"{maximum}."])
+        if not Common.initialised:
+            Common.initialisation()
+        route = quote_route(request.GET.get("route",
+                                            Common.outbound_routes[0]))
+    except BookingRejected as e:
+        return error_response(e.status, e.errors)
+
+    return JsonResponse(flexdates.flexible_dates(route, flight_date,
+                                                 counts["seats"],
+                                                 counts["days"]))
+
+
+@replica_read
+@require_GET
+def itineraries(request):
+    """
+    The flights, connecting or not, from one airport to another
+    on a date which can seat a party e.g.
+    ?from=LCY&to=BHD&date=2024-02-01&seats=2
+    'seats' (default 1) is the number of Adults and Children
+    See booking/itineraries.py
+    """
+
+    user, response = api_user(request)
+    if response is not None:
+        return response
+
+    airports = itinerary_search.network().airports
+    try:
+        travel_date = quote_date(request.GET.get("date"), "date")
+        origin, destination = (request.GET.get(name, "").upper()
+                               for name in ("from", "to"))
+        for name, airport in (("from", origin), ("to", destination)):
+            if airport not in airports:
+                raise BookingRejected(400, [f"'{name}' must be one of "
+                                            f"{', '.join(airports)}."])
+        if origin == destination:
+            raise BookingRejected(400, ["'from' and 'to' must be "
+                                        "different airports."])
+        value = request.GET.get("seats", "1")
+        seats_needed = quote_count(int(value) if value.isdigit() else None,
+                                   "seats", Common.MAXIMUM_PAX)
+        if seats_needed < 1:
+            raise BookingRejected(400, [f"'seats' must be a whole number "
+                                        f"from 1 to {Common.MAXIMUM_PAX}."])
+    except BookingRejected as e:
+        return error_response(e.status, e.errors)
+
+    return JsonResponse(itinerary_search.itineraries(
+        origin, destination, travel_date, seats_needed))
+
+
+def quote_date(value, name):
+    """ A date in the format YYYY-MM-DD """
+    try:
+        return datetime.strptime(value or "", "%Y-%m-%d").date()
+    except (TypeError, ValueError):
+        raise BookingRejected(400, [f"'{name}' must be a date in the "
+                                    f"format YYYY-MM-DD."])
+
+
+def quote_count(value, name, maximum=Common.MAXIMUM_PAX):
+    """ A whole number between 0 and 'maximum' """
+    if (isinstance(value, bool) or not isinstance(value, int) or
+            not 0 <= value <= maximum):
+        raise BookingRejected(400, [f"'{name}' must be a whole number "
+                                    f"from 0 to {maximum}."])
+    return value
+
+
+def quote_route(value):
+    """ The (origin, destination) of the route named 'value' """
+    if value not in Common.outbound_routes:
+        raise BookingRejected(400, [f"'route' must be one of "
+                                    f"{', '.join(Common.outbound_routes)}."])
+    return route_airports(value)
+
+
+def quote_flight(value, origin, destination, flight_date, name):
+    """
+    The flight number of the flight from 'origin' to 'destination'
+    departing at the time 'value' on 'flight_date'
+    """
+    table = timetable()
+    flight_number = table.flight_at(origin, destination, flight_date, value)
+    if flight_number is None:
+        times = [table.flights[flight_number]["flight_STD"]
+                 for flight_number in table.flights_on(origin, destination,
+                                                       flight_date)]
+        raise BookingRejected(400, [f"'{name}' must be one of "
+                                    f"{', '.join(times) or 'none'} "
+                                    f"on {flight_date:%d/%m/%Y}."])
+    return flight_number
+
+
+def parse_quote(item, number):
+    """ Convert one entry of the 'quotes' list to a fares.Quote """
+
+    if not isinstance(item, dict):
+        raise BookingRejected(400, [f"Quote {number} must be an object."])
+
+    prefix = f"Quote {number}: "
+    try:
+        adults = quote_count(item.get("adults", 1), "adults")
+        origin, destination = quote_route(item.get("route",
+                                                   Common.outbound_routes[0]))
+        outbound_date = quote_date(item.get("departing_date"),
+                                   "departing_date")
+        quote = fares.Quote(
+            outbound_flight=quote_flight(item.get("departing_time"),
+                                         origin, destination, outbound_date,
+                                         "departing_time"),
+            outbound_date=outbound_date,
+            adults=adults,
+            children=quote_count(item.get("children", 0), "children"),
+            infants=quote_count(item.get("infants", 0), "infants",
+                                adults),
+            bags=quote_count(item.get("bags", 0), "bags", 1000))
+        if item.get("return_option", "N") == "Y":
+            inbound_date = quote_date(item.get("returning_date"),
+                                      "returning_date")
+            quote = quote._replace(
+                inbound_flight=quote_flight(item.get("returning_time"),
+                                            destination, origin,
+                                            inbound_date, "returning_time"),
+                inbound_date=inbound_date)
+    except BookingRejected as e:
+        raise BookingRejected(400, [prefix + error for error in e.errors])
+    return quote
+
+
+@csrf_exempt
+@require_POST
+def quotes(request):
+    """
+    Price many journeys in one request e.g.
+
+    {"quotes": [{"route": "LCY-IOM", "return_option": "Y",
+                 "departing_date": "2024-02-01", "departing_time": "0800",
+                 "returning_date": "2024-02-08", "returning_time": "2100",
+                 "adults": 2, "children": 1, "infants": 0, "bags": 2}],
+     "load": 80}
+
+    'route' is optional as for 'create_booking'
+    'load' is optional: price the flights as if they were that
+    percent full rather than at their current load factor
+    Nothing is booked. The prices are in the same order as the quotes
+    """
+
+    user, response = api_user(request)
+    if response is not None:
+        return response
+
+    if not Common.initialised:
+        Common.initialisation()
+
+    try:
+        payload = parse_payload(request)
+        items = payload.get("quotes")
+        if not isinstance(items, list) or not items:
+            raise BookingRejected(400, ["'quotes' must be a list "
+                                        "of at least one quote."])
+        if len(items) > MAXIMUM_QUOTES:
+            raise BookingRejected(400, [f"No more than {MAXIMUM_QUOTES} "
+                                        f"quotes can be priced at once."])
+        load = payload.get("load")
+        if load is not None:
+            load = quote_count(load, "load", 100)
+        batch = [parse_quote(item, number)
+                 for number, item in enumerate(items, 1)]
+    except BookingRejected as e:
+        return error_response(e.status, e.errors)
+
+    return JsonResponse({"prices": [f"{price:.2f}" for price in
+                                    fares.quote_batch(batch, load)]})
+
+
+@replica_read
+@require_GET
+def cheapest_days(request):
+    """
+    The cheapest flight of each remaining day of a month e.g.
+    ?month=2024-02&direction=outbound&adults=2&children=0&infants=0&bags=1
+    'direction' is 'outbound' (the default) or 'inbound'
+    'route' is optional e.g. &route=LCY-IOM (default the first route)
+    and the inbound flights fly it the other way
+    """
+
+    user, response = api_user(request)
+    if response is not None:
+        return response
+
+    try:
+        month = datetime.strptime(request.GET.get("month", ""), "%Y-%m")
+    except ValueError:
+        return error_response(400, ["Enter the month in the format "
+                                    "YYYY-MM."])
+
+    direction = request.GET.get("direction", "outbound")
+    if direction not in ("outbound", "inbound"):
+        return error_response(400, ["'direction' must be 'outbound' "
+                                    "or 'inbound'."])
+
+    try:
+        counts = {}
+        for name, default in (("adults", "1"), ("children", "0"),
+                              ("infants", "0"), ("bags", "0")):
+            value = request.GET.get(name, default)
+            counts[name] = quote_count(int(value) if value.isdigit()
+                                       else None, name,
+                                       1000 if name == "bags"
+                                       else Common.MAXIMUM_PAX)
+        if counts["adults"] < 1:
+            raise BookingRejected(400, ["There must be at least one adult."])
+        if not Common.initialised:
+            Common.initialisation()
+        route = quote_route(request.GET.get("route",
+                                            Common.outbound_routes[0]))
+    except BookingRejected as e:
+        return error_response(e.status, e.errors)
+
+    days = fares.cheapest_days(month.year, month.month,
+                               direction == "outbound", route=route,
+                               **counts)
+    return JsonResponse({
+        "month": month.strftime("%Y-%m"),
+        "direction": direction,
+        "days": [{"date": day["date"].isoformat(),
+                  "flight_number": day["flight_number"],
+                  "departure_time": day["departure_time"],
+                  "total_price": (f"{day['total_price']:.2f}"
+                                  if day["total_price"] is not None
+                                  else None)}
+                 for day in days]})
+
+
+@replica_read
+@require_GET
+def sales(request):
+    """
+    The sales from the Sales Rollups, for staff only e.g.
+    ?from=2024-02-01&to=2024-02-29&group=day
+    'group' is 'day' (the default) or 'agent'
+    With 'group=day', '&username=...' restricts it to one agent
+    """
+
+    user, response = api_user(request)
+    if response is not None:
+        return response
+    if not user.is_staff:
+        return error_response(403, ["Only staff may view the sales."])
+
+    try:
+        start = quote_date(request.GET.get("from"), "from")
+        end = quote_date(request.GET.get("to"), "to")
+    except BookingRejected as e:
+        return error_response(e.status, e.errors)
+
+    group = request.GET.get("group", "day")
+    if group == "day":
+        rows = sales_reports.daily_sales(start, end,
+                                         request.GET.get("username"))
+        for row in rows:
+            row["day"] = row["day"].isoformat()
+    elif group == "agent":
+        rows = sales_reports.agent_sales(start, end)
+    else:
+        return error_response(400, ["'group' must be 'day' or 'agent'."])
+
+    for row in rows:
+        row["revenue"] = f"{row['revenue']:.2f}"
+    return JsonResponse({"from": start.isoformat(), "to": end.isoformat(),
+                         "group": group, "sales": rows})
+
+
+@replica_read
+@require_GET
+def seat_analytics(request):
+    """
+    The seat analytics of the departures of a range of dates,
+    for staff only e.g.
+    ?from=2024-04-01&to=2024-09-30&flight=MX0465&flight=MX466
+    'flight' is optional and may be repeated (default every flight)
+    See booking/analytics.py
+    """
+
+    user, response = api_user(request)
+    if response is not None:
+        return response
+    if not user.is_staff:
+        return error_response(403, ["Only staff may view the "
+                                    "seat analytics."])
+
+    try:
+        start = quote_date(request.GET.get("from"), "from")
+        end = quote_date(request.GET.get("to"), "to")
+    except BookingRejected as e:
+        return error_response(e.status, e.errors)
+    if start > end:
+        return error_response(400, ["'from' is later than 'to'."])
+    if (end - start).days >= MAXIMUM_ANALYTICS_DAYS:
+        return error_response(400, [f"No more than "
+                                    f"{MAXIMUM_ANALYTICS_DAYS} days "
+                                    f"can be analysed at once."])
+
+    if not Common.initialised:
+        Common.initialisation()
+    flights = request.GET.getlist("flight")
+    unknown = [flight for flight in flights
+               if flight not in timetable().flights]
+    if unknown:
+        return error_response(400, [f"Unknown flight {flight}."
+                                    for flight in unknown])
+
+    return JsonResponse(analytics.season_analytics(start, end, flights))
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class BookingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'booking'
+
+    def ready(self):
+        # Connect the signals which keep the compiled Fares
+        # and the Sales Rollups up to date
+        from . import fares  # noqa: F401
+        from . import sales  # noqa: F401
@@ -0,0 +1,85 @@
+"""
+Archiving Old Bookings
+
+Bookings whose flights (outbound and return) all departed more than
+ARCHIVE_AFTER_DAYS ago are moved, with their Passengers, out of the
+Booking and Passenger tables into the ArchivedBooking and
+ArchivedPassenger tables. The live tables then only hold the Bookings
+which agents are still working on, so that searching them and checking
+for unique PNRs stays quick however many years of history there are.
+
+Bookings are moved in batches, each batch in its own transaction,
+by 'manage.py archive_bookings'. An archived Booking keeps its id and
+PNR, and is still found by the Search when nothing live matches,
+but it can no longer be changed.
+"""
+
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import ArchivedBooking, ArchivedPassenger, Booking, Passenger
+
+
+def archive_cutoff(days=None):
+    """ Bookings whose last flight departed before this date are archived """
+    if days is None:
+        days = settings.ARCHIVE_AFTER_DAYS
+    return date.today() - timedelta(days=days)
+
+
+def archivable_bookings(cutoff):
+    """ The Bookings whose flights all departed before 'cutoff' """
+    return (Booking.objects.filter(outbound_date__lt=cutoff)
+            .exclude(inbound_date__gte=cutoff))
+
+
+def copy_fields(record, model, **extra):
+    """ A new 'model' instance with the same field values as 'record' """
+    values = {field.attname: getattr(record, field.attname)
+              for field in record._meta.concrete_fields}
+    return model(**values, **extra)
+
+
+def archive_batch(cutoff, batch_size):
+    """
+    Move up to 'batch_size' of the archivable Bookings
+    and their Passengers into the archive
+    Returns the number of Bookings moved
+    """
+
+    with transaction.atomic():
+        ids = list(archivable_bookings(cutoff).select_for_update()
+                   .order_by("id").values_list("id", flat=True)[:batch_size])
+        if not ids:
+            return 0
+
+        today = date.today()
+        ArchivedBooking.objects.bulk_create(
+            [copy_fields(booking, ArchivedBooking, archived_at=today)
+             for booking in Booking.objects.filter(id__in=ids)])
+        ArchivedPassenger.objects.bulk_create(
+            [copy_fields(pax, ArchivedPassenger)
+             for pax in Passenger.objects.filter(pnr_id__in=ids)])
+
+        Passenger.objects.filter(pnr_id__in=ids).delete()
+        Booking.objects.filter(id__in=ids).delete()
+        return len(ids)
+
+
+def archive_bookings(cutoff, batch_size=500, max_batches=None):
+    """
+    Move every Booking whose flights departed before 'cutoff'
+    into the archive, 'batch_size' Bookings at a time
+    Returns the number of Bookings moved
+    """
+
+    moved = batches = 0
+    while max_batches is None or batches < max_batches:
+        count = archive_batch(cutoff, batch_size)
+        moved += count
+        batches += 1
+        if count < batch_size:
+            break
+    return moved
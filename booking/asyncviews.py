@@ -0,0 +1,112 @@
+"""
+Asynchronous versions of the read-heavy views
+
+When this App is served by an ASGI server, Django runs every
+synchronous view on one shared thread so that these reads queue up
+behind each other. These views instead hand their database work
+to a bounded pool of threads which means that many searches and
+lookups can be in progress at once. The size of the pool also
+bounds the number of database connections that they can open.
+Django 3.2 has no asynchronous ORM, hence 'sync_to_async'
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.db import close_old_connections
+from django.http import HttpResponseRedirect
+from django.urls import reverse
+
+from manxairlines.db import check_all_connections
+from manxairlines.routers import replica_read
+
+from . import admission
+from . import api
+from . import views
+
+READ_EXECUTOR = ThreadPoolExecutor(max_workers=settings.ASYNC_READ_THREADS,
+                                   thread_name_prefix="booking-read")
+
+
+def run_read(func):
+    """
+    Run 'func' on the bounded pool of reader threads
+    The reader threads' connections are managed in the same way
+    as those of the request threads i.e. they are closed once
+    they become obsolete and are checked before they are reused
+    """
+
+    @wraps(func)
+    def managed(*args, **kwargs):
+        close_old_connections()
+        check_all_connections()
+        return func(*args, **kwargs)
+
+    return sync_to_async(managed, thread_sensitive=False,
+                         executor=READ_EXECUTOR)
+
+
+def async_login_required(view):
+    """
+    The asynchronous equivalent of 'login_required'
+    Fetching 'request.user' reads the session database
+    so it is done on a reader thread
+    """
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        is_authenticated = await run_read(
+                                lambda: request.user.is_authenticated)()
+        if not is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+@replica_read
+@async_login_required
+async def view_booking(request, id):
+    """ View The Booking """
+    return await run_read(views.render_booking)(request, id)
+
+
+@replica_read
+@async_login_required
+async def search_bookings(request):
+    """
+    Search for the Booking using either
+    1) The PNR
+    2) The Principal Pax (Adult 1)'s First Name
+    3) The Principal Pax (Adult 1)'s Last Name
+    """
+
+    query = request.GET.get("query", "").strip()
+    # Blank Search
+    if not query:
+        return HttpResponseRedirect(reverse("home"))
+
+    refused = await run_read(admission.limit)(
+                    request, "search", admission.search_cost(request))
+    if refused is not None:
+        return refused
+
+    return await run_read(views.render_search_results)(request, query)
+
+
+@replica_read
+async def availability(request):
+    """ The Availability of every flight on the date '?date=YYYY-MM-DD' """
+
+    if request.method != "GET":
+        return api.error_response(405, ["Only GET is allowed."])
+
+    user, response = await run_read(api.api_user)(request)
+    if response is not None:
+        return response
+
+    return await run_read(api.availability_response)(
+                                    request.GET.get("date"))
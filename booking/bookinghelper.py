@@ -6,6 +6,7 @@ I have added other methods here
 from django.shortcuts import render, get_object_or_404
 from django.http import HttpResponseRedirect
 from django.urls import reverse
+from django.db import transaction
 from django.db.models import Q, OuterRef, Subquery
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.contrib import messages
@@ -14,6 +15,7 @@ from django.core.exceptions import ValidationError
 from django.core.validators import validate_email
 
 from .models import Booking, Passenger
+from .models import ArchivedBooking
 from .models import Schedule, Transaction
 
 from .forms import AdultsForm, MinorsForm
@@ -22,6 +24,17 @@ from .forms import BagsRemarks
 from .forms import AdultsEditForm, MinorsEditForm
 
 from .common import Common
+from . import fares
+from . import loads
+from . import freeseats
+from . import seatlog
+from . import allocators
+from . import metrics
+from .timetable import MINIMUM_CONNECTION, timetable
+from .allocators import row_of_N_seats, find_N_seats  # noqa: F401
+from .logs import event, allocation_log, pricing_log
+from .logs import persistence_log, forms_log
+from logging import DEBUG, INFO, WARNING
 from datetime import datetime, date
 from dateutil.relativedelta import relativedelta
 from bitstring import BitArray
@@ -49,12 +62,6 @@ FUTURE_DATE = "Your date of birth must be in the past."
 TOO_YOUNG = ("Newly born infants younger than 14 days "
              " on the {0} will not be accepted for travel.")
 
-ADULT_PRICE = 100  # Age > 15
-CHILD_PRICE = 60  # Age 2-15
-INFANT_PRICE = 30   # Age < 2
-BAG_PRICE = 30
-CHANGE_FEE = 20
-
 ######################
 
 
@@ -78,83 +85,6 @@ CAPACITY = 96  # Number of seats in the aircraft
 LEFT_BIT_POS = CAPACITY - 1  # I.E. 95
 
 
-def row_of_N_seats(number_needed, allocated, available):
-    """ Find a 'row' of 'number_needed' seats """
-    zeros = "0b" + "0"*number_needed
-    result = available.find(zeros)
-    if not result:
-        return (False, allocated, available)
-
-    # Set the bits to 1 to represent 'taken' seats
-    bitrange = range(result[0], result[0] + number_needed)
-    available.invert(bitrange)
-
-    """
-    Determine the range of seat positions
-    e.g. 6 seats at position 77
-    77-6+1 = 72
-    so range(72, 78) = 72, 73, 74, 75, 76, 77
-    Then add that range of seats to the 'allocated' list
-    """
-    end = LEFT_BIT_POS - result[0]
-    start = end - number_needed + 1
-    seat_range = range(start, end + 1)
-    allocated += [*seat_range]
-    return (True, allocated, available)
-
-
-def find_N_seats(number_needed, allocated, available):
-    """
-    Find 'N' number of seats
-    N being 'number_needed'
-    'allocated' are all the seats found so far
-    'available' is a bitstring depicting what is available
-    This is a recursive algorithm
-    """
-
-    result = row_of_N_seats(number_needed, allocated, available)
-    if result[0]:
-        # Successfully found a row of N seats - so allocation is done!
-        return result
-
-    # if N = 1 then no available seats i.e. the flight is full
-    if number_needed == 1:
-        return (False, allocated, available)
-
-    # Otherwise, starting with M=N-1,
-    # see if it is possible to find a row of M seats
-    # if so, allocate that row of seats
-    # then see if the remainder can be allocated
-    minus1 = number_needed - 1
-    count = number_needed - 1
-    while count != 1:
-        result = row_of_N_seats(count, allocated, available)
-        if not result[0]:
-            # Try a smaller row allocation
-            count != 1
-            continue
-
-        remainder_needed = number_needed - count
-        remainder = find_N_seats(remainder_needed,
-                                 allocated + result[1], result[2])
-        if remainder[0]:
-            # Found all the seats!
-            return remainder
-
-    # Not successful in finding any 'row' > 1
-    # Therefore, allocate one seat
-    # Then repeat 'find_N_seats' for the remainder
-
-    result = row_of_N_seats(1, allocated, available)
-    """
-    Finding one seat at this stage should not fail
-    TODO: Error 500 if this is not the case!
-    """
-
-    return find_N_seats(minus1,
-                        allocated + result[1], result[2])
-
-
 def seat_number(number):
     """
     Convert the number into its corresponding 'Seat Number'
@@ -228,17 +158,26 @@ def convert_bitarray_to_hexstring(bit_array):
     """
 
 
-def report_unavailability(request, direction, date_formatted, thetime):
-    """ Send a Django Message regarding unavailability of seats """
-    message_string = (
+def unavailability_message(direction, date_formatted, thetime):
+    """ The wording used to report the unavailability of seats """
+    return (
         "There is insufficent availability "
         "for the requested {0} on {1} at {2}:{3}. "
         "Please choose an alternative flight."
         ).format(direction, date_formatted, thetime[0:2], thetime[2:])
+
+
+def report_unavailability(request, direction, date_formatted, thetime):
+    """ Send a Django Message regarding unavailability of seats """
+    message_string = unavailability_message(direction, date_formatted,
+                                            thetime)
+    event(allocation_log, INFO, "insufficient seats", direction=direction,
+          flight_date=date_formatted, time=thetime)
     messages.add_message(request, messages.ERROR,
                          message_string)
 
 
+@metrics.timed("check_availability")
 def check_availability(request, departing, outbound_date,
                        outbound_flightno, outbound_time,
                        returning, inbound_date,
@@ -248,97 +187,130 @@ def check_availability(request, departing, outbound_date,
     This routine will check whether there are enough seats
     available for the booking
     """
-    queryset = Schedule.objects.filter(flight_date=outbound_date,
-                                       flight_number=outbound_flightno)
-    if len(queryset) == 0:
-        # Empty Flight  - initialise the seatmap
-        # 96-bit string = 24 character hex-string
-        current_seatmap = "0" * 24
-        Common.outbound_schedule_id = 0
-        Common.outbound_schedule_instance = (outbound_date,
-                                             outbound_flightno)
-        Common.outbound_total_booked = 0
-    else:
-        instance = queryset[0]
-        current_seatmap = instance.seatmap
-        # Id/Instance of the Schedule Record
-        Common.outbound_schedule_id = instance.id
-        Common.outbound_total_booked = instance.total_booked
-        Common.outbound_schedule_instance = instance
 
-    # ADULTS
-    numberof_seats_needed = (cleaned_data["adults"] +
-                             cleaned_data["children"])
     # Note: Infants sit on the laps of the Adults
     # I.E. no seats for Infants!
+    numberof_seats_needed = (cleaned_data["adults"] +
+                             cleaned_data["children"])
+
+    # Turn the booking down straightaway if the number of free seats
+    # (see freeseats.py), confirmed by the Schedule, says it will not fit
+    outbound_full = outbound_flightno in freeseats.full_flights(
+                        outbound_date, [outbound_flightno],
+                        numberof_seats_needed, confirm=True)
+    inbound_full = (cleaned_data["return_option"] == "Y" and
+                    inbound_flightno in freeseats.full_flights(
+                        inbound_date, [inbound_flightno],
+                        numberof_seats_needed, confirm=True))
+    if outbound_full or inbound_full:
+        if outbound_full:
+            report_unavailability(request, departing,
+                                  outbound_date.strftime("%d/%m/%Y"),
+                                  outbound_time)
+        if inbound_full:
+            report_unavailability(request, returning,
+                                  inbound_date.strftime("%d/%m/%Y"),
+                                  inbound_time)
+        Common.outbound_allocated_seats = []
+        Common.inbound_allocated_seats = []
+        return False
+
+    Common.outbound_flight = (outbound_date, outbound_flightno,
+                              outbound_time)
 
     # Are there enough seats on the Outbound Flight?
-    bit_array = convert_string_to_bitarray(current_seatmap)
+    choose = seat_chooser(numberof_seats_needed)
+    allocated = choose(seatlog.current_seats(outbound_date, outbound_flightno))
 
     all_OK = True
-    allocated = []
-    result = find_N_seats(numberof_seats_needed, allocated, bit_array)
-    if not result[0]:
+    if allocated is None:
         # Insufficient Availability!
         date_formatted = outbound_date.strftime("%d/%m/%Y")
         report_unavailability(request, departing,
                               date_formatted, outbound_time)
         Common.outbound_allocated_seats = []
-        Common.outbound_seatmap = None
         all_OK = False
     else:
-        # Seats Allocated
-        Common.outbound_allocated_seats = result[1]
-        Common.outbound_allocated_seats.reverse()  # Descending Order
-        Common.outbound_seatmap = convert_bitarray_to_hexstring(result[2])
-        Common.outbound_total_booked += numberof_seats_needed
+        # Seats Allocated - taken once the Booking is confirmed
+        Common.outbound_allocated_seats = allocated
+        event(allocation_log, DEBUG, "seats allocated",
+              flight_number=outbound_flightno, flight_date=outbound_date,
+              seats=Common.outbound_allocated_seats)
 
     if cleaned_data["return_option"] != "Y":
         # No Return Flight
         return all_OK
 
-    queryset = Schedule.objects.filter(flight_date=inbound_date,
-                                       flight_number=inbound_flightno)
-    if len(queryset) == 0:
-        # Empty Flight  - initialise the seatmap
-        # 96-bit string = 24 character hex-string
-        current_seatmap = "0" * 24
-        Common.inbound_schedule_id = 0
-        Common.inbound_schedule_instance = (inbound_date,
-                                            inbound_flightno)
-        Common.inbound_total_booked = 0
-    else:
-        instance = queryset[0]
-        current_seatmap = instance.seatmap
-        # Id/Instance of the Schedule Record
-        Common.inbound_schedule_id = instance.id
-        Common.inbound_total_booked = instance.total_booked
-        Common.inbound_schedule_instance = instance
+    Common.inbound_flight = (inbound_date, inbound_flightno, inbound_time)
 
     # Are there enough seats on the Inbound Flight?
-    bit_array = BitArray(length=96)
-    bit_array.overwrite("0x" + current_seatmap, 0)
-
-    allocated = []
-    result = find_N_seats(numberof_seats_needed, allocated, bit_array)
-    if not result[0]:
+    allocated = choose(seatlog.current_seats(inbound_date, inbound_flightno))
+    if allocated is None:
         # Insufficient Availability!
         date_formatted = inbound_date.strftime("%d/%m/%Y")
         report_unavailability(request, returning, date_formatted, inbound_time)
         Common.inbound_allocated_seats = []
-        Common.inbound_seatmap = None
         all_OK = False
 
     else:
-        # Seats Allocated
-        Common.inbound_allocated_seats = result[1]
-        Common.inbound_allocated_seats.reverse()  # Descending Order
-        Common.inbound_seatmap = convert_bitarray_to_hexstring(result[2])
-        Common.inbound_total_booked += numberof_seats_needed
+        # Seats Allocated - taken once the Booking is confirmed
+        Common.inbound_allocated_seats = allocated
+        event(allocation_log, DEBUG, "seats allocated",
+              flight_number=inbound_flightno, flight_date=inbound_date,
+              seats=Common.inbound_allocated_seats)
 
     return all_OK
 
-""" 
+
+def flight_availability(flight_date):
+    """
+    Return the availability of every flight operating on the given date
+    (see timetable.py)
+    Flights which nobody has booked yet have no Schedule record
+    so they are entirely free
+    The figures come from the cached numbers of free seats
+    """
+
+    table = timetable()
+    flight_numbers = [flight_number for flight_number in
+                      (Common.outbound_listof_flights +
+                       Common.inbound_listof_flights)
+                      if table.operates(flight_number, flight_date)]
+    free_seats = freeseats.free_seats(flight_date, flight_numbers)
+
+    availability = []
+    for flight_number in flight_numbers:
+        info = table.flights[flight_number]
+        free = free_seats[flight_number]
+        availability.append({"flight_number": flight_number,
+                             "flight_from": info["flight_from"],
+                             "flight_to": info["flight_to"],
+                             "outbound": info["outbound"],
+                             "departure_time": info["flight_STD"],
+                             "arrival_time": info["flight_STA"],
+                             "capacity": info["capacity"],
+                             "booked": info["capacity"] - free,
+                             "free": free})
+    return availability
+
+
+def seat_chooser(numberof_seats_needed):
+    """
+    The function used by 'seatlog.take_seats' to allocate seats
+    It is given the seats already taken and returns the seat positions
+    allocated (see allocators.py) or None if there is insufficient
+    availability
+    """
+
+    allocate = allocators.allocator()
+
+    def choose(taken):
+        with metrics.stage("find_seats"):
+            return allocate(taken, numberof_seats_needed)
+
+    return choose
+
+"""
 What follows are a series of patches and Work-arounds
 to 'fix' a group of intermittent errors that ONLY occur
 when this App runs on Heroku
@@ -466,9 +438,9 @@ def heroku_display_fix():
         Common.save_context["display"]["inbound_date"] = (
               Common.the_inbound_date)
 
-        # TODO
-        messages.add_message(request, messages.ERROR,
-                                     "DISPLAY " + Common.the_outbound_date)
+    event(forms_log, DEBUG, "display dates restored",
+          outbound_date=Common.save_context["display"]["outbound_date"],
+          inbound_date=Common.save_context["display"].get("inbound_date"))
 
 
 def heroku_editmode_fix(request):
@@ -476,10 +448,9 @@ def heroku_editmode_fix(request):
     Heroku fix: just in case 'Common.paxdetails_editmode'
     loses its value - ensure they are identical
     """
-    messages.add_message(request, messages.ERROR,
-                         "EFIX" + str(Common.paxdetails_editmode))
-    messages.add_message(request, messages.ERROR,
-                         "EFIX2" + str(Common.heroku_editmode))
+    event(forms_log, DEBUG, "edit mode check",
+          editmode=Common.paxdetails_editmode,
+          heroku_editmode=Common.heroku_editmode)
     return # TODO
     if Common.paxdetails_editmode != Common.heroku_editmode:
         Common.paxdetails_editmode = Common.heroku_editmode
@@ -508,15 +479,9 @@ def heroku_details_fix(request):
     exists with values at this stage
     """
 
-    messages.add_message(request, messages.ERROR,
-                                     type(Common.the_original_details))
-
     if (hasattr(Common, "save_context") and
         Common.save_context is not None and
         "original_pax_details" in Common.save_context):
-        print("CHECK1", Common.save_context["original_pax_details"]) # TODO
-        messages.add_message(request, messages.ERROR,
-                                     type(Common.save_context["original_pax_details"]))
         return
     
     if not hasattr(Common, "save_context"):
@@ -526,9 +491,8 @@ def heroku_details_fix(request):
     Common.save_context["original_pax_details"] = (
         Common.the_original_details
     )
-    print("CHECK2", Common.the_original_details) # TODO
-    messages.add_message(request, messages.ERROR,
-                                     type(Common.save_context["original_pax_details"]))
+    event(forms_log, DEBUG, "original pax details restored",
+          passengers=len(Common.the_original_details or []))
 
 
 def heroku_hidden_fix():
@@ -569,34 +533,46 @@ def unique_pnr():
     matches = 1
     while matches > 0:
         newpnr = generate_random_pnr()
-        # Is it Unique?
-        matches = Booking.objects.filter(pnr=newpnr)[:1].count()
+        # Is it Unique? Including the Archived Bookings
+        matches = (Booking.objects.filter(pnr=newpnr)[:1].count() or
+                   ArchivedBooking.objects.filter(pnr=newpnr)[:1].count())
 
     return newpnr
 
 
-def calc_time_difference(return_time, depart_time):
+def journey_times_error(cleaned_data):
     """
-    Calculate the difference between these two times
-    Which are represented as 4 character strings
-    e.g. '1130'
+    Check the Journey Times of a validated Create Booking Form
+    The flights are those found by the Form (see forms.py)
+    Returns the error message to be displayed
+    or None if the times are acceptable
     """
 
-    return_time = int(return_time)
-    quotient_rem = divmod(return_time, 100)
-    return_time = (quotient_rem[0] * 60 +
-                   quotient_rem[1])
+    table = timetable()
+    outbound_flightno = cleaned_data["outbound_flightno"]
+    if (cleaned_data["return_option"] == "Y" and
+            cleaned_data["returning_date"] == cleaned_data["departing_date"]):
+        # Same Day Travel - Is there enough time between journey times?
+        inbound_flightno = cleaned_data["inbound_flightno"]
+        depart_time = table.flights[outbound_flightno]["std"]
+        return_time = table.flights[inbound_flightno]["std"]
+        if return_time < depart_time:
+            return ("Returning Time - The time of the return flight "
+                    "cannot be in the past.")
 
-    depart_time = int(depart_time)
-    quotient_rem = divmod(depart_time, 100)
-    depart_time = (quotient_rem[0] * 60 +
-                   quotient_rem[1])
-    if return_time < depart_time:  # In the Past!
-        return return_time - depart_time
+        if return_time - table.arrival(outbound_flightno) < MINIMUM_CONNECTION:
+            return (f"Returning Time - The interval between flights cannot "
+                    f"be less than {MINIMUM_CONNECTION} minutes.")
 
-    # Add 1HR45MINS = 105 minutes to the Departure Time
-    depart_time += 105
-    return return_time - depart_time
+    if (cleaned_data["departing_date"] == datetime.now().date()):
+        # User has selected today's date - check the time HH:MM
+        timenow = datetime.now()
+        if (table.flights[outbound_flightno]["std"] <
+                timenow.hour * 60 + timenow.minute):
+            return ("Departing Time - The time of the outbound flight "
+                    "cannot be in the past.")
+
+    return None
 
 
 def reset_common_fields(request):
@@ -607,15 +583,11 @@ def reset_common_fields(request):
     would hold many values
     """
     Common.save_context = {}
-    Common.outbound_schedule_instance = None
-    Common.inbound_schedule_instance = None
-    Common.outbound_seatmap = None
-    Common.inbound_seatmap = None
+    Common.outbound_flight = None
+    Common.inbound_flight = None
     Common.outbound_allocated_seats = []
     Common.inbound_allocated_seats = []
-    # TODO
-    messages.add_message(request, messages.ERROR,
-                                     "edit mode reset")
+    event(forms_log, DEBUG, "edit mode reset")
     Common.paxdetails_editmode = None
     # Heroku fix
     Common.heroku_editmode = None
@@ -625,205 +597,150 @@ def reset_common_fields(request):
 
 def create_transaction_record(request):
     """ Record the Fees charged into the Transaction database """
-    # New Instance
-    trans_record = Transaction()
-
     # Heroku fix
-    print("TP2", Common.the_pnr, Common.the_total_price) # TODO 
-    trans_record.pnr = Common.save_context.get("pnr", Common.the_pnr);    
-    trans_record.amount = Common.save_context.get("total_price", Common.the_total_price)
+    record_transaction(Common.save_context.get("pnr", Common.the_pnr),
+                       Common.save_context.get("total_price",
+                                               Common.the_total_price),
+                       request.user)
 
 
-    trans_record.username = request.user
-    # Write the new Transaction record
-    trans_record.save()
+def save_schedule_record(flight, seats_booked):
+    """
+    Add the newly Booked seats to the flight's Booked Figure
+    'flight' - (flight_date, flight_number, time)
+    Returns the Schedule record
+    """
 
+    flight_date, flight_number, _ = flight
+    schedule = seatlog.add_to_booked(flight_date, flight_number,
+                                     seats_booked)
+    event(persistence_log, DEBUG, "schedule saved",
+          flight_number=schedule.flight_number,
+          flight_date=schedule.flight_date,
+          total_booked=schedule.total_booked)
+    return schedule
 
-def save_schedule_record(id, instance, total_booked, seatmap):
-    """ Save this Instance of the Schedule Database """
 
-    if id:
-        # Update Existing Record
-        schedule = instance
-    else:
-        # New Instance
-        schedule = Schedule()
-        schedule.flight_date = instance[0]
-        schedule.flight_number = instance[1]
+def booked_passenger_mix():
+    """
+    The types and Wheelchair SSRs of the newly Booked Passengers
+    held in 'Common.save_context'
+    """
+
+    passengers = [("A", data["wheelchair_ssr"])
+                  for data in Common.save_context["adults_data"]]
+    if Common.save_context["children_included"]:
+        passengers += [("C", data["wheelchair_ssr"])
+                       for data in Common.save_context["children_data"]]
+    if Common.save_context["infants_included"]:
+        passengers += [("I", data["wheelchair_ssr"])
+                       for data in Common.save_context["infants_data"]]
+    return loads.passenger_mix(passengers)
 
-    schedule.total_booked = total_booked
-    schedule.seatmap = seatmap
-    # Save Schedule record
-    schedule.save()
+
+def schedule_saved(schedule, mix=loads.NO_PASSENGERS):
+    """
+    Bring the figures kept alongside a Schedule record into step with it
+    i.e. the flight's Departure Load and its number of free seats
+    'mix' - the PassengerMix of the passengers added or removed
+    """
+
+    loads.record_departure_load(schedule.flight_date, schedule.flight_number,
+                                schedule.total_booked, mix)
+    freeseats.forget_free_seats(schedule.flight_date, schedule.flight_number)
 
 
 def update_schedule_database(request):
     """
     Update the Schedule Database
-    with an updated seatmap for selected Date/Flight
+    with an updated Booked Figure for selected Date/Flight
     reflecting the newly Booked Passengers
+    (their seats having been taken by 'take_booked_seats')
+    Also update the Departure Loads of the flights
     """
 
+    mix = booked_passenger_mix()
+
     # Outbound Flight
-    save_schedule_record(Common.outbound_schedule_id,
-                         Common.outbound_schedule_instance,
-                         Common.outbound_total_booked,
-                         Common.outbound_seatmap)
+    schedule = save_schedule_record(Common.outbound_flight,
+                                    len(Common.outbound_allocated_seats))
+    schedule_saved(schedule, mix)
 
     if Common.save_context["return_option"] != "Y":
         return
 
     # Return Flight
-    save_schedule_record(Common.inbound_schedule_id,
-                         Common.inbound_schedule_instance,
-                         Common.inbound_total_booked,
-                         Common.inbound_seatmap)
-
-
-def create_booking_instance(request, pnr):
-    """
-    Create the Booking Record instance
-    All the Booking information is stored
-    in the Class Variable 'Common.save_context'
-    """
-
-    # New Instance
-    booking = Booking()
-    booking.pnr = pnr
-    # Heroku fix
-    # TODO
-    print("CD2", Common.save_context)
-    # print("CD3", Common.save_context["depart_pos"])
-    # print("CD3A", Common.save_context["return_pos"])
-    print("CD3B", Common.save_context.get("depart_pos"))
-    print("CD3C", Common.save_context.get("return_pos"))
-    print("KEYS")
-
-    # Heroku fix
-    depart_pos = Common.save_context.get("depart_pos",
-                        Common.the_depart_pos)
-
-    # TODO
-    print("DPR", Common.the_depart_pos, Common.the_return_pos, Common.the_return_option,
-    Common.the_total_price, Common.the_bags, Common.the_remarks)
-    # Outbound Flight Info
-    outbound_flightno = Common.outbound_listof_flights[depart_pos]
-    booking.outbound_date = Common.save_context["booking"]["departing_date"]
-    booking.outbound_flightno = outbound_flightno
-    booking.flight_from = Common.flight_info[outbound_flightno]["flight_from"]
-    booking.flight_to = Common.flight_info[outbound_flightno]["flight_to"]
-
-    # Heroku fix
-    return_option = Common.save_context.get("return_option",
-                           Common.the_return_option)
-    if return_option == "Y":
-        # Inbound Flight Info
-        booking.return_flight = True
-        booking.inbound_date = Common.save_context["booking"]["returning_date"]
-
-        # Heroku fix
-        return_pos = Common.save_context.get("return_pos",
-                           Common.the_return_pos)
-
-        booking.inbound_flightno = Common.inbound_listof_flights[return_pos]
+    schedule = save_schedule_record(Common.inbound_flight,
+                                    len(Common.inbound_allocated_seats))
+    schedule_saved(schedule, mix)
 
-    else:
-        # One-way:
-        booking.return_flight = False
-        booking.inbound_date = None
-        booking.inbound_flightno = ""
-
-    # Heroku fix TODO
-    total_price = Common.save_context.get("total_price",
-                         Common.the_total_price)
-    # TODO
-    print("TP",Common.the_total_price)
-
-    booking.fare_quote = total_price
-    booking.ticket_class = "Y"
-    booking.cabin_class = "Y"
-    booking.number_of_adults = Common.save_context["booking"]["adults"]
-    number_of_adults = booking.number_of_adults
-
-    booking.number_of_children = (Common.save_context["booking"]["children"]
-                                  if Common.save_context["children_included"]
-                                  else 0)
-    number_of_children = booking.number_of_children
-
-    booking.number_of_infants = (Common.save_context["booking"]["infants"]
-                                 if Common.save_context["infants_included"]
-                                 else 0)
-    number_of_infants = booking.number_of_infants
-
-    booking.departure_time = (
-        Common.flight_info[outbound_flightno]["flight_STD"])
-    booking.arrival_time = Common.flight_info[outbound_flightno]["flight_STA"]
-    # Heroku fix
-    booking.number_of_bags = Common.save_context.get("bags",
-                                    Common.the_bags)
-    remarks = Common.save_context.get("remarks",
-                    Common.the_remarks)
 
-    booking.remarks = remarks.strip().upper()
-    # Write the new Booking record
-    booking.save()
-
-    # Return the Numbers of each Passenger type
-    return (booking, number_of_adults, number_of_children, number_of_infants)
-
-
-def determine_seatnumber(request, paxno, pax_type):
+def take_booked_seats(request):
     """
-    Convert the numerical seat number into an aircraft seat number
-    EG   0 is 1A, 1 is 1B , 2 is 1C, 3 is 1D, 4 is 2A, ...
-       91 is 23D, 92 is 24A, 93 is 24B, 94 is 24C, 95 is 24D
+    Take the seats allocated by 'check_availability' in the seat log
+    (see seatlog.py). Should any have been taken by another Booking
+    since, seats are allocated afresh.
+    Returns False, having reported it, if the party no longer fits
     """
 
-    outbound_seatno = (seat_number(Common.outbound_allocated_seats[paxno])
-                       if pax_type != "I" else "")
+    pnr = Common.save_context.get("pnr", Common.the_pnr)
+    chooser = seat_chooser(len(Common.outbound_allocated_seats))
 
-    inbound_seatno = (seat_number(Common.inbound_allocated_seats[paxno])
-                      if Common.save_context["return_option"] == "Y"
-                      and pax_type != "I" else "")
+    # Outbound Flight
+    flight_date, flight_number, thetime = Common.outbound_flight
+    seats = seatlog.take_seats(flight_date, flight_number, pnr, chooser,
+                               Common.outbound_allocated_seats)
+    if seats is None:
+        report_unavailability(request, "Departing Flight",
+                              flight_date.strftime("%d/%m/%Y"), thetime)
+        return False
+    Common.outbound_allocated_seats = seats
 
-    return (outbound_seatno, inbound_seatno)
+    if Common.save_context["return_option"] != "Y":
+        return True
 
+    # Return Flight
+    flight_date, flight_number, thetime = Common.inbound_flight
+    seats = seatlog.take_seats(flight_date, flight_number, pnr, chooser,
+                               Common.inbound_allocated_seats)
+    if seats is None:
+        report_unavailability(request, "Returning Flight",
+                              flight_date.strftime("%d/%m/%Y"), thetime)
+        return False
+    Common.inbound_allocated_seats = seats
+    return True
 
-def create_pax_instance(request,
-                        booking, dataset_name, key, paxno, pax_type,
-                        order_number,
-                        infant_status_number,
-                        outbound_seatno, inbound_seatno):
 
+def new_passenger(booking, data, pax_type, order_number, status_number,
+                  outbound_seatno, inbound_seatno):
     """
-    Create the actual Passenger Record instance
-    All the Passenger information is stored
-    in the Class Variable 'Common.save_context'
+    Create (but do not save) a Passenger record
 
     order_number: First Pax numbered 1, 2nd 2, etc
-    infant_status_number:
+    status_number:
     Infant's Status Number matches each corresponding Adult's Status Number
     which starts at 1 i.e. Adult 1 - the Principal Passenger
 
-    The data for each passenger is in 'dataset'
-    'dataset' is a 'list' of each passenger's info e.g.
-    [{'title': 'MR', 'first_name': 'FRED', 'last_name': 'BLOGGS',
+    'data' is the passenger's info as entered on the form e.g.
+    {'title': 'MR', 'first_name': 'FRED', 'last_name': 'BLOGGS',
     'contact_number': '012345678', 'contact_email': '',
-    'wheelchair_ssr': '', 'wheelchair_type': ''},
-    {'title': 'MR', 'first_name': 'JOE', 'last_name': 'BLOGGS',
-    'contact_number': '', 'contact_email': '',
-    'wheelchair_ssr': '', 'wheelchair_type': ''}]
-    """
-
-    pax = Passenger()
-    pax.pnr = booking  # Foreign Key
-    # Fetch a record of data which represents a form eg
-    data = Common.save_context[dataset_name][paxno]
-    pax.title = data["title"].strip().upper()
-    pax.first_name = data["first_name"].strip().upper()
-    pax.last_name = data["last_name"].strip().upper()
-    pax.pax_type = pax_type
-    pax.pax_number = order_number
+    'wheelchair_ssr': '', 'wheelchair_type': ''}
+    """
+
+    pax = Passenger(pnr=booking,  # Foreign Key
+                    title=data["title"].strip().upper(),
+                    first_name=data["first_name"].strip().upper(),
+                    last_name=data["last_name"].strip().upper(),
+                    pax_type=pax_type,
+                    pax_number=order_number,
+                    outbound_seat_number=outbound_seatno,
+                    inbound_seat_number=inbound_seatno,
+                    status=f"HK{status_number}",
+                    # SSR: Blank or R for WCHR, S for WCHS, C for WCHC
+                    wheelchair_ssr=data["wheelchair_ssr"],
+                    # Type: Blank or M for WCMP, L for WCLB;
+                    # D for WCBD; W for WCBW
+                    wheelchair_type=data["wheelchair_type"])
 
     # Date of Birth is NULL for Adult
     # Contact Details are "" for Non-Adult
@@ -833,121 +750,149 @@ def create_pax_instance(request,
         pax.contact_email = data["contact_email"].strip().upper()
     else:
         pax.date_of_birth = data["date_of_birth"]
-        pax.contact_number = ""
-        pax.contact_email = ""
-
-    pax.outbound_seat_number = outbound_seatno
-    pax.inbound_seat_number = inbound_seatno
-    pax.status = (f"HK{order_number}" if pax_type != "I"
-                  else f"HK{infant_status_number}")
-    order_number += 1
-    infant_status_number += 1
-
-    # SSR: # Blank or R for WCHR, S for WCHS, C for WCHC
-    pax.wheelchair_ssr = data["wheelchair_ssr"]
+    return pax
 
-    # Type: Blank or M for WCMP, L for WCLB; D for WCBD; W for WCBW
-    pax.wheelchair_type = data["wheelchair_type"]
-
-    return (pax, order_number, infant_status_number)
-
-
-def write_passenger_record(request,
-                           booking, passenger_type, plural, pax_type,
-                           number_of_pax_type,
-                           # First Pax numbered 1, 2nd 2, etc
-                           order_number, editing_pax_details):
-    """
-    Passenger Records
-
-    Passenger Info is stored in
-    Common.save_context["adults_data"]
-    Common.save_context["children_data"]
-    Common.save_context["infants_data"]
-
-    For each passenger allocate new seats
-    for both the outbound and optionally the inbound flights
-    """
-
-    dataset_name = f"{plural}_data"  # EG "adults_data"
-    paxno = 0
-    key = f"{passenger_type}-{paxno}-"
-    infant_status_number = 1
-    while paxno < number_of_pax_type:
-        outbound_seatno, inbound_seatno = (
-                            determine_seatnumber(request,
-                                                 order_number - 1,
-                                                 pax_type))
-        tuple = create_pax_instance(request,
-                                    booking, dataset_name, key,
-                                    paxno, pax_type,
-                                    order_number, infant_status_number,
-                                    outbound_seatno, inbound_seatno)
-        pax, order_number, infant_status_number = tuple
-        pax.save()
-        paxno += 1
-
-    return order_number
 
+def record_transaction(pnr, amount, username):
+    """ Record the Fees charged into the Transaction database """
+    trans_record = Transaction.objects.create(pnr=pnr, amount=amount,
+                                              username=str(username))
+    event(persistence_log, INFO, "transaction created",
+          pnr=trans_record.pnr, amount=trans_record.amount,
+          username=trans_record.username)
+    return trans_record
+
+
+def create_booking_records(pnr, itinerary, passengers, seats, total_price,
+                           username):
+    """
+    Create the Booking Record, a Passenger Record for each passenger
+    attached to the Booking and the Transaction Record of the fees
+    Used by both the Booking Form (see 'create_new_booking_records')
+    and the API (see api.py) so that their records are the same
+
+    'itinerary' - 'return_option', 'departing_date', 'outbound_flightno',
+                  'returning_date' and 'inbound_flightno'
+    'passengers' - (adults_data, children_data, infants_data, bags, remarks)
+    'seats' - (outbound seat positions, inbound seat positions)
+              one for each Adult and Child, in that order
+    Returns (booking, pax_records)
+    """
+
+    adults_data, children_data, infants_data, bags, remarks = passengers
+    outbound_seats, inbound_seats = seats
+    return_flight = itinerary["return_option"] == "Y"
+    outbound_flightno = itinerary["outbound_flightno"]
+    flight = timetable().flights[outbound_flightno]
+
+    # Only the PNR, the flights and the numbers of passengers
+    # are logged - never the passengers' personal details
+    event(persistence_log, DEBUG, "creating booking", pnr=pnr,
+          outbound_flightno=outbound_flightno,
+          inbound_flightno=itinerary["inbound_flightno"],
+          return_option=itinerary["return_option"],
+          adults=len(adults_data), children=len(children_data),
+          infants=len(infants_data), total_price=total_price, bags=bags)
+
+    booking = Booking(
+        pnr=pnr,
+        flight_from=flight["flight_from"],
+        flight_to=flight["flight_to"],
+        return_flight=return_flight,
+        outbound_date=itinerary["departing_date"],
+        outbound_flightno=outbound_flightno,
+        inbound_date=itinerary["returning_date"] if return_flight else None,
+        inbound_flightno=(itinerary["inbound_flightno"] if return_flight
+                          else ""),
+        fare_quote=total_price,
+        ticket_class="Y",
+        cabin_class="Y",
+        number_of_adults=len(adults_data),
+        number_of_children=len(children_data),
+        number_of_infants=len(infants_data),
+        number_of_bags=bags,
+        departure_time=flight["flight_STD"],
+        arrival_time=flight["flight_STA"],
+        remarks=remarks.strip().upper())
+    booking.save()
 
-def create_new_booking_pax_records(request):
-    """
-    Create the Booking Record
-    Create a Passenger Record for each passenger attached to the Booking
+    # Passengers are numbered Adults first, then Children then Infants
+    # Infants sit on the laps of the Adults i.e. no seats for Infants!
+    # and share the status number of their accompanying Adult
+    pax_records = []
+    order_number = 1
+    for (pax_type, dataset) in (("A", adults_data), ("C", children_data)):
+        for data in dataset:
+            seat_index = order_number - 1
+            outbound_seatno = seat_number(outbound_seats[seat_index])
+            inbound_seatno = (seat_number(inbound_seats[seat_index])
+                              if return_flight else "")
+            pax_records.append(new_passenger(booking, data, pax_type,
+                                             order_number, order_number,
+                                             outbound_seatno,
+                                             inbound_seatno))
+            order_number += 1
+
+    for infant_status_number, data in enumerate(infants_data, start=1):
+        pax_records.append(new_passenger(booking, data, "I", order_number,
+                                         infant_status_number, "", ""))
+        order_number += 1
+
+    Passenger.objects.bulk_create(pax_records)
+
+    record_transaction(pnr, total_price, username)
+    return (booking, pax_records)
+
+
+def create_new_booking_records(request):
+    """
+    Create the Booking, Passenger and Transaction Records
+    of the Booking Form
     There will be at least ONE Adult Passenger for each booking
     All the information is stored in the Class Variable 'Common.save_context'
     """
 
-    # New Booking Instance
-    # TODO
-    print("CC3", request.POST.get("pnr"), request.POST)
-    print("CC3A", Common.save_context)
-    g = Common.save_context.get("pnr")
-    print("pnr=", g)
-    # TODO
-    # f = Common.save_context.get("booking")
-    # print("F1",f)
-    # print("PNR2=",f.get("pnr"))
+    booking_data = Common.save_context["booking"]
+    # Heroku fix
+    return_option = Common.save_context.get("return_option",
+                                            Common.the_return_option)
+    itinerary = {
+        "return_option": return_option,
+        "departing_date": booking_data["departing_date"],
+        "outbound_flightno": Common.save_context.get(
+                                "outbound_flightno",
+                                Common.the_outbound_flightno),
+        "returning_date": booking_data.get("returning_date"),
+        "inbound_flightno": Common.save_context.get(
+                                "inbound_flightno",
+                                Common.the_inbound_flightno)}
+
+    number_of_children = (booking_data["children"]
+                          if Common.save_context["children_included"] else 0)
+    number_of_infants = (booking_data["infants"]
+                         if Common.save_context["infants_included"] else 0)
+    passengers = (
+        Common.save_context["adults_data"][:booking_data["adults"]],
+        (Common.save_context["children_data"][:number_of_children]
+         if number_of_children else []),
+        (Common.save_context["infants_data"][:number_of_infants]
+         if number_of_infants else []),
+        # Heroku fix
+        Common.save_context.get("bags", Common.the_bags),
+        Common.save_context.get("remarks", Common.the_remarks))
+
+    seats = (Common.outbound_allocated_seats,
+             Common.inbound_allocated_seats if return_option == "Y" else [])
+
     # Include Heroku fix
-    pnr = Common.save_context.get("pnr", Common.the_pnr)
-    print("PNR=", pnr) # TODO
-    tuple = create_booking_instance(request, pnr)
-    booking, number_of_adults, number_of_children, number_of_infants = tuple
-
-    # Now create the corresponding Passenger Records
-    # Adult Passengers
-    passenger_type = "adult"
-    plural = "adults"
-    pax_type = "A"
-    order_number = write_passenger_record(request,
-                                          booking, passenger_type,
-                                          plural, pax_type,
-                                          number_of_adults,
-                                          1, False)
-
-    # Child Passengers
-    if number_of_children > 0:
-        passenger_type = "child"
-        plural = "children"
-        pax_type = "C"
-        order_number = write_passenger_record(request,
-                                              booking, passenger_type,
-                                              plural, pax_type,
-                                              number_of_children,
-                                              order_number, False)
-
-    # Infant Passengers
-    if number_of_infants > 0:
-        passenger_type = "infant"
-        plural = "infants"
-        pax_type = "I"
-        order_number = write_passenger_record(request,
-                                              booking, passenger_type,
-                                              plural, pax_type,
-                                              number_of_infants,
-                                              order_number, False)
+    create_booking_records(Common.save_context.get("pnr", Common.the_pnr),
+                           itinerary, passengers, seats,
+                           Common.save_context.get("total_price",
+                                                   Common.the_total_price),
+                           request.user)
 
 
+@metrics.timed("create_new_records")
 def create_new_records(request):
     """
     Create the Booking Record
@@ -955,73 +900,93 @@ def create_new_records(request):
 
     Create a Transaction Record record of the fees charged
 
-    Update the Schedule Database
-    with an updated seatmap for selected Dates/Flights
-    reflecting the Booked Passengers
+    Take the Booked Passengers' seats in the seat log and
+    update the Schedule Database for selected Dates/Flights
+
+    Returns the PNR or None if the Booking could not be made
     """
 
-    create_new_booking_pax_records(request)
-    create_transaction_record(request)
-    update_schedule_database(request)
+    with transaction.atomic():
+        seats_taken = take_booked_seats(request)
+        if seats_taken:
+            create_new_booking_records(request)
+            update_schedule_database(request)
+        else:
+            # The flight has filled up since the seats were allocated
+            transaction.set_rollback(True)
+
+    if not seats_taken:
+        reset_common_fields(request)  # RESET!
+        return None
+
+    pnr = Common.save_context["pnr"]
+    event(persistence_log, INFO, "booking created", pnr=pnr)
 
     # Indicate success
     messages.add_message(request, messages.SUCCESS,
-                         ("Booking {0} Created Successfully"
-                          .format(Common.save_context["pnr"])))
+                         "Booking {0} Created Successfully".format(pnr))
 
     reset_common_fields(request)  # RESET!
+    return pnr
 
 
-def freeup_seats(thedate, flightno, seat_numbers_list):
+def freeup_seats(thedate, flightno, seat_numbers_list, pnr,
+                 mix=loads.NO_PASSENGERS):
     """
-    Fetch the relevant flight from the Schedule Database
+    Check the relevant flight is in the Schedule Database
     using 'thedate & flightno'
-    Then for each number in 'seat_numbers_list',
-    reset the seats' 'bit-string' positions to 0 indicating
-    that the seat is now available.
+    Then release each seat in 'seat_numbers_list'
+    in the seat log (see seatlog.py) on behalf of the Booking 'pnr'
+    indicating that the seat is now available.
     Also update the Booked figure.
+    'mix' - the (negative) PassengerMix of the departing passengers
+    for the flight's Departure Load, which is updated even when no
+    seats are freed e.g. for Infants, who have no seats
     """
     queryset = Schedule.objects.filter(flight_date=thedate,
                                        flight_number=flightno)
-    if len(queryset) == 0:
+    if not queryset.exists():
         """
         Defensive - should always exist i.e. length nonzero
-        TODO: Error 500 If Zero!
+        Logged - 'manage.py check_inventory' finds and repairs
+        any flights whose records have drifted apart
         """
+        event(allocation_log, WARNING, "no schedule to free seats from",
+              flight_number=flightno, flight_date=thedate,
+              seats=seat_numbers_list)
+        loads.record_departure_load(thedate, flightno, change=mix)
         return
 
-    schedule = queryset[0]
-    bit_array = convert_string_to_bitarray(schedule.seatmap)
-    removed_seats_count = 0
-
+    removed_seats = []
     for seatpos in seat_numbers_list:
         if seatpos < 0 or seatpos >= CAPACITY:
             """
             Defensive - should be between 0-95
-            TODO: Error 500 If This Is Not The Case
+            Logged - see 'manage.py check_inventory'
             """
+            event(allocation_log, WARNING, "seat out of range",
+                  flight_number=flightno, flight_date=thedate, seat=seatpos)
             continue
 
-        # For the correct 'leftmost' position
-        # subtract from 95
-        bit_array.overwrite("0b0", LEFT_BIT_POS - seatpos)
-        removed_seats_count += 1
-
-    seatmap = convert_bitarray_to_hexstring(bit_array)
+        removed_seats.append(seatpos)
 
-    if removed_seats_count == 0:
+    if not removed_seats:
         """
         Defensive - should be nonzero
-        TODO: Error 500 If This Is Not The Case
+        Logged - see 'manage.py check_inventory'
         """
+        event(allocation_log, WARNING, "no seats freed",
+              flight_number=flightno, flight_date=thedate,
+              seats=seat_numbers_list)
+        loads.record_departure_load(thedate, flightno, change=mix)
         return
 
-    schedule.seatmap = seatmap
+    seatlog.release_seats(thedate, flightno, removed_seats, pnr)
     # Updated Flight's Booked Figure
-    schedule.total_booked -= removed_seats_count
-
-    # Update Schedule Record
-    schedule.save()
+    schedule = seatlog.add_to_booked(thedate, flightno, -len(removed_seats))
+    schedule_saved(schedule, mix)
+    event(allocation_log, DEBUG, "seats freed", flight_number=flightno,
+          flight_date=thedate, seats=seat_numbers_list)
 
 
 def list_pax_seatnos(passenger_record, key):
@@ -1049,17 +1014,19 @@ def realloc_seats_first(request, id, booking):
     # Retrieve the Passengers
     queryset = Passenger.objects.filter(pnr_id=id).order_by("pax_number")
     passenger_list = queryset.values()
+    mix = loads.passenger_mix(((pax["pax_type"], pax["wheelchair_ssr"])
+                               for pax in passenger_list), sign=-1)
     seat_numbers_list = list_pax_seatnos(passenger_list,
                                          "outbound_seat_number")
     freeup_seats(booking.outbound_date, booking.outbound_flightno,
-                 seat_numbers_list)
+                 seat_numbers_list, booking.pnr, mix)
 
     # Return Flight
     if booking.return_flight:
         seat_numbers_list = list_pax_seatnos(passenger_list,
                                              "inbound_seat_number")
         freeup_seats(booking.inbound_date, booking.inbound_flightno,
-                     seat_numbers_list)
+                     seat_numbers_list, booking.pnr, mix)
 
 
 def display_formset_errors(request, prefix, errors_list):
@@ -1076,6 +1043,18 @@ def display_formset_errors(request, prefix, errors_list):
       'wheelchair_type': ['This field is required.']}, {}]
     """
 
+    for message_string in formset_error_messages(prefix, errors_list):
+        messages.add_message(request, messages.ERROR,
+                             message_string)
+
+
+def formset_error_messages(prefix, errors_list):
+    """
+    Format the errors of a formset as a list of message strings
+    e.g. 'Adult 1: First name - This field is required.'
+    """
+
+    message_list = []
     number_of_forms = len(errors_list)
     for form_number in range(number_of_forms):
         prefix_number = form_number + 1
@@ -1087,9 +1066,9 @@ def display_formset_errors(request, prefix, errors_list):
             for item in field_errors:
                 begin = f"{prefix} {prefix_number}:"
                 formatted = Common.format_error(f"{field}")
-                message_string = f"{begin} {formatted} - {item}"
-                messages.add_message(request, messages.ERROR,
-                                     message_string)
+                message_list.append(f"{begin} {formatted} - {item}")
+
+    return message_list
 
 
 def append_to_dict(dict, key, item):
@@ -1136,6 +1115,21 @@ def name_validation(fields_dict, accum_dict, errors_found):
 
 def adults_formset_validated(cleaned_data, request):
     """ Carry out Custom Validation of the Adults Formset """
+    errors_found, formset_errors = adults_formset_errors(cleaned_data)
+    if errors_found:
+        # Send as 'Django Messages' the errors that were found
+        display_formset_errors(request, "Adult", formset_errors)
+        return False
+
+    return True
+
+
+def adults_formset_errors(cleaned_data):
+    """
+    The Custom Validation of the Adults Formset
+    Returns whether any errors were found together with
+    a list of the errors found for each form
+    """
     formset_errors = []  # Hopefully this will remain empty
     errors_found = False
     number_of_forms = len(cleaned_data)
@@ -1183,25 +1177,22 @@ def adults_formset_validated(cleaned_data, request):
 
         formset_errors.append(accum_dict)
 
-    if errors_found:
-        # Send as 'Django Messages' the errors that were found
-        display_formset_errors(request, "Adult", formset_errors)
-        return False
-
-    return True
+    return (errors_found, formset_errors)
 
 
-def date_validation_part2(request, accum_dict, errors_found,
-                          date_of_birth, is_child):
-    """ Handles the date validation for children and infants """
+def date_of_birth_validation(accum_dict, errors_found,
+                             date_of_birth, is_child, journey):
+    """
+    Validate the date of birth of a child or infant
+    against the dates of the journey
+    'journey' holds the 'departing_date', 'returning_date'
+    and 'return_option' of the Booking
+    """
 
     todays_date = datetime.now().date()
     # datediff = date_of_birth - todays_date
 
-    # Heroku fix
-    heroku_dates_fix(request)
-
-    departing_date = Common.save_context["booking"]["departing_date"]
+    departing_date = journey["departing_date"]
     output_departing_date = departing_date.strftime("%d/%m/%Y")
     datediff = date_of_birth - todays_date
     days = datediff.days
@@ -1265,13 +1256,13 @@ def date_validation_part2(request, accum_dict, errors_found,
             return (accum_dict, errors_found)
 
     # Does this Booking have a Return Journey?
-    if Common.save_context["booking"]["return_option"] == "N":
+    if journey["return_option"] == "N":
         # No! This is a one-way journey!
         return (accum_dict, errors_found)
 
     # Yes! - This is a Return Journey!
     # Check the D.O.B. against the Return Date
-    returning_date = Common.save_context["booking"]["returning_date"]
+    returning_date = journey["returning_date"]
     output_returning_date = returning_date.strftime("%d/%m/%Y")
     # Method to determine the difference in years was found at
     # https://stackoverflow.com/questions/4436957/pythonic-difference-between-two-dates-in-years
@@ -1312,6 +1303,29 @@ def minors_formset_validated(cleaned_data, is_child_formset, request,):
     Carry out Custom Validation of the Children Formset
     and the Infants Formset
     """
+
+    # Heroku fix
+    heroku_dates_fix(request)
+
+    errors_found, formset_errors = minors_formset_errors(
+                                        cleaned_data, is_child_formset,
+                                        Common.save_context["booking"])
+    if errors_found:
+        # Send as 'Django Messages' the errors that were found
+        paxtype = "Child" if is_child_formset else "Infant"
+        display_formset_errors(request, paxtype, formset_errors)
+        return False
+
+    return True
+
+
+def minors_formset_errors(cleaned_data, is_child_formset, journey):
+    """
+    The Custom Validation of the Children Formset or the Infants Formset
+    'journey' holds the dates of the Booking
+    Returns whether any errors were found together with
+    a list of the errors found for each form
+    """
     formset_errors = []  # Hopefully this will remain empty
     errors_found = False
     number_of_forms = len(cleaned_data)
@@ -1345,21 +1359,16 @@ def minors_formset_validated(cleaned_data, is_child_formset, request,):
                                         "date_of_birth", BAD_DATE)
 
         else:
-            accum_dict, errors_found = date_validation_part2(request,
-                                                             accum_dict,
-                                                             errors_found,
-                                                             date_of_birth,
-                                                             is_child_formset)
+            accum_dict, errors_found = date_of_birth_validation(
+                                                        accum_dict,
+                                                        errors_found,
+                                                        date_of_birth,
+                                                        is_child_formset,
+                                                        journey)
 
         formset_errors.append(accum_dict)
 
-    if errors_found:
-        # Send as 'Django Messages' the errors that were found
-        paxtype = "Child" if is_child_formset else "Infant"
-        display_formset_errors(request, paxtype, formset_errors)
-        return False
-
-    return True
+    return (errors_found, formset_errors)
 
 
 def initialise_formset_context(request):
@@ -1367,7 +1376,9 @@ def initialise_formset_context(request):
     Create the 'context' to be used by the Passenger Details Template
     Necessary preset values have been saved in 'Common.save_context'
     """
-    print("ED2", Common.paxdetails_editmode, Common.heroku_editmode)
+    event(forms_log, DEBUG, "formset context",
+          editmode=Common.paxdetails_editmode,
+          heroku_editmode=Common.heroku_editmode)
     if Common.paxdetails_editmode:
         # Editing Pax Details
         return initialise_for_editing(request)
@@ -1418,14 +1429,11 @@ def initialise_formset_context(request):
     return context
 
 
+@metrics.timed("compute_total_price")
 def compute_total_price(request, children_included, infants_included):
     """
     Compute the Total Price of the Booking
-
-    Adults   - £100     Age > 15
-    Children -  £60     Age 2-15
-    Infants  -  £30     Age < 2
-    Bags     -  £30
+    using the Fares of the selected flights - see fares.py
 
     Then store the values in 'the_fees_template_values'
     in order that they can be rendered on the Confirmation Form
@@ -1438,48 +1446,92 @@ def compute_total_price(request, children_included, infants_included):
         Common.save_context["return_option"] = (
             request.POST.get("return_option"))
 
-    multiple = (2 if Common.save_context["return_option"] == "Y"
-                else 1)
-    adult_price = ADULT_PRICE * multiple
-    child_price = CHILD_PRICE * multiple
-    infant_price = INFANT_PRICE * multiple
+    number_of_adults = Common.save_context["booking"]["adults"]
+    number_of_children = (Common.save_context["booking"]["children"]
+                          if children_included else 0)
+    number_of_infants = (Common.save_context["booking"]["infants"]
+                         if infants_included else 0)
+    number_of_bags = int(Common.save_context["bags"])
+
+    # Heroku fix
+    outbound_flightno = Common.save_context.get("outbound_flightno",
+                                                Common.the_outbound_flightno)
+    legs = [(outbound_flightno,
+             Common.save_context["booking"]["departing_date"])]
+    if Common.save_context["return_option"] == "Y":
+        inbound_flightno = Common.save_context.get(
+                                "inbound_flightno",
+                                Common.the_inbound_flightno)
+        legs.append((inbound_flightno,
+                     Common.save_context["booking"]["returning_date"]))
+
+    the_fees_template_values = price_booking(
+                                    Common.save_context["return_option"],
+                                    number_of_adults, number_of_children,
+                                    number_of_infants, number_of_bags,
+                                    legs)
+
+    total = the_fees_template_values["total_price"]
+    event(pricing_log, DEBUG, "booking priced", legs=legs, total=total)
+    Common.save_context["total_price"] = total
+    # Heroku fix TODO
+    Common.the_total_price = total
+
+    return the_fees_template_values
+
+
+def price_booking(return_option, number_of_adults, number_of_children,
+                  number_of_infants, number_of_bags, legs=None):
+    """
+    Price a Booking from its passenger mix and number of bags
+    'legs' - the (flight number, date) of each flight of the journey
+    Without them the default fares are used
+    Returns the fees in the form rendered on the Confirmation Form
+    'total_price' holds the actual Total Price
+    """
+
+    if legs:
+        leg_fares = fares.journey_fares(legs)
+    else:
+        multiple = 2 if return_option == "Y" else 1
+        leg_fares = [fares.DEFAULT_FARE] * multiple
+
+    # Each passenger pays the fare of every flight
+    # Bags are charged once per booking at the first flight's price
+    adult_price = sum(fare.adult for fare in leg_fares)
+    child_price = sum(fare.child for fare in leg_fares)
+    infant_price = sum(fare.infant for fare in leg_fares)
+    bag_price = leg_fares[0].bag
 
     the_fees_template_values = {}
-    number_of_adults = Common.save_context["booking"]["adults"]
     total = number_of_adults * adult_price
     the_fees_template_values["adults_total"] = (
             f"{number_of_adults} x GBP{adult_price:3.2f} = GBP{total:5.2f}")
 
-    if children_included:
-        number_of_children = Common.save_context["booking"]["children"]
+    if number_of_children > 0:
         product = number_of_children * child_price
         total += product
         the_fees_template_values["children_total"] = (
                     f"{number_of_children} x GBP{child_price:3.2f} = "
                     f"GBP{product:5.2f}")
 
-    if infants_included:
-        number_of_infants = Common.save_context["booking"]["infants"]
+    if number_of_infants > 0:
         product = number_of_infants * infant_price
         total += product
         the_fees_template_values["infants_total"] = (
                     f"{number_of_infants} x GBP{infant_price:3.2f} = "
                     f"GBP{product:5.2f}")
 
-    number_of_bags = int(Common.save_context["bags"])
     if number_of_bags > 0:
-        product = number_of_bags * BAG_PRICE
+        product = number_of_bags * bag_price
         total += product
         the_fees_template_values["bags_total"] = (
-                f"{number_of_bags} x GBP{BAG_PRICE:3.2f} = "
+                f"{number_of_bags} x GBP{bag_price:3.2f} = "
                 f"GBP{product:5.2f}")
 
     the_fees_template_values["total_price_string"] = f"GBP{total:5.2f}"
     # The Actual Total Price
     the_fees_template_values["total_price"] = total
-    Common.save_context["total_price"] = total
-    # Heroku fix TODO
-    Common.the_total_price = total
 
     return the_fees_template_values
 
@@ -1569,19 +1621,19 @@ def any_string_changes(string1, string2):
 
 
 def calc_change_fees(request, context, count, key, fees, fee_key,
-                     pax_number, minors):
+                     pax_number, minors, change_fee):
     """ Calculate Change Fees
-        £20 per pax
-        £30 for each extra bags
+        'change_fee' per pax - see fares.py
         Will not charge for any 'wheelchair' changes
     """
 
     # Has any passenger been removed from the booking? - £20 fee!
     label = f"{key}remove_pax"
     if context.get(label, None):
-        fees[fee_key] += CHANGE_FEE
+        fees[fee_key] += change_fee
         fees["changed"] = True
-        print("REM") # TODO
+        event(pricing_log, DEBUG, "change fee", pax_number=pax_number,
+              reason="removed", fee=change_fee)
         return fees
 
     label = f"{key}first_name"
@@ -1591,21 +1643,16 @@ def calc_change_fees(request, context, count, key, fees, fee_key,
     heroku_details_fix(request)
 
     paxlist = Common.save_context["original_pax_details"]
-    print("TITLES", context[f"{key}title"], paxlist[pax_number]["title"])
-    print("FN", context[f"{key}first_name"], paxlist[pax_number]["first_name"])
-    print("LN", context[f"{key}last_name"], paxlist[pax_number]["last_name"])
 
     if (context[f"{key}title"] != paxlist[pax_number]["title"] or
         any_string_changes(context[f"{key}first_name"],
                            paxlist[pax_number]["first_name"]) or
         any_string_changes(context[f"{key}last_name"],
                            paxlist[pax_number]["last_name"])):
-        print("NAMES") # TODO
-        print("TITLES", context[f"{key}title"], paxlist[pax_number]["title"])
-        print("FN", context[f"{key}first_name"], paxlist[pax_number]["first_name"])
-        print("LN", context[f"{key}last_name"], paxlist[pax_number]["last_name"])
-        fees[fee_key] += CHANGE_FEE
+        fees[fee_key] += change_fee
         fees["changed"] = True
+        event(pricing_log, DEBUG, "change fee", pax_number=pax_number,
+              reason="name", fee=change_fee)
         return fees
 
     if not minors:
@@ -1614,23 +1661,22 @@ def calc_change_fees(request, context, count, key, fees, fee_key,
                                paxlist[pax_number]["contact_number"]) or
             any_string_changes(context[f"{key}contact_email"],
                                paxlist[pax_number]["contact_email"])):
-            fees[fee_key] += CHANGE_FEE
+            fees[fee_key] += change_fee
             fees["changed"] = True
+            event(pricing_log, DEBUG, "change fee", pax_number=pax_number,
+                  reason="contact details", fee=change_fee)
 
     else:
 
         # Any date of birth changes
         newdate = context[f"{key}date_of_birth"]
         newdate = datetime.strptime(newdate, "%Y-%m-%d").date()
-        # TODO
-        print("dates")
-        print(newdate)
-        print(paxlist[pax_number]["date_of_birth"])
         if (newdate != paxlist[pax_number]["date_of_birth"]):
-            fees[fee_key] += CHANGE_FEE
+            fees[fee_key] += change_fee
             fees["changed"] = True
+            event(pricing_log, DEBUG, "change fee", pax_number=pax_number,
+                  reason="date of birth", fee=change_fee)
 
-    print("FEES", fees) # TODO
     return fees
 
 
@@ -1639,8 +1685,8 @@ def compute_change_fees(request,
     """
     Compute the Total Price for Changing the Booking
 
-    £20 per passenger
-    £30 for every extra bag
+    The change fee per passenger and the price of every extra bag
+    are those of the Fare of the outbound flight - see fares.py
 
     Then store the values in 'the_fees_template_values'
     in order that they can be rendered on the Confirmation Form
@@ -1649,6 +1695,8 @@ def compute_change_fees(request,
     the_fees_template_values = {}
     fees = dict(admin=0, adults=0, children=0, infants=0,
                 bags=0, changed=False)
+    fare = fares.fare_for(Common.save_context["booking"]["outbound_flightno"],
+                          Common.save_context["booking"]["outbound_date"])
 
     pax_number = 0  # Use this to determine the Pax Details
     # from the Original List of Passengers which is stored at
@@ -1661,7 +1709,7 @@ def compute_change_fees(request,
         key = f"adult-{count}-"
         fees = calc_change_fees(request, context, count,
                                 key, fees, "adults",
-                                pax_number, False)
+                                pax_number, False, fare.change_fee)
         count += 1
         pax_number += 1
 
@@ -1678,7 +1726,7 @@ def compute_change_fees(request,
             key = f"child-{count}-"
             fees = calc_change_fees(request, context, count,
                                     key, fees, "children",
-                                    pax_number, True)
+                                    pax_number, True, fare.change_fee)
             count += 1
             pax_number += 1
 
@@ -1695,7 +1743,7 @@ def compute_change_fees(request,
             key = f"infant-{count}-"
             fees = calc_change_fees(request, context, count,
                                     key, fees, "infants",
-                                    pax_number, True)
+                                    pax_number, True, fare.change_fee)
             count += 1
             pax_number += 1
 
@@ -1709,20 +1757,20 @@ def compute_change_fees(request,
     orig_number_of_bags = int(Common.save_context["original_bags"])
     if number_of_bags > orig_number_of_bags:
         the_difference = number_of_bags - orig_number_of_bags
-        fees["bags"] = the_difference * BAG_PRICE
+        fees["bags"] = the_difference * fare.bag
         fees["changed"] = True
         product = fees["bags"]
         the_fees_template_values["bags_total"] = (
                 f"Baggage = {the_difference} x "
-                f"GBP{BAG_PRICE:3.2f} = "
+                f"GBP{fare.bag:3.2f} = "
                 f"GBP{product:5.2f}")
 
     orig_remarks = Common.save_context["original_remarks"]
     if any_string_changes(context["bagrem-remarks"], orig_remarks):
-        fees["admin"] = CHANGE_FEE
+        fees["admin"] = fare.change_fee
         fees["changed"] = True
         the_fees_template_values["admin_total"] = (
-                f"Admin Fee = GBP{CHANGE_FEE:5.2f}")
+                f"Admin Fee = GBP{fare.change_fee:5.2f}")
 
     if not fees["changed"]:
         # Charge 0.00 !
@@ -1781,8 +1829,6 @@ def setup_formsets_for_create(request):
     AdultsFormSet = formset_factory(AdultsForm, extra=0)
     adults_formset = AdultsFormSet(request.POST or None, prefix="adult")
 
-    ## TODO
-    print("CC2", int(request.POST.get("children")) > 0, request.POST)
     # CHILDREN
 
     # Add Heroku fix
@@ -1980,7 +2026,9 @@ def handle_pax_details_POST(request,
         context_copy = request.POST.copy()  # Because of Immutability
 
         # Is it Editing Pax Details?
-        print("ED3", Common.paxdetails_editmode, Common.heroku_editmode)
+        event(forms_log, DEBUG, "pax details valid",
+              editmode=Common.paxdetails_editmode,
+              heroku_editmode=Common.heroku_editmode)
         if Common.paxdetails_editmode:
             new_context = setup_confirm_changes_context(request,
                                                         children_included,
@@ -1988,9 +2036,6 @@ def handle_pax_details_POST(request,
                                                         context_copy)
             new_context["pnr"] = Common.save_context["booking"]["pnr"]
 
-            # Heroku fix TODO
-            print(request.POST)
-
             # Editing: Therefore Proceed with Updating The Record
             Common.save_context["confirm-booking-context"] = context_copy
             return (True, new_context)
@@ -2031,24 +2076,13 @@ def handle_editpax_GET(request, id, booking):
     # Convert from "16NOV23" format to Datevalue i.e. 16/11/2023
     departing_date = Common.save_context["display"]["outbound_date"]
 
-    # TODO
-    messages.add_message(request, messages.ERROR,
-                         "AFTER DISPLAY FIX")
-    messages.add_message(request, messages.ERROR,
-                         Common.the_outbound_date)
-    messages.add_message(request, messages.ERROR,
-                         Common.save_context["display"]["outbound_date"])
-
     # Heroku fix TODO
     if departing_date is None:
         # Heroku fix
         heroku_display_fix()
-        # TODO
         departing_date = Common.the_outbound_date
-        messages.add_message(request, messages.ERROR,
-                         "NONE CHECK")
-        messages.add_message(request, messages.ERROR,
-                         departing_date)
+        event(forms_log, DEBUG, "departing date missing",
+              the_outbound_date=departing_date)
 
     departing_date = datetime.strptime(departing_date,
                                        "%d%b%y").date()
@@ -2088,14 +2122,6 @@ def handle_editpax_GET(request, id, booking):
     """
 
     pax_initial_list = pax["_result_cache"]
-    # TODO
-    pax2 = Common.context_2ndcopy["passengers"]
-    print("PAX2")
-    print(1,pax2)
-    pax2 = pax2.__dict__
-    print(2,pax2)
-    pax2_initial_list = pax2["_result_cache"]
-    print(3, pax2_initial_list)
 
     count = 0
     # Convert from "12JAN12" format to Datevalue i.e. 12/01/2012
@@ -2190,14 +2216,9 @@ def handle_editpax_GET(request, id, booking):
 
     # Indicate that 'Editing' is being perform
     # Definitely needed for Heroku - Heroku fix
-    # TODO
-    messages.add_message(request, messages.ERROR,
-                         "REDO EDITMODE> BEFORE" + str(Common.paxdetails_editmode))
     Common.paxdetails_editmode = True
-    # TODO
-    messages.add_message(request, messages.ERROR,
-                         "REDO EDITMODE> AFTER" + str(Common.paxdetails_editmode))
-    print("ED4", Common.paxdetails_editmode, Common.heroku_editmode)
+    event(forms_log, DEBUG, "edit mode set",
+          heroku_editmode=Common.heroku_editmode)
     return context
 
 
@@ -2265,7 +2286,6 @@ def setup_formsets_for_edit(request):
 
     result = initialise_for_editing(request)
     context = {}
-    print("rp", request.POST)
 
     # ADULTS
     AdultsFormSet = formset_factory(AdultsForm, extra=0)
@@ -2292,6 +2312,76 @@ def setup_formsets_for_edit(request):
             context)
 
 
+def submitted_pax_values(data, pax_type):
+    """
+    The values of a Passenger's fields as submitted on the Edit Form
+    normalised in the same way as 'new_passenger'
+    """
+
+    values = {"title": data["title"].strip().upper(),
+              "first_name": data["first_name"].strip().upper(),
+              "last_name": data["last_name"].strip().upper(),
+              "wheelchair_ssr": data["wheelchair_ssr"],
+              "wheelchair_type": data["wheelchair_type"]}
+
+    # Date of Birth is NULL for Adult
+    # Contact Details are "" for Non-Adult
+    if pax_type == "A":
+        values["date_of_birth"] = None
+        values["contact_number"] = data["contact_number"].strip().upper()
+        values["contact_email"] = data["contact_email"].strip().upper()
+    else:
+        values["date_of_birth"] = data["date_of_birth"]
+        values["contact_number"] = ""
+        values["contact_email"] = ""
+    return values
+
+
+def diff_passengers(originals, submitted, newdata):
+    """
+    Compare the Passengers as they were when the Edit Form was displayed
+    with what has been submitted
+
+    originals: the original Passenger details in Passenger order
+    submitted: {"A": adults_data, "C": children_data, "I": infants_data}
+    newdata: the posted form which holds the 'remove_pax' checkboxes
+
+    Returns (kept, removed)
+    kept: a list of (original details, submitted values) in Passenger order
+    removed: a list of the original details of the removed passengers
+    """
+
+    prefixes = {"A": "adult", "C": "child", "I": "infant"}
+    kept = []
+    removed = []
+    removed_adults = set()
+    for pax_type in "ACI":
+        originals_of_type = [pax for pax in originals
+                             if pax["pax_type"] == pax_type]
+        for index, original in enumerate(originals_of_type):
+            prefix = f"{prefixes[pax_type]}-{index}-"
+            data = submitted.get(pax_type) or []
+            is_removed = (
+                index >= len(data) or
+                bool(newdata.get(f"{prefix}remove_pax")) or
+                # An Infant goes with the corresponding Adult
+                (pax_type == "I" and index in removed_adults))
+            if is_removed:
+                """
+                (NOTE: Adult 1 should never be removed
+                This is because the first Adult passenger is
+                a mandatory part of the booking)
+                """
+                removed.append(original)
+                if pax_type == "A":
+                    removed_adults.add(index)
+            else:
+                kept.append((original,
+                             submitted_pax_values(data[index], pax_type)))
+
+    return (kept, removed)
+
+
 def update_pax_records(request):
     """
     Update the Passenger Records with any amendments and deletions
@@ -2300,192 +2390,94 @@ def update_pax_records(request):
     All the information is stored in the Class Variable 'Common.save_context'
 
     Procedure:
-    Delete ALL the PAX records from the Passenger record
-    Then write out the updated data taking into consideration any deletions
+    Compare the submitted details with the original details
+    Delete only the removed Passengers and free only their seats
+    The remaining Passengers keep their records and their seats
+    Only those rows whose details, Passenger Number or Status
+    have changed are updated
     """
 
-    # TODO
-    messages.add_message(request, messages.ERROR,
-                         "PNR1 " + Common.the_pnr)
-    messages.add_message(request, messages.ERROR,
-                         hasattr(Common, "save_context"))
-    messages.add_message(request, messages.ERROR,
-                         Common.save_context.get("confirm-booking-context"))
+    event(persistence_log, DEBUG, "updating pax records",
+          pnr=Common.the_pnr,
+          passengers=len(Common.the_original_details or []))
 
     # Need a second copy of the PNR!
     Common.save_context["pnr"] = Common.the_pnr
-    print("2ND COPY", Common.the_pnr)
 
     newdata = Common.save_context.get("confirm-booking-context")
-    
-    # Delete all the Passengers in the Booking
     booking_id = Common.the_booking_id
-    Passenger.objects.filter(pnr_id=booking_id).delete()
-
-    outbound_seats_list = []
-    inbound_seats_list = []
-    number_outbound_seats_deleted = 0
-    number_inbound_seats_deleted = 0
-    #    pax_orig_data_list = context["original_pax_details"]
-    # TODO
-    # Derived from Common.save_context["original_pax_details"]
+
     # Heroku fix
     heroku_details_fix(request)
     pax_orig_data_list = Common.save_context["original_pax_details"]
-    # Fetch all Adults into one list
-    adults_list = list(filter(lambda f: (f["pax_type"] == "A"),
-                              pax_orig_data_list))
-    # Fetch all Children into one list
-    children_list = list(filter(lambda f: (f["pax_type"] == "C"),
-                                pax_orig_data_list))
-    # Fetch all Infants into one list
-    infants_list = list(filter(lambda f: (f["pax_type"] == "I"),
-                               pax_orig_data_list))
-
-    # Remove any pairs of Adult and Infant marked for deletion
-    # Record the seat numbers of all Adults
-    count = 0
-    while True:
-        # 'adult-1-title'
-        key = f"adult-{count}-title"
-        if not newdata.get(key):
-            break
-
-        # Record Adult's Seat Number
-        outbound_seats_list.append(from_seat_to_number(
-                adults_list[count]["outbound_seat_number"]))
-        if "inbound_seat_number" in adults_list[count]:
-            inbound_seats_list.append(from_seat_to_number(
-                adults_list[count]["inbound_seat_number"]))
-
-        # Is this Adult Marked for deletion?
-        # e.g. 'adult-1-remove_pax': ['on']
-        key = f"adult-{count}-remove_pax"
-        if newdata.get(key):
-            """
-            (NOTE: The value of 'count' should never be 0
-            That is, key should never represent 'adult-0-remove_pax': ['on']
-            That is, -0-
-            This is because the first Adult passenger is
-            a mandatory part of the booking
-            Suggest Error 500)
-            """
-
-            number_outbound_seats_deleted += 1
-            if "inbound_seat_number" in adults_list[count]:
-                number_inbound_seats_deleted += 1
-
-            # Remove Adult from the list
-            adults_list[count] = None
-
-            # Any corresponding infant attached to this Adult?
-            # EG 'adult-1-title' plus a corresponding
-            #   'infant-1-title'
-            if newdata.get(f"infant-{count}-title"):
-                # Remove Infant from the list
-                infants_list[count] = None
-
-        count += 1
-
-    # Remove any Infants marked for deletion
-    count = 0
-    while True:
-        # 'infant-0-title'
-        key = f"infant-{count}-title"
-        if not newdata.get(key):
-            break
-
-        # Marked for deletion?
-        # e.g. 'infant-0-remove_pax': ['on']
-        key = f"infant-{count}-remove_pax"
-        if newdata.get(key):
-            # Remove Infant from the list
-            infants_list[count] = None
-        count += 1
-
-    # Remove any children marked for deletion
-    count = 0
-    while True:
-        # 'child-0-title'
-        key = f"child-{count}-title"
-        if not newdata.get(key):
-            break
-
-        # Record Child's Seat Number
-        outbound_seats_list.append(from_seat_to_number(
-                children_list[count]["outbound_seat_number"]))
-        if "inbound_seat_number" in children_list[count]:
-            inbound_seats_list.append(from_seat_to_number(
-                children_list[count]["inbound_seat_number"]))
-
-        # Is this Child Marked for deletion?
-        # e.g. 'child-0-remove_pax': ['on']
-        key = f"child-{count}-remove_pax"
-        if newdata.get(key):
-            number_outbound_seats_deleted += 1
-            if "inbound_seat_number" in children_list[count]:
-                number_inbound_seats_deleted += 1
-
-            # Remove child from the list
-            children_list[count] = None
+    submitted = {"A": Common.save_context.get("adults_data"),
+                 "C": (Common.save_context.get("children_data")
+                       if Common.save_context.get("children_included")
+                       else None),
+                 "I": (Common.save_context.get("infants_data")
+                       if Common.save_context.get("infants_included")
+                       else None)}
+    kept, removed = diff_passengers(pax_orig_data_list, submitted, newdata)
+
+    # Free exactly the seats of the removed passengers
+    # Infants have no seats
+    Common.outbound_removed_seats = [
+        from_seat_to_number(pax["outbound_seat_number"])
+        for pax in removed if pax["outbound_seat_number"]]
+    Common.inbound_removed_seats = [
+        from_seat_to_number(pax["inbound_seat_number"])
+        for pax in removed if pax.get("inbound_seat_number")]
+    number_outbound_seats_deleted = len(Common.outbound_removed_seats)
+    number_inbound_seats_deleted = len(Common.inbound_removed_seats)
+
+    # The change to the flights' Departure Loads
+    # i.e. the removed passengers plus any Wheelchair SSRs added or dropped
+    wheelchairs_added = sum(bool(values["wheelchair_ssr"]) -
+                            bool(original["wheelchair_ssr"])
+                            for original, values in kept)
+    Common.pax_mix_change = loads.combine(
+        loads.passenger_mix(((pax["pax_type"], pax["wheelchair_ssr"])
+                             for pax in removed), sign=-1),
+        loads.PassengerMix(wheelchairs=wheelchairs_added))
+
+    if removed:
+        Passenger.objects.filter(pnr_id=booking_id,
+                                 id__in=[pax["id"] for pax in removed]
+                                 ).delete()
+
+    # Renumber the remaining passengers in place
+    # Infants' Status Numbers match their Adults' i.e. start at 1
+    records = Passenger.objects.filter(
+                        pnr_id=booking_id,
+                        id__in=[original["id"] for original, _ in kept]
+                        ).in_bulk()
+    changed_records = []
+    changed_fields = set()
+    infant_status_number = 1
+    for order_number, (original, values) in enumerate(kept, start=1):
+        pax = records[original["id"]]
+        if pax.pax_type == "I":
+            values["status"] = f"HK{infant_status_number}"
+            infant_status_number += 1
+        else:
+            values["status"] = f"HK{order_number}"
+        values["pax_number"] = order_number
 
-        count += 1
+        fields = [field for field, value in values.items()
+                  if getattr(pax, field) != value]
+        if fields:
+            for field in fields:
+                setattr(pax, field, values[field])
+            changed_records.append(pax)
+            changed_fields.update(fields)
 
-    # Filter Out The Deleted Items
-    adults_list = list(filter(None, adults_list))
-    children_list = list(filter(None, children_list))
-    infants_list = list(filter(None, infants_list))
-    """
-    len(adults_list) should never be zero!
-    TODO: Error 500 If This Happens!
-    """
-    number_outbound_seated_adults = len(adults_list)
-    # Unlike this value which could be zero
-    number_outbound_seated_children = len(children_list)
-    number_seated_pax = (number_outbound_seated_adults +
-                         number_outbound_seated_children)
-
-    Common.outbound_allocated_seats = None
-    Common.outbound_removed_seats = None
-    Common.inbound_allocated_seats = None
-    Common.inbound_removed_seats = None
-
-    outbound_seats_list.sort()
-    outbound_seats_list.reverse()  # Descending Order
-    inbound_seats_list.sort()
-    inbound_seats_list.reverse()   # Descending Order
-
-    # Outbound
-    if number_outbound_seats_deleted > 0:
-        # Determine the seats that need to be removed from the Booking
-        # Keep these
-        Common.outbound_allocated_seats = (
-            outbound_seats_list[0:number_seated_pax])
-        # Remove these
-        Common.outbound_removed_seats = (
-            outbound_seats_list[-number_outbound_seats_deleted:])
-    else:
-        # No seats to remove
-        Common.outbound_allocated_seats = outbound_seats_list
-
-    # Inbound
-    if number_inbound_seats_deleted > 0:
-        # Determine the seats that need to be removed
-        # Keep these
-        Common.inbound_allocated_seats = (
-            inbound_seats_list[0:number_seated_pax])
-        # Remove these
-        Common.inbound_removed_seats = (
-            inbound_seats_list[-number_inbound_seats_deleted:])
-    else:
-        # No seats to remove
-        Common.inbound_allocated_seats = inbound_seats_list
+    if changed_records:
+        Passenger.objects.bulk_update(changed_records,
+                                      sorted(changed_fields))
 
-    # In fact these two values ought to be identical
-    # if the Booking contains a return flight
-    # number_outbound_seats_deleted
-    # number_inbound_seats_deleted
-    # TODO: Otherwise Error 500 If This Happens!
+    event(persistence_log, DEBUG, "pax records diffed",
+          pnr=Common.the_pnr, updated=len(changed_records),
+          fields=sorted(changed_fields), removed=len(removed))
 
     # Fetch Booking Instance
     booking = get_object_or_404(Booking, pk=booking_id)
@@ -2495,46 +2487,11 @@ def update_pax_records(request):
     # Need a second copy of 'return_option' before proceeding
     Common.save_context["return_option"] = (
            Common.save_context["booking"]["return_option"])
-    pnr = Common.save_context["pnr"]
-    number_of_adults = len(adults_list)
-    number_of_children = len(children_list)
-    number_of_infants = len(infants_list)
-
-    # Now create the corresponding Passenger Records
-    # Adult Passengers
-    passenger_type = "adult"
-    plural = "adults"
-    pax_type = "A"
-    order_number = write_passenger_record(request,
-                                          booking, passenger_type,
-                                          plural, pax_type,
-                                          number_of_adults, 1, True)
-
-    # Child Passengers
-    if number_of_children > 0:
-        passenger_type = "child"
-        plural = "children"
-        pax_type = "C"
-        order_number = write_passenger_record(request,
-                                              booking, passenger_type,
-                                              plural, pax_type,
-                                              number_of_children,
-                                              order_number, True)
-
-    # Infant Passengers
-    if number_of_infants > 0:
-        passenger_type = "infant"
-        plural = "infants"
-        pax_type = "I"
-        order_number = write_passenger_record(request,
-                                              booking, passenger_type,
-                                              plural, pax_type,
-                                              number_of_infants,
-                                              order_number, True)
 
+    pax_types = [original["pax_type"] for original, _ in kept]
     return (booking,
-            number_of_adults, number_of_children,
-            number_of_infants,
+            pax_types.count("A"), pax_types.count("C"),
+            pax_types.count("I"),
             number_outbound_seats_deleted,
             number_inbound_seats_deleted)
 
@@ -2557,29 +2514,33 @@ def update_booking(request, booking,
 
 
 def update_booked_figure_seatmap(schedule,
-                                 number_deleted, seatnumbers_list):
+                                 number_deleted, seatnumbers_list,
+                                 mix=loads.NO_PASSENGERS):
     """
-    # Adjust the Total Booked Figure and the Seatmap
-    # in regards to the deleted passengers
+    # Adjust the Total Booked Figure and release the seats
+    # of the deleted passengers in the seat log
+    # and the flight's Departure Load by 'mix'
     """
 
-    schedule.total_booked -= number_deleted
-    # Adjust the seatmap
-    bit_array = convert_string_to_bitarray(schedule.seatmap)
+    released_seats = []
     for each_seatno in seatnumbers_list:
         if each_seatno < 0 or each_seatno >= CAPACITY:
             """
             Defensive - should be between 0-95
-            TODO: Error 500 If This Is Not The Case
+            Logged - see 'manage.py check_inventory'
             """
+            event(allocation_log, WARNING, "seat out of range",
+                  flight_number=schedule.flight_number,
+                  flight_date=schedule.flight_date, seat=each_seatno)
             continue
 
-        # For the correct 'leftmost' position
-        # subtract from 95
-        bit_array.overwrite("0b0", LEFT_BIT_POS - each_seatno)
+        released_seats.append(each_seatno)
 
-    schedule.seatmap = convert_bitarray_to_hexstring(bit_array)
-    schedule.save()
+    seatlog.release_seats(schedule.flight_date, schedule.flight_number,
+                          released_seats, Common.save_context["pnr"])
+    schedule = seatlog.add_to_booked(schedule.flight_date,
+                                     schedule.flight_number, -number_deleted)
+    schedule_saved(schedule, mix)
 
 
 def update_schedule_seating(request,
@@ -2591,14 +2552,21 @@ def update_schedule_seating(request,
     """
 
     # Outbound Flight
+    the_flightdate = Common.save_context["booking"]["outbound_date"]
+    the_flightno = Common.save_context["booking"]["outbound_flightno"]
     if number_outbound_deleted == 0:
         # No Adults or Children removed
         # Just infants which do not occupy seats
+        # or changes to Wheelchair SSRs
+        loads.record_departure_load(the_flightdate, the_flightno,
+                                    change=Common.pax_mix_change)
+        if Common.save_context["booking"]["return_option"] == "Y":
+            loads.record_departure_load(
+                Common.save_context["booking"]["inbound_date"],
+                Common.save_context["booking"]["inbound_flightno"],
+                change=Common.pax_mix_change)
         return
 
-    the_flightdate = Common.save_context["booking"]["outbound_date"]
-    the_flightno = Common.save_context["booking"]["outbound_flightno"]
-
     # Fetch Schedule Instance
     queryset = Schedule.objects.filter(flight_date=the_flightdate,
                                        flight_number=the_flightno)
@@ -2606,7 +2574,8 @@ def update_schedule_seating(request,
     # Adjust the Total Booked Figure and the Seatmap
     update_booked_figure_seatmap(schedule,
                                  number_outbound_deleted,
-                                 Common.outbound_removed_seats)
+                                 Common.outbound_removed_seats,
+                                 Common.pax_mix_change)
 
     if Common.save_context["booking"]["return_option"] != "Y":
         return
@@ -2621,9 +2590,11 @@ def update_schedule_seating(request,
     # Adjust the Total Booked Figure and the Seatmap
     update_booked_figure_seatmap(schedule,
                                  number_inbound_deleted,
-                                 Common.inbound_removed_seats)
+                                 Common.inbound_removed_seats,
+                                 Common.pax_mix_change)
 
 
+@metrics.timed("update_pax_details")
 def update_pax_details(request):
     """
     Update the Passenger Records with any amendments and deletions
@@ -2635,27 +2606,34 @@ def update_pax_details(request):
 
     Update the Schedule Database with any seat changes
     due to removal/deletions of passengers from the Booking
+
+    Returns the PNR
     """
 
-    (booking,
-     number_of_adults, number_of_children,
-     number_of_infants,
-     number_outbound_deleted,
-     number_inbound_deleted) = update_pax_records(request)
+    with transaction.atomic():
+        (booking,
+         number_of_adults, number_of_children,
+         number_of_infants,
+         number_outbound_deleted,
+         number_inbound_deleted) = update_pax_records(request)
 
-    update_booking(request, booking,
-                   number_of_adults,
-                   number_of_children,
-                   number_of_infants)
-    create_transaction_record(request)
+        update_booking(request, booking,
+                       number_of_adults,
+                       number_of_children,
+                       number_of_infants)
+        create_transaction_record(request)
 
-    update_schedule_seating(request,
-                            number_outbound_deleted,
-                            number_inbound_deleted)
+        update_schedule_seating(request,
+                                number_outbound_deleted,
+                                number_inbound_deleted)
+    pnr = Common.save_context["pnr"]
+    event(persistence_log, INFO, "booking updated", pnr=pnr,
+          outbound_seats_freed=number_outbound_deleted,
+          inbound_seats_freed=number_inbound_deleted)
 
     # Indicate success
     messages.add_message(request, messages.SUCCESS,
-                         ("Booking {0} Updated Successfully"
-                          .format(Common.save_context["pnr"])))
+                         "Booking {0} Updated Successfully".format(pnr))
 
-    reset_common_fields(request)  # RESET!
\ No newline at end of file
+    reset_common_fields(request)  # RESET!
+    return pnr
@@ -1,7 +1,9 @@
 # common.py
 
-from .models import Flight
-from django.shortcuts import get_list_or_404
+from .models import Flight, Route
+from .timetable import timetable, route_name
+from django.db.models.signals import post_delete, post_save
+from django.http import Http404
 
 
 class Common:
@@ -19,24 +21,24 @@ class Common:
     inbound_flights = None
     outbound_listof_flights = None  # I.E. [MX465, MX475, MX485]
     inbound_listof_flights = None  # I.E. [MX466, MX476, MX486]
-    flight_info = None
+    # The routes of the outbound flights I.E. ["LCY-IOM"]
+    # The first is the route offered on the forms by default
+    outbound_routes = None
+    # The flights' details are read from timetable().flights
     save_context = None
     OUTBOUND_TIME_OPTIONS1 = None
     OUTBOUND_TIME_OPTIONS2 = None
-    outbound_schedule_id = None
-    inbound_schedule_id = None
-    outbound_schedule_instance = None
-    inbound_schedule_instance = None
-    outbound_seatmap = None
-    inbound_seatmap = None
+    # (flight_date, flight_number, time) of the flights being booked
+    outbound_flight = None
+    inbound_flight = None
     outbound_allocated_seats = []
     inbound_allocated_seats = []
-    outbound_total_booked = None
-    inbound_total_booked = None
+    # The change to the Departure Loads when amending a Booking
+    pax_mix_change = None
     paxdetails_editmode = None
     # New Class Variables for Heroku fix
-    the_depart_pos = None
-    the_return_pos = None
+    the_outbound_flightno = None
+    the_inbound_flightno = None
     the_return_option = None
     the_total_price = None
     the_pnr = None
@@ -76,23 +78,18 @@ class Common:
 
     def initialisation():
         """
-        Fetch the contents of the Flights Database
+        Fetch the Timetable (see timetable.py)
         which holds the available flights' times, routes and capacity
         information and set them up in variables to be accessed by this App.
         """
 
-        all_flight_entries = get_list_or_404(Flight.objects
-                                             .all()
-                                             .order_by("flight_STD",
-                                                       "flight_STA"))
+        table = timetable()
+        if not table.flights:
+            raise Http404("No Flight matches the given query.")
 
-        # Two dictionaries for outbound and inbound
-        outbound = {}
-        inbound = {}
-        # Nested Dictionary
-        newdict = {}
         outbound_flights = []
         inbound_flights = []
+        outbound_routes = []
 
         # Needed to create the radio button options for each flight
         out_time_options1 = []
@@ -100,47 +97,38 @@ class Common:
         in_time_options1 = []
         in_time_options2 = []
 
-        for each in all_flight_entries:
-            newdict[each.flight_number] = {}
-            newdict[each.flight_number]["flight_from"] = (each.flight_from
-                                                          .strip().upper())
-            newdict[each.flight_number]["flight_to"] = (each.flight_to
-                                                            .strip().upper())
-            newdict[each.flight_number]["flight_STD"] = each.flight_STD
-            newdict[each.flight_number]["flight_STA"] = each.flight_STA
-            newdict[each.flight_number]["outbound"] = each.outbound
-            newdict[each.flight_number]["capacity"] = each.capacity
-            if each.outbound:
+        # The Timetable lists the flights in order of STD
+        for flight_number, each in table.flights.items():
+            option = Common.format_radio_button_option(each["flight_STD"],
+                                                       each["flight_from"],
+                                                       each["flight_STA"],
+                                                       each["flight_to"])
+            if each["outbound"]:
                 # Outbound Flight
                 # E.G. [MX465, MX475, MX485]
-                outbound_flights.append(each.flight_number)
-                out_time_options1.append(each.flight_STD)
-                out_time_options2.append(Common.format_radio_button_option(
-                                                each.flight_STD,
-                                                each.flight_from,
-                                                each.flight_STA,
-                                                each.flight_to))
+                outbound_flights.append(flight_number)
+                out_time_options1.append(each["flight_STD"])
+                out_time_options2.append(option)
+                route = route_name(each["flight_from"], each["flight_to"])
+                if route not in outbound_routes:
+                    outbound_routes.append(route)
             else:
                 # Inbound Flight
                 # I.E. [MX466, MX476, MX486]
-                inbound_flights.append(each.flight_number)
-                in_time_options1.append(each.flight_STD)
-                in_time_options2.append(Common.format_radio_button_option(
-                                               each.flight_STD,
-                                               each.flight_from,
-                                               each.flight_STA,
-                                               each.flight_to))
+                inbound_flights.append(flight_number)
+                in_time_options1.append(each["flight_STD"])
+                in_time_options2.append(option)
 
         # Store the results in Class variables
-        Common.flight_info = newdict
-        Common.outbound_flights = outbound
-        Common.inbound_flights = inbound
+        Common.outbound_flights = {}
+        Common.inbound_flights = {}
         Common.OUTBOUND_TIME_OPTIONS1 = out_time_options1
         Common.OUTBOUND_TIME_OPTIONS2 = out_time_options2
         Common.INBOUND_TIME_OPTIONS1 = in_time_options1
         Common.INBOUND_TIME_OPTIONS2 = in_time_options2
         Common.outbound_listof_flights = outbound_flights
         Common.inbound_listof_flights = inbound_flights
+        Common.outbound_routes = sorted(outbound_routes)
 
         # Indicate that Initialisation has been done
         Common.initialised = True
@@ -149,3 +137,13 @@ class Common:
         """ Convert any underscores to spaces and capitalise the text. """
         text = text.replace("_", " ").replace("ssr", "SSR", 1)
         return f"{text[0].capitalize()}{text[1:]}"
+
+
+def forget_flights(**kwargs):
+    """ Set the flights up again once the Routes or Flights change """
+    Common.initialised = False
+
+
+for model in (Route, Flight):
+    post_save.connect(forget_flights, sender=model)
+    post_delete.connect(forget_flights, sender=model)
@@ -0,0 +1,74 @@
+"""
+Compiled Tables
+
+The Fares (see fares.py) and the Timetable (see timetable.py) are
+compiled from the database into tables held in memory by each process.
+
+A CompiledTable holds the current table and compiles it again when
+- a change to one of its models has been committed, in this process
+  or, through a version number held in the cache, in any other
+- or it is more than 'max age' seconds old, in case the cache is not
+  shared between processes (the default local memory cache)
+
+The version is only bumped once the change has committed. Any sooner
+and another process could recompile from the old rows and keep them
+until the next change.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+
+class CompiledTable:
+    """
+    'compile' - called with the version number, returns the new table
+                which has 'version' and 'compiled_at' (time.monotonic())
+    'max_age' - the name of the setting giving the most seconds a table
+                is kept
+    'models'  - a change to any of these discards the table
+    """
+
+    def __init__(self, name, compile, max_age, models):
+        self.version_key = f"booking:{name}:version"
+        self.compile = compile
+        self.max_age = max_age
+        self.table = None
+        self.lock = threading.Lock()
+        for model in models:
+            post_save.connect(self.invalidate, sender=model, weak=False)
+            post_delete.connect(self.invalidate, sender=model, weak=False)
+
+    def current(self):
+        """ The current table, compiled if need be """
+
+        version = cache.get(self.version_key, 0)
+        table = self.table
+        if (table is not None and table.version == version and
+                time.monotonic() - table.compiled_at <
+                getattr(settings, self.max_age)):
+            return table
+
+        with self.lock:
+            if self.table is None or self.table is table:
+                self.table = self.compile(version)
+            return self.table
+
+    def discard(self):
+        """ Discard the table of every process """
+
+        self.table = None
+        if not cache.add(self.version_key, 1):
+            try:
+                cache.incr(self.version_key)
+            except ValueError:
+                # The key expired in the meantime
+                cache.add(self.version_key, 1)
+
+    def invalidate(self, **kwargs):
+        """ Discard the table of every process once the change commits """
+        transaction.on_commit(self.discard)
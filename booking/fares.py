@@ -0,0 +1,353 @@
+"""
+The Fares Engine
+
+The Fares and their load factor rules (see the Fare and FareRule models)
+are compiled into a table which is held in memory so that pricing
+a flight is a dictionary lookup rather than a search through the rules:
+
+    flight number -> the dates on which its fare changes
+                     + the fare of each of those date bands
+    fare          -> the prices at each load factor from 0% to 100%
+
+Prices for a (flight number, date) are remembered once looked up.
+Any change to the Fares, FareRules or Flights discards the table so
+that it is recompiled on the next lookup, in every process, and the
+table is recompiled anyway every FARE_TABLE_MAX_AGE seconds
+(see compiled.py)
+"""
+
+import time
+from bisect import bisect_right
+from collections import namedtuple
+from datetime import date, timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+import numpy
+
+from .common import Common
+from .compiled import CompiledTable
+from .models import Fare, FareRule, Flight, Schedule
+from .timetable import route_airports, timetable
+
+PriceSet = namedtuple("PriceSet", ["adult", "child", "infant",
+                                   "bag", "change_fee"])
+
+# The prices used whenever no Fare applies
+DEFAULT_FARE = PriceSet(adult=Decimal("100.00"),  # Age > 15
+                        child=Decimal("60.00"),  # Age 2-15
+                        infant=Decimal("30.00"),  # Age < 2
+                        bag=Decimal("30.00"),
+                        change_fee=Decimal("20.00"))
+
+PENNY = Decimal("0.01")
+
+
+def adjusted(price, percent):
+    """ Add 'percent' percent to the price, to the nearest penny """
+    return (price * (100 + percent) / 100).quantize(PENNY, ROUND_HALF_UP)
+
+
+def compile_load_bands(fare, rules):
+    """
+    The prices of a Fare at each load factor, i.e. a list of 101 PriceSets
+    'rules' are the Fare's FareRules in order of 'min_load_factor'
+    """
+
+    percents = [0] * 101
+    for rule in rules:
+        start = min(rule.min_load_factor, 100)
+        percents[start:] = [rule.adjustment_percent] * (101 - start)
+
+    bands = []
+    previous = None
+    for percent in percents:
+        if bands and percent == previous:
+            bands.append(bands[-1])
+            continue
+        bands.append(PriceSet(adult=adjusted(fare.adult_price, percent),
+                              child=adjusted(fare.child_price, percent),
+                              infant=adjusted(fare.infant_price, percent),
+                              bag=fare.bag_price,
+                              change_fee=fare.change_fee))
+        previous = percent
+    return bands
+
+
+def best_fare(fares, day):
+    """
+    The Fare which applies on 'day' (an ordinal) or None
+    A flight's own Fare beats one for all flights,
+    then the highest priority wins, then the newest
+    """
+
+    best = None
+    for fare in fares:
+        if fare.valid_from and fare.valid_from.toordinal() > day:
+            continue
+        if fare.valid_to and fare.valid_to.toordinal() < day:
+            continue
+        key = (fare.flight_number != "", fare.priority, fare.id)
+        if best is None or key > best[0]:
+            best = (key, fare)
+    return best[1] if best else None
+
+
+def compile_date_bands(fares):
+    """
+    Split the calendar at every date on which one of the 'fares'
+    starts or ends. Returns the first day (an ordinal) of each band
+    and the Fare of each band (None where no Fare applies)
+    """
+
+    boundaries = {date.min.toordinal()}
+    for fare in fares:
+        if fare.valid_from:
+            boundaries.add(fare.valid_from.toordinal())
+        if fare.valid_to and fare.valid_to < date.max:
+            boundaries.add(fare.valid_to.toordinal() + 1)
+
+    starts = sorted(boundaries)
+    return starts, [best_fare(fares, day) for day in starts]
+
+
+class FareTable:
+    """ The compiled Fares """
+
+    def __init__(self, version):
+        self.version = version
+        self.compiled_at = time.monotonic()
+        self.flights = {}
+        self.prices = {}
+
+        fares = list(Fare.objects.all())
+        rules = {}
+        for rule in FareRule.objects.order_by("min_load_factor"):
+            rules.setdefault(rule.fare_id, []).append(rule)
+
+        load_bands = {fare.id: compile_load_bands(fare,
+                                                  rules.get(fare.id, []))
+                      for fare in fares}
+
+        all_flights = [fare for fare in fares if not fare.flight_number]
+        flight_numbers = set(Flight.objects.values_list("flight_number",
+                                                        flat=True))
+        flight_numbers.update(fare.flight_number for fare in fares)
+        # "" - Flights which are not in the Flights Database
+        flight_numbers.add("")
+
+        for flight_number in flight_numbers:
+            applicable = all_flights + [fare for fare in fares
+                                        if fare.flight_number == flight_number
+                                        and flight_number]
+            starts, band_fares = compile_date_bands(applicable)
+            self.flights[flight_number] = (
+                starts, [load_bands[fare.id] if fare else None
+                         for fare in band_fares])
+
+    def load_bands(self, flight_number, flight_date):
+        """ The prices at each load factor of the flight on 'flight_date' """
+
+        key = (flight_number, flight_date)
+        bands = self.prices.get(key)
+        if bands is not None:
+            return bands
+
+        starts, date_bands = self.flights.get(flight_number,
+                                              self.flights[""])
+        bands = date_bands[bisect_right(starts,
+                                        flight_date.toordinal()) - 1]
+        bands = bands or [DEFAULT_FARE] * 101
+        self.prices[key] = bands
+        return bands
+
+
+_fares = CompiledTable("fares", FareTable, "FARE_TABLE_MAX_AGE",
+                       (Fare, FareRule, Flight))
+
+
+def fare_table():
+    """ The current FareTable, compiled if need be """
+    return _fares.current()
+
+
+def total_booked(legs):
+    """
+    The number of passengers booked on each of the 'legs'
+    i.e. (flight number, flight date), using one query
+    """
+
+    legs = set(legs)
+    if not legs:
+        return {}
+
+    dates = [flight_date for _, flight_date in legs]
+    booked = dict.fromkeys(legs, 0)
+    for flight_number, flight_date, total in (
+            Schedule.objects
+            .filter(flight_date__range=(min(dates), max(dates)),
+                    flight_number__in={leg[0] for leg in legs})
+            .values_list("flight_number", "flight_date", "total_booked")):
+        if (flight_number, flight_date) in booked:
+            booked[(flight_number, flight_date)] = total
+    return booked
+
+
+def capacity(flight_number):
+    return timetable().flights.get(flight_number, {}).get("capacity")
+
+
+def load_factor(booked, capacity):
+    """ The percentage (0-100) of the seats of a flight which are booked """
+
+    if not capacity:
+        return 0
+    return min(100, booked * 100 // capacity)
+
+
+def fare_for(flight_number, flight_date, load=0):
+    """ The PriceSet of a flight on a date when it is 'load' percent full """
+    return fare_table().load_bands(flight_number, flight_date)[load]
+
+
+def journey_fares(legs):
+    """
+    The PriceSet of each flight of a journey at its current load factor
+    'legs' is a list of (flight number, flight date)
+    """
+
+    booked = total_booked(legs)
+    return [fare_for(flight_number, flight_date,
+                     load_factor(booked[(flight_number, flight_date)],
+                                 capacity(flight_number)))
+            for flight_number, flight_date in legs]
+
+
+# Batch Quotes
+# A Quote is one journey for one passenger mix
+# A one-way journey has no 'inbound_flight'
+Quote = namedtuple("Quote", ["outbound_flight", "outbound_date",
+                             "adults", "children", "infants", "bags",
+                             "inbound_flight", "inbound_date"],
+                   defaults=[0, 0, 0, "", None])
+
+# Bags are paid for once per Quote i.e. on the outbound flight only
+INBOUND_CHARGES = numpy.array([1, 1, 1, 0], dtype=numpy.int64)
+
+
+def in_pence(price_set):
+    return [int(price * 100) for price in price_set[:4]]
+
+
+def quote_totals_pence(quotes, load=None):
+    """
+    Price many Quotes in one pass
+    Returns a NumPy array of the total price of each Quote in pence
+
+    Each distinct flight is looked up only once. The prices of the
+    flights are then gathered into one array per direction and
+    multiplied by the passenger mix of every Quote at once
+
+    'load' - price every flight as if it were 'load' percent full
+    (for what-if pricing) rather than at its current load factor
+    """
+
+    if not quotes:
+        return numpy.zeros(0, dtype=numpy.int64)
+
+    # Number each distinct flight, 0 is 'no flight'
+    legs = {}
+    outbound = numpy.empty(len(quotes), dtype=numpy.intp)
+    inbound = numpy.empty(len(quotes), dtype=numpy.intp)
+    for i, quote in enumerate(quotes):
+        outbound[i] = legs.setdefault(
+                        (quote.outbound_flight, quote.outbound_date),
+                        len(legs) + 1)
+        inbound[i] = (legs.setdefault(
+                        (quote.inbound_flight, quote.inbound_date),
+                        len(legs) + 1)
+                      if quote.inbound_flight else 0)
+
+    booked = total_booked(legs) if load is None else {}
+    table = fare_table()
+    leg_prices = numpy.zeros((len(legs) + 1, 4), dtype=numpy.int64)
+    for (flight_number, flight_date), row in legs.items():
+        leg_load = (load if load is not None else
+                    load_factor(booked[(flight_number, flight_date)],
+                                capacity(flight_number)))
+        leg_prices[row] = in_pence(
+            table.load_bands(flight_number, flight_date)[leg_load])
+
+    passengers = numpy.array([quote[2:6] for quote in quotes],
+                             dtype=numpy.int64)
+    unit_prices = leg_prices[outbound] + leg_prices[inbound] * INBOUND_CHARGES
+    return (unit_prices * passengers).sum(axis=1)
+
+
+def quote_batch(quotes, load=None):
+    """ The total price of each of the Quotes """
+    return [Decimal(int(total)).scaleb(-2)
+            for total in quote_totals_pence(quotes, load)]
+
+
+def cheapest_days(year, month, outbound, adults, children=0, infants=0,
+                  bags=0, route=None):
+    """
+    The cheapest one-way flight of each day of a month
+    which still has enough free seats for the passengers
+    'route' - the (origin, destination) of the outbound flights
+    (None - the first route, see Common)
+    'outbound' - True for the outbound flights, else the inbound flights
+    i.e. those flying the route the other way
+    Returns a list of {date, flight_number, departure_time, total_price}
+    with None as the flight and price of days which cannot be booked
+    """
+
+    if not Common.initialised:
+        Common.initialisation()
+    origin, destination = route or route_airports(Common.outbound_routes[0])
+    if not outbound:
+        origin, destination = destination, origin
+    table = timetable()
+    flights = table.route_flights(origin, destination)
+
+    today = date.today()
+    days = [day for day in
+            (date(year, month, 1) + timedelta(days=n) for n in range(31))
+            if day.month == month and day >= today]
+    if not days or not flights:
+        return [{"date": day, "flight_number": None,
+                 "departure_time": None, "total_price": None}
+                for day in days]
+
+    seats_needed = adults + children
+    quotes = [Quote(flight_number, day, adults, children, infants, bags)
+              for day in days for flight_number in flights]
+    totals = quote_totals_pence(quotes).reshape(len(days), len(flights))
+
+    booked = total_booked((quote.outbound_flight, quote.outbound_date)
+                          for quote in quotes)
+    # Flights which do not operate on the day are as good as full
+    full = numpy.array([not table.operates(quote.outbound_flight,
+                                           quote.outbound_date) or
+                        capacity(quote.outbound_flight) -
+                        booked[(quote.outbound_flight, quote.outbound_date)]
+                        < seats_needed for quote in quotes]
+                       ).reshape(len(days), len(flights))
+
+    totals = numpy.where(full, numpy.iinfo(numpy.int64).max, totals)
+    cheapest = totals.argmin(axis=1)
+
+    results = []
+    for row, day in enumerate(days):
+        column = cheapest[row]
+        if full[row, column]:
+            results.append({"date": day, "flight_number": None,
+                            "departure_time": None, "total_price": None})
+            continue
+        flight_number = flights[column]
+        results.append({
+            "date": day,
+            "flight_number": flight_number,
+            "departure_time": table.flights[flight_number]["flight_STD"],
+            "total_price": Decimal(int(totals[row, column])).scaleb(-2)})
+    return results
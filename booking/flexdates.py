@@ -0,0 +1,102 @@
+"""
+Flexible Dates
+
+When the chosen flight cannot seat the party the agent can look at
+every flight of the route within a few days either side of the date
+instead of trying the dates one at a time.
+
+The seats of the whole window come from one range query on the
+Schedules (plus their seat log tails, see seatlog.py) and are checked
+in memory with the seat matrix of analytics.py: a flight is offered
+if it has enough free seats for the party and is marked 'together'
+if one row of free seats can hold all of them.
+
+The result is cached per route, window and party size for
+FLEXIBLE_SEARCH_TTL seconds, so it may be a little behind the
+bookings. A flight picked from it is still checked by
+'check_availability' when the Create Booking Form is submitted.
+"""
+
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .analytics import departures, free_runs, seat_matrix
+from .common import Common
+from .timetable import timetable
+
+# Days either side of the requested date
+FLEXIBLE_DAYS = 3
+MAXIMUM_FLEXIBLE_DAYS = 7
+
+
+def flexible_key(route, start, end, seats_needed):
+    origin, destination = route
+    return (f"booking:flexible:{origin}-{destination}:"
+            f"{start.isoformat()}:{end.isoformat()}:{seats_needed}")
+
+
+def flexible_window(flight_date, days=FLEXIBLE_DAYS):
+    """ The dates searched around 'flight_date' - none in the past """
+    return (max(flight_date - timedelta(days=days), date.today()),
+            flight_date + timedelta(days=days))
+
+
+def flights_with_room(route, start, end, seats_needed):
+    """
+    Every flight of 'route' (origin, destination) from 'start' to 'end'
+    inclusive which can seat 'seats_needed' passengers, the outbound
+    flights apart from the inbound ones, which fly the route the other way
+    """
+
+    origin, destination = route
+    table = timetable()
+    outbound = table.route_flights(origin, destination)
+    inbound = table.route_flights(destination, origin)
+    keys = departures(start, end, outbound + inbound)
+    matrix = seat_matrix(keys)
+    booked = matrix.sum(axis=1)
+    _, longest = free_runs(matrix)
+
+    flights = table.flights
+    found = {"outbound": [], "inbound": []}
+    for (flight_date, flight_number), seats_booked, longest_run in zip(
+            keys, booked, longest):
+        info = flights[flight_number]
+        free = max(info["capacity"] - int(seats_booked), 0)
+        if free < seats_needed:
+            continue
+        found["outbound" if flight_number in outbound else "inbound"].append(
+            {"date": flight_date.isoformat(),
+             "flight_number": flight_number,
+             "departure_time": info["flight_STD"],
+             "arrival_time": info["flight_STA"],
+             "free": free,
+             "together": int(longest_run) >= seats_needed})
+    return found
+
+
+def flexible_dates(route, flight_date, seats_needed, days=FLEXIBLE_DAYS):
+    """
+    The flights of 'route' (origin, destination) and back within 'days'
+    days of 'flight_date' which can seat 'seats_needed' passengers, as a
+    dictionary which can be written as JSON
+    """
+
+    if not Common.initialised:
+        Common.initialisation()
+
+    start, end = flexible_window(flight_date, days)
+    if start > end:
+        return {"from": start.isoformat(), "to": end.isoformat(),
+                "seats_needed": seats_needed, "outbound": [], "inbound": []}
+
+    key = flexible_key(route, start, end, seats_needed)
+    result = cache.get(key)
+    if result is None:
+        result = {"from": start.isoformat(), "to": end.isoformat(),
+                  "seats_needed": seats_needed,
+                  **flights_with_room(route, start, end, seats_needed)}
+        cache.set(key, result, settings.FLEXIBLE_SEARCH_TTL)
+    return result
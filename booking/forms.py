@@ -2,6 +2,9 @@
 from django import forms
 from .models import Booking
 from .common import Common
+from . import freeseats
+from .timetable import MINIMUM_CONNECTION
+from .timetable import route_airports, timetable
 import datetime
 
 
@@ -13,28 +16,143 @@ class BookingForm(forms.ModelForm):
         fields = "__all__"
 
 
+class AvailabilityRadioSelect(forms.RadioSelect):
+    """
+    Radio Buttons on which the flights which cannot be booked
+    are greyed out
+    """
+
+    def __init__(self, *args, unavailable=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        # The values (departure times) of the flights which cannot be
+        # booked and why e.g. {"0800": "Full"}
+        self.unavailable = dict(unavailable or {})
+
+    def create_option(self, name, value, label, selected, index,
+                      subindex=None, attrs=None):
+        option = super().create_option(name, value, label, selected, index,
+                                       subindex, attrs)
+        if value in self.unavailable:
+            option["attrs"]["disabled"] = True
+            option["label"] = f"{label} ({self.unavailable[value]})"
+        return option
+
+
 class CreateBookingForm(forms.Form):
     """ Creating a Form """
 
     def __init__(self, *args, **kwargs):
         super(CreateBookingForm, self).__init__(*args, **kwargs)
 
+        self.fields["route"].choices = [
+            (route, route.replace("-", " - "))
+            for route in Common.outbound_routes]
+        self.fields["route"].initial = Common.outbound_routes[0]
+        origin, destination = self.route_entered()
+        outbound_flights = timetable().route_flights(origin, destination)
+        inbound_flights = timetable().route_flights(destination, origin)
+
+        # The flights which cannot seat the party on the chosen dates
+        seats_needed = (self.number_entered("adults", 1) +
+                        self.number_entered("children", 0))
+        unavailable_outbound = self.unavailable_times(
+                                    self.date_entered("departing_date"),
+                                    outbound_flights, seats_needed)
+        unavailable_inbound = self.unavailable_times(
+                                    self.date_entered("returning_date"),
+                                    inbound_flights, seats_needed)
+
         # Finally found the solution to how to update choice fields here:
         # https://stackoverflow.com/questions/24877686/update-django-choice-field-with-database-results
-        the_choices = list(zip(Common.OUTBOUND_TIME_OPTIONS1,
-                               Common.OUTBOUND_TIME_OPTIONS2))
+        the_choices = self.time_choices(outbound_flights)
         self.fields["departing_time"] = forms.ChoiceField(
-                    initial=Common.OUTBOUND_TIME_OPTIONS1[0],
-                    choices=the_choices, widget=forms.RadioSelect)
-
-        the_choices = list(zip(Common.INBOUND_TIME_OPTIONS1,
-                               Common.INBOUND_TIME_OPTIONS2))
-        # Common.INBOUND_TIME_OPTIONS1[0] would be an interval
-        # of less than 90 minutes. Therefore use the next available slot
-        # i.e. Common.INBOUND_TIME_OPTIONS1[1]
+                    initial=the_choices[0][0] if the_choices else None,
+                    choices=the_choices,
+                    widget=AvailabilityRadioSelect(
+                                unavailable=unavailable_outbound))
+
+        # The first return flight could leave less than 90 minutes
+        # after the first flight arrives.
+        # Therefore use the first one which does not
+        the_choices = self.time_choices(inbound_flights)
+        initial = next((flight_number for flight_number in inbound_flights
+                        if outbound_flights and
+                        timetable().flights[flight_number]["std"] -
+                        timetable().arrival(outbound_flights[0]) >=
+                        MINIMUM_CONNECTION),
+                       inbound_flights[0] if inbound_flights else None)
         self.fields["returning_time"] = forms.ChoiceField(
-                    initial=Common.INBOUND_TIME_OPTIONS1[1],
-                    choices=the_choices, widget=forms.RadioSelect)
+                    initial=(timetable().flights[initial]["flight_STD"]
+                             if initial else None),
+                    choices=the_choices,
+                    widget=AvailabilityRadioSelect(
+                                unavailable=unavailable_inbound))
+        if self["return_option"].value() == self.ONE_WAY:
+            # One-way: No return flight to choose
+            self.fields["returning_time"].required = False
+
+    def route_entered(self):
+        """ The (origin, destination) of the route chosen """
+        route = self["route"].value()
+        if route not in Common.outbound_routes:
+            route = Common.outbound_routes[0]
+        return route_airports(route)
+
+    def time_choices(self, flight_numbers):
+        """
+        The radio button options of the flights, one for each departure
+        time - flights at the same time operate on different dates
+        """
+        flights = timetable().flights
+        choices = {}
+        for flight_number in flight_numbers:
+            info = flights[flight_number]
+            choices.setdefault(info["flight_STD"],
+                               Common.format_radio_button_option(
+                                   info["flight_STD"], info["flight_from"],
+                                   info["flight_STA"], info["flight_to"]))
+        return list(choices.items())
+
+    def date_entered(self, name):
+        """ The date entered in the field (or its initial date) or None """
+        value = self[name].value()
+        if isinstance(value, datetime.date):
+            return value
+        try:
+            return datetime.datetime.strptime(value or "", "%Y-%m-%d").date()
+        except ValueError:
+            return None
+
+    def number_entered(self, name, default):
+        try:
+            return max(int(self[name].value()), 0)
+        except (TypeError, ValueError):
+            return default
+
+    def unavailable_times(self, flight_date, flight_numbers, seats_needed):
+        """
+        The departure times of the flights which do not operate
+        on 'flight_date' or are full
+        """
+        if flight_date is None:
+            return {}
+        table = timetable()
+        operating = [flight_number for flight_number in flight_numbers
+                     if table.operates(flight_number, flight_date)]
+        full = freeseats.full_flights(flight_date, operating,
+                                      max(seats_needed, 1))
+        unavailable = {}
+        for flight_number in flight_numbers:
+            departure_time = table.flights[flight_number]["flight_STD"]
+            if flight_number in full:
+                unavailable[departure_time] = "Full"
+            elif flight_number not in operating:
+                unavailable.setdefault(departure_time, "Not operating")
+            else:
+                # Another flight at the same time operates on this date
+                unavailable[departure_time] = None
+        return {departure_time: reason for departure_time, reason in
+                unavailable.items() if reason}
 
     def as_p(self):
         """
@@ -145,6 +263,39 @@ class CreateBookingForm(forms.Form):
             raise forms.ValidationError(Common.MAXIMUM_MESSAGE)
 
         return number_of_children
+
+    def clean(self):
+        """
+        Find the flights chosen - the flight of the route
+        which departs at the time chosen on the date chosen
+        """
+        cleaned_data = super().clean()
+        table = timetable()
+        origin, destination = route_airports(cleaned_data.get("route"))
+
+        cleaned_data["outbound_flightno"] = None
+        departing_date = cleaned_data.get("departing_date")
+        departing_time = cleaned_data.get("departing_time")
+        if departing_date and departing_time:
+            cleaned_data["outbound_flightno"] = table.flight_at(
+                origin, destination, departing_date, departing_time)
+            if cleaned_data["outbound_flightno"] is None:
+                self.add_error("departing_time",
+                               "There is no flight at this time "
+                               "on the Departing date.")
+
+        cleaned_data["inbound_flightno"] = None
+        returning_date = cleaned_data.get("returning_date")
+        returning_time = cleaned_data.get("returning_time")
+        if (cleaned_data.get("return_option") == self.RETURN and
+                returning_date and returning_time):
+            cleaned_data["inbound_flightno"] = table.flight_at(
+                destination, origin, returning_date, returning_time)
+            if cleaned_data["inbound_flightno"] is None:
+                self.add_error("returning_time",
+                               "There is no flight at this time "
+                               "on the Returning date.")
+        return cleaned_data
     ######################################################################
 
     # Initialisations
@@ -156,6 +307,8 @@ class CreateBookingForm(forms.Form):
         (ONE_WAY, "One Way")
     ]
 
+    route = forms.ChoiceField()
+
     return_option = forms.ChoiceField(
         choices=RETURN_CHOICE,
     )
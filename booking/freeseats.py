@@ -0,0 +1,101 @@
+"""
+Free Seats
+
+The number of free seats of each flight on each date is kept in the
+cache so that the Create Booking Form can grey out the full flights
+and 'check_availability' can turn down a party which will not fit
+without reading the Schedule and decoding its seatmap.
+
+Every function which takes or frees seats drops the flight's figure
+from the cache once its transaction has committed. (Writing the new
+figure instead could leave the older of two bookings' figures in the
+cache, as the commits' callbacks can run in either order.)
+Flights which are not in the cache are read from the Schedules
+(one query for all of the flights of a date) and then cached.
+
+The figures expire after FREE_SEATS_TTL seconds. The cache is shared
+by the processes (see CACHES in settings.py) but a figure read just
+before another booking commits can still be cached after it, so a
+figure may be behind by a booking or two:
+- one which shows too many free seats is harmless, as seats are always
+  allocated from the seat log (see seatlog.py)
+- one which shows too few would turn a party away, so 'full_flights'
+  with 'confirm' reads the Schedules of the flights before they are
+  reported as full
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Schedule
+from .timetable import timetable
+
+
+def free_seats_key(flight_date, flight_number):
+    return f"booking:free:{flight_date.isoformat()}:{flight_number}"
+
+
+def capacity(flight_number):
+    return timetable().flights.get(flight_number, {}).get("capacity", 0)
+
+
+def forget_free_seats(flight_date, flight_number):
+    """
+    Drop the flight's figure once the current transaction commits
+    so that it is read afresh
+    """
+
+    key = free_seats_key(flight_date, flight_number)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def free_seats(flight_date, flight_numbers):
+    """ The number of free seats of each of the flights on 'flight_date' """
+
+    keys = {free_seats_key(flight_date, flight_number): flight_number
+            for flight_number in flight_numbers}
+    free = {keys[key]: count for key, count in cache.get_many(keys).items()}
+
+    missing = [flight_number for flight_number in flight_numbers
+               if flight_number not in free]
+    if missing:
+        booked = dict(Schedule.objects
+                      .filter(flight_date=flight_date,
+                              flight_number__in=missing)
+                      .values_list("flight_number", "total_booked"))
+        for flight_number in missing:
+            free[flight_number] = max(capacity(flight_number) -
+                                      booked.get(flight_number, 0), 0)
+            # 'add' so that a booking written through in the meantime
+            # is not overwritten with the older figure
+            cache.add(free_seats_key(flight_date, flight_number),
+                      free[flight_number], settings.FREE_SEATS_TTL)
+    return free
+
+
+def full_flights(flight_date, flight_numbers, seats_needed=1,
+                 confirm=False):
+    """
+    Those of the flights which have fewer than 'seats_needed' free
+    'confirm' - check the flights which the cache says are full against
+    their Schedules, correcting the cache, before turning a party away
+    """
+
+    free = free_seats(flight_date, flight_numbers)
+    full = {flight_number for flight_number in flight_numbers
+            if free[flight_number] < seats_needed}
+    if not (confirm and full):
+        return full
+
+    booked = dict(Schedule.objects
+                  .filter(flight_date=flight_date, flight_number__in=full)
+                  .values_list("flight_number", "total_booked"))
+    for flight_number in list(full):
+        seats = max(capacity(flight_number) - booked.get(flight_number, 0),
+                    0)
+        cache.set(free_seats_key(flight_date, flight_number), seats,
+                  settings.FREE_SEATS_TTL)
+        if seats >= seats_needed:
+            full.discard(flight_number)
+    return full
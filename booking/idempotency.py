@@ -0,0 +1,120 @@
+"""
+Idempotency Keys
+
+Agents double-click "Agree and pay now" and browsers and API clients
+retry requests which are slow to respond, yet each confirmation must
+only be carried out once:
+
+- the Confirm Booking and Confirm Changes Forms carry a key issued by
+  the server as the form is shown ('issue')
+- API clients may send a key of their own in an Idempotency-Key header
+
+The request which claims a key ('claim') makes its writes and records
+its result against the key ('complete') in one transaction. Any other
+request with the key is a replay and is given that result instead,
+without writing anything. Should the writes fail the claim is rolled
+back with them, so the key can be used again.
+
+Keys are honoured for IDEMPOTENCY_KEY_TTL seconds, after which
+'manage.py sweep_idempotency_keys' deletes them.
+"""
+
+import hashlib
+import json
+import secrets
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+# What a key confirms
+CONFIRM = "confirm"
+AMEND = "amend"
+API_BOOKING = "api-booking"
+
+# The hidden field of the confirmation forms
+FIELD_NAME = "idempotency_key"
+
+# The header of the API requests
+HEADER = "Idempotency-Key"
+MAXIMUM_KEY_LENGTH = 64
+
+# Random bytes in a key issued by the server (32 characters)
+KEY_BYTES = 24
+
+
+def oldest_honoured(ttl=None):
+    """ Keys created before this have expired """
+    if ttl is None:
+        ttl = settings.IDEMPOTENCY_KEY_TTL
+    return timezone.now() - timedelta(seconds=ttl)
+
+
+def fingerprint(body):
+    """ The SHA-256 of a request's body """
+    return hashlib.sha256(body).hexdigest()
+
+
+def issue(username, purpose):
+    """ A new key for a form which 'username' is about to be shown """
+    key = secrets.token_urlsafe(KEY_BYTES)
+    IdempotencyKey.objects.create(key=key, username=username,
+                                  purpose=purpose)
+    return key
+
+
+def claim(key, username, purpose, request_fingerprint="", issued=True):
+    """
+    Claim the key for carrying out a request
+    Must be called in the transaction which makes the request's writes
+    Returns (claimed, record):
+        (True, record)   go ahead, then 'complete' the record
+        (False, record)  a replay - the record holds the result
+        (False, None)    the key is unknown or has expired
+    'issued' - the key must have been issued by the server, otherwise
+    (the API) an unknown key is added as it is claimed
+    """
+
+    keys = IdempotencyKey.objects.filter(username=username, key=key)
+    if not issued:
+        keys.filter(created_at__lt=oldest_honoured()).delete()
+        try:
+            # A savepoint so that the transaction survives a duplicate
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    key=key, username=username, purpose=purpose,
+                    state=IdempotencyKey.CLAIMED,
+                    fingerprint=request_fingerprint)
+            return (True, record)
+        except IntegrityError:
+            # Claimed by an earlier request
+            pass
+
+    keys = keys.filter(purpose=purpose, created_at__gte=oldest_honoured())
+    # Only one request can move the key on from ISSUED
+    claimed = (keys.filter(state=IdempotencyKey.ISSUED)
+               .update(state=IdempotencyKey.CLAIMED))
+    return (claimed == 1, keys.first())
+
+
+def complete(record, result, status=200):
+    """ Record the result of the request which claimed the key """
+    record.state = IdempotencyKey.DONE
+    record.status = status
+    record.result = json.dumps(result)
+    record.save(update_fields=["state", "status", "result"])
+
+
+def result(record):
+    """ The result recorded by 'complete' """
+    return json.loads(record.result or "null")
+
+
+def sweep(ttl=None):
+    """ Delete the expired keys, returning how many there were """
+    deleted, _ = (IdempotencyKey.objects
+                  .filter(created_at__lt=oldest_honoured(ttl)).delete())
+    return deleted
@@ -0,0 +1,243 @@
+"""
+Seat Inventory Checks
+
+A flight's seats are recorded three times over:
+    the seat log                  the seats taken i.e. the Schedule's
+                                  seatmap plus later SeatEvents
+                                  (see seatlog.py)
+    the Schedule's total_booked   the number of seats taken
+    the Passengers' seat numbers  who sits where
+together with its DepartureLoad (see loads.py).
+
+'check_inventory' recomputes what the Schedules and DepartureLoads
+ought to hold from the Passengers of the flights of a range of dates
+and reports every flight on which they differ. With 'repair' the
+Schedules and DepartureLoads are rewritten from the Passengers
+and SeatEvents (with no PNR) are added to correct the seat log.
+Two Passengers in the same seat cannot be repaired automatically
+and are only reported.
+
+Each range of dates is checked with one query on each of the
+Passengers, the Archived Passengers, the Schedules, the SeatEvents
+and the DepartureLoads, so that many ranges can be checked in parallel
+(see the 'check_inventory' management command)
+"""
+
+from collections import namedtuple
+from itertools import chain
+
+from django.db import connection, transaction
+from django.db.models import Q
+
+from . import freeseats
+from . import seatlog
+from .bookinghelper import CAPACITY, from_seat_to_number
+from .models import ArchivedPassenger, DepartureLoad, Passenger, Schedule
+from .seatlog import bits_seatmap, seatmap_bits
+
+# What the Passengers say a flight should hold
+# 'seats' - the seat positions taken as a 96-bit integer, bit N is seat N
+Inventory = namedtuple("Inventory", ["seats", "seated", "adults", "children",
+                                     "infants", "wheelchairs",
+                                     "double_booked", "bad_seats"])
+
+# A flight whose records differ from its Passengers
+# 'expected' - the Inventory from the Passengers
+# 'seatmap' - the seats taken now according to the seat log
+# 'total_booked' - the Schedule's (None - no Schedule)
+# 'load' - the DepartureLoad's (booked, adults, children, infants,
+# wheelchairs) or None
+Discrepancy = namedtuple("Discrepancy", ["flight_date", "flight_number",
+                                         "expected", "seatmap",
+                                         "total_booked", "load", "problems"])
+
+PAX_TYPE_FIELDS = {"A": "adults", "C": "children", "I": "infants"}
+
+
+def passenger_rows(model, start, end):
+    """ The flights and seats of the Passengers flying 'start' to 'end' """
+
+    return (model.objects
+            .filter(Q(pnr__outbound_date__range=(start, end)) |
+                    Q(pnr__return_flight=True,
+                      pnr__inbound_date__range=(start, end)))
+            .values_list("pnr__outbound_date", "pnr__outbound_flightno",
+                         "outbound_seat_number",
+                         "pnr__return_flight", "pnr__inbound_date",
+                         "pnr__inbound_flightno", "inbound_seat_number",
+                         "pax_type", "wheelchair_ssr")
+            .iterator())
+
+
+def expected_inventory(start, end):
+    """
+    The Inventory of every flight from 'start' to 'end' inclusive
+    according to its Passengers, live and archived (see archive.py)
+    """
+
+    flights = {}
+    for (outbound_date, outbound_flightno, outbound_seat,
+         return_flight, inbound_date, inbound_flightno, inbound_seat,
+         pax_type, wheelchair_ssr) in chain(passenger_rows(Passenger,
+                                                          start, end),
+                                            passenger_rows(ArchivedPassenger,
+                                                           start, end)):
+        legs = [(outbound_date, outbound_flightno, outbound_seat)]
+        if return_flight:
+            legs.append((inbound_date, inbound_flightno, inbound_seat))
+
+        for flight_date, flight_number, seat in legs:
+            if flight_date is None or not start <= flight_date <= end:
+                continue
+            flight = flights.setdefault((flight_date, flight_number), {
+                        "seats": 0, "seated": 0, "adults": 0,
+                        "children": 0, "infants": 0, "wheelchairs": 0,
+                        "double_booked": [], "bad_seats": []})
+            flight[PAX_TYPE_FIELDS.get(pax_type, "adults")] += 1
+            if wheelchair_ssr:
+                flight["wheelchairs"] += 1
+            if not seat:
+                # Infants have no seats
+                continue
+
+            seatpos = from_seat_to_number(seat)
+            if seatpos < 0 or seatpos >= CAPACITY:
+                flight["bad_seats"].append(seat)
+                continue
+            if flight["seats"] >> seatpos & 1:
+                flight["double_booked"].append(seat)
+                continue
+            flight["seats"] |= 1 << seatpos
+            flight["seated"] += 1
+
+    return {key: Inventory(**flight) for key, flight in flights.items()}
+
+
+def empty_inventory():
+    return Inventory(0, 0, 0, 0, 0, 0, [], [])
+
+
+def find_problems(expected, schedule, load, seats):
+    """
+    How a flight's seats, Schedule and DepartureLoad differ from 'expected'
+    'seats' - the seats taken now according to the seat log
+    """
+
+    problems = []
+    total_booked = schedule.total_booked if schedule else 0
+
+    if schedule is None and expected.seated:
+        problems.append("no schedule")
+    if seats & ~expected.seats:
+        problems.append(f"{bin(seats & ~expected.seats).count('1')} "
+                        f"seats taken by nobody")
+    if expected.seats & ~seats:
+        problems.append(f"{bin(expected.seats & ~seats).count('1')} "
+                        f"passengers' seats free on the seatmap")
+    if total_booked != bin(seats).count("1"):
+        problems.append(f"total booked {total_booked} but "
+                        f"{bin(seats).count('1')} seats on the seatmap")
+    if total_booked != expected.seated:
+        problems.append(f"total booked {total_booked} but "
+                        f"{expected.seated} seated passengers")
+    if expected.double_booked:
+        problems.append(f"seats booked twice: "
+                        f"{', '.join(expected.double_booked)}")
+    if expected.bad_seats:
+        problems.append(f"invalid seats: {', '.join(expected.bad_seats)}")
+
+    expected_load = (expected.seated, expected.adults, expected.children,
+                     expected.infants, expected.wheelchairs)
+    found_load = ((load.booked, load.adults, load.children, load.infants,
+                   load.wheelchairs) if load else (0, 0, 0, 0, 0))
+    if found_load != expected_load:
+        problems.append(f"departure load {found_load} "
+                        f"should be {expected_load}")
+    return problems
+
+
+def repair(discrepancy, schedule, load):
+    """
+    Rewrite the Schedule and DepartureLoad of a flight and add
+    the SeatEvents which bring its seats into line with the Passengers
+    """
+
+    expected = discrepancy.expected
+    if schedule is None:
+        if expected.seated:
+            Schedule.objects.create(flight_date=discrepancy.flight_date,
+                                    flight_number=discrepancy.flight_number,
+                                    total_booked=expected.seated)
+    else:
+        schedule.total_booked = expected.seated
+        schedule.save(update_fields=["total_booked"])
+    seatlog.correct_seats(discrepancy.flight_date, discrepancy.flight_number,
+                          seatmap_bits(discrepancy.seatmap), expected.seats)
+
+    freeseats.forget_free_seats(discrepancy.flight_date,
+                                discrepancy.flight_number)
+    DepartureLoad.objects.update_or_create(
+        flight_date=discrepancy.flight_date,
+        flight_number=discrepancy.flight_number,
+        defaults={"booked": expected.seated, "adults": expected.adults,
+                  "children": expected.children,
+                  "infants": expected.infants,
+                  "wheelchairs": expected.wheelchairs})
+
+
+def check_inventory(start, end, repair_records=False):
+    """
+    Check the flights from 'start' to 'end' inclusive against
+    their Passengers. Returns a list of Discrepancies and the
+    number of flights checked. With 'repair_records' the Schedules and
+    DepartureLoads are corrected, except where seats are booked twice
+
+    Intended to be run in a process or thread of its own,
+    so the database connection is closed at the end
+    """
+
+    try:
+        with transaction.atomic():
+            schedules = Schedule.objects.filter(
+                                        flight_date__range=(start, end))
+            if repair_records:
+                # New bookings wait for the Schedules before they commit
+                # (see 'seatlog.add_to_booked') so nothing they do is
+                # seen partly done whilst checking
+                schedules = schedules.select_for_update()
+            schedules = {(schedule.flight_date, schedule.flight_number):
+                         schedule for schedule in schedules}
+            loads = {(load.flight_date, load.flight_number): load
+                     for load in DepartureLoad.objects.filter(
+                                        flight_date__range=(start, end))}
+            tails = seatlog.tail_events(start, end)
+            inventories = expected_inventory(start, end)
+
+            discrepancies = []
+            for key in sorted(schedules.keys() | loads.keys() |
+                              tails.keys() | inventories.keys()):
+                schedule = schedules.get(key)
+                load = loads.get(key)
+                expected = inventories.get(key) or empty_inventory()
+                seats = seatlog.apply_events(
+                            seatmap_bits(schedule.seatmap) if schedule else 0,
+                            tails.get(key, []))
+                problems = find_problems(expected, schedule, load, seats)
+                if not problems:
+                    continue
+
+                discrepancy = Discrepancy(
+                    *key, expected, bits_seatmap(seats),
+                    schedule.total_booked if schedule else None,
+                    ((load.booked, load.adults, load.children,
+                      load.infants, load.wheelchairs) if load else None),
+                    problems)
+                discrepancies.append(discrepancy)
+                if (repair_records and not expected.double_booked and
+                        not expected.bad_seats):
+                    repair(discrepancy, schedule, load)
+
+            return discrepancies, len(schedules.keys() | inventories.keys())
+    finally:
+        connection.close()
+
@@ -0,0 +1,272 @@
+"""
+Connecting Itineraries
+
+Where no flight flies a route, or the party will not fit on those
+which do, the passengers can get there through another airport,
+e.g. LCY -> IOM -> BHD.
+
+The Timetable (see timetable.py) is turned into a Network - the
+departures from each airport on each day of the week in order of STD -
+once per Timetable. An itinerary search then works in minutes after
+midnight of the travel date so that a flight on the following day is
+just a later time:
+
+1) every leg which could be part of an itinerary is found from the
+   timetable alone: the departures from the origin on the date and
+   then from each airport reached, no sooner than MINIMUM_CONNECTION
+   and no later than MAXIMUM_CONNECTION after arriving there,
+   up to MAXIMUM_LEGS flights
+2) the free seats of all of those legs are read in one query
+   on the Schedules
+3) for each departure from the origin with room for the party the
+   earliest arrival at the destination is found with a shortest path
+   search over the legs with room, fewer flights winning a tie
+4) itineraries which depart no later and arrive no sooner than
+   another one are dropped
+
+The result is cached per origin, destination, date and party size for
+ITINERARY_SEARCH_TTL seconds, so as with the flexible dates search
+(see flexdates.py) the seats are checked again when booking.
+"""
+
+import heapq
+from bisect import bisect_left, bisect_right
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Schedule
+from .timetable import MINIMUM_CONNECTION, MINUTES_PER_DAY, timetable
+
+# The most flights of one itinerary
+MAXIMUM_LEGS = 3
+
+# The longest wait for a connecting flight
+MAXIMUM_CONNECTION = 6 * 60
+
+# The later flights of an itinerary may depart on the day after
+# the travel date but no later
+SEARCH_DAYS = 2
+
+_network = None
+
+
+class Network:
+    """ The Timetable as a graph of airports joined by flights """
+
+    def __init__(self, table):
+        self.table = table
+        self.airports = sorted({airport for route in table.routes
+                                for airport in route})
+
+        # (airport, weekday) -> [(STD, flight number)] in order of STD
+        departures = {}
+        for (origin, _, weekday), flight_numbers in table.by_weekday.items():
+            departures.setdefault((origin, weekday), []).extend(
+                (table.flights[flight_number]["std"], flight_number)
+                for flight_number in flight_numbers)
+        self.departures = {key: sorted(flights)
+                           for key, flights in departures.items()}
+        self.times = {key: [std for std, _ in flights]
+                      for key, flights in self.departures.items()}
+
+    def legs_from(self, airport, travel_date, earliest, latest):
+        """
+        The flights from 'airport' departing from 'earliest' to 'latest'
+        (minutes after midnight of 'travel_date') as
+        (departs, arrives, flight date, flight number)
+        """
+
+        legs = []
+        first_day = max(earliest // MINUTES_PER_DAY, 0)
+        last_day = min(latest // MINUTES_PER_DAY, SEARCH_DAYS - 1)
+        for day in range(first_day, last_day + 1):
+            flight_date = travel_date + timedelta(days=day)
+            key = (airport, flight_date.weekday())
+            times = self.times.get(key, [])
+            midnight = day * MINUTES_PER_DAY
+            for std, flight_number in self.departures.get(key, [])[
+                    bisect_left(times, earliest - midnight):
+                    bisect_right(times, latest - midnight)]:
+                if not self.table.in_effect(flight_number, flight_date):
+                    continue
+                departs = midnight + std
+                legs.append((departs,
+                             departs +
+                             self.table.flights[flight_number]["duration"],
+                             flight_date, flight_number))
+        return legs
+
+    def connections(self, airport, arrives, travel_date):
+        """ The flights which connect with an arrival at 'airport' """
+        return self.legs_from(airport, travel_date,
+                              arrives + MINIMUM_CONNECTION,
+                              arrives + MAXIMUM_CONNECTION)
+
+    def candidate_legs(self, origin, destination, travel_date):
+        """
+        Every leg which could be part of an itinerary from 'origin'
+        to 'destination' on 'travel_date', seats aside
+        """
+
+        legs = set()
+        reached = {(origin, None)}
+        for _ in range(MAXIMUM_LEGS):
+            arrivals = set()
+            for airport, arrives in reached:
+                if arrives is None:
+                    found = self.legs_from(airport, travel_date,
+                                           0, MINUTES_PER_DAY - 1)
+                else:
+                    found = self.connections(airport, arrives, travel_date)
+                for leg in found:
+                    legs.add(leg)
+                    flight_to = self.table.flights[leg[3]]["flight_to"]
+                    if flight_to not in (origin, destination):
+                        arrivals.add((flight_to, leg[1]))
+            reached = arrivals
+        return legs
+
+    def earliest_arrival(self, first_leg, destination, travel_date, room):
+        """
+        The legs of the itinerary beginning with 'first_leg' which
+        arrives soonest at 'destination' using only the legs in 'room'
+        or None if there is none
+        """
+
+        table = self.table
+        # Ordered by arrival, then number of flights
+        queue = [(first_leg[1], 1, [first_leg])]
+        while queue:
+            arrives, count, legs = heapq.heappop(queue)
+            airport = table.flights[legs[-1][3]]["flight_to"]
+            if airport == destination:
+                return legs
+            if count == MAXIMUM_LEGS:
+                continue
+            visited = {table.flights[legs[0][3]]["flight_from"]}
+            visited.update(table.flights[leg[3]]["flight_to"] for leg in legs)
+            for leg in self.connections(airport, arrives, travel_date):
+                if (leg in room and
+                        table.flights[leg[3]]["flight_to"] not in visited):
+                    heapq.heappush(queue, (leg[1], count + 1, legs + [leg]))
+        return None
+
+
+def network():
+    """ The Network of the current Timetable """
+
+    global _network
+    table = timetable()
+    current = _network
+    if current is None or current.table is not table:
+        current = _network = Network(table)
+    return current
+
+
+def legs_free_seats(legs):
+    """
+    The number of free seats of each of the legs
+    (from one query on the Schedules)
+    Flights which nobody has booked yet have no Schedule record
+    """
+
+    table = timetable()
+    booked = {}
+    if legs:
+        booked = {(flight_date, flight_number): total_booked
+                  for flight_date, flight_number, total_booked in
+                  Schedule.objects
+                  .filter(flight_date__in={leg[2] for leg in legs},
+                          flight_number__in={leg[3] for leg in legs})
+                  .values_list("flight_date", "flight_number",
+                               "total_booked")}
+    return {leg: max(table.flights[leg[3]]["capacity"] -
+                     booked.get((leg[2], leg[3]), 0), 0)
+            for leg in legs}
+
+
+def dominated(itinerary, others):
+    """ Whether another itinerary departs no sooner and arrives no later """
+    departs, arrives = itinerary[0][0], itinerary[-1][1]
+    return any(other is not itinerary and
+               other[0][0] >= departs and other[-1][1] <= arrives and
+               (other[0][0], -other[-1][1], -len(other)) >
+               (departs, -arrives, -len(itinerary))
+               for other in others)
+
+
+def search(origin, destination, travel_date, seats_needed):
+    """
+    The itineraries from 'origin' to 'destination' departing on
+    'travel_date' which can seat 'seats_needed' passengers
+    as lists of legs (departs, arrives, flight date, flight number)
+    in order of departure
+    """
+
+    graph = network()
+    free = legs_free_seats(graph.candidate_legs(origin, destination,
+                                                travel_date))
+    room = {leg for leg, count in free.items() if count >= seats_needed}
+
+    found = []
+    for leg in graph.legs_from(origin, travel_date, 0, MINUTES_PER_DAY - 1):
+        if leg in room:
+            legs = graph.earliest_arrival(leg, destination, travel_date,
+                                          room)
+            if legs:
+                found.append(legs)
+    return [legs for legs in found if not dominated(legs, found)], free
+
+
+def describe(legs, free):
+    """ An itinerary as a dictionary which can be written as JSON """
+
+    table = timetable()
+    described = []
+    for departs, arrives, flight_date, flight_number in legs:
+        info = table.flights[flight_number]
+        described.append(
+            {"date": flight_date.isoformat(),
+             "flight_number": flight_number,
+             "flight_from": info["flight_from"],
+             "flight_to": info["flight_to"],
+             "departure_time": info["flight_STD"],
+             "arrival_time": info["flight_STA"],
+             "arrival_date": (flight_date + timedelta(
+                 days=table.arrival(flight_number) // MINUTES_PER_DAY))
+             .isoformat(),
+             "free": free[(departs, arrives, flight_date, flight_number)]})
+    return {"departure_date": described[0]["date"],
+            "departure_time": described[0]["departure_time"],
+            "arrival_date": described[-1]["arrival_date"],
+            "arrival_time": described[-1]["arrival_time"],
+            "duration": legs[-1][1] - legs[0][0],
+            "connections": len(legs) - 1,
+            "legs": described}
+
+
+def itineraries_key(version, origin, destination, travel_date, seats_needed):
+    return (f"booking:itineraries:{version}:{origin}:{destination}:"
+            f"{travel_date.isoformat()}:{seats_needed}")
+
+
+def itineraries(origin, destination, travel_date, seats_needed):
+    """
+    The itineraries from 'origin' to 'destination' on 'travel_date'
+    which can seat 'seats_needed' passengers, as a dictionary which
+    can be written as JSON
+    """
+
+    key = itineraries_key(timetable().version, origin, destination,
+                          travel_date, seats_needed)
+    result = cache.get(key)
+    if result is None:
+        found, free = search(origin, destination, travel_date, seats_needed)
+        result = {"from": origin, "to": destination,
+                  "date": travel_date.isoformat(),
+                  "seats_needed": seats_needed,
+                  "itineraries": [describe(legs, free) for legs in found]}
+        cache.set(key, result, settings.ITINERARY_SEARCH_TTL)
+    return result
@@ -0,0 +1,129 @@
+"""
+Departure Loads
+
+Each flight's DepartureLoad holds its booked figure and the numbers
+of Adults, Children, Infants and Wheelchair passengers on board.
+It is written alongside the flight's Schedule record, in the same
+transaction, whenever seats are taken or freed so that the Departures
+page is one range query on the DepartureLoads rather than a count of
+the Passengers of every Booking.
+"""
+
+from collections import namedtuple
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from .common import Common
+from .models import DepartureLoad
+from .timetable import timetable
+
+PassengerMix = namedtuple("PassengerMix", ["adults", "children", "infants",
+                                           "wheelchairs"],
+                          defaults=[0, 0, 0, 0])
+
+NO_PASSENGERS = PassengerMix()
+
+PAX_TYPE_FIELDS = {"A": "adults", "C": "children", "I": "infants"}
+
+
+def passenger_mix(passengers, sign=1):
+    """
+    Count the passengers of each type and those needing a wheelchair
+    'passengers' - the (pax_type, wheelchair_ssr) of each passenger
+    'sign' -1 gives negative counts i.e. the passengers are leaving
+    """
+
+    counts = dict.fromkeys(PassengerMix._fields, 0)
+    for pax_type, wheelchair_ssr in passengers:
+        counts[PAX_TYPE_FIELDS[pax_type]] += sign
+        if wheelchair_ssr:
+            counts["wheelchairs"] += sign
+    return PassengerMix(**counts)
+
+
+def combine(*mixes):
+    """ Add PassengerMixes together """
+    return PassengerMix(*(sum(counts) for counts in zip(*mixes)))
+
+
+def record_departure_load(flight_date, flight_number, total_booked=None,
+                          change=NO_PASSENGERS):
+    """
+    Bring a flight's DepartureLoad into step with its Schedule
+    'total_booked' - the Schedule's new booked figure (None - unchanged)
+    'change' - a PassengerMix of the passengers added (positive counts)
+    and/or removed (negative counts)
+    Call this within the transaction which saves the Schedule
+    """
+
+    changes = {field: Greatest(F(field) + count, 0)
+               for field, count in change._asdict().items() if count}
+    if total_booked is not None:
+        changes["booked"] = total_booked
+    if not changes:
+        return
+
+    load = DepartureLoad.objects.filter(flight_date=flight_date,
+                                        flight_number=flight_number)
+    with transaction.atomic():
+        if load.update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                DepartureLoad.objects.create(
+                    flight_date=flight_date, flight_number=flight_number,
+                    booked=total_booked or 0,
+                    **{field: max(count, 0)
+                       for field, count in change._asdict().items()})
+        except IntegrityError:
+            # Another booking has created the load in the meantime
+            load.update(**changes)
+
+
+def upcoming_departures(start, end):
+    """
+    The load of every flight from 'start' to 'end' inclusive in order
+    of departure. Flights which nobody has booked yet are included,
+    those which do not operate on a date (see timetable.py) are not
+    """
+
+    if not Common.initialised:
+        Common.initialisation()
+
+    loads = {(load.flight_date, load.flight_number): load
+             for load in DepartureLoad.objects.filter(
+                                        flight_date__range=(start, end))}
+
+    table = timetable()
+    flights = sorted(table.flights.items(),
+                     key=lambda item: item[1]["std"])
+    departures = []
+    day = start
+    while day <= end:
+        for flight_number, info in flights:
+            if not table.operates(flight_number, day):
+                continue
+            load = (loads.get((day, flight_number)) or
+                    DepartureLoad(flight_date=day,
+                                  flight_number=flight_number))
+            capacity = info["capacity"]
+            departures.append({
+                "flight_date": day,
+                "flight_number": flight_number,
+                "flight_from": info["flight_from"],
+                "flight_to": info["flight_to"],
+                "departure_time": info["flight_STD"],
+                "booked": load.booked,
+                "capacity": capacity,
+                "available": max(capacity - load.booked, 0),
+                "load_factor": (load.booked * 100 // capacity
+                                if capacity else 0),
+                "adults": load.adults,
+                "children": load.children,
+                "infants": load.infants,
+                "wheelchairs": load.wheelchairs})
+        day += timedelta(days=1)
+    return departures
@@ -0,0 +1,191 @@
+"""
+Logging for the Booking App
+
+Each part of the booking process has its own named logger
+so that its level can be set separately (see LOGGING in settings.py):
+
+    booking.allocation   seat allocation and the Schedule seatmaps
+    booking.pricing      fares and fees
+    booking.persistence  writing Bookings, Passengers and Transactions
+    booking.forms        the state carried between the Booking Forms
+    booking.queries      the slow database queries (see slowqueries.py)
+
+Events are logged with 'event()' which takes the event's name and its
+fields. Nothing is formatted unless the event is going to be written,
+so debug events cost next to nothing when debug logging is off.
+
+The filters limit how many events are written:
+    SampleFilter     writes only a fraction of the debug events
+    RateLimitFilter  writes at most N events per second per event name
+                     and reports how many were dropped
+
+ProcessFileHandler writes each process's events to a file of its own,
+as a RotatingFileHandler shared by the gunicorn workers would rotate
+the file from under the others.
+"""
+
+import glob
+import json
+import logging
+import logging.handlers
+import os
+import random
+import re
+import threading
+import time
+
+allocation_log = logging.getLogger("booking.allocation")
+pricing_log = logging.getLogger("booking.pricing")
+persistence_log = logging.getLogger("booking.persistence")
+forms_log = logging.getLogger("booking.forms")
+query_log = logging.getLogger("booking.queries")
+
+
+def event(logger, level, name, **fields):
+    """ Log the event 'name' with its fields """
+    if logger.isEnabledFor(level):
+        logger.log(level, name, extra={"fields": fields}, stacklevel=2)
+
+
+class SampleFilter(logging.Filter):
+    """
+    Pass only 'rate' (0.0 - 1.0) of the debug events
+    Events above debug level always pass
+    """
+
+    def __init__(self, rate=1.0):
+        super().__init__()
+        self.rate = float(rate)
+
+    def filter(self, record):
+        if record.levelno > logging.DEBUG or self.rate >= 1:
+            return True
+        return random.random() < self.rate
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Pass at most 'per_second' events of each name per second
+    The first event after some have been dropped
+    carries the number dropped in its 'suppressed' field
+    Errors always pass
+    """
+
+    def __init__(self, per_second=50):
+        super().__init__()
+        self.per_second = int(per_second)
+        self.lock = threading.Lock()
+        # (logger name, event name) -> [window start, count, suppressed]
+        self.windows = {}
+
+    def filter(self, record):
+        if record.levelno >= logging.ERROR or self.per_second <= 0:
+            return True
+
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self.lock:
+            window = self.windows.get(key)
+            if window is None or now - window[0] >= 1:
+                suppressed = window[2] if window else 0
+                self.windows[key] = [now, 1, 0]
+            elif window[1] < self.per_second:
+                window[1] += 1
+                suppressed = 0
+            else:
+                window[2] += 1
+                return False
+
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Write each event on one line, either as JSON or as
+        time level logger event key=value ...
+    """
+
+    def __init__(self, json_lines=False):
+        super().__init__()
+        self.json_lines = json_lines
+
+    def fields(self, record):
+        fields = dict(getattr(record, "fields", {}))
+        if getattr(record, "suppressed", 0):
+            fields["suppressed"] = record.suppressed
+        if record.exc_info:
+            fields["exception"] = self.formatException(record.exc_info)
+        return fields
+
+    def format(self, record):
+        timestamp = self.formatTime(record, "%Y-%m-%dT%H:%M:%S")
+        fields = self.fields(record)
+
+        if self.json_lines:
+            return json.dumps({"time": timestamp,
+                               "level": record.levelname,
+                               "logger": record.name,
+                               "event": record.getMessage(),
+                               **fields}, default=repr)
+
+        pairs = " ".join(f"{key}={value!r}" for key, value in fields.items())
+        return (f"{timestamp} {record.levelname} {record.name} "
+                f"{record.getMessage()} {pairs}").rstrip()
+
+
+def process_log_file(path, pid):
+    """ e.g. /tmp/slow-queries.jsonl -> /tmp/slow-queries.1234.jsonl """
+    root, extension = os.path.splitext(path)
+    return f"{root}.{pid}{extension}"
+
+
+def process_log_files(path):
+    """
+    The files written by every process for 'path', each preceded by its
+    rotated backups, oldest first
+    """
+    root, extension = os.path.splitext(path)
+    process_file = re.compile(re.escape(root) + r"\.\d+" +
+                              re.escape(extension))
+    files = []
+    for name in sorted(glob.glob(f"{glob.escape(root)}.*{extension}")):
+        if not process_file.fullmatch(name):
+            continue
+        backups = [backup for backup in glob.glob(f"{glob.escape(name)}.*")
+                   if backup.rsplit(".", 1)[1].isdigit()]
+        backups.sort(key=lambda backup: int(backup.rsplit(".", 1)[1]),
+                     reverse=True)
+        files += backups + [name]
+    return files
+
+
+class ProcessFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    A RotatingFileHandler writing to 'filename' with the process id
+    added (see 'process_log_file'). The name is settled when the first
+    event is written, so that workers forked after the logging was
+    configured each have their own file
+    """
+
+    def __init__(self, filename, maxBytes=0, backupCount=0, **kwargs):
+        self.pattern = os.path.abspath(filename)
+        kwargs["delay"] = True
+        super().__init__(process_log_file(self.pattern, os.getpid()),
+                         maxBytes=maxBytes, backupCount=backupCount,
+                         **kwargs)
+
+    def emit(self, record):
+        filename = process_log_file(self.pattern, os.getpid())
+        if filename != self.baseFilename:
+            # Forked since the file was named
+            self.acquire()
+            try:
+                if self.stream:
+                    self.stream.close()
+                    self.stream = None
+                self.baseFilename = filename
+            finally:
+                self.release()
+        super().emit(record)
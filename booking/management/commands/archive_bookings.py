@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from booking.archive import archivable_bookings, archive_bookings
+from booking.archive import archive_cutoff
+
+
+class Command(BaseCommand):
+    help = ("Move the Bookings whose flights departed long ago, "
+            "with their Passengers, into the archive tables")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int,
+                            default=settings.ARCHIVE_AFTER_DAYS,
+                            help="Archive Bookings whose last flight "
+                                 "departed more than this many days ago")
+        parser.add_argument("--batch-size", type=int, default=500,
+                            help="Bookings moved in each transaction")
+        parser.add_argument("--max-batches", type=int,
+                            help="Stop after this many batches")
+        parser.add_argument("--dry-run", action="store_true",
+                            help="Only count the Bookings to archive")
+
+    def handle(self, *args, **options):
+        if options["days"] < 1:
+            raise CommandError("--days must be at least 1")
+        cutoff = archive_cutoff(options["days"])
+
+        if options["dry_run"]:
+            count = archivable_bookings(cutoff).count()
+            self.stdout.write(f"{count} Bookings departed before "
+                              f"{cutoff:%d/%m/%Y} would be archived")
+            return
+
+        moved = archive_bookings(cutoff, max(1, options["batch_size"]),
+                                 options["max_batches"])
+        self.stdout.write(self.style.SUCCESS(
+            f"{moved} Bookings departed before {cutoff:%d/%m/%Y} archived"))
@@ -0,0 +1,109 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from functools import partial
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Max, Min
+
+from booking.inventory import check_inventory
+from booking.models import Booking, Schedule
+from booking.sales import date_chunks
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise CommandError(f"'{value}' is not a date in the format "
+                           f"YYYY-MM-DD")
+
+
+def check_chunk(repair, chunk):
+    return check_inventory(*chunk, repair_records=repair)
+
+
+class Command(BaseCommand):
+    help = ("Check the Schedules' seatmaps and booked figures and the "
+            "Departure Loads against the Passengers and optionally "
+            "repair them")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="start", type=parse_date,
+                            help="First flight date (YYYY-MM-DD), default "
+                                 "the earliest flight")
+        parser.add_argument("--to", dest="end", type=parse_date,
+                            help="Last flight date (YYYY-MM-DD), default "
+                                 "the latest flight")
+        parser.add_argument("--chunk-days", type=int, default=14,
+                            help="Days checked by each job")
+        parser.add_argument("--workers", type=int, default=4,
+                            help="Processes checking chunks at the same time")
+        parser.add_argument("--repair", action="store_true",
+                            help="Rewrite the records which differ "
+                                 "from the Passengers")
+
+    def date_range(self, start, end):
+        """ Default to the dates of every flight on record """
+
+        firsts, lasts = [], []
+        for bounds in (Schedule.objects.aggregate(first=Min("flight_date"),
+                                                  last=Max("flight_date")),
+                       Booking.objects.aggregate(first=Min("outbound_date"),
+                                                 last=Max("outbound_date")),
+                       Booking.objects.aggregate(first=Min("inbound_date"),
+                                                 last=Max("inbound_date"))):
+            if bounds["first"]:
+                firsts.append(bounds["first"])
+                lasts.append(bounds["last"])
+        return (start or (min(firsts) if firsts else date.today()),
+                end or (max(lasts) if lasts else date.today()))
+
+    def handle(self, *args, **options):
+        start, end = options["start"], options["end"]
+        if start is None or end is None:
+            start, end = self.date_range(start, end)
+        if start > end:
+            raise CommandError("--from is later than --to")
+
+        chunks = date_chunks(start, end, max(1, options["chunk_days"]))
+        workers = max(1, options["workers"])
+        if options["repair"] and connection.vendor == "sqlite":
+            # SQLite allows only one writer at a time
+            workers = 1
+
+        # The worker processes open their own connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=django.setup) as pool:
+            results = list(pool.map(partial(check_chunk, options["repair"]),
+                                    chunks))
+
+        discrepancies = [discrepancy for found, _ in results
+                         for discrepancy in found]
+        flights = sum(checked for _, checked in results)
+        unrepairable = 0
+        for discrepancy in discrepancies:
+            expected = discrepancy.expected
+            if expected.double_booked or expected.bad_seats:
+                unrepairable += 1
+            self.stdout.write(
+                f"{discrepancy.flight_number} "
+                f"{discrepancy.flight_date:%d/%m/%Y}: "
+                f"{'; '.join(discrepancy.problems)}")
+
+        summary = (f"{start:%d/%m/%Y} to {end:%d/%m/%Y}: {flights} flights "
+                   f"in {len(chunks)} chunks, "
+                   f"{len(discrepancies)} discrepancies")
+        if discrepancies and options["repair"]:
+            summary += (f", {len(discrepancies) - unrepairable} repaired")
+            if unrepairable:
+                summary += (f", {unrepairable} with seats booked twice or "
+                            f"invalid seats need correcting by hand")
+            self.stdout.write(self.style.WARNING(summary) if unrepairable
+                              else self.style.SUCCESS(summary))
+        elif discrepancies:
+            self.stdout.write(self.style.WARNING(summary))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
@@ -0,0 +1,48 @@
+from datetime import date, datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+
+from booking.models import Schedule
+from booking.seatlog import compact
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise CommandError(f"'{value}' is not a date in the format "
+                           f"YYYY-MM-DD")
+
+
+class Command(BaseCommand):
+    help = ("Fold the seat events logged since the last compaction "
+            "into the Schedules' seatmaps")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="start", type=parse_date,
+                            help="First flight date (YYYY-MM-DD), default "
+                                 "the earliest flight")
+        parser.add_argument("--to", dest="end", type=parse_date,
+                            help="Last flight date (YYYY-MM-DD), default "
+                                 "the latest flight")
+        parser.add_argument("--lag", type=int,
+                            default=settings.SEAT_EVENT_COMPACTION_LAG,
+                            help="Leave the events logged in the last "
+                                 "this many seconds")
+
+    def handle(self, *args, **options):
+        bounds = Schedule.objects.aggregate(first=Min("flight_date"),
+                                            last=Max("flight_date"))
+        start = options["start"] or bounds["first"] or date.today()
+        end = options["end"] or bounds["last"] or date.today()
+        if start > end:
+            raise CommandError("--from is later than --to")
+        if options["lag"] < 0:
+            raise CommandError("--lag cannot be negative")
+
+        flights, events = compact(start, end, options["lag"])
+        self.stdout.write(self.style.SUCCESS(
+            f"{start:%d/%m/%Y} to {end:%d/%m/%Y}: {events} seat events "
+            f"folded into {flights} seatmaps"))
@@ -0,0 +1,76 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+
+from booking.models import SalesRollup, Transaction
+from booking.sales import date_chunks, reconcile
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise CommandError(f"'{value}' is not a date in the format "
+                           f"YYYY-MM-DD")
+
+
+class Command(BaseCommand):
+    help = ("Check the Sales Rollups against the Transactions "
+            "and optionally repair them")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="start", type=parse_date,
+                            help="First day (YYYY-MM-DD), default the "
+                                 "earliest Transaction")
+        parser.add_argument("--to", dest="end", type=parse_date,
+                            help="Last day (YYYY-MM-DD), default the "
+                                 "latest Transaction")
+        parser.add_argument("--chunk-days", type=int, default=31,
+                            help="Days reconciled by each job")
+        parser.add_argument("--workers", type=int, default=4,
+                            help="Chunks reconciled at the same time")
+        parser.add_argument("--repair", action="store_true",
+                            help="Correct the rollups which differ")
+
+    def handle(self, *args, **options):
+        start, end = options["start"], options["end"]
+        if start is None or end is None:
+            bounds = Transaction.objects.aggregate(first=Min("date_created"),
+                                                   last=Max("date_created"))
+            rollup_bounds = SalesRollup.objects.aggregate(first=Min("day"),
+                                                          last=Max("day"))
+            firsts = [d for d in (bounds["first"], rollup_bounds["first"])
+                      if d]
+            lasts = [d for d in (bounds["last"], rollup_bounds["last"]) if d]
+            start = start or (min(firsts) if firsts else date.today())
+            end = end or (max(lasts) if lasts else date.today())
+        if start > end:
+            raise CommandError("--from is later than --to")
+
+        chunks = date_chunks(start, end, max(1, options["chunk_days"]))
+        workers = max(1, options["workers"])
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(
+                lambda chunk: reconcile(*chunk, repair=options["repair"]),
+                chunks))
+
+        differences = [difference for result in results
+                       for difference in result]
+        for day, username, expected, found in differences:
+            self.stdout.write(
+                f"{day:%d/%m/%Y} {username}: "
+                f"transactions {expected.transactions} "
+                f"(rollup {found.transactions}), "
+                f"revenue GBP{expected.revenue:.2f} "
+                f"(rollup GBP{found.revenue:.2f})")
+
+        summary = (f"{start:%d/%m/%Y} to {end:%d/%m/%Y} in {len(chunks)} "
+                   f"chunks: {len(differences)} differences")
+        if differences and options["repair"]:
+            self.stdout.write(self.style.SUCCESS(summary + " repaired"))
+        elif differences:
+            self.stdout.write(self.style.WARNING(summary))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
@@ -0,0 +1,76 @@
+import json
+from datetime import date, datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from booking.analytics import SEAT_LETTERS, season_analytics
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise CommandError(f"'{value}' is not a date in the format "
+                           f"YYYY-MM-DD")
+
+
+class Command(BaseCommand):
+    help = ("Seat fill rates, load factors and how broken up the free "
+            "seats are across the departures of a range of dates")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="start", type=parse_date,
+                            help="First flight date (YYYY-MM-DD), "
+                                 "default today")
+        parser.add_argument("--to", dest="end", type=parse_date,
+                            help="Last flight date (YYYY-MM-DD), "
+                                 "default 90 days after --from")
+        parser.add_argument("--flight", dest="flights", action="append",
+                            help="Only this flight number (repeatable)")
+        parser.add_argument("--json", action="store_true",
+                            help="Print the figures as JSON")
+
+    def handle(self, *args, **options):
+        start = options["start"] or date.today()
+        end = options["end"] or start + timedelta(days=90)
+        if start > end:
+            raise CommandError("--from is later than --to")
+
+        figures = season_analytics(start, end, options["flights"])
+        if options["json"]:
+            self.stdout.write(json.dumps(figures, indent=2))
+            return
+
+        load = figures["load_factor"]
+        fragmentation = figures["fragmentation"]
+        self.stdout.write(
+            f"{start:%d/%m/%Y} to {end:%d/%m/%Y}: "
+            f"{figures['departures']} departures, "
+            f"{figures['seats_booked']} seats booked")
+        self.stdout.write(
+            f"Load factor %: mean {load['mean']}, median {load['median']}, "
+            f"90th percentile {load['p90']}")
+        for band in load["histogram"]:
+            self.stdout.write(f"  {band['from']:>3}-{band['to']:<3} "
+                              f"{band['departures']:>6}")
+        self.stdout.write(
+            f"Free seats: {fragmentation['mean_free_runs']} runs, "
+            f"longest {fragmentation['mean_longest_free_run']} "
+            f"(means), fragmentation {fragmentation['mean_index']}")
+        self.stdout.write("Departures with room for a party which "
+                          "cannot sit together: " +
+                          ", ".join(f"{count} for {size}" for size, count in
+                                    fragmentation["parties_split"].items()))
+        for flight in figures["flights"]:
+            self.stdout.write(
+                f"  {flight['flight_number']:<7} "
+                f"{flight['departures']:>5} departures, "
+                f"load {flight['mean_load_factor']:>5}%, "
+                f"fragmentation {flight['mean_fragmentation']}")
+
+        self.stdout.write("Seats filled % (row: " +
+                          " ".join(SEAT_LETTERS) + ")")
+        for row in figures["seats"]:
+            self.stdout.write(f"  {row['row']:>2}: " +
+                              " ".join(f"{row[letter] * 100:3.0f}"
+                                       for letter in SEAT_LETTERS))
@@ -0,0 +1,134 @@
+import json
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import partial
+from random import Random
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from booking.allocators import ALLOCATORS
+from booking.simulation import add_figures, new_figures, random_operations
+from booking.simulation import recorded_operations, simulate_flights
+from booking.simulation import summary
+
+# The problems found by --check which are printed
+PROBLEMS_SHOWN = 20
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise CommandError(f"'{value}' is not a date in the format "
+                           f"YYYY-MM-DD")
+
+
+class Command(BaseCommand):
+    help = ("Replay bookings, cancellations and amendments against "
+            "in-memory seatmaps with each seat allocator and compare "
+            "their speed, turn-downs and fragmentation")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--flights", type=int, default=2000,
+                            help="Flights made up at random")
+        parser.add_argument("--seed", type=int, default=1,
+                            help="Seed of the flights made up at random")
+        parser.add_argument("--recorded", action="store_true",
+                            help="Replay the flights of the seat log "
+                                 "from --from to --to instead")
+        parser.add_argument("--from", dest="start", type=parse_date,
+                            help="First flight date (YYYY-MM-DD) "
+                                 "for --recorded")
+        parser.add_argument("--to", dest="end", type=parse_date,
+                            help="Last flight date (YYYY-MM-DD) "
+                                 "for --recorded")
+        parser.add_argument("--allocator", dest="allocators",
+                            action="append", choices=list(ALLOCATORS),
+                            help="Only this allocator (repeatable), "
+                                 "default all of them")
+        parser.add_argument("--chunk-flights", type=int, default=100,
+                            help="Flights replayed by each job")
+        parser.add_argument("--workers", type=int, default=4,
+                            help="Processes replaying chunks "
+                                 "at the same time")
+        parser.add_argument("--check", action="store_true",
+                            help="Check that the allocators agree on the "
+                                 "seats allocated at every booking")
+        parser.add_argument("--json", action="store_true",
+                            help="Print the figures as JSON")
+
+    def handle(self, *args, **options):
+        names = options["allocators"] or list(ALLOCATORS)
+        if options["recorded"]:
+            if not options["start"] or not options["end"]:
+                raise CommandError("--recorded needs --from and --to")
+            if options["start"] > options["end"]:
+                raise CommandError("--from is later than --to")
+            flights = recorded_operations(options["start"], options["end"])
+        else:
+            random = Random(options["seed"])
+            flights = [random_operations(random)
+                       for _ in range(max(0, options["flights"]))]
+        flights = [operations for operations in flights if operations]
+        if not flights:
+            raise CommandError("No flights to replay")
+
+        size = max(1, options["chunk_flights"])
+        chunks = [flights[first:first + size]
+                  for first in range(0, len(flights), size)]
+
+        # The worker processes open their own connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=max(1, options["workers"]),
+                                 initializer=django.setup) as pool:
+            results = list(pool.map(partial(simulate_flights, names,
+                                            options["check"]), chunks))
+
+        figures = {name: new_figures() for name in names}
+        problems = []
+        for number, (chunk_figures, chunk_problems) in enumerate(results):
+            for name in names:
+                add_figures(figures[name], chunk_figures[name])
+            problems += [(number * size + flight, *problem)
+                         for flight, *problem in chunk_problems]
+        summaries = {name: summary(figures[name]) for name in names}
+
+        if options["json"]:
+            self.stdout.write(json.dumps(
+                {"allocators": summaries,
+                 "problems": [{"flight": flight, "operation": index,
+                               "allocator": name, "problem": problem}
+                              for flight, index, name, problem in problems]},
+                indent=2))
+        else:
+            self.write_summaries(len(flights), summaries)
+
+        if options["check"]:
+            for flight, index, name, problem in problems[:PROBLEMS_SHOWN]:
+                self.stdout.write(f"Flight {flight} operation {index} "
+                                  f"{name}: {problem}")
+            if problems:
+                raise CommandError(f"{len(problems)} problems found "
+                                   f"by the differential check")
+            self.stdout.write(self.style.SUCCESS(
+                "The allocators agree on every booking"))
+
+    def write_summaries(self, flights, summaries):
+        self.stdout.write(f"{flights} flights replayed")
+        for name, figures in summaries.items():
+            latency = figures["latency_us"]
+            self.stdout.write(
+                f"{name:<10} {figures['bookings']} bookings: latency us "
+                f"p50 {latency['p50']}, p95 {latency['p95']}, "
+                f"p99 {latency['p99']}, max {latency['max']}")
+            self.stdout.write(
+                f"{'':<10} turned down {figures['turned_down']} "
+                f"(with room {figures['turned_down_with_room_rate']:.2%}), "
+                f"split {figures['split_rate']:.2%}, "
+                f"load {figures['mean_load_factor']}%")
+            self.stdout.write(
+                f"{'':<10} fragmentation as the flights fill: " +
+                " ".join(f"{index:.3f}"
+                         for index in figures["fragmentation"]))
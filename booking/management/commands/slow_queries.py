@@ -0,0 +1,136 @@
+import json
+import os
+from collections import Counter
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from booking.logs import process_log_files
+
+SORT_KEYS = {
+    "total": lambda group: group["total_ms"],
+    "max": lambda group: group["max_ms"],
+    "count": lambda group: group["count"],
+}
+
+
+def log_files(path):
+    """
+    Every process's log and its rotated backups (see booking/logs.py)
+    and any log written to 'path' itself by an earlier version
+    """
+    backups = [f"{path}.{number}"
+               for number in range(settings.SLOW_QUERY_LOG_BACKUPS, 0, -1)]
+    return ([name for name in backups + [path] if os.path.isfile(name)] +
+            process_log_files(path))
+
+
+def read_queries(path, since):
+    for name in log_files(path):
+        try:
+            log = open(name)
+        except FileNotFoundError:
+            # Rotated away since the files were listed
+            continue
+        with log:
+            for line in log:
+                try:
+                    query = json.loads(line)
+                except ValueError:
+                    # A line cut short as the log was rotated
+                    continue
+                if since and query.get("time", "") < since:
+                    continue
+                yield query
+
+
+def summarise(queries):
+    """ The slow queries grouped by statement """
+
+    groups = {}
+    for query in queries:
+        group = groups.get(query["fingerprint"])
+        if group is None:
+            group = groups[query["fingerprint"]] = {
+                "fingerprint": query["fingerprint"], "count": 0,
+                "total_ms": 0.0, "max_ms": 0.0, "sql": query["sql"],
+                "plan": None, "views": Counter(), "callers": Counter(),
+                "helpers": Counter(), "last_seen": "", "planned": ""}
+        duration = query["duration_ms"]
+        group["count"] += 1
+        group["total_ms"] += duration
+        if duration >= group["max_ms"]:
+            group["max_ms"] = duration
+            group["slowest_params"] = query.get("params")
+        group["views"][query.get("view")] += 1
+        group["callers"][query.get("caller")] += 1
+        if query.get("helper"):
+            group["helpers"][query["helper"]] += 1
+        if query.get("plan") and query.get("time", "") >= group["planned"]:
+            # The latest plan of any process
+            group["plan"] = query["plan"]
+            group["planned"] = query.get("time", "")
+        group["last_seen"] = max(group["last_seen"], query.get("time", ""))
+
+    for group in groups.values():
+        del group["planned"]
+        group["mean_ms"] = round(group["total_ms"] / group["count"], 2)
+        group["total_ms"] = round(group["total_ms"], 2)
+        for name in ("views", "callers", "helpers"):
+            group[name] = dict(group[name].most_common())
+    return list(groups.values())
+
+
+class Command(BaseCommand):
+    help = ("Summarise the slow queries in the slow query log, "
+            "worst first, with their query plans")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--log", default=settings.SLOW_QUERY_LOG,
+                            help="The slow query log, whose files of "
+                                 "every process are read, default "
+                                 "settings.SLOW_QUERY_LOG")
+        parser.add_argument("--top", type=int, default=10,
+                            help="How many statements to show, default 10")
+        parser.add_argument("--sort", choices=SORT_KEYS, default="total",
+                            help="Worst by total time (default), "
+                                 "slowest run or number of runs")
+        parser.add_argument("--hours", type=float,
+                            help="Only the queries of the last N hours")
+        parser.add_argument("--json", action="store_true",
+                            help="Print the summary as JSON")
+
+    def handle(self, *args, **options):
+        if options["top"] < 1:
+            raise CommandError("--top must be at least 1")
+        if not log_files(options["log"]):
+            raise CommandError(f"There is no slow query log at "
+                               f"{options['log']}")
+        since = None
+        if options["hours"]:
+            since = (datetime.now() - timedelta(hours=options["hours"])
+                     ).strftime("%Y-%m-%dT%H:%M:%S")
+
+        groups = summarise(read_queries(options["log"], since))
+        groups.sort(key=SORT_KEYS[options["sort"]], reverse=True)
+        groups = groups[:options["top"]]
+        if options["json"]:
+            self.stdout.write(json.dumps(groups, indent=2))
+            return
+
+        if not groups:
+            self.stdout.write("No slow queries")
+        for rank, group in enumerate(groups, 1):
+            self.stdout.write(
+                f"{rank}. {group['fingerprint']}: {group['count']} runs, "
+                f"total {group['total_ms']} ms, mean {group['mean_ms']} ms, "
+                f"max {group['max_ms']} ms, last {group['last_seen']}")
+            self.stdout.write(f"   {group['sql']}")
+            for name in ("views", "callers", "helpers"):
+                if group[name]:
+                    self.stdout.write(f"   {name}: " + ", ".join(
+                        f"{where} ({count})"
+                        for where, count in group[name].items()))
+            for line in group["plan"] or ["(not explained)"]:
+                self.stdout.write(f"   | {line}")
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from booking.idempotency import sweep
+
+
+class Command(BaseCommand):
+    help = ("Delete the idempotency keys of the confirmation forms "
+            "and the API which are no longer honoured")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ttl", type=int,
+                            default=settings.IDEMPOTENCY_KEY_TTL,
+                            help="Delete the keys created more than "
+                                 "this many seconds ago")
+
+    def handle(self, *args, **options):
+        if options["ttl"] < 0:
+            raise CommandError("--ttl cannot be negative")
+
+        deleted = sweep(options["ttl"])
+        self.stdout.write(self.style.SUCCESS(
+            f"{deleted} idempotency keys deleted"))
@@ -0,0 +1,176 @@
+"""
+Metrics
+
+Counters and latency histograms of the stages of the booking flow
+and of every request, exposed in the Prometheus text format on
+/metrics for dashboards and alerts:
+
+    booking_stage_seconds{stage}           how long each stage took
+    booking_stage_total{stage, outcome}    stages completed ("ok")
+                                           or raising an exception
+    booking_request_seconds{view, method}  time taken by each request
+    booking_request_db_seconds{view}       time each request spent
+                                           in database queries
+    booking_request_db_queries{view}       queries made by each request
+
+The stages are the functions decorated with 'timed' (or run under
+'stage') e.g. check_availability, find_seats (whichever allocator is
+configured, see allocators.py), compute_total_price,
+create_new_records, update_pax_details and search_bookings.
+'view' is the name of the URL pattern.
+
+Under gunicorn every worker process has its own figures. When
+PROMETHEUS_MULTIPROC_DIR is set (see gunicorn.conf.py) each process
+writes them to files in that directory and /metrics adds up the files
+of all of them, so it does not matter which worker is scraped.
+
+/metrics needs the METRICS_TOKEN as a bearer token or, without one,
+a logged-in staff user.
+The database time includes that of the asynchronous views' reader
+threads (see asyncviews.py and 'wrap_queries' in manxairlines/db.py).
+"""
+
+import hmac
+import os
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from django.conf import settings
+from django.http import HttpResponse
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY
+from prometheus_client import CollectorRegistry, Counter, Histogram
+from prometheus_client import generate_latest, multiprocess
+
+from manxairlines.db import wrap_queries
+from manxairlines.middleware import AsyncCapableMiddleware
+
+# From 50 microseconds (finding seats) to 10 seconds (a slow request)
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025,
+                   0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+STAGE_SECONDS = Histogram("booking_stage_seconds",
+                          "Time taken by each stage of the booking flow",
+                          ["stage"], buckets=LATENCY_BUCKETS)
+STAGE_TOTAL = Counter("booking_stage",
+                      "Stages of the booking flow run, by outcome",
+                      ["stage", "outcome"])
+REQUEST_SECONDS = Histogram("booking_request_seconds",
+                            "Time taken by each request",
+                            ["view", "method"], buckets=LATENCY_BUCKETS)
+REQUEST_DB_SECONDS = Histogram("booking_request_db_seconds",
+                               "Time spent by each request in "
+                               "database queries",
+                               ["view"], buckets=LATENCY_BUCKETS)
+REQUEST_DB_QUERIES = Histogram("booking_request_db_queries",
+                               "Database queries made by each request",
+                               ["view"], buckets=QUERY_BUCKETS)
+
+
+@contextmanager
+def stage(name):
+    """ Time the code run under it as the stage 'name' """
+
+    began = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        STAGE_SECONDS.labels(name).observe(time.perf_counter() - began)
+        STAGE_TOTAL.labels(name, outcome).inc()
+
+
+def timed(name):
+    """ Time each call of the decorated function as the stage 'name' """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+class QueryTimer:
+    """ Adds up the time taken by the queries run through it """
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.queries = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        began = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - began
+            self.queries += 1
+
+
+def view_name(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unmatched"
+    return match.view_name or "unnamed"
+
+
+class MetricsMiddleware(AsyncCapableMiddleware):
+    """ Time every request and the database queries which it makes """
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        timer = QueryTimer()
+        began = time.perf_counter()
+        with wrap_queries(timer):
+            response = self.get_response(request)
+        self.observe(request, began, timer)
+        return response
+
+    async def __acall__(self, request):
+        timer = QueryTimer()
+        began = time.perf_counter()
+        with wrap_queries(timer):
+            response = await self.get_response(request)
+        self.observe(request, began, timer)
+        return response
+
+    def observe(self, request, began, timer):
+        view = view_name(request)
+        REQUEST_SECONDS.labels(view, request.method).observe(
+            time.perf_counter() - began)
+        REQUEST_DB_SECONDS.labels(view).observe(timer.seconds)
+        REQUEST_DB_QUERIES.labels(view).observe(timer.queries)
+
+
+def registry():
+    """ The figures of this process or, under gunicorn, of every worker """
+
+    if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        return REGISTRY
+    combined = CollectorRegistry()
+    multiprocess.MultiProcessCollector(combined)
+    return combined
+
+
+def allowed(request):
+    token = settings.METRICS_TOKEN
+    if token:
+        return hmac.compare_digest(
+            request.headers.get("Authorization", ""), f"Bearer {token}")
+    return request.user.is_authenticated and request.user.is_staff
+
+
+def metrics(request):
+    """ The metrics in the Prometheus text format """
+
+    if not allowed(request):
+        return HttpResponse("Forbidden\n", status=403,
+                            content_type="text/plain")
+    return HttpResponse(generate_latest(registry()),
+                        content_type=CONTENT_TYPE_LATEST)
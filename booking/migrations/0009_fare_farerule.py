@@ -0,0 +1,48 @@
+# Generated by Django 3.2.23 on 2026-10-19 14:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0008_alter_transaction_username'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Fare',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('flight_number', models.CharField(blank=True, default='', max_length=6)),
+                ('valid_from', models.DateField(blank=True, null=True)),
+                ('valid_to', models.DateField(blank=True, null=True)),
+                ('priority', models.SmallIntegerField(default=0)),
+                ('adult_price', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('child_price', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('infant_price', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('bag_price', models.DecimalField(decimal_places=2, max_digits=6)),
+                ('change_fee', models.DecimalField(decimal_places=2, max_digits=6)),
+            ],
+            options={
+                'ordering': ['flight_number', 'valid_from', '-priority'],
+            },
+        ),
+        migrations.CreateModel(
+            name='FareRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('min_load_factor', models.PositiveSmallIntegerField()),
+                ('adjustment_percent', models.SmallIntegerField()),
+                ('fare', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rules', to='booking.fare')),
+            ],
+            options={
+                'ordering': ['fare', 'min_load_factor'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='farerule',
+            constraint=models.UniqueConstraint(fields=('fare', 'min_load_factor'), name='unique_fare_load_factor'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+from decimal import Decimal
+
+from django.db import migrations
+
+
+def seed_fares(apps, schema_editor):
+    """
+    One Fare for all flights at all dates with the prices
+    which were previously hard-coded in bookinghelper.py
+    """
+    Fare = apps.get_model("booking", "Fare")
+    if Fare.objects.exists():
+        return
+    Fare.objects.create(adult_price=Decimal("100.00"),
+                        child_price=Decimal("60.00"),
+                        infant_price=Decimal("30.00"),
+                        bag_price=Decimal("30.00"),
+                        change_fee=Decimal("20.00"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0009_fare_farerule'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_fares, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+from django.db import migrations
+from django.db.models import Count, Sum
+
+
+def backfill_rollups(apps, schema_editor):
+    """ Roll up the Transactions made before the rollups existed """
+    Transaction = apps.get_model("booking", "Transaction")
+    SalesRollup = apps.get_model("booking", "SalesRollup")
+
+    totals = (Transaction.objects
+              .values("date_created", "username")
+              .annotate(transactions=Count("id"), revenue=Sum("amount"))
+              .order_by())
+    SalesRollup.objects.all().delete()
+    SalesRollup.objects.bulk_create(
+        [SalesRollup(day=row["date_created"], username=row["username"],
+                     transactions=row["transactions"],
+                     revenue=row["revenue"] or 0)
+         for row in totals],
+        batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0011_salesrollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
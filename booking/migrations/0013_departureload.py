@@ -0,0 +1,33 @@
+# Generated by Django 3.2.23 on 2026-10-19 14:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0012_backfill_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DepartureLoad',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('flight_date', models.DateField()),
+                ('flight_number', models.CharField(max_length=6)),
+                ('booked', models.PositiveSmallIntegerField(default=0)),
+                ('adults', models.PositiveSmallIntegerField(default=0)),
+                ('children', models.PositiveSmallIntegerField(default=0)),
+                ('infants', models.PositiveSmallIntegerField(default=0)),
+                ('wheelchairs', models.PositiveSmallIntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['flight_date', 'flight_number'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='departureload',
+            constraint=models.UniqueConstraint(fields=('flight_date', 'flight_number'), name='unique_departure_load'),
+        ),
+    ]
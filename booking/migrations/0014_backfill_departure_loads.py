@@ -0,0 +1,51 @@
+from django.db import migrations
+from django.db.models import Count, Q
+
+
+def backfill_loads(apps, schema_editor):
+    """ Count the passengers booked before the Departure Loads existed """
+    Schedule = apps.get_model("booking", "Schedule")
+    Passenger = apps.get_model("booking", "Passenger")
+    DepartureLoad = apps.get_model("booking", "DepartureLoad")
+
+    loads = {}
+    for schedule in Schedule.objects.all():
+        loads[(schedule.flight_date, schedule.flight_number)] = DepartureLoad(
+            flight_date=schedule.flight_date,
+            flight_number=schedule.flight_number,
+            booked=schedule.total_booked)
+
+    counts = {"adults": Count("id", filter=Q(pax_type="A")),
+              "children": Count("id", filter=Q(pax_type="C")),
+              "infants": Count("id", filter=Q(pax_type="I")),
+              "wheelchairs": Count("id", filter=~Q(wheelchair_ssr=""))}
+    outbound = (Passenger.objects
+                .values("pnr__outbound_date", "pnr__outbound_flightno")
+                .annotate(**counts).order_by())
+    inbound = (Passenger.objects.filter(pnr__return_flight=True)
+               .values("pnr__inbound_date", "pnr__inbound_flightno")
+               .annotate(**counts).order_by())
+    for direction, rows in (("outbound", outbound), ("inbound", inbound)):
+        for row in rows:
+            key = (row[f"pnr__{direction}_date"],
+                   row[f"pnr__{direction}_flightno"])
+            if key[0] is None:
+                continue
+            load = loads.setdefault(key, DepartureLoad(flight_date=key[0],
+                                                       flight_number=key[1]))
+            for field in counts:
+                setattr(load, field, getattr(load, field) + row[field])
+
+    DepartureLoad.objects.all().delete()
+    DepartureLoad.objects.bulk_create(loads.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0013_departureload'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_loads, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 3.2.23 on 2026-10-19 14:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0014_backfill_departure_loads'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedBooking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pnr', models.CharField(max_length=6, unique=True)),
+                ('flight_from', models.CharField(max_length=3)),
+                ('flight_to', models.CharField(max_length=3)),
+                ('return_flight', models.BooleanField(default=True)),
+                ('outbound_date', models.DateField(null=True)),
+                ('outbound_flightno', models.CharField(default='', max_length=6)),
+                ('inbound_date', models.DateField(null=True)),
+                ('inbound_flightno', models.CharField(blank=True, default='', max_length=6)),
+                ('fare_quote', models.DecimalField(decimal_places=2, default=0, max_digits=6)),
+                ('ticket_class', models.CharField(default='Y', max_length=1)),
+                ('cabin_class', models.CharField(default='Y', max_length=1)),
+                ('number_of_adults', models.PositiveSmallIntegerField(default=0)),
+                ('number_of_children', models.PositiveSmallIntegerField(default=0)),
+                ('number_of_infants', models.PositiveSmallIntegerField(default=0)),
+                ('number_of_bags', models.PositiveSmallIntegerField(default=0)),
+                ('departure_time', models.CharField(max_length=4)),
+                ('arrival_time', models.CharField(max_length=4)),
+                ('remarks', models.TextField(blank=True, default='')),
+                ('created_at', models.DateField()),
+                ('amended_at', models.DateField()),
+                ('archived_at', models.DateField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['pnr'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedPassenger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=4)),
+                ('first_name', models.CharField(max_length=40)),
+                ('last_name', models.CharField(max_length=40)),
+                ('pax_type', models.CharField(default='A', max_length=1)),
+                ('pax_number', models.PositiveSmallIntegerField(default=1)),
+                ('date_of_birth', models.DateField(null=True)),
+                ('contact_number', models.CharField(blank=True, default='', max_length=40)),
+                ('contact_email', models.CharField(blank=True, default='', max_length=40)),
+                ('outbound_seat_number', models.CharField(default='', max_length=3)),
+                ('inbound_seat_number', models.CharField(default='', max_length=3)),
+                ('status', models.CharField(max_length=4)),
+                ('wheelchair_ssr', models.CharField(blank=True, default='', max_length=1)),
+                ('wheelchair_type', models.CharField(blank=True, default='', max_length=1)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['outbound_date'], name='booking_outbound_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedpassenger',
+            name='pnr',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='passenger_set', related_query_name='passenger', to='booking.archivedbooking'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedbooking',
+            index=models.Index(fields=['outbound_date'], name='archived_outbound_date_idx'),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 3.2.23 on 2026-10-19 16:05
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def merge_duplicate_schedules(apps, schema_editor):
+    """
+    A flight date can have more than one Schedule from before it was
+    unique. Merge them into the first: the seats taken in any of them
+    and the passengers booked on all of them
+    """
+    Schedule = apps.get_model("booking", "Schedule")
+
+    duplicated = (Schedule.objects.values("flight_date", "flight_number")
+                  .annotate(schedules=Count("id"))
+                  .filter(schedules__gt=1).order_by())
+    for flight in duplicated:
+        schedules = list(Schedule.objects
+                         .filter(flight_date=flight["flight_date"],
+                                 flight_number=flight["flight_number"])
+                         .order_by("id"))
+        kept, extras = schedules[0], schedules[1:]
+        seats = 0
+        for schedule in schedules:
+            seats |= int(schedule.seatmap or "0", 16)
+        kept.seatmap = format(seats, "024X")
+        kept.total_booked = sum(schedule.total_booked
+                                for schedule in schedules)
+        kept.save(update_fields=["seatmap", "total_booked"])
+        Schedule.objects.filter(id__in=[schedule.id
+                                        for schedule in extras]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0015_archive_bookings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeatEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('flight_date', models.DateField()),
+                ('flight_number', models.CharField(max_length=6)),
+                ('seat', models.PositiveSmallIntegerField()),
+                ('action', models.CharField(choices=[('T', 'Take'), ('R', 'Release')], max_length=1)),
+                ('pnr', models.CharField(blank=True, default='', max_length=6)),
+                ('previous', models.BigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='schedule',
+            name='events_compacted_to',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(merge_duplicate_schedules,
+                             migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='schedule',
+            constraint=models.UniqueConstraint(fields=('flight_date', 'flight_number'), name='unique_schedule_flight'),
+        ),
+        migrations.AddIndex(
+            model_name='seatevent',
+            index=models.Index(fields=['flight_date', 'flight_number', 'id'], name='seat_event_flight_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='seatevent',
+            constraint=models.UniqueConstraint(fields=('flight_date', 'flight_number', 'seat', 'previous'), name='unique_seat_event_previous'),
+        ),
+    ]
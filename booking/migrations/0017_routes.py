@@ -0,0 +1,61 @@
+# Generated by Django 3.2.23 on 2026-10-19 17:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0016_seat_events'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Route',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('origin', models.CharField(max_length=3)),
+                ('destination', models.CharField(max_length=3)),
+            ],
+            options={
+                'ordering': ['origin', 'destination'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='route',
+            constraint=models.UniqueConstraint(fields=('origin', 'destination'), name='unique_route'),
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='route',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='flights', to='booking.route'),
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='std_minutes',
+            field=models.PositiveSmallIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='sta_minutes',
+            field=models.PositiveSmallIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='days_of_operation',
+            field=models.CharField(default='1234567', max_length=7),
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='effective_from',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='flight',
+            name='effective_to',
+            field=models.DateField(blank=True, null=True),
+        ),
+    ]
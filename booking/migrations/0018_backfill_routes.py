@@ -0,0 +1,45 @@
+from django.db import migrations
+
+
+def to_minutes(hhmm):
+    hours, minutes = divmod(int(hhmm or 0), 100)
+    return hours * 60 + minutes
+
+
+def backfill_routes(apps, schema_editor):
+    """ A Route for each airport pair and the STD/STA in minutes """
+    Route = apps.get_model("booking", "Route")
+    Flight = apps.get_model("booking", "Flight")
+
+    for flight in Flight.objects.all():
+        flight.route, _ = Route.objects.get_or_create(
+            origin=flight.flight_from.strip().upper(),
+            destination=flight.flight_to.strip().upper())
+        flight.std_minutes = to_minutes(flight.flight_STD)
+        flight.sta_minutes = to_minutes(flight.flight_STA)
+        flight.save()
+
+
+def restore_times(apps, schema_editor):
+    """ Back to the airports and the "HHMM" times on each Flight """
+    Flight = apps.get_model("booking", "Flight")
+
+    for flight in Flight.objects.select_related("route"):
+        flight.flight_from = flight.route.origin
+        flight.flight_to = flight.route.destination
+        flight.flight_STD = (f"{flight.std_minutes // 60:02d}"
+                             f"{flight.std_minutes % 60:02d}")
+        flight.flight_STA = (f"{flight.sta_minutes // 60:02d}"
+                             f"{flight.sta_minutes % 60:02d}")
+        flight.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0017_routes'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_routes, restore_times),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 3.2.23 on 2026-10-19 17:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0018_backfill_routes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='flight',
+            name='route',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='flights', to='booking.route'),
+        ),
+        # Defaults so that the columns can be put back when
+        # unapplied, 0018_backfill_routes then filling them in
+        migrations.AlterField(
+            model_name='flight',
+            name='flight_from',
+            field=models.CharField(default='', max_length=3),
+        ),
+        migrations.AlterField(
+            model_name='flight',
+            name='flight_to',
+            field=models.CharField(default='', max_length=3),
+        ),
+        migrations.AlterField(
+            model_name='flight',
+            name='flight_STD',
+            field=models.CharField(default='', max_length=4),
+        ),
+        migrations.AlterField(
+            model_name='flight',
+            name='flight_STA',
+            field=models.CharField(default='', max_length=4),
+        ),
+        migrations.RemoveField(
+            model_name='flight',
+            name='flight_from',
+        ),
+        migrations.RemoveField(
+            model_name='flight',
+            name='flight_to',
+        ),
+        migrations.RemoveField(
+            model_name='flight',
+            name='flight_STD',
+        ),
+        migrations.RemoveField(
+            model_name='flight',
+            name='flight_STA',
+        ),
+        migrations.AddIndex(
+            model_name='flight',
+            index=models.Index(fields=['route', 'std_minutes'], name='flight_route_std_idx'),
+        ),
+    ]
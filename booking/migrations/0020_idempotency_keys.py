@@ -0,0 +1,35 @@
+# Generated by Django 3.2.23 on 2026-10-19 17:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0019_flight_route_required'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64)),
+                ('username', models.CharField(max_length=150)),
+                ('purpose', models.CharField(max_length=16)),
+                ('state', models.CharField(choices=[('I', 'Issued'), ('C', 'Claimed'), ('D', 'Done')], default='I', max_length=1)),
+                ('fingerprint', models.CharField(blank=True, default='', max_length=64)),
+                ('status', models.PositiveSmallIntegerField(default=0)),
+                ('result', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='idempotencykey',
+            index=models.Index(fields=['created_at'], name='idempotency_created_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='idempotencykey',
+            constraint=models.UniqueConstraint(fields=('username', 'key'), name='unique_idempotency_key'),
+        ),
+    ]
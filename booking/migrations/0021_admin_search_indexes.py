@@ -0,0 +1,21 @@
+# Generated by Django 3.2.23 on 2026-10-19 18:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0020_idempotency_keys'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='passenger',
+            index=models.Index(fields=['last_name', 'first_name'], name='passenger_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['pnr'], name='transaction_pnr_idx'),
+        ),
+    ]
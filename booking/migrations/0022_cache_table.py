@@ -0,0 +1,23 @@
+from django.core.management import call_command
+from django.db import migrations
+
+
+def create_cache_table(apps, schema_editor):
+    """
+    The table of the database cache (see CACHES in settings.py)
+    so that every deployment has it. Nothing is done for other caches
+    or if the table is already there
+    """
+    call_command("createcachetable",
+                 database=schema_editor.connection.alias)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0021_admin_search_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_table, migrations.RunPython.noop),
+    ]
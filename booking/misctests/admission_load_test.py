@@ -0,0 +1,156 @@
+# Show that admission control keeps the tail latency bounded under overload
+#
+# Many threads send requests as fast as they can for a few seconds:
+# searches for one letter (which match many Bookings) and Create Booking
+# Form POSTs (which run the seat allocator). This is done first with no
+# limits (RATE_LIMIT_STORE "off") and then with the token buckets and
+# the allocation cap of booking/admission.py counted in this process
+# ("local") and in the cache ("cache").
+# For each run it prints the responses by status and the latency
+# percentiles of all the requests and of those which were admitted
+# Run from the project directory against a scratch database, e.g.
+#       DATABASE_URL=sqlite:////tmp/load.db python manage.py migrate
+#       DATABASE_URL=sqlite:////tmp/load.db python manage.py loaddata flights
+#       DATABASE_URL=sqlite:////tmp/load.db python \
+#           booking/misctests/admission_load_test.py --threads 32 --seconds 5
+
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import date, timedelta
+
+sys.path.insert(0, os.getcwd())
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "manxairlines.settings")
+
+import django  # noqa: E402
+django.setup()
+
+import numpy  # noqa: E402
+from django.conf import settings  # noqa: E402
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client  # noqa: E402
+
+from booking.models import Booking, Passenger  # noqa: E402
+
+FIRST_NAMES = ["ANNE", "BOB", "CARL", "DAWN", "ERIC", "FRAN", "GARY", "HELEN"]
+
+# Agents sharing the threads - each has their own token buckets
+AGENTS = 4
+
+settings.ALLOWED_HOSTS = ["*"]
+
+
+def seed_bookings(count):
+    """ Bookings for the searches to find """
+
+    missing = count - Booking.objects.filter(pnr__startswith="L").count()
+    if missing <= 0:
+        return
+    first = Booking.objects.filter(pnr__startswith="L").count()
+    outbound = date.today() + timedelta(days=30)
+    bookings = Booking.objects.bulk_create(
+        Booking(pnr=f"L{number:05d}", flight_from="LCY", flight_to="IOM",
+                return_flight=False, outbound_date=outbound,
+                outbound_flightno="MX0465", number_of_adults=1,
+                departure_time="0800", arrival_time="0945")
+        for number in range(first, first + missing))
+    if connection.vendor != "postgresql":
+        # Only PostgreSQL returns the ids from a bulk create
+        bookings = Booking.objects.filter(pnr__startswith="L",
+                                          passenger__isnull=True)
+    Passenger.objects.bulk_create(
+        Passenger(pnr=booking, title="MR", status="HK1",
+                  first_name=FIRST_NAMES[booking.id % len(FIRST_NAMES)],
+                  last_name="LOADTEST")
+        for booking in bookings)
+
+
+def client(number):
+    user, _ = User.objects.get_or_create(username=f"loadtest{number}")
+    agent = Client()
+    agent.force_login(user)
+    return agent
+
+
+def send(agent, number):
+    """ Send one request, alternating searches and bookings """
+
+    if number % 2:
+        letter = FIRST_NAMES[number % len(FIRST_NAMES)][0]
+        return agent.get("/search/", {"query": letter}).status_code
+    departing = date.today() + timedelta(days=14)
+    return agent.post("/create/", {
+        "route": "LCY-IOM", "return_option": "N",
+        "departing_date": departing.isoformat(), "departing_time": "0800",
+        "returning_date": departing.isoformat(), "returning_time": "",
+        "adults": 2, "children": 0, "infants": 0}).status_code
+
+
+def run(store, threads, seconds):
+    settings.RATE_LIMIT_STORE = store
+    agents = [client(number % AGENTS) for number in range(threads)]
+    results = []
+    lock = threading.Lock()
+    stop = time.perf_counter() + seconds
+
+    def work(agent, offset):
+        mine = []
+        number = offset
+        while time.perf_counter() < stop:
+            began = time.perf_counter()
+            status = send(agent, number)
+            mine.append((status, time.perf_counter() - began))
+            number += 1
+        connection.close()
+        with lock:
+            results.extend(mine)
+
+    workers = [threading.Thread(target=work, args=(agent, offset))
+               for offset, agent in enumerate(agents)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return results
+
+
+def percentiles(latencies):
+    if not latencies:
+        return "-"
+    p50, p95, p99 = numpy.percentile(numpy.array(latencies) * 1000,
+                                     [50, 95, 99])
+    return f"p50 {p50:7.1f} p95 {p95:7.1f} p99 {p99:7.1f} ms"
+
+
+def report(store, results, seconds):
+    statuses = Counter(status for status, _ in results)
+    admitted = [latency for status, latency in results
+                if status not in (429, 503)]
+    print(f"{store:<6} {len(results) / seconds:7.1f} requests/s  " +
+          "  ".join(f"{status}: {count}"
+                    for status, count in sorted(statuses.items())))
+    print(f"{'':<6} all      {percentiles([l for _, l in results])}")
+    print(f"{'':<6} admitted {percentiles(admitted)}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--bookings", type=int, default=3000)
+    args = parser.parse_args()
+
+    seed_bookings(args.bookings)
+    print(f"{args.threads} threads for {args.seconds}s, limits "
+          f"{settings.RATE_LIMITS}, allocation cap "
+          f"{settings.SEAT_ALLOCATION_CONCURRENCY}")
+    for store in ("off", "local", "cache"):
+        report(store, run(store, args.threads, args.seconds), args.seconds)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+# Count the queries made by 'update_pax_records' when a Booking is amended
+#
+# Creates a Booking of three Adults, one Child and one Infant through
+# the API helpers, then amends it the way the Edit Passengers Form does:
+# 1) one Adult's surname corrected
+# 2) the second Adult (and so the Infant with them) removed
+# and prints the queries which write to the Passenger table
+# Run from the project directory against a scratch database, e.g.
+#       DATABASE_URL=sqlite:////tmp/amend.db python manage.py migrate
+#       DATABASE_URL=sqlite:////tmp/amend.db python manage.py loaddata flights
+#       DATABASE_URL=sqlite:////tmp/amend.db python \
+#           booking/misctests/amendment_query_count.py
+
+import os
+import sys
+from datetime import date, timedelta
+
+sys.path.insert(0, os.getcwd())
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "manxairlines.settings")
+
+import django  # noqa: E402
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+
+from booking import api  # noqa: E402
+from booking import bookinghelper as m  # noqa: E402
+from booking.common import Common  # noqa: E402
+from booking.models import Passenger  # noqa: E402
+
+
+def adult(first_name):
+    return {"title": "MR", "first_name": first_name, "last_name": "BLOGGS",
+            "contact_number": "0123456789", "contact_email": "",
+            "wheelchair_ssr": "", "wheelchair_type": ""}
+
+
+def minor(first_name, years):
+    return {"title": "MSTR", "first_name": first_name, "last_name": "BLOGGS",
+            "date_of_birth": date.today() - timedelta(days=365 * years),
+            "wheelchair_ssr": "", "wheelchair_type": ""}
+
+
+def new_booking():
+    Common.initialisation()
+    departing = date.today() + timedelta(days=7)
+    itinerary = {"return_option": "N",
+                 "departing_date": departing, "departing_time": "0800",
+                 "outbound_flightno": "MX0465",
+                 "returning_date": departing, "returning_time": "1600",
+                 "inbound_flightno": ""}
+    passengers = ([adult("FRED"), adult("JOE"), adult("JIM")],
+                  [minor("TIM", 8)], [minor("TOM", 1)], 0, "")
+    booking, _, _ = api.book_itinerary("amendment_query_count",
+                                       itinerary, passengers)
+    return booking
+
+
+def edit(booking, change, removals):
+    """ Submit the Edit Passengers Form with the given changes """
+
+    originals = list(Passenger.objects.filter(pnr=booking)
+                     .order_by("pax_number").values())
+    data = {"A": [], "C": [], "I": []}
+    for pax in originals:
+        data[pax["pax_type"]].append(dict(pax))
+    change(data)
+
+    Common.the_pnr = booking.pnr
+    Common.the_booking_id = booking.id
+    Common.save_context = {
+        "booking": {"pnr": booking.pnr, "return_option": "N"},
+        "original_pax_details": originals,
+        "adults_data": data["A"], "children_data": data["C"],
+        "infants_data": data["I"],
+        "children_included": True, "infants_included": True,
+        "confirm-booking-context": {key: "on" for key in removals}}
+
+    request = RequestFactory().post("/details/")
+    with CaptureQueriesContext(connection) as queries:
+        result = m.update_pax_records(request)
+
+    writes = [query["sql"] for query in queries.captured_queries
+              if not query["sql"].startswith("SELECT")]
+    print(f"{len(queries.captured_queries)} queries, "
+          f"{len(writes)} writing to the database:")
+    for sql in writes:
+        print("   ", sql[:150])
+    print("    seats freed:", result[4], Common.outbound_removed_seats)
+
+
+def main():
+    booking = new_booking()
+
+    print("1) One surname corrected")
+    edit(booking, lambda data: data["A"][2].update(last_name="BLOGS"), [])
+
+    print("2) The second Adult and their Infant removed")
+    edit(booking, lambda data: None, ["adult-1-remove_pax"])
+
+    for pax in Passenger.objects.filter(pnr=booking).order_by("pax_number"):
+        print(f"    {pax.pax_number} {pax.status} {pax.pax_type} "
+              f"{pax.first_name} {pax.last_name} {pax.outbound_seat_number}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# Time the seat analytics of a season against decoding each seatmap
+#
+# Fills a scratch database with DAYS days of Schedules (every flight)
+# with random seatmaps, then works out the fill rate of each seat and
+# the load factors
+# 1) the old way: 'convert_string_to_bitarray' on each Schedule in turn
+# 2) 'season_analytics' (see booking/analytics.py) which also works out
+#    the histogram and the fragmentation figures
+# Run from the project directory against a scratch database, e.g.
+#       DATABASE_URL=sqlite:////tmp/analytics.db python manage.py migrate
+#       DATABASE_URL=sqlite:////tmp/analytics.db python manage.py loaddata flights
+#       DATABASE_URL=sqlite:////tmp/analytics.db python \
+#           booking/misctests/analytics_benchmark.py [DAYS]
+
+import os
+import sys
+import time
+from datetime import date, timedelta
+from random import Random
+
+sys.path.insert(0, os.getcwd())
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "manxairlines.settings")
+
+import django  # noqa: E402
+django.setup()
+
+from booking import bookinghelper as m  # noqa: E402
+from booking.analytics import season_analytics  # noqa: E402
+from booking.common import Common  # noqa: E402
+from booking.models import Schedule  # noqa: E402
+from booking.timetable import timetable  # noqa: E402
+from booking.seatlog import bits_seatmap  # noqa: E402
+
+DAYS = int(sys.argv[1]) if len(sys.argv) > 1 else 3 * 365
+
+random = Random(1)
+
+
+def fill(first_day):
+    """ Seats taken mostly from the back with a few cancellations """
+
+    Common.initialisation()
+    schedules = []
+    for n in range(DAYS):
+        for flight_number in timetable().flights:
+            booked = random.randrange(m.CAPACITY + 1)
+            bits = ((1 << m.CAPACITY) - 1) ^ ((1 << (m.CAPACITY - booked))
+                                               - 1)
+            for _ in range(random.randrange(6)):
+                bits &= ~(1 << random.randrange(m.CAPACITY))
+            schedules.append(Schedule(flight_date=first_day +
+                                      timedelta(days=n),
+                                      flight_number=flight_number,
+                                      total_booked=bin(bits).count("1"),
+                                      seatmap=bits_seatmap(bits)))
+    Schedule.objects.bulk_create(schedules, batch_size=5000)
+
+
+def row_by_row(first_day, last_day):
+    """ The fill rates and load factors decoding each seatmap in turn """
+
+    taken = [0] * m.CAPACITY
+    load_factors = []
+    schedules = Schedule.objects.filter(
+                    flight_date__range=(first_day, last_day))
+    for schedule in schedules:
+        bit_array = m.convert_string_to_bitarray(schedule.seatmap)
+        for seat in range(m.CAPACITY):
+            if bit_array[m.LEFT_BIT_POS - seat]:
+                taken[seat] += 1
+        load_factors.append(bit_array.count(1) * 100 / m.CAPACITY)
+    return [count / len(load_factors) for count in taken], load_factors
+
+
+def main():
+    first_day = date.today() + timedelta(days=1)
+    last_day = first_day + timedelta(days=DAYS - 1)
+    if not Schedule.objects.filter(flight_date=last_day).exists():
+        print(f"Filling {DAYS} days of flights...")
+        fill(first_day)
+    print(f"{Schedule.objects.count()} Schedules")
+
+    began = time.perf_counter()
+    fill_rates, _ = row_by_row(first_day, last_day)
+    print(f"Row by row:       {time.perf_counter() - began:.2f} s")
+
+    began = time.perf_counter()
+    figures = season_analytics(first_day, last_day)
+    print(f"season_analytics: {time.perf_counter() - began:.2f} s")
+
+    vectorised = [row[letter] for row in figures["seats"]
+                  for letter in "ABCD"]
+    print("Fill rates agree:", all(abs(old - new) < 0.001 for old, new in
+                                   zip(fill_rates, vectorised)))
+
+
+if __name__ == "__main__":
+    main()
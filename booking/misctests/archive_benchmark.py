@@ -0,0 +1,121 @@
+# Time the Search with and without years of history in the live tables
+#
+# 1) 2,000 live Bookings (flights in the coming weeks)
+# 2) plus HISTORY Bookings whose flights departed 1-3 years ago
+# 3) after 'archive_bookings' has moved the history to the archive
+# For each stage prints the median time of searching by surname, by PNR
+# and for a PNR that is only in the archive (the fallback)
+# Run from the project directory against a scratch database, e.g.
+#       DATABASE_URL=sqlite:////tmp/archive.db python manage.py migrate
+#       DATABASE_URL=sqlite:////tmp/archive.db python manage.py loaddata flights
+#       DATABASE_URL=sqlite:////tmp/archive.db python \
+#           booking/misctests/archive_benchmark.py [HISTORY]
+
+import os
+import sys
+import time
+from datetime import date, timedelta
+from random import Random
+from statistics import median
+
+sys.path.insert(0, os.getcwd())
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "manxairlines.settings")
+
+import django  # noqa: E402
+django.setup()
+
+from django.core.paginator import Paginator  # noqa: E402
+from django.db import transaction  # noqa: E402
+
+from booking.archive import archive_bookings, archive_cutoff  # noqa: E402
+from booking.models import ArchivedBooking, Booking  # noqa: E402
+from booking.models import Passenger  # noqa: E402
+from booking.views import search_bookings_queryset  # noqa: E402
+
+LIVE = 2000
+HISTORY = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+SURNAMES = ["SMITH", "JONES", "TAYLOR", "BROWN", "WILLIAMS", "WILSON",
+            "JOHNSON", "DAVIES", "ROBINSON", "WRIGHT", "THOMPSON", "EVANS",
+            "WALKER", "WHITE", "ROBERTS", "GREEN", "HALL", "WOOD", "JACKSON",
+            "CLARKE", "QUAYLE", "KERMODE", "CHRISTIAN", "CORLETT", "KINRADE"]
+REPEATS = 15
+
+random = Random(1)
+
+
+def add_bookings(count, first_pnr, first_day, days):
+    """ Bookings of two Adults on random days from 'first_day' """
+
+    with transaction.atomic():
+        for offset in range(0, count, 5000):
+            batch = []
+            for n in range(offset, min(count, offset + 5000)):
+                day = first_day + timedelta(days=random.randrange(days))
+                batch.append(Booking(
+                    pnr=f"{first_pnr}{n:05d}", flight_from="LCY",
+                    flight_to="IOM", return_flight=False,
+                    outbound_date=day, outbound_flightno="MX0465",
+                    number_of_adults=2, departure_time="0800",
+                    arrival_time="0945"))
+            bookings = Booking.objects.bulk_create(batch)
+            if bookings[0].pk is None:
+                bookings = Booking.objects.filter(
+                            pnr__in=[booking.pnr for booking in batch])
+
+            passengers = []
+            for booking in bookings:
+                surname = random.choice(SURNAMES)
+                for pax_number in (1, 2):
+                    passengers.append(Passenger(
+                        pnr=booking, title="MR", first_name="FRED",
+                        last_name=surname, pax_number=pax_number,
+                        status=f"HK{pax_number}",
+                        outbound_seat_number=f"{pax_number}A"))
+            Passenger.objects.bulk_create(passengers)
+
+
+def search(query):
+    """ What the Search view does: count the matches and fetch page 1 """
+
+    paginator = Paginator(search_bookings_queryset(query), 3)
+    if paginator.count == 0:
+        paginator = Paginator(search_bookings_queryset(query, archived=True),
+                              3)
+    return paginator.count, list(paginator.page(1))
+
+
+def time_searches(stage):
+    queries = {"surname": "QUAYLE", "PNR": "L00123",
+               "archived PNR": "H00123"}
+    results = []
+    for name, query in queries.items():
+        timings = []
+        for _ in range(REPEATS):
+            began = time.perf_counter()
+            count, _ = search(query)
+            timings.append(time.perf_counter() - began)
+        results.append(f"{name} {median(timings) * 1000:.1f} ms "
+                       f"({count} found)")
+    print(f"{stage:<32}", ", ".join(results))
+
+
+def main():
+    if Booking.objects.filter(pnr__startswith="L").count() < LIVE:
+        add_bookings(LIVE, "L", date.today() + timedelta(days=1), 60)
+    time_searches(f"{LIVE} live Bookings")
+
+    if not (Booking.objects.filter(pnr__startswith="H").exists() or
+            ArchivedBooking.objects.exists()):
+        print(f"Adding {HISTORY} past Bookings...")
+        add_bookings(HISTORY, "H", date.today() - timedelta(days=3 * 365),
+                     2 * 365)
+    time_searches(f"+ {Booking.objects.count() - LIVE} past Bookings")
+
+    began = time.perf_counter()
+    moved = archive_bookings(archive_cutoff(), batch_size=2000)
+    print(f"Archived {moved} Bookings in {time.perf_counter() - began:.1f} s")
+    time_searches(f"+ {ArchivedBooking.objects.count()} archived")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# Measure the per-request cost of the database connection
+#
+# Compares the three ways in which a request could get its connection
+# 1) A new connection for every request - CONN_MAX_AGE = 0 (the old setting)
+# 2) A persistent connection - CONN_MAX_AGE > 0
+# 3) A persistent connection which is health checked before every request
+#
+# Each 'request' runs one short query, just like most of the views
+# Run from the project directory against the database to be measured, e.g.
+#       DATABASE_URL=postgres://... python \
+#           booking/misctests/connection_benchmark.py --requests 500
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.getcwd())
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "manxairlines.settings")
+
+import django  # noqa: E402
+django.setup()
+
+from django.db import connection  # noqa: E402
+from manxairlines.db import check_connection_health  # noqa: E402
+
+
+def short_query():
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+
+
+def new_connection_per_request():
+    connection.close()
+    short_query()
+
+
+def persistent_connection():
+    short_query()
+
+
+def health_checked_connection():
+    # Forget when the last check was made so that every request is checked
+    connection.health_checked_at = None
+    check_connection_health(connection)
+    short_query()
+
+
+def measure(label, request, count):
+    connection.close()
+    request()  # Warm up
+    start = time.perf_counter()
+    for _ in range(count):
+        request()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<32} {elapsed / count * 1000:8.3f} ms per request")
+    return elapsed / count
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"Database: {connection.vendor} "
+          f"{connection.settings_dict.get('HOST') or ''}")
+    connection.settings_dict["HEALTH_CHECK_INTERVAL"] = 0
+
+    before = measure("New connection per request",
+                     new_connection_per_request, args.requests)
+    after = measure("Persistent connection",
+                    persistent_connection, args.requests)
+    checked = measure("Persistent + health check",
+                      health_checked_connection, args.requests)
+
+    print(f"Connection overhead per request: "
+          f"{(before - after) * 1000:.3f} ms "
+          f"(health check adds {(checked - after) * 1000:.3f} ms)")
+    connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# Time 'manage.py check_inventory' over a year of flights
+#
+# Fills a scratch database with a year of bookings on every flight
+# (about 20 Bookings of 4 passengers each per flight), corrupts a few
+# Schedules and then runs the check with 1 and with 4 worker processes
+# Run from the project directory against a scratch database, e.g.
+#       DATABASE_URL=sqlite:////tmp/inventory.db python manage.py migrate
+#       DATABASE_URL=sqlite:////tmp/inventory.db python manage.py loaddata flights
+#       DATABASE_URL=sqlite:////tmp/inventory.db python \
+#           booking/misctests/inventory_benchmark.py
+
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.getcwd())
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "manxairlines.settings")
+
+import django  # noqa: E402
+django.setup()
+
+from django.core.management import call_command  # noqa: E402
+from django.db import transaction  # noqa: E402
+
+from booking import bookinghelper as m  # noqa: E402
+from booking.common import Common  # noqa: E402
+from booking.inventory import bits_seatmap  # noqa: E402
+from booking.models import Booking, DepartureLoad  # noqa: E402
+from booking.models import Passenger, Schedule  # noqa: E402
+
+DAYS = 365
+BOOKINGS_PER_FLIGHT = 20
+# 3 seated passengers and an Infant per Booking
+SEATED = 3
+
+
+def fill_year(first_day):
+    Common.initialisation()
+    pnr = 0
+    for day in (first_day + timedelta(days=n) for n in range(DAYS)):
+        with transaction.atomic():
+            flights = list(zip(Common.outbound_listof_flights,
+                               Common.inbound_listof_flights))
+            bookings = []
+            for outbound, inbound in flights:
+                for _ in range(BOOKINGS_PER_FLIGHT):
+                    pnr += 1
+                    bookings.append(Booking(
+                        pnr=f"B{pnr:05d}", flight_from="LCY",
+                        flight_to="IOM", return_flight=True,
+                        outbound_date=day, outbound_flightno=outbound,
+                        inbound_date=day, inbound_flightno=inbound,
+                        number_of_adults=2, number_of_children=1,
+                        number_of_infants=1, departure_time="0000",
+                        arrival_time="0000"))
+            Booking.objects.bulk_create(bookings)
+            bookings = Booking.objects.filter(outbound_date=day)
+
+            passengers = []
+            for index, booking in enumerate(bookings.order_by("pnr")):
+                first_seat = (index % BOOKINGS_PER_FLIGHT) * SEATED
+                for pax_number, pax_type in enumerate("AACI", start=1):
+                    seat = (m.seat_number(first_seat + pax_number - 1)
+                            if pax_type != "I" else "")
+                    passengers.append(Passenger(
+                        pnr=booking, title="MR", first_name="FRED",
+                        last_name="BLOGGS", pax_type=pax_type,
+                        pax_number=pax_number, status=f"HK{pax_number}",
+                        outbound_seat_number=seat, inbound_seat_number=seat))
+            Passenger.objects.bulk_create(passengers)
+
+            seated = BOOKINGS_PER_FLIGHT * SEATED
+            seatmap = bits_seatmap((1 << seated) - 1)
+            Schedule.objects.bulk_create(
+                [Schedule(flight_date=day, flight_number=flight,
+                          total_booked=seated, seatmap=seatmap)
+                 for pair in flights for flight in pair])
+            DepartureLoad.objects.bulk_create(
+                [DepartureLoad(flight_date=day, flight_number=flight,
+                               booked=seated,
+                               adults=BOOKINGS_PER_FLIGHT * 2,
+                               children=BOOKINGS_PER_FLIGHT,
+                               infants=BOOKINGS_PER_FLIGHT)
+                 for pair in flights for flight in pair])
+
+
+def main():
+    first_day = date.today() + timedelta(days=1)
+    if not Schedule.objects.filter(flight_date=first_day).exists():
+        print(f"Filling {DAYS} days of flights...")
+        fill_year(first_day)
+
+    # A seat taken by nobody, and a booked figure out by one
+    schedules = Schedule.objects.filter(flight_date__gte=first_day)
+    for schedule in schedules.order_by("?")[:5]:
+        schedule.total_booked += 1
+        schedule.save()
+    print(f"{schedules.count()} flights, "
+          f"{Passenger.objects.count()} passengers")
+
+    for workers in (1, 4):
+        began = time.perf_counter()
+        call_command("check_inventory", "--workers", str(workers),
+                     "--from", str(first_day),
+                     "--to", str(first_day + timedelta(days=DAYS - 1)))
+        print(f"{workers} workers: {time.perf_counter() - began:.2f} s\n")
+
+    call_command("check_inventory", "--repair", "--from", str(first_day))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# Measure the batch fare quoting of booking/fares.py
+#
+# Prices a batch of random one-way and return Quotes spread over the
+# next few months with 'quote_batch' and compares it with pricing the
+# same Quotes one at a time with 'price_booking'
+# Run from the project directory, e.g.
+#       DATABASE_URL=sqlite:////tmp/bench.db python \
+#           booking/misctests/quote_benchmark.py --quotes 10000
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.getcwd())
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "manxairlines.settings")
+
+import django  # noqa: E402
+django.setup()
+
+from booking import bookinghelper as m  # noqa: E402
+from booking import fares  # noqa: E402
+from booking.common import Common  # noqa: E402
+
+
+def random_quotes(count):
+    Common.initialisation()
+    start = date.today() + timedelta(days=1)
+    quotes = []
+    for _ in range(count):
+        departing = start + timedelta(days=random.randrange(120))
+        adults = random.randint(1, 4)
+        quote = fares.Quote(random.choice(Common.outbound_listof_flights),
+                            departing, adults, random.randint(0, 3),
+                            random.randint(0, adults), random.randint(0, 4))
+        if random.random() < 0.6:
+            quote = quote._replace(
+                inbound_flight=random.choice(Common.inbound_listof_flights),
+                inbound_date=departing + timedelta(
+                                            days=random.randrange(15)))
+        quotes.append(quote)
+    return quotes
+
+
+def one_at_a_time(quotes):
+    totals = []
+    for quote in quotes:
+        legs = [(quote.outbound_flight, quote.outbound_date)]
+        if quote.inbound_flight:
+            legs.append((quote.inbound_flight, quote.inbound_date))
+        fees = m.price_booking("Y" if quote.inbound_flight else "N",
+                               quote.adults, quote.children, quote.infants,
+                               quote.bags, legs)
+        totals.append(fees["total_price"])
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--quotes", type=int, default=10000)
+    parser.add_argument("--single", type=int, default=1000,
+                        help="How many of the quotes to price one at a time")
+    args = parser.parse_args()
+
+    quotes = random_quotes(args.quotes)
+    fares.quote_batch(quotes[:10])  # Compile the fare table
+
+    start = time.perf_counter()
+    batch = fares.quote_batch(quotes)
+    elapsed = time.perf_counter() - start
+    print(f"quote_batch    {args.quotes:>6} quotes {elapsed * 1000:9.1f} ms")
+
+    single = quotes[:args.single]
+    start = time.perf_counter()
+    totals = one_at_a_time(single)
+    elapsed = time.perf_counter() - start
+    print(f"price_booking  {len(single):>6} quotes {elapsed * 1000:9.1f} ms "
+          f"(~{elapsed / len(single) * args.quotes * 1000:.0f} ms "
+          f"for {args.quotes})")
+
+    mismatches = sum(1 for a, b in zip(batch, totals) if a != b)
+    print(f"Mismatches between the two: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
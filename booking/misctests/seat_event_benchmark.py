@@ -0,0 +1,166 @@
+# Compare the throughput of concurrent bookings of the same flight
+# when seats are taken
+# 1) as they were before the seat log: lock the Schedule record,
+#    rewrite its seatmap and save it at the end of the transaction
+# 2) with the seat log: insert SeatEvents and add to the Schedule's
+#    booked figure at the end of the transaction (see seatlog.py)
+# THREADS threads make Bookings of 2 Adults until the flights are full,
+# each Booking spending WORK seconds in its transaction after taking its
+# seats (standing in for pricing, the Passengers and Transaction etc.)
+# Prints the Bookings made per second and checks nobody shares a seat
+# Needs PostgreSQL to see the difference, e.g.
+#       DATABASE_URL=postgres://... python manage.py migrate
+#       DATABASE_URL=postgres://... python manage.py loaddata flights
+#       DATABASE_URL=postgres://... python \
+#           booking/misctests/seat_event_benchmark.py [THREADS]
+# SQLite allows only one writer at a time so it runs with one thread
+
+import os
+import sys
+import threading
+import time
+from datetime import date, timedelta
+from queue import Empty, Queue
+
+sys.path.insert(0, os.getcwd())
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "manxairlines.settings")
+
+import django  # noqa: E402
+django.setup()
+
+from django.db import connection, transaction  # noqa: E402
+from django.db.models import Count  # noqa: E402
+
+from booking import bookinghelper as m  # noqa: E402
+from booking import seatlog  # noqa: E402
+from booking.models import Booking, Passenger, Schedule  # noqa: E402
+from booking.models import SeatEvent  # noqa: E402
+
+THREADS = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+FLIGHTS = 4
+SEATS_PER_BOOKING = 2
+WORK = 0.005
+FLIGHT_NUMBER = "MX0465"
+
+
+def lock_and_allocate(flight_date, pnr):
+    """ Taking seats before the seat log """
+
+    schedule = (Schedule.objects.select_for_update()
+                .get(flight_date=flight_date, flight_number=FLIGHT_NUMBER))
+    seats = m.seat_chooser(SEATS_PER_BOOKING)(
+                seatlog.seatmap_bits(schedule.seatmap))
+    if seats is None:
+        return None, None
+    schedule.seatmap = seatlog.bits_seatmap(
+                seatlog.apply_events(seatlog.seatmap_bits(schedule.seatmap),
+                                     ((seat, seatlog.TAKE)
+                                      for seat in seats)))
+    schedule.total_booked += len(seats)
+    return seats, schedule.save
+
+
+def take_from_log(flight_date, pnr):
+    """ Taking seats with the seat log """
+
+    seats = seatlog.take_seats(flight_date, FLIGHT_NUMBER, pnr,
+                               m.seat_chooser(SEATS_PER_BOOKING))
+    if seats is None:
+        return None, None
+    return seats, lambda: seatlog.add_to_booked(flight_date, FLIGHT_NUMBER,
+                                                len(seats))
+
+
+def book(take, flight_date, pnr):
+    """ One Booking in its own transaction, False if the flight is full """
+
+    with transaction.atomic():
+        seats, finish = take(flight_date, pnr)
+        if seats is None:
+            return False
+        booking = Booking.objects.create(
+                    pnr=pnr, flight_from="LCY", flight_to="IOM",
+                    return_flight=False, outbound_date=flight_date,
+                    outbound_flightno=FLIGHT_NUMBER,
+                    number_of_adults=len(seats), departure_time="0800",
+                    arrival_time="0945")
+        Passenger.objects.bulk_create(
+            [Passenger(pnr=booking, title="MR", first_name="FRED",
+                       last_name="BLOGGS", pax_number=number,
+                       status=f"HK{number}",
+                       outbound_seat_number=m.seat_number(seat))
+             for number, seat in enumerate(seats, start=1)])
+        time.sleep(WORK)
+        finish()
+    return True
+
+
+def worker(take, prefix, flights, made):
+    try:
+        while True:
+            try:
+                flight_date = flights.get_nowait()
+            except Empty:
+                return
+            with made["lock"]:
+                made["count"] += 1
+                pnr = f"{prefix}{made['count']:05d}"
+            if book(take, flight_date, pnr):
+                # Book the flight again until it is full
+                flights.put(flight_date)
+    finally:
+        connection.close()
+
+
+def run(name, take, prefix, first_day, threads):
+    days = [first_day + timedelta(days=n) for n in range(FLIGHTS)]
+    Schedule.objects.bulk_create(
+        [Schedule(flight_date=day, flight_number=FLIGHT_NUMBER,
+                  total_booked=0) for day in days])
+    flights = Queue()
+    for _ in range(threads):
+        for day in days:
+            flights.put(day)
+
+    made = {"count": 0, "lock": threading.Lock()}
+    began = time.perf_counter()
+    workers = [threading.Thread(target=worker,
+                                args=(take, prefix, flights, made))
+               for _ in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - began
+
+    bookings = Booking.objects.filter(pnr__startswith=prefix).count()
+    shared = (Passenger.objects.filter(pnr__pnr__startswith=prefix)
+              .values("pnr__outbound_date", "outbound_seat_number")
+              .annotate(sharing=Count("id")).filter(sharing__gt=1).count())
+    print(f"{name:<24} {bookings} Bookings in {elapsed:.2f} s = "
+          f"{bookings / elapsed:.0f} per second, "
+          f"{shared} seats booked twice")
+
+
+def main():
+    threads = THREADS
+    if connection.vendor == "sqlite":
+        print("SQLite allows only one writer at a time - using one thread")
+        threads = 1
+
+    if Booking.objects.filter(pnr__startswith="Q").exists():
+        print("Run against a fresh database")
+        return
+
+    first_day = date.today() + timedelta(days=200)
+    print(f"{threads} threads booking {FLIGHTS} flights of "
+          f"{m.CAPACITY} seats, {SEATS_PER_BOOKING} seats per Booking")
+    run("Locked seatmap", lock_and_allocate, "Q",
+        first_day, threads)
+    run("Seat log", take_from_log, "R",
+        first_day + timedelta(days=FLIGHTS), threads)
+    print(f"{SeatEvent.objects.count()} seat events logged")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# Compare the throughput of the WSGI and the ASGI servers
+# when many connections are reading at the same time
+#
+# 1) Set up a database (SQLite will do) with some Bookings, e.g.
+#       export DATABASE_URL=sqlite:////tmp/bench.db
+#       python manage.py migrate && python manage.py loaddata flights
+#    then log in with the browser and copy the 'sessionid' cookie
+#
+# 2) Start the WSGI server and run the benchmark against the sync views
+#       gunicorn manxairlines.wsgi -w 1 --threads 4 -b 127.0.0.1:8000
+#       python booking/misctests/wsgi_asgi_benchmark.py \
+#           --session SESSIONID --path "/search/?query=A"
+#
+# 3) Start the ASGI server (see Procfile.asgi) and run it against
+#    the async views
+#       gunicorn manxairlines.asgi:application \
+#           -k uvicorn.workers.UvicornWorker -w 1 -b 127.0.0.1:8000
+#       python booking/misctests/wsgi_asgi_benchmark.py \
+#           --session SESSIONID --path "/async/search/?query=A"
+#
+# Only the standard library is used so that it runs anywhere
+
+import argparse
+import http.client
+import statistics
+import threading
+import time
+
+
+def worker(host, port, path, headers, count, timings, errors):
+    """ Send 'count' requests over one keep-alive connection """
+    connection = http.client.HTTPConnection(host, port, timeout=30)
+    for _ in range(count):
+        start = time.perf_counter()
+        try:
+            connection.request("GET", path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 400:
+                errors.append(response.status)
+        except (OSError, http.client.HTTPException) as e:
+            errors.append(str(e))
+            connection.close()
+            connection = http.client.HTTPConnection(host, port, timeout=30)
+            continue
+        timings.append(time.perf_counter() - start)
+    connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--path", default="/async/search/?query=A")
+    parser.add_argument("--session", default="",
+                        help="The value of the 'sessionid' cookie")
+    parser.add_argument("--concurrency", type=int, nargs="+",
+                        default=[1, 8, 32, 64])
+    parser.add_argument("--requests", type=int, default=20,
+                        help="Requests per connection")
+    args = parser.parse_args()
+
+    headers = {"Cookie": f"sessionid={args.session}"} if args.session else {}
+
+    print(f"GET {args.path}")
+    print(f"{'conns':>6} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+    for concurrency in args.concurrency:
+        timings = []
+        errors = []
+        threads = [threading.Thread(target=worker,
+                                    args=(args.host, args.port, args.path,
+                                          headers, args.requests,
+                                          timings, errors))
+                   for _ in range(concurrency)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        if len(timings) < 2:
+            print(f"{concurrency:>6} {'-':>9} {'-':>8} {'-':>8} "
+                  f"{len(errors):>7}")
+            continue
+        cuts = statistics.quantiles(timings, n=20)
+        print(f"{concurrency:>6} {len(timings) / elapsed:>9.1f} "
+              f"{statistics.median(timings) * 1000:>8.1f} "
+              f"{cuts[18] * 1000:>8.1f} {len(errors):>7}")
+
+
+if __name__ == "__main__":
+    main()
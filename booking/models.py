@@ -3,22 +3,60 @@ from django.db import models
 # Create your models here.
 
 
+class Route(models.Model):
+    """ An airport pair flown e.g. LCY to IOM - see booking/timetable.py """
+    origin = models.CharField(max_length=3)
+    destination = models.CharField(max_length=3)
+
+    class Meta:
+        ordering = ["origin", "destination"]
+        constraints = [
+            models.UniqueConstraint(fields=["origin", "destination"],
+                                    name="unique_route"),
+        ]
+
+    def __str__(self):
+        return f"{self.origin}-{self.destination}"
+
+
 class Flight(models.Model):
     flight_number = models.CharField(max_length=6, primary_key=True)
-    flight_from = models.CharField(max_length=3)
-    flight_to = models.CharField(max_length=3)
-    flight_STD = models.CharField(max_length=4)
-    flight_STA = models.CharField(max_length=4)
+    route = models.ForeignKey(Route, on_delete=models.PROTECT,
+                              related_name="flights")
+    # STD and STA in minutes after midnight (local times)
+    # An STA earlier than the STD arrives the next day
+    std_minutes = models.PositiveSmallIntegerField()
+    sta_minutes = models.PositiveSmallIntegerField()
     outbound = models.BooleanField(default=True)
     capacity = models.PositiveSmallIntegerField()
+    # The ISO weekdays on which the flight operates, Monday is 1
+    # e.g. "1234567" daily, "67" weekends only
+    days_of_operation = models.CharField(max_length=7, default="1234567")
+    # The first and last dates on which the flight operates
+    # (None - no limit)
+    effective_from = models.DateField(null=True, blank=True)
+    effective_to = models.DateField(null=True, blank=True)
 
     class Meta:
         ordering = ["flight_number"]
+        indexes = [
+            models.Index(fields=["route", "std_minutes"],
+                         name="flight_route_std_idx"),
+        ]
+
+    @property
+    def flight_from(self):
+        return self.route.origin
+
+    @property
+    def flight_to(self):
+        return self.route.destination
 
     def __str__(self):
         return (f"{self.flight_number} "
                 f"{self.flight_from} {self.flight_to} "
-                f"{self.flight_STD} {self.flight_STA}")
+                f"{self.std_minutes // 60:02d}{self.std_minutes % 60:02d} "
+                f"{self.sta_minutes // 60:02d}{self.sta_minutes % 60:02d}")
 
 
 class Schedule(models.Model):
@@ -28,9 +66,17 @@ class Schedule(models.Model):
     # Bit String which represents the seating of passengers
     # The Bit String is represented as a 24-character hex string
     seatmap = models.CharField(max_length=24, default="0" * 24)
+    # The seatmap is a snapshot of the seats as of this SeatEvent
+    # The later SeatEvents of the flight have still to be applied
+    # See booking/seatlog.py
+    events_compacted_to = models.BigIntegerField(default=0)
 
     class Meta:
         ordering = ["flight_date", "flight_number"]
+        constraints = [
+            models.UniqueConstraint(fields=["flight_date", "flight_number"],
+                                    name="unique_schedule_flight"),
+        ]
 
     def __str__(self):
         return "{0} {1} BOOKED TO {2} PAX".format(self.flight_number,
@@ -39,7 +85,8 @@ class Schedule(models.Model):
                                                   self.total_booked)
 
 
-class Booking(models.Model):
+class BookingRecord(models.Model):
+    """ The fields of both the live and the archived Bookings """
     pnr = models.CharField(max_length=6, unique=True)
     created_at = models.DateField(auto_now=True)
     amended_at = models.DateField(auto_now_add=True)
@@ -68,6 +115,7 @@ class Booking(models.Model):
     remarks = models.TextField(blank=True, default="")
 
     class Meta:
+        abstract = True
         ordering = ["pnr"]
 
     def __str__(self):
@@ -94,7 +142,18 @@ class Booking(models.Model):
                  infant_plural))  # 9
 
 
-class Passenger(models.Model):
+class Booking(BookingRecord):
+
+    class Meta(BookingRecord.Meta):
+        indexes = [
+            # Finding the Bookings to archive
+            models.Index(fields=["outbound_date"],
+                         name="booking_outbound_date_idx"),
+        ]
+
+
+class PassengerRecord(models.Model):
+    """ The fields of both the live and the archived Passengers """
     title = models.CharField(max_length=4)
     first_name = models.CharField(max_length=40)
     last_name = models.CharField(max_length=40)
@@ -108,7 +167,6 @@ class Passenger(models.Model):
     # Either one of these two fields needs to be set for Adult No. 1
     contact_number = models.CharField(max_length=40, blank=True, default="")
     contact_email = models.CharField(max_length=40, blank=True, default="")
-    pnr = models.ForeignKey(Booking, on_delete=models.CASCADE)
     outbound_seat_number = models.CharField(max_length=3, default="")
     inbound_seat_number = models.CharField(max_length=3, default="")
     # Status: HK1 for PAX 1, HK2 for PAX 2, etc up to HK20
@@ -122,18 +180,261 @@ class Passenger(models.Model):
     # Blank - PAX not travelling with a wheelchair
     wheelchair_type = models.CharField(max_length=1, blank=True, default="")
 
+    class Meta:
+        abstract = True
+
     def __str__(self):
         return "{0} PAX: {1} {2} {3}".format(
             self.pnr, self.title, self.first_name, self.last_name)
 
 
+class Passenger(PassengerRecord):
+    pnr = models.ForeignKey(Booking, on_delete=models.CASCADE)
+
+    class Meta(PassengerRecord.Meta):
+        indexes = [
+            # Finding the Passengers by name in the admin
+            models.Index(fields=["last_name", "first_name"],
+                         name="passenger_name_idx"),
+        ]
+
+
 class Transaction(models.Model):
     pnr = models.CharField(max_length=6)
     amount = models.DecimalField(max_digits=6, decimal_places=2, default=0)
     date_created = models.DateField(auto_now=True)
     username = models.CharField(max_length=40, default="username")
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["date_created", "username"],
+                         name="transaction_date_user_idx"),
+            # Finding a Booking's Transactions
+            models.Index(fields=["pnr"], name="transaction_pnr_idx"),
+        ]
+
     def __str__(self):
         return "PNR: {0} AMOUNT: GBP{1} DATE CREATED {2} BY {3}".format(
             self.pnr, self.amount,
             self.date_created.strftime("%d/%m/%Y"), self.username)
+
+
+class Fare(models.Model):
+    """
+    The Fares of a flight for a range of dates
+    A blank 'flight_number' applies to every flight
+    Where several Fares apply, the flight's own Fare beats a blank one
+    and then the one with the highest priority wins
+    See booking/fares.py
+    """
+    flight_number = models.CharField(max_length=6, blank=True, default="")
+    valid_from = models.DateField(null=True, blank=True)
+    valid_to = models.DateField(null=True, blank=True)
+    priority = models.SmallIntegerField(default=0)
+    # One-way fares per passenger
+    adult_price = models.DecimalField(max_digits=6, decimal_places=2)
+    child_price = models.DecimalField(max_digits=6, decimal_places=2)
+    infant_price = models.DecimalField(max_digits=6, decimal_places=2)
+    # Per booking
+    bag_price = models.DecimalField(max_digits=6, decimal_places=2)
+    change_fee = models.DecimalField(max_digits=6, decimal_places=2)
+
+    class Meta:
+        ordering = ["flight_number", "valid_from", "-priority"]
+
+    def __str__(self):
+        flight = self.flight_number or "ALL FLIGHTS"
+        valid_from = (self.valid_from.strftime("%d/%m/%Y")
+                      if self.valid_from else "-")
+        valid_to = (self.valid_to.strftime("%d/%m/%Y")
+                    if self.valid_to else "-")
+        return (f"{flight} {valid_from} TO {valid_to} "
+                f"ADULT GBP{self.adult_price}")
+
+
+class FareRule(models.Model):
+    """
+    Adjust the passenger fares of a Fare once the flight's load factor
+    (the percentage of seats booked) reaches 'min_load_factor'
+    E.G. min_load_factor=80, adjustment_percent=25 means
+    the fares are 25% dearer once the flight is 80% full
+    """
+    fare = models.ForeignKey(Fare, on_delete=models.CASCADE,
+                             related_name="rules")
+    min_load_factor = models.PositiveSmallIntegerField()
+    adjustment_percent = models.SmallIntegerField()
+
+    class Meta:
+        ordering = ["fare", "min_load_factor"]
+        constraints = [
+            models.UniqueConstraint(fields=["fare", "min_load_factor"],
+                                    name="unique_fare_load_factor"),
+        ]
+
+    def __str__(self):
+        return (f"{self.fare} FROM {self.min_load_factor}% LOAD "
+                f"{self.adjustment_percent:+d}%")
+
+
+class SalesRollup(models.Model):
+    """
+    The number and total amount of the Transactions
+    made by one agent on one day
+    Kept up to date as each Transaction is created - see booking/sales.py
+    """
+    day = models.DateField()
+    username = models.CharField(max_length=40)
+    transactions = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ["day", "username"]
+        constraints = [
+            models.UniqueConstraint(fields=["day", "username"],
+                                    name="unique_sales_day_username"),
+        ]
+
+    def __str__(self):
+        return "{0} {1}: {2} TRANSACTIONS GBP{3}".format(
+            self.day.strftime("%d/%m/%Y"), self.username,
+            self.transactions, self.revenue)
+
+
+class DepartureLoad(models.Model):
+    """
+    How full a flight is on one date: its booked figure
+    and the numbers of each type of passenger on board
+    Kept in step with the Schedule as seats are taken and freed
+    so that the Departures page reads one row per flight
+    See booking/loads.py
+    """
+    flight_date = models.DateField()
+    flight_number = models.CharField(max_length=6)
+    booked = models.PositiveSmallIntegerField(default=0)
+    adults = models.PositiveSmallIntegerField(default=0)
+    children = models.PositiveSmallIntegerField(default=0)
+    infants = models.PositiveSmallIntegerField(default=0)
+    # Passengers with a Wheelchair SSR
+    wheelchairs = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        ordering = ["flight_date", "flight_number"]
+        constraints = [
+            models.UniqueConstraint(fields=["flight_date", "flight_number"],
+                                    name="unique_departure_load"),
+        ]
+
+    def __str__(self):
+        return "{0} {1} BOOKED {2}: {3}A {4}C {5}I {6} WCH".format(
+            self.flight_number, self.flight_date.strftime("%d/%m/%Y"),
+            self.booked, self.adults, self.children, self.infants,
+            self.wheelchairs)
+
+
+class ArchivedBooking(BookingRecord):
+    """
+    A Booking whose flights departed long ago
+    moved out of the Booking table by 'manage.py archive_bookings'
+    It keeps the id and PNR of the original Booking
+    See booking/archive.py
+    """
+    # Copied from the original Booking rather than set automatically
+    created_at = models.DateField()
+    amended_at = models.DateField()
+    archived_at = models.DateField(auto_now_add=True)
+
+    class Meta(BookingRecord.Meta):
+        indexes = [
+            models.Index(fields=["outbound_date"],
+                         name="archived_outbound_date_idx"),
+        ]
+
+
+class ArchivedPassenger(PassengerRecord):
+    """ A Passenger of an ArchivedBooking """
+    # Named as for Passenger so that the Bookings can be searched
+    # in the same way i.e. 'booking.passenger_set', 'passenger__last_name'
+    pnr = models.ForeignKey(ArchivedBooking, on_delete=models.CASCADE,
+                            related_name="passenger_set",
+                            related_query_name="passenger")
+
+
+class SeatEvent(models.Model):
+    """
+    A seat on a flight taken or released by a Booking
+    SeatEvents are only ever added, never changed
+    'previous' is the id of the seat's previous SeatEvent on the flight
+    (0 for its first) and no two SeatEvents may follow the same one,
+    so two Bookings cannot both take the same free seat
+    See booking/seatlog.py
+    """
+    TAKE = "T"
+    RELEASE = "R"
+    ACTIONS = [(TAKE, "Take"), (RELEASE, "Release")]
+
+    flight_date = models.DateField()
+    flight_number = models.CharField(max_length=6)
+    # Seat position 0-95 i.e. 1A is 0, 24D is 95
+    seat = models.PositiveSmallIntegerField()
+    action = models.CharField(max_length=1, choices=ACTIONS)
+    # Blank for corrections made by 'manage.py check_inventory'
+    pnr = models.CharField(max_length=6, blank=True, default="")
+    previous = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["id"]
+        constraints = [
+            models.UniqueConstraint(fields=["flight_date", "flight_number",
+                                            "seat", "previous"],
+                                    name="unique_seat_event_previous"),
+        ]
+        indexes = [
+            models.Index(fields=["flight_date", "flight_number", "id"],
+                         name="seat_event_flight_idx"),
+        ]
+
+    def __str__(self):
+        return "{0} {1} SEAT {2} {3} BY {4}".format(
+            self.flight_number, self.flight_date.strftime("%d/%m/%Y"),
+            self.seat, self.get_action_display().upper(), self.pnr or "-")
+
+
+class IdempotencyKey(models.Model):
+    """
+    A confirmation which must only be carried out once
+    and, once it has been, the result given to any replay of it
+    See booking/idempotency.py
+    """
+    ISSUED = "I"
+    CLAIMED = "C"
+    DONE = "D"
+    STATES = [(ISSUED, "Issued"), (CLAIMED, "Claimed"), (DONE, "Done")]
+
+    key = models.CharField(max_length=64)
+    username = models.CharField(max_length=150)
+    # What the key confirms e.g. "confirm", "amend", "api-booking"
+    purpose = models.CharField(max_length=16)
+    state = models.CharField(max_length=1, choices=STATES, default=ISSUED)
+    # API keys only - the SHA-256 of the request's body
+    fingerprint = models.CharField(max_length=64, blank=True, default="")
+    # The HTTP status and JSON result of the original request
+    status = models.PositiveSmallIntegerField(default=0)
+    result = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["username", "key"],
+                                    name="unique_idempotency_key"),
+        ]
+        indexes = [
+            # Sweeping the expired keys
+            models.Index(fields=["created_at"],
+                         name="idempotency_created_idx"),
+        ]
+
+    def __str__(self):
+        return "{0} {1} BY {2} {3}".format(
+            self.purpose.upper(), self.key, self.username,
+            self.get_state_display().upper())
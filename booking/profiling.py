@@ -0,0 +1,213 @@
+"""
+Request Profiling
+
+To find out why a page is slow for one agent (e.g. the Passenger
+Details Form for a big family) the request can be profiled where it
+happens. A request is profiled when
+- a staff user sends the header 'X-Profile: 1' or adds '?profile=1'
+- or it is picked at random, one in PROFILE_SAMPLE_RATE requests
+  (0 - never)
+
+The view (and the rendering of its template) is run under cProfile
+and tracemalloc. Two reports are written to PROFILE_DIR:
+    <id>.prof       the cProfile statistics, e.g. for 'snakeviz'
+                    or 'python -m pstats'
+    <id>.alloc.txt  the lines which allocated the most memory
+                    and the peak memory of the request
+and, for staff, the response links to them in its X-Profile-CPU and
+X-Profile-Memory headers (see 'profile_report').
+
+Only one request is profiled at a time (tracemalloc traces the whole
+process) and only the newest PROFILE_KEEP reports are kept.
+When no request is being profiled the cost is a header and a query
+string lookup per request.
+"""
+
+import cProfile
+import os
+import random
+import re
+import threading
+import tracemalloc
+import uuid
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import FileResponse, Http404
+from django.urls import reverse
+
+from manxairlines.middleware import AsyncCapableMiddleware
+
+from .logs import event, forms_log
+from logging import INFO
+
+HEADER = "X-Profile"
+QUERY_FLAG = "profile"
+
+# Lines listed in the memory report
+TOP_ALLOCATIONS = 30
+
+# Frames kept of each allocation's traceback
+TRACEBACK_FRAMES = 10
+
+REPORT_NAME = re.compile(r"^[\w.-]+\.(prof|alloc\.txt)$")
+
+_profiling = threading.Lock()
+
+
+def flagged(request):
+    """ Whether the request asks to be profiled (by anyone) """
+    return (request.headers.get(HEADER) == "1" or
+            request.GET.get(QUERY_FLAG) == "1")
+
+
+def is_staff(request):
+    user = getattr(request, "user", None)
+    return user is not None and user.is_staff
+
+
+def requested(request):
+    """ Whether a staff user has asked for the request to be profiled """
+    return flagged(request) and is_staff(request)
+
+
+def sampled():
+    rate = settings.PROFILE_SAMPLE_RATE
+    return rate > 0 and random.randrange(rate) == 0
+
+
+def report_id(request):
+    match = getattr(request, "resolver_match", None)
+    view = re.sub(r"\W", "-", (match.view_name if match else "") or "view")
+    return (f"{datetime.now():%Y%m%d-%H%M%S}-{view}-"
+            f"{uuid.uuid4().hex[:8]}")
+
+
+def write_memory_report(path, snapshot, peak, request):
+    statistics = snapshot.statistics("lineno")
+    with open(path, "w") as report:
+        report.write(f"{request.method} {request.get_full_path()}\n")
+        report.write(f"Peak traced memory: {peak / 1024:.1f} KiB\n")
+        report.write(f"Top {TOP_ALLOCATIONS} allocations by line:\n")
+        for statistic in statistics[:TOP_ALLOCATIONS]:
+            report.write(f"{statistic}\n")
+
+
+def prune_reports(directory):
+    """ Keep the newest PROFILE_KEEP reports of each kind """
+
+    for suffix in (".prof", ".alloc.txt"):
+        names = sorted(name for name in os.listdir(directory)
+                       if name.endswith(suffix))
+        for name in names[:max(len(names) - settings.PROFILE_KEEP, 0)]:
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+
+
+class ProfilingMiddleware(AsyncCapableMiddleware):
+    """
+    Profile the requests which ask for it or are sampled
+    Must be last in MIDDLEWARE - after AuthenticationMiddleware so that
+    the user is known, and so that only the view is profiled
+    Under ASGI the profiler only sees the event loop's thread, so the
+    report of an asynchronous view has its awaits but not the work done
+    in the reader threads, and may have bits of other requests in it
+    """
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        asked = requested(request)
+        if not (asked or sampled()):
+            return self.get_response(request)
+        if not _profiling.acquire(blocking=False):
+            # Another request is being profiled
+            return self.get_response(request)
+        try:
+            return self.profile(request, asked)
+        finally:
+            _profiling.release()
+
+    async def __acall__(self, request):
+        # The user is only looked up (in the database) when it's asked for
+        asked = flagged(request) and await sync_to_async(is_staff)(request)
+        if not (asked or sampled()):
+            return await self.get_response(request)
+        if not _profiling.acquire(blocking=False):
+            return await self.get_response(request)
+        try:
+            tracing = start_profiling()
+            try:
+                response = await self.get_response(request)
+            finally:
+                results = stop_profiling(*tracing)
+            return await sync_to_async(report)(request, response, asked,
+                                               *results)
+        finally:
+            _profiling.release()
+
+    def profile(self, request, asked):
+        tracing = start_profiling()
+        try:
+            # Last in MIDDLEWARE this is the view and its template
+            response = self.get_response(request)
+        finally:
+            results = stop_profiling(*tracing)
+        return report(request, response, asked, *results)
+
+
+def start_profiling():
+    already_tracing = tracemalloc.is_tracing()
+    if not already_tracing:
+        tracemalloc.start(TRACEBACK_FRAMES)
+    tracemalloc.reset_peak()
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler, already_tracing
+
+
+def stop_profiling(profiler, already_tracing):
+    profiler.disable()
+    snapshot = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    if not already_tracing:
+        tracemalloc.stop()
+    return profiler, snapshot, peak
+
+
+def report(request, response, asked, profiler, snapshot, peak):
+    """ Write the request's reports and point the staff at them """
+
+    directory = settings.PROFILE_DIR
+    os.makedirs(directory, exist_ok=True)
+    name = report_id(request)
+    profiler.dump_stats(os.path.join(directory, f"{name}.prof"))
+    write_memory_report(os.path.join(directory, f"{name}.alloc.txt"),
+                        snapshot.filter_traces([tracemalloc.Filter(
+                            False, tracemalloc.__file__)]),
+                        peak, request)
+    prune_reports(directory)
+    event(forms_log, INFO, "request profiled", path=request.path,
+          report=name, peak_kib=round(peak / 1024))
+
+    if asked or is_staff(request):
+        response[f"{HEADER}-CPU"] = reverse("profile-report",
+                                            args=[f"{name}.prof"])
+        response[f"{HEADER}-Memory"] = reverse(
+            "profile-report", args=[f"{name}.alloc.txt"])
+    return response
+
+
+def profile_report(request, name):
+    """ Download a report - staff only """
+
+    if not (request.user.is_authenticated and request.user.is_staff):
+        raise Http404
+    path = os.path.join(settings.PROFILE_DIR, name)
+    if not REPORT_NAME.match(name) or not os.path.isfile(path):
+        raise Http404
+    return FileResponse(open(path, "rb"), as_attachment=True,
+                        filename=name)
@@ -0,0 +1,319 @@
+"""
+Seat Event Log
+
+Every seat taken or released on a flight is added to the log as a
+SeatEvent together with the PNR of the Booking concerned. Events are
+never changed, so the log is the history of who sat where, and taking
+a seat is an insert rather than a rewrite of the Schedule's seatmap.
+
+The Schedule's seatmap is a snapshot of the flight's seats as of its
+SeatEvent 'events_compacted_to'. The seats taken now are the snapshot
+with the flight's later events (the 'tail') applied on top.
+'manage.py compact_seat_events' folds the tails into the snapshots
+every so often so that the tails stay short.
+The Schedule's total_booked is kept up to date by every Booking.
+
+Each event names the seat's previous event on the flight and no two
+events may name the same one (see SeatEvent). When two Bookings pick
+the same free seat at the same time the database turns the second
+one away and it picks again, so Bookings of the same flight only wait
+for each other when they want the same seat.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .logs import event, allocation_log
+from .models import Schedule, SeatEvent
+from logging import WARNING
+
+TAKE = SeatEvent.TAKE
+RELEASE = SeatEvent.RELEASE
+
+CAPACITY = 96
+EMPTY_SEATMAP = "0" * (CAPACITY // 4)
+
+# How many times a Booking picks its seats again when they are taken
+# by another Booking whilst it is taking them
+MAXIMUM_ATTEMPTS = 5
+
+
+class SeatTaken(Exception):
+    """ Raised when a seat being taken turns out to be taken already """
+
+
+def seatmap_bits(seatmap):
+    """ The 24-character hex seatmap as an integer, bit N is seat N """
+    return int(seatmap or "0", 16)
+
+
+def bits_seatmap(bits):
+    """ The integer seat bits as a 24-character hex seatmap """
+    return f"{bits:0{CAPACITY // 4}X}"
+
+
+def apply_events(bits, events):
+    """ The seat bits after applying the (seat, action) events in order """
+    for seat, action in events:
+        if action == TAKE:
+            bits |= 1 << seat
+        else:
+            bits &= ~(1 << seat)
+    return bits
+
+
+def flight_events(flight_date, flight_number):
+    return SeatEvent.objects.filter(flight_date=flight_date,
+                                    flight_number=flight_number)
+
+
+def current_seats(flight_date, flight_number):
+    """ The seats taken on the flight now, bit N is seat N """
+
+    snapshot = (Schedule.objects
+                .filter(flight_date=flight_date, flight_number=flight_number)
+                .values_list("seatmap", "events_compacted_to").first())
+    seatmap, compacted_to = snapshot or (EMPTY_SEATMAP, 0)
+    tail = (flight_events(flight_date, flight_number)
+            .filter(id__gt=compacted_to).order_by("id")
+            .values_list("seat", "action"))
+    return apply_events(seatmap_bits(seatmap), tail)
+
+
+def tail_events(start, end):
+    """
+    The events not yet compacted of the flights from 'start' to 'end'
+    inclusive, as a list of (seat, action) in order for each flight
+    """
+
+    compacted_to = (Schedule.objects
+                    .filter(flight_date=OuterRef("flight_date"),
+                            flight_number=OuterRef("flight_number"))
+                    .values("events_compacted_to")[:1])
+    events = (SeatEvent.objects.filter(flight_date__range=(start, end))
+              .annotate(compacted_to=Coalesce(Subquery(compacted_to), 0))
+              .filter(id__gt=F("compacted_to")).order_by("id")
+              .values_list("flight_date", "flight_number", "seat", "action"))
+    tails = {}
+    for flight_date, flight_number, seat, action in events:
+        tails.setdefault((flight_date, flight_number), []).append(
+            (seat, action))
+    return tails
+
+
+def latest_events(flight_date, flight_number, seats):
+    """ The (id, action) of the latest event of each of the seats """
+
+    latest = {}
+    for seat, id, action in (flight_events(flight_date, flight_number)
+                             .filter(seat__in=seats).order_by("id")
+                             .values_list("seat", "id", "action")):
+        latest[seat] = (id, action)
+    return latest
+
+
+def append_events(flight_date, flight_number, seats, action, pnr):
+    """
+    Add an event to the log of each of the seats which are not already
+    taken/released ('action') according to their latest events
+    Returns the seats given events
+    Raises IntegrityError if another Booking has added an event
+    to one of the seats in the meantime
+    """
+
+    latest = latest_events(flight_date, flight_number, seats)
+    # Seats without events were taken or released before
+    # the log began so they are given events either way
+    changed = [seat for seat in seats
+               if latest.get(seat, (0, None))[1] != action]
+    SeatEvent.objects.bulk_create(
+        [SeatEvent(flight_date=flight_date, flight_number=flight_number,
+                   seat=seat, action=action, pnr=pnr,
+                   previous=latest.get(seat, (0, None))[0])
+         for seat in changed])
+    return changed
+
+
+def take_seats(flight_date, flight_number, pnr, choose, preferred=None):
+    """
+    Take seats on the flight for the Booking 'pnr'
+    'choose(taken)' picks the seats given the seats already taken
+    (bit N is seat N) returning their positions, or None if the
+    party will not fit
+    'preferred' - the positions of seats picked earlier, which are
+    taken if they are all still free
+    Returns the positions of the seats taken or None
+    if there is insufficient availability
+    """
+
+    taken_meanwhile = 0
+    for _ in range(MAXIMUM_ATTEMPTS):
+        taken = current_seats(flight_date, flight_number) | taken_meanwhile
+        if preferred and not any(taken >> seat & 1 for seat in preferred):
+            seats = list(preferred)
+        else:
+            seats = choose(taken)
+        if seats is None:
+            return None
+
+        try:
+            with transaction.atomic():
+                changed = append_events(flight_date, flight_number,
+                                        seats, TAKE, pnr)
+                if len(changed) != len(seats):
+                    raise SeatTaken()
+            return seats
+        except (IntegrityError, SeatTaken):
+            # Another Booking got there first - pick again
+            # leaving out the seats which the log shows are taken
+            for seat, (_, action) in latest_events(flight_date,
+                                                   flight_number,
+                                                   seats).items():
+                if action == TAKE:
+                    taken_meanwhile |= 1 << seat
+            preferred = None
+
+    event(allocation_log, WARNING, "seats taken by other bookings",
+          flight_number=flight_number, flight_date=flight_date,
+          attempts=MAXIMUM_ATTEMPTS)
+    return None
+
+
+def release_seats(flight_date, flight_number, seats, pnr):
+    """
+    Release the seats of the Booking 'pnr' on the flight
+    Returns the seats released i.e. not those which were free already
+    or None if other Bookings kept changing them
+    """
+
+    for _ in range(MAXIMUM_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                return append_events(flight_date, flight_number,
+                                     seats, RELEASE, pnr)
+        except IntegrityError:
+            # Another event was added to one of the seats - look again
+            continue
+
+    event(allocation_log, WARNING, "seats not released",
+          flight_number=flight_number, flight_date=flight_date, seats=seats)
+    return None
+
+
+def add_to_booked(flight_date, flight_number, count):
+    """
+    Add 'count' (negative to subtract) to the flight's booked figure
+    creating its Schedule record if nobody has booked the flight yet
+    Returns the updated Schedule record
+    Called last in a Booking's transaction as the Schedule record
+    stays locked until the end of the transaction
+    """
+
+    schedules = Schedule.objects.filter(flight_date=flight_date,
+                                        flight_number=flight_number)
+    with transaction.atomic():
+        if not schedules.update(
+                total_booked=Greatest(F("total_booked") + count, 0)):
+            try:
+                with transaction.atomic():
+                    Schedule.objects.create(flight_date=flight_date,
+                                            flight_number=flight_number,
+                                            total_booked=max(count, 0))
+            except IntegrityError:
+                # Another Booking has created it in the meantime
+                schedules.update(
+                    total_booked=Greatest(F("total_booked") + count, 0))
+    return schedules.get()
+
+
+def correct_seats(flight_date, flight_number, taken, expected, pnr=""):
+    """
+    Add the events which bring the seats taken on the flight now
+    ('taken') into line with 'expected' (bit N is seat N)
+    """
+
+    release_seats(flight_date, flight_number,
+                  [seat for seat in range(CAPACITY)
+                   if (taken & ~expected) >> seat & 1], pnr)
+    with transaction.atomic():
+        append_events(flight_date, flight_number,
+                      [seat for seat in range(CAPACITY)
+                       if (expected & ~taken) >> seat & 1], TAKE, pnr)
+
+
+def compaction_horizon(lag=None):
+    """
+    The id of the latest event which is at least 'lag' seconds old
+    Newer events are left in the tails in case an older transaction
+    has yet to commit an event with a lower id
+    """
+
+    if lag is None:
+        lag = settings.SEAT_EVENT_COMPACTION_LAG
+    cutoff = timezone.now() - timedelta(seconds=lag)
+    return (SeatEvent.objects.filter(created_at__lt=cutoff)
+            .aggregate(latest=Max("id"))["latest"] or 0)
+
+
+def compact_flight(flight_date, flight_number, horizon):
+    """
+    Fold the flight's events up to 'horizon' into its snapshot
+    Returns the number of events folded
+    """
+
+    with transaction.atomic():
+        schedule = (Schedule.objects.select_for_update()
+                    .filter(flight_date=flight_date,
+                            flight_number=flight_number).first())
+        if schedule is None:
+            return 0
+        tail = list(flight_events(flight_date, flight_number)
+                    .filter(id__gt=schedule.events_compacted_to,
+                            id__lte=horizon).order_by("id")
+                    .values_list("id", "seat", "action"))
+        if not tail:
+            return 0
+
+        schedule.seatmap = bits_seatmap(
+            apply_events(seatmap_bits(schedule.seatmap),
+                         ((seat, action) for _, seat, action in tail)))
+        schedule.events_compacted_to = tail[-1][0]
+        schedule.save(update_fields=["seatmap", "events_compacted_to"])
+        return len(tail)
+
+
+def flights_to_compact(start, end, horizon):
+    """ The flights from 'start' to 'end' with events up to 'horizon' """
+
+    latest = (SeatEvent.objects
+              .filter(flight_date=OuterRef("flight_date"),
+                      flight_number=OuterRef("flight_number"),
+                      id__lte=horizon)
+              .order_by("-id").values("id")[:1])
+    return list(Schedule.objects.filter(flight_date__range=(start, end))
+                .annotate(latest_event=Subquery(latest))
+                .filter(latest_event__gt=F("events_compacted_to"))
+                .order_by("flight_date", "flight_number")
+                .values_list("flight_date", "flight_number"))
+
+
+def compact(start, end, lag=None):
+    """
+    Fold the tails of the flights from 'start' to 'end' into their
+    snapshots. Returns the numbers of flights and events compacted
+    """
+
+    horizon = compaction_horizon(lag)
+    flights = events = 0
+    for flight_date, flight_number in flights_to_compact(start, end,
+                                                         horizon):
+        folded = compact_flight(flight_date, flight_number, horizon)
+        if folded:
+            flights += 1
+            events += folded
+    return flights, events
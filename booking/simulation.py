@@ -0,0 +1,252 @@
+"""
+Seat Allocation Simulator
+
+Replays a season of bookings, cancellations and amendments against
+seatmaps held in memory with each of the allocators (see allocators.py)
+so that they can be compared without touching the database.
+
+A flight is replayed from an empty seatmap as a list of operations
+    (BOOK, booking, seats needed)
+    (CANCEL, booking)
+    (AMEND, booking, passengers removed)   the last Passengers go
+which are either made up at random ('random_operations') or rebuilt
+from the seat log of real flights ('recorded_operations').
+
+For each allocator the replay records how long each allocation took,
+how many parties were turned down although there were enough seats
+free, how many were not seated together, and how broken up the free
+seats were as the flights filled up. 'check_flight' is the
+differential check: at every booking each allocator is given the same
+seatmap and they must all allocate the same number of seats, which
+must be free, or all turn the party down.
+
+'manage.py simulate_allocators' replays chunks of flights in parallel.
+"""
+
+from itertools import groupby
+from time import perf_counter_ns
+
+import numpy
+
+from .allocators import ALLOCATORS, allocation_problems
+from .allocators import fragmentation, free_seat_count
+from .models import SeatEvent
+from .seatlog import CAPACITY, TAKE
+
+BOOK = "book"
+CANCEL = "cancel"
+AMEND = "amend"
+
+# The sizes of the parties made up at random and how often they book
+# - mostly couples and families, the odd group of up to 20
+GROUP_SIZES = range(1, 21)
+GROUP_WEIGHTS = [18, 30, 10, 14, 5, 6, 2, 3] + [1] * 12
+
+# The chance of each operation made up being a cancellation
+# or the removal of a Passenger rather than a booking
+CANCEL_RATE = 0.08
+AMEND_RATE = 0.05
+
+# Seats asked for on each flight made up, as a multiple of its capacity
+DEMAND = 1.2
+
+# Fragmentation is reported at this many stages of each flight's replay
+PROGRESS_STEPS = 10
+
+
+def random_operations(random):
+    """ A flight's operations made up with 'random' (a random.Random) """
+
+    operations = []
+    bookings = []
+    requested = 0
+    while requested < CAPACITY * DEMAND:
+        chance = random.random()
+        if bookings and chance < CANCEL_RATE:
+            booking = bookings.pop(random.randrange(len(bookings)))
+            operations.append((CANCEL, booking))
+        elif bookings and chance < CANCEL_RATE + AMEND_RATE:
+            operations.append((AMEND, random.choice(bookings), 1))
+        else:
+            size = random.choices(GROUP_SIZES, GROUP_WEIGHTS)[0]
+            bookings.append(len(operations))
+            operations.append((BOOK, len(operations), size))
+            requested += size
+    return operations
+
+
+def recorded_operations(start, end):
+    """
+    The operations of each flight from 'start' to 'end' inclusive
+    rebuilt from the seat log, the bookings being the PNRs
+    Seats taken before the log began and corrections (events with
+    no PNR) are left out
+    """
+
+    events = (SeatEvent.objects.filter(flight_date__range=(start, end))
+              .exclude(pnr="").order_by("id")
+              .values_list("flight_date", "flight_number", "pnr", "action"))
+    flights = {}
+    # The seats of a booking are taken or released together
+    # so their events are next to each other
+    for (flight_date, flight_number, pnr, action), group in groupby(events):
+        count = len(list(group))
+        operations, held = flights.setdefault((flight_date, flight_number),
+                                              ([], {}))
+        if action == TAKE:
+            operations.append((BOOK, pnr, count))
+            held[pnr] = held.get(pnr, 0) + count
+        elif pnr in held:
+            held[pnr] -= count
+            if held[pnr] > 0:
+                operations.append((AMEND, pnr, count))
+            else:
+                operations.append((CANCEL, pnr))
+                del held[pnr]
+    return [operations for _, (operations, _) in sorted(flights.items())]
+
+
+def release(seats_of, operation):
+    """ The seats given up by a CANCEL or AMEND operation """
+
+    if operation[0] == CANCEL:
+        return seats_of.pop(operation[1], [])
+    seats = seats_of.get(operation[1], [])
+    released = seats[-operation[2]:]
+    del seats[-operation[2]:]
+    return released
+
+
+def new_figures():
+    return {"flights": 0, "bookings": 0, "latencies": [],
+            "turned_down": 0, "turned_down_with_room": 0, "split": 0,
+            "seats_booked": 0,
+            "fragmentation": [0.0] * PROGRESS_STEPS,
+            "samples": [0] * PROGRESS_STEPS}
+
+
+def add_figures(figures, more):
+    for key, value in more.items():
+        if isinstance(value, list) and key != "latencies":
+            figures[key] = [a + b for a, b in zip(figures[key], value)]
+        else:
+            figures[key] += value
+
+
+def replay(allocate, operations, figures):
+    """ Replay a flight's operations with 'allocate' adding to 'figures' """
+
+    taken = 0
+    seats_of = {}
+    for index, operation in enumerate(operations):
+        if operation[0] == BOOK:
+            _, booking, size = operation
+            began = perf_counter_ns()
+            seats = allocate(taken, size)
+            figures["latencies"].append(perf_counter_ns() - began)
+            figures["bookings"] += 1
+            if seats is None:
+                figures["turned_down"] += 1
+                if free_seat_count(taken) >= size:
+                    figures["turned_down_with_room"] += 1
+            else:
+                for seat in seats:
+                    taken |= 1 << seat
+                seats_of.setdefault(booking, []).extend(seats)
+                if max(seats) - min(seats) + 1 != len(seats):
+                    figures["split"] += 1
+        else:
+            for seat in release(seats_of, operation):
+                taken &= ~(1 << seat)
+
+        step = index * PROGRESS_STEPS // len(operations)
+        figures["fragmentation"][step] += fragmentation(taken)
+        figures["samples"][step] += 1
+
+    figures["flights"] += 1
+    figures["seats_booked"] += CAPACITY - free_seat_count(taken)
+
+
+def check_flight(operations, names):
+    """
+    Replay a flight's operations with the first of the allocators 'names'
+    asking all of them for seats at each booking
+    Returns the problems found as (operation index, allocator, problem)
+    """
+
+    problems = []
+    taken = 0
+    seats_of = {}
+    for index, operation in enumerate(operations):
+        if operation[0] != BOOK:
+            for seat in release(seats_of, operation):
+                taken &= ~(1 << seat)
+            continue
+
+        _, booking, size = operation
+        allocated = {name: ALLOCATORS[name](taken, size) for name in names}
+        for name, seats in allocated.items():
+            problems += [(index, name, problem) for problem in
+                         allocation_problems(taken, size, seats)]
+        counts = {name: len(seats or []) for name, seats in allocated.items()}
+        if len(set(counts.values())) > 1:
+            problems.append((index, "all", "seat counts differ: " +
+                             ", ".join(f"{name} {count}"
+                                       for name, count in counts.items())))
+
+        seats = allocated[names[0]]
+        if seats and not allocation_problems(taken, size, seats):
+            for seat in seats:
+                taken |= 1 << seat
+            seats_of.setdefault(booking, []).extend(seats)
+    return problems
+
+
+def simulate_flights(names, check, flights):
+    """
+    Replay each of the 'flights' (lists of operations) with each of the
+    allocators 'names'
+    Returns the figures of each allocator and, with 'check',
+    the problems found as (flight index, operation index,
+    allocator, problem) where the index is within 'flights'
+    """
+
+    results = {name: new_figures() for name in names}
+    problems = []
+    for flight, operations in enumerate(flights):
+        for name in names:
+            replay(ALLOCATORS[name], operations, results[name])
+        if check:
+            problems += [(flight, *problem)
+                         for problem in check_flight(operations, names)]
+    return results, problems
+
+
+def summary(figures):
+    """ The figures of an allocator's replays as a dictionary for JSON """
+
+    latencies = numpy.array(figures["latencies"], dtype=numpy.int64)
+    p50, p95, p99 = (numpy.percentile(latencies, [50, 95, 99]) / 1000
+                     if len(latencies) else (0.0, 0.0, 0.0))
+    bookings = max(figures["bookings"], 1)
+    return {
+        "flights": figures["flights"],
+        "bookings": figures["bookings"],
+        "latency_us": {"p50": round(float(p50), 1),
+                       "p95": round(float(p95), 1),
+                       "p99": round(float(p99), 1),
+                       "max": round(float(latencies.max() / 1000), 1)
+                       if len(latencies) else 0.0},
+        "turned_down": figures["turned_down"],
+        "turned_down_with_room_rate": round(
+            figures["turned_down_with_room"] / bookings, 4),
+        "split_rate": round(figures["split"] / bookings, 4),
+        "mean_load_factor": round(figures["seats_booked"] * 100 /
+                                  max(figures["flights"] * CAPACITY, 1), 1),
+        # The mean fragmentation index (see allocators.py) at each
+        # stage of the flights' replays, first to last
+        "fragmentation": [round(total / samples, 3) if samples else 0.0
+                          for total, samples in
+                          zip(figures["fragmentation"],
+                              figures["samples"])],
+    }
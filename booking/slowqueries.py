@@ -0,0 +1,204 @@
+"""
+Slow Query Capture
+
+The metrics (see metrics.py) show how many queries each view makes and
+how long they take in total, but not why a particular one is slow, e.g.
+the distinct() search with its two Subqueries in search_bookings or the
+Schedule filters.
+
+SlowQueryMiddleware watches every query made while a request is handled.
+Any statement taking SLOW_QUERY_MS or longer is written as one line of
+JSON to SLOW_QUERY_LOG, each process to its own file with the process
+id added to the name (rotated at SLOW_QUERY_LOG_BYTES), with
+    duration_ms, sql, params      the statement
+    view, method, path            the request which made it
+    caller                        the function in the booking app
+                                  which made it, e.g.
+                                  booking.views.render_search_results
+    helper                        the bookinghelper.py function it was
+                                  made under, if any
+    fingerprint                   the same for every run of the statement
+    plan                          its query plan
+The plan is found by running EXPLAIN (EXPLAIN QUERY PLAN on SQLite)
+straight after the statement. With SLOW_QUERY_ANALYZE set (for test
+and staging databases only - it runs each SELECT a second time) EXPLAIN
+ANALYZE gives the actual row counts and timings where the database can.
+Each statement is explained at most once every
+SLOW_QUERY_EXPLAIN_INTERVAL seconds per process so that a database
+which is slow for everything is not given twice the work.
+
+'manage.py slow_queries' summarises the worst offenders.
+SLOW_QUERY_MS 0 turns the capture off.
+"""
+
+import hashlib
+import re
+import sys
+import threading
+import time
+from contextlib import ExitStack
+from logging import INFO
+
+from django.conf import settings
+from django.db import DatabaseError, NotSupportedError, transaction
+
+from manxairlines.db import wrap_queries
+from manxairlines.middleware import AsyncCapableMiddleware
+
+from .logs import event, query_log
+from .metrics import view_name
+
+# Statements which can be explained
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+
+# Characters of the parameters written
+MAXIMUM_PARAMS_LENGTH = 500
+
+# Statements remembered as recently explained before the oldest are
+# forgotten
+MAXIMUM_EXPLAINED = 1000
+
+# Frames not counted as the caller of a query
+SKIPPED_MODULES = ("booking.slowqueries", "booking.metrics")
+
+_explained = {}
+_explained_lock = threading.Lock()
+
+
+def fingerprint(sql):
+    """
+    A hash of the statement, the same whatever its parameters
+    and however many there are in an IN (...)
+    """
+    normalised = re.sub(r"\s+", " ", sql.strip())
+    normalised = re.sub(r"IN \((%s, )*%s\)", "IN (...)", normalised)
+    return hashlib.sha1(normalised.encode()).hexdigest()[:12]
+
+
+def callers():
+    """ The booking function making the query and the bookinghelper one """
+
+    caller = helper = None
+    frame = sys._getframe(2)
+    while frame is not None and helper is None:
+        module = frame.f_globals.get("__name__", "")
+        if module.startswith("booking.") and module not in SKIPPED_MODULES:
+            if caller is None:
+                caller = (f"{module}.{frame.f_code.co_name}:"
+                          f"{frame.f_lineno}")
+            if module == "booking.bookinghelper":
+                helper = frame.f_code.co_name
+        frame = frame.f_back
+    return caller, helper
+
+
+def due_for_explaining(key):
+    """ Whether the statement 'key' has not been explained lately """
+
+    now = time.monotonic()
+    with _explained_lock:
+        if now - _explained.get(key, -sys.float_info.max) < \
+                settings.SLOW_QUERY_EXPLAIN_INTERVAL:
+            return False
+        if len(_explained) >= MAXIMUM_EXPLAINED:
+            _explained.clear()
+        _explained[key] = now
+        return True
+
+
+def explain(connection, sql, params):
+    """ The query plan of a statement as a list of lines, or None """
+
+    words = sql.lstrip().split(None, 1)
+    statement = words[0].upper() if words else ""
+    if statement not in EXPLAINABLE:
+        return None
+
+    try:
+        prefix = connection.ops.explain_query_prefix()
+        if settings.SLOW_QUERY_ANALYZE and statement in ("SELECT", "WITH"):
+            try:
+                prefix = connection.ops.explain_query_prefix(analyze=True)
+            except ValueError:
+                # e.g. SQLite has no EXPLAIN ANALYZE
+                pass
+    except NotSupportedError:
+        return None
+
+    # A cursor of the database's own, which is not watched, and in a
+    # savepoint so that a failure does not spoil the request's transaction
+    try:
+        with ExitStack() as stack:
+            if connection.in_atomic_block:
+                stack.enter_context(transaction.atomic(using=connection.alias))
+            cursor = connection.create_cursor()
+            try:
+                cursor.execute(f"{prefix} {sql}", params)
+                rows = cursor.fetchall()
+            finally:
+                cursor.close()
+    except DatabaseError as error:
+        return [f"{prefix} failed: {error}"]
+
+    if connection.vendor == "sqlite":
+        # (id, parent, notused, detail)
+        return [row[-1] for row in rows]
+    return [" ".join(str(column) for column in row) for row in rows]
+
+
+class SlowQueryRecorder:
+    """ Writes the statements taking at least 'threshold' ms to the log """
+
+    def __init__(self, request, threshold):
+        self.request = request
+        self.threshold = threshold
+
+    def __call__(self, execute, sql, params, many, context):
+        began = time.perf_counter()
+        result = execute(sql, params, many, context)
+        duration = (time.perf_counter() - began) * 1000
+        if duration >= self.threshold:
+            self.record(sql, params, many, context, duration)
+        return result
+
+    def record(self, sql, params, many, context, duration):
+        connection = context["connection"]
+        if many:
+            params = params[0] if params else None
+        key = fingerprint(sql)
+        caller, helper = callers()
+        plan = None
+        if due_for_explaining(key):
+            plan = explain(connection, sql, params)
+        event(query_log, INFO, "slow query",
+              duration_ms=round(duration, 2),
+              view=view_name(self.request),
+              method=self.request.method,
+              path=self.request.path,
+              caller=caller, helper=helper,
+              alias=connection.alias, vendor=connection.vendor,
+              fingerprint=key, many=many, sql=sql,
+              params=repr(params)[:MAXIMUM_PARAMS_LENGTH],
+              plan=plan)
+
+
+class SlowQueryMiddleware(AsyncCapableMiddleware):
+    """ Record the slow queries made by every request """
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        threshold = settings.SLOW_QUERY_MS
+        if threshold <= 0:
+            return self.get_response(request)
+
+        with wrap_queries(SlowQueryRecorder(request, threshold)):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        threshold = settings.SLOW_QUERY_MS
+        if threshold <= 0:
+            return await self.get_response(request)
+
+        with wrap_queries(SlowQueryRecorder(request, threshold)):
+            return await self.get_response(request)
@@ -53,6 +53,117 @@ function infantsCheck() {
     return true; // Indicate Test Success
 }
 
+// Grey out the flights which cannot seat the party on the chosen date
+// or do not operate on that date, using the Availability API
+// - 'availabilityUrl' is set by the page
+function markFullFlights(dateId, radioName, outbound) {
+    const flightDate = $(`#${dateId}`).val();
+    if (!flightDate || typeof availabilityUrl === "undefined") {
+        return;
+    }
+    const seatsNeeded = Math.max(1, (Number($("#id_adults").val()) || 0) +
+                                    (Number($("#id_children").val()) || 0));
+    // The return flights fly the route the other way
+    let [origin, destination] = ($("#id_route").val() || "-").split("-");
+    if (!outbound) {
+        [origin, destination] = [destination, origin];
+    }
+
+    $.getJSON(availabilityUrl, {date: flightDate}, function(data) {
+        // The flights of the route operating on the date by time
+        const operating = {};
+        for (const flight of data.flights) {
+            if (flight.flight_from === origin &&
+                    flight.flight_to === destination) {
+                operating[flight.departure_time] = flight;
+            }
+        }
+        $(`input[name="${radioName}"]`).each(function() {
+            const radio = $(this);
+            const flight = operating[radio.val()];
+            // The label's text follows the radio button
+            const label = radio.parent();
+            const text = label.contents().last()[0];
+            if (label.data("text") === undefined) {
+                label.data("text", text.nodeValue.replace(
+                    / \((Full|Not operating)\)$/, ""));
+            }
+            let reason = "";
+            if (!flight) {
+                reason = " (Not operating)";
+            } else if (flight.free < seatsNeeded) {
+                reason = " (Full)";
+            }
+            radio.prop("disabled", reason !== "");
+            text.nodeValue = label.data("text") + reason;
+        });
+    });
+}
+
+// The times offered depend on the route so show the form again
+function changeRoute() {
+    window.location.search = $.param({route: $("#id_route").val()});
+}
+
+function checkFullFlights() {
+    markFullFlights("id_departing_date", "departing_time", true);
+    markFullFlights("id_returning_date", "returning_time", false);
+}
+
+// List the flights of the chosen route on the dates either side of the
+// chosen date which can seat the party - 'flexibleDatesUrl' is set by the page
+// Picking one fills in its date and time on the form
+function listFlexibleDates(dateId, radioName, outbound, listId) {
+    const list = $(`#${listId}`);
+    list.empty();
+    const flightDate = $(`#${dateId}`).val();
+    if (!flightDate || !$(`#${dateId}`).is(":visible")) {
+        return;
+    }
+    const seatsNeeded = Math.max(1, (Number($("#id_adults").val()) || 0) +
+                                    (Number($("#id_children").val()) || 0));
+
+    const query = {date: flightDate, seats: seatsNeeded};
+    if ($("#id_route").val()) {
+        query.route = $("#id_route").val();
+    }
+
+    $.getJSON(flexibleDatesUrl, query, function(data) {
+        const flights = outbound ? data.outbound : data.inbound;
+        const heading = outbound ? "Departing" : "Returning";
+        if (!flights.length) {
+            list.append(`<p>${heading}: no flights from ${data.from} to ` +
+                        `${data.to} can seat ${seatsNeeded}.</p>`);
+            return;
+        }
+        list.append(`<h4 class="ui header">${heading}</h4>`);
+        const items = $('<div class="ui list"></div>');
+        for (const flight of flights) {
+            const time = flight.departure_time;
+            const item = $('<a class="item" href="#"></a>').text(
+                `${flight.date} ${time.slice(0, 2)}:${time.slice(2)} ` +
+                `${flight.flight_number} - ${flight.free} free` +
+                (flight.together ? "" : " (not all together)"));
+            item.on("click", function(event) {
+                event.preventDefault();
+                $(`#${dateId}`).val(flight.date);
+                $(`input[name="${radioName}"][value="${time}"]`)
+                    .prop("checked", true);
+                checkFullFlights();
+            });
+            items.append(item);
+        }
+        list.append(items);
+    });
+}
+
+function searchFlexibleDates() {
+    listFlexibleDates("id_departing_date", "departing_time", true,
+                      "flexible-outbound");
+    listFlexibleDates("id_returning_date", "returning_time", false,
+                      "flexible-inbound");
+}
+
 function checkReturnFlightOption() {
     if ($("#id_returning_date").length) {
         returnCheck();
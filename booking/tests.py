@@ -1,3 +1,411 @@
-from django.test import TestCase
+import base64
+import json
+import re
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.db import IntegrityError, connection, transaction
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from . import admission, api
+from . import bookinghelper as m
+from . import idempotency, seatlog
+from .common import Common
+from .models import Booking, IdempotencyKey, Passenger, Schedule, SeatEvent
+
+
+def adult(first_name):
+    return {"title": "MR", "first_name": first_name, "last_name": "BLOGGS",
+            "contact_number": "0123456789", "contact_email": "",
+            "wheelchair_ssr": "", "wheelchair_type": ""}
+
+
+def minor(first_name, years):
+    return {"title": "MSTR", "first_name": first_name, "last_name": "BLOGGS",
+            "date_of_birth": date.today() - timedelta(days=365 * years),
+            "wheelchair_ssr": "", "wheelchair_type": ""}
+
+
+class AmendPassengersTest(TestCase):
+    """
+    Amending a Booking touches only the Passengers which change
+    See 'update_pax_records'
+    """
+
+    fixtures = ["flights"]
+
+    def setUp(self):
+        Common.initialisation()
+        self.departing = date.today() + timedelta(days=7)
+        itinerary = {"return_option": "N",
+                     "departing_date": self.departing,
+                     "departing_time": "0800",
+                     "outbound_flightno": "MX0465",
+                     "returning_date": self.departing,
+                     "returning_time": "1600",
+                     "inbound_flightno": ""}
+        passengers = ([adult("FRED"), adult("JOE"), adult("JIM")],
+                      [minor("TIM", 8)], [minor("TOM", 1)], 0, "")
+        self.booking, _, _ = api.book_itinerary("tests", itinerary,
+                                                passengers)
+
+    def passengers(self):
+        return list(Passenger.objects.filter(pnr=self.booking)
+                    .order_by("pax_number"))
+
+    def edit(self, change, removals=()):
+        """
+        Submit the Edit Passengers Form with 'change' made to the
+        passengers' details and the 'removals' checkboxes ticked
+        Returns the queries which 'update_pax_records' made
+        and what it returned
+        """
+
+        originals = list(Passenger.objects.filter(pnr=self.booking)
+                         .order_by("pax_number").values())
+        data = {"A": [], "C": [], "I": []}
+        for pax in originals:
+            data[pax["pax_type"]].append(dict(pax))
+        change(data)
+
+        Common.the_pnr = self.booking.pnr
+        Common.the_booking_id = self.booking.id
+        Common.save_context = {
+            "booking": {"pnr": self.booking.pnr, "return_option": "N",
+                        "outbound_date": self.departing,
+                        "outbound_flightno": "MX0465"},
+            "original_pax_details": originals,
+            "adults_data": data["A"], "children_data": data["C"],
+            "infants_data": data["I"],
+            "children_included": True, "infants_included": True,
+            "confirm-booking-context": {key: "on" for key in removals}}
+
+        request = RequestFactory().post("/details/")
+        with CaptureQueriesContext(connection) as queries:
+            with transaction.atomic():
+                result = m.update_pax_records(request)
+                m.update_schedule_seating(request, result[4], result[5])
+        return queries.captured_queries, result
+
+    def passenger_writes(self, queries, statement):
+        return [query["sql"] for query in queries
+                if query["sql"].startswith(statement) and
+                '"booking_passenger"' in query["sql"]]
+
+    def test_surname_correction_updates_one_row(self):
+        jim = self.passengers()[2]
+        queries, _ = self.edit(
+            lambda data: data["A"][2].update(last_name="BLOGS"))
+
+        updates = self.passenger_writes(queries, "UPDATE")
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(re.findall(r"\bIN \(([^)]*)\)", updates[0]),
+                         [str(jim.id)])
+        self.assertEqual(self.passenger_writes(queries, "DELETE"), [])
+        self.assertEqual(self.passenger_writes(queries, "INSERT"), [])
+        self.assertEqual([pax.last_name for pax in self.passengers()],
+                         ["BLOGGS", "BLOGGS", "BLOGS", "BLOGGS", "BLOGGS"])
+
+    def test_removal_deletes_one_row_and_frees_its_seat(self):
+        before = self.passengers()
+        child = before[3]
+        seats_before = seatlog.current_seats(self.departing, "MX0465")
+        booked_before = Schedule.objects.get(
+            flight_date=self.departing, flight_number="MX0465").total_booked
+
+        queries, result = self.edit(lambda data: None,
+                                    ["child-0-remove_pax"])
+
+        deletes = self.passenger_writes(queries, "DELETE")
+        self.assertEqual(len(deletes), 1)
+        self.assertEqual(re.findall(r"\bIN \(([^)]*)\)", deletes[0]),
+                         [str(child.id)])
+        self.assertEqual([pax.id for pax in self.passengers()],
+                         [pax.id for pax in before if pax.id != child.id])
+        self.assertEqual(result[4], 1)
+
+        # Only the Child's seat is freed
+        child_seat = 1 << m.from_seat_to_number(child.outbound_seat_number)
+        self.assertTrue(seats_before & child_seat)
+        self.assertEqual(seatlog.current_seats(self.departing, "MX0465"),
+                         seats_before & ~child_seat)
+        self.assertEqual(Schedule.objects.get(
+            flight_date=self.departing, flight_number="MX0465").total_booked,
+            booked_before - 1)
+
+
+def first_free(count):
+    """ A 'choose' for take_seats picking the first 'count' free seats """
+    def choose(taken):
+        return [seat for seat in range(seatlog.CAPACITY)
+                if not taken >> seat & 1][:count]
+    return choose
+
+
+class SeatLogTest(TestCase):
+    """
+    Bookings racing for the same seats
+    See booking/seatlog.py
+    """
+
+    def setUp(self):
+        self.flight = (date.today() + timedelta(days=7), "MX0465")
+
+    def take_before(self, seat, pnr="OTHER"):
+        """ Another Booking takes 'seat' """
+        with transaction.atomic():
+            seatlog.append_events(*self.flight, [seat], seatlog.TAKE, pnr)
+
+    def sneak_in(self, seat):
+        """
+        Patch seatlog so that another Booking takes 'seat' just after
+        the first look at the flight's seats, which that look misses
+        """
+
+        current_seats = seatlog.current_seats
+        latest_events = seatlog.latest_events
+        first = {"current_seats": True, "latest_events": True}
+
+        def current_then_sneak(*args):
+            taken = current_seats(*args)
+            if first.pop("current_seats", False):
+                self.take_before(seat)
+            return taken
+
+        def stale_latest(*args):
+            latest = latest_events(*args)
+            if first.pop("latest_events", False):
+                latest.pop(seat, None)
+            return latest
+
+        return mock.patch.multiple(seatlog, current_seats=current_then_sneak,
+                                   latest_events=stale_latest)
+
+    def takers(self):
+        return dict(seatlog.flight_events(*self.flight)
+                    .filter(action=seatlog.TAKE).values_list("seat", "pnr"))
+
+    def test_conflicting_previous_is_refused(self):
+        self.take_before(3)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            SeatEvent.objects.create(
+                flight_date=self.flight[0], flight_number=self.flight[1],
+                seat=3, action=seatlog.TAKE, pnr="LATE", previous=0)
+
+    def test_conflict_is_retried_without_the_seat(self):
+        choose = mock.Mock(side_effect=first_free(2))
+        with self.sneak_in(0):
+            seats = seatlog.take_seats(*self.flight, "MINE", choose)
+
+        self.assertEqual(seats, [1, 2])
+        self.assertEqual(choose.call_count, 2)
+        self.assertEqual(choose.call_args_list[1][0][0] & 1, 1)
+        self.assertEqual(self.takers(), {0: "OTHER", 1: "MINE", 2: "MINE"})
+
+    def test_preferred_seats_kept_while_free(self):
+        choose = mock.Mock(side_effect=first_free(2))
+        seats = seatlog.take_seats(*self.flight, "MINE", choose,
+                                   preferred=[10, 11])
+
+        self.assertEqual(seats, [10, 11])
+        choose.assert_not_called()
+
+    def test_preferred_seats_dropped_once_taken(self):
+        self.take_before(11)
+        seats = seatlog.take_seats(*self.flight, "MINE", first_free(2),
+                                   preferred=[10, 11])
+
+        self.assertEqual(seats, [0, 1])
+        self.assertEqual(self.takers(), {11: "OTHER", 0: "MINE", 1: "MINE"})
+
+    def test_preferred_seats_dropped_when_taken_meanwhile(self):
+        with self.sneak_in(10):
+            seats = seatlog.take_seats(*self.flight, "MINE", first_free(2),
+                                       preferred=[10, 11])
+
+        self.assertEqual(seats, [0, 1])
+        self.assertEqual(self.takers(), {10: "OTHER", 0: "MINE", 1: "MINE"})
+
+    def test_release_gives_up_after_maximum_attempts(self):
+        self.take_before(5, "MINE")
+        with mock.patch.object(seatlog, "append_events",
+                               side_effect=IntegrityError) as append, \
+                self.assertLogs("booking.allocation", "WARNING"):
+            released = seatlog.release_seats(*self.flight, [5], "MINE")
+
+        self.assertIsNone(released)
+        self.assertEqual(append.call_count, seatlog.MAXIMUM_ATTEMPTS)
+        self.assertEqual(seatlog.current_seats(*self.flight), 1 << 5)
+
+    def test_release_returns_the_seats_released(self):
+        self.take_before(5, "MINE")
+        self.assertEqual(seatlog.release_seats(*self.flight, [5], "MINE"),
+                         [5])
+        # Free already
+        self.assertEqual(seatlog.release_seats(*self.flight, [5], "MINE"),
+                         [])
+        self.assertEqual(seatlog.current_seats(*self.flight), 0)
+
+
+class IdempotencyTest(TestCase):
+    """
+    Confirmations carried out once whatever the retries
+    See booking/idempotency.py
+    """
+
+    fixtures = ["flights"]
+
+    def setUp(self):
+        self.alice = User.objects.create_user("alice")
+        self.bob = User.objects.create_user("bob")
+        departing = date.today() + timedelta(days=7)
+        self.body = json.dumps({
+            "return_option": "N", "departing_date": departing.isoformat(),
+            "departing_time": "0800", "adults": [adult("FRED")]})
+
+    def post(self, user, key, body=None):
+        client = Client()
+        client.force_login(user)
+        return client.post("/api/bookings/", body or self.body,
+                           content_type="application/json",
+                           HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_done_key_replays_the_stored_result(self):
+        key = idempotency.issue("alice", idempotency.CONFIRM)
+        with transaction.atomic():
+            claimed, record = idempotency.claim(key, "alice",
+                                                idempotency.CONFIRM)
+            idempotency.complete(record, {"pnr": "ABC123"})
+        self.assertTrue(claimed)
+
+        claimed, record = idempotency.claim(key, "alice",
+                                            idempotency.CONFIRM)
+        self.assertFalse(claimed)
+        self.assertEqual(record.state, IdempotencyKey.DONE)
+        self.assertEqual(idempotency.result(record), {"pnr": "ABC123"})
+
+    def test_api_replay_gets_the_original_response(self):
+        first = self.post(self.alice, "retry-1")
+        again = self.post(self.alice, "retry-1")
+
+        self.assertEqual(first.status_code, 201)
+        self.assertEqual(again.status_code, 201)
+        self.assertEqual(again.json(), first.json())
+        self.assertEqual(again["Idempotent-Replayed"], "true")
+        self.assertEqual(Booking.objects.count(), 1)
+
+    def test_claimed_key_is_rejected(self):
+        key = idempotency.issue("alice", idempotency.CONFIRM)
+        self.assertEqual(idempotency.claim(key, "alice",
+                                           idempotency.CONFIRM)[0], True)
+        claimed, record = idempotency.claim(key, "alice",
+                                            idempotency.CONFIRM)
+        self.assertFalse(claimed)
+        self.assertEqual(record.state, IdempotencyKey.CLAIMED)
+
+        # An API request still being carried out
+        idempotency.claim("busy-1", "alice", idempotency.API_BOOKING,
+                          idempotency.fingerprint(self.body.encode()),
+                          issued=False)
+        response = self.post(self.alice, "busy-1")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Booking.objects.count(), 0)
+
+    def test_other_users_key_is_not_honoured(self):
+        key = idempotency.issue("alice", idempotency.CONFIRM)
+        self.assertEqual(idempotency.claim(key, "bob", idempotency.CONFIRM),
+                         (False, None))
+        self.assertEqual(IdempotencyKey.objects.get(key=key).state,
+                         IdempotencyKey.ISSUED)
+
+        # Bob's request with Alice's API key is a request of his own
+        first = self.post(self.alice, "shared-1")
+        second = self.post(self.bob, "shared-1")
+        self.assertEqual(second.status_code, 201)
+        self.assertNotIn("Idempotent-Replayed", second)
+        self.assertNotEqual(second.json()["pnr"], first.json()["pnr"])
+        self.assertEqual(Booking.objects.count(), 2)
+
+    def test_key_reused_for_a_different_request(self):
+        self.post(self.alice, "reused-1")
+        response = self.post(self.alice, "reused-1",
+                             self.body.replace("FRED", "JIM"))
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Booking.objects.count(), 1)
+
+
+# Buckets which hardly refill during a test
+SLOW = 0.001
+
+
+@override_settings(RATE_LIMIT_STORE="local")
+class AdmissionTest(TestCase):
+    """
+    Requests over their budget turned away at once
+    See booking/admission.py
+    """
+
+    fixtures = ["flights"]
+
+    def setUp(self):
+        # A fresh set of buckets for each test
+        admission._store = None
+        self.alice = User.objects.create_user("alice", password="pw12345!")
+        self.bob = User.objects.create_user("bob", password="pw12345!")
+
+    def tearDown(self):
+        admission._store = None
+
+    def api_post(self, username):
+        credentials = base64.b64encode(f"{username}:pw12345!".encode())
+        return Client().post("/api/bookings/", "{",
+                             content_type="application/json",
+                             HTTP_AUTHORIZATION="Basic " +
+                             credentials.decode())
+
+    @override_settings(RATE_LIMITS={"search": {"user": (SLOW, 2),
+                                               "all": (SLOW, 100)}})
+    def test_over_budget_gets_the_busy_page(self):
+        client = Client()
+        client.force_login(self.alice)
+        for _ in range(2):
+            # (Nothing is found so they are sent back to the home page)
+            self.assertNotEqual(client.get("/search/",
+                                           {"query": "BLOGGS"}).status_code,
+                                429)
+
+        response = client.get("/search/", {"query": "BLOGGS"})
+        self.assertEqual(response.status_code, 429)
+        self.assertTemplateUsed(response, "includes/busy.html")
+        self.assertGreaterEqual(int(response["Retry-After"]), 1)
+
+        # Short queries cost more
+        client.force_login(self.bob)
+        self.assertEqual(client.get("/search/", {"query": "B"}).status_code,
+                         429)
+
+    @override_settings(RATE_LIMITS={"search": {"user": (SLOW, 5),
+                                               "all": (SLOW, 1)}})
+    def test_refused_by_everybody_gives_the_tokens_back(self):
+        request = RequestFactory().get("/search/")
+        request.user = self.alice
+        self.assertIsNone(admission.limit(request, "search"))
+        self.assertEqual(admission.limit(request, "search").status_code, 429)
+
+        tokens, _, _ = admission.store().buckets["search:user:alice"]
+        self.assertAlmostEqual(tokens, 4, places=1)
+
+    @override_settings(RATE_LIMITS={"allocate": {"user": (SLOW, 1),
+                                                 "all": (SLOW, 100)}})
+    def test_api_clients_have_a_bucket_each(self):
+        self.assertEqual(self.api_post("alice").status_code, 400)
+        refused = self.api_post("alice")
+        self.assertEqual(refused.status_code, 429)
+        self.assertIn("errors", refused.json())
+
+        self.assertEqual(self.api_post("bob").status_code, 400)
+        self.assertEqual(set(admission.store().buckets),
+                         {"allocate:user:alice", "allocate:user:bob",
+                          "allocate"})
@@ -0,0 +1,149 @@
+"""
+The Timetable
+
+The Routes and Flights are compiled into a Timetable held in memory
+so that finding the flights of a route on a date is a dictionary
+lookup rather than a query:
+
+    flight number                      -> the flight's details
+    (origin, destination)              -> its flights in order of STD
+    (origin, destination, weekday)     -> the flights operating on that
+                                          day of the week in order of STD
+
+A flight operates on the days of the week in its 'days_of_operation'
+between its 'effective_from' and 'effective_to' dates. Its STD and STA
+are held in minutes after midnight; the "HHMM" strings shown on the
+forms and written to the Bookings are made from them.
+
+As with the Fares (see fares.py) any change to the Routes or Flights
+discards the Timetable so that it is compiled again on the next
+lookup, in every process, and it is compiled again anyway every
+TIMETABLE_MAX_AGE seconds (see compiled.py).
+"""
+
+import time
+
+from .compiled import CompiledTable
+from .models import Flight, Route
+
+MINUTES_PER_DAY = 24 * 60
+
+# The shortest interval allowed between arriving on one flight and
+# departing on the next, e.g. a same-day return
+MINIMUM_CONNECTION = 90
+
+
+def format_hhmm(minutes):
+    """ Minutes after midnight as "HHMM" e.g. 585 is "0945" """
+    return f"{minutes // 60:02d}{minutes % 60:02d}"
+
+
+def parse_hhmm(hhmm):
+    """ "HHMM" as minutes after midnight e.g. "0945" is 585 """
+    hours, minutes = divmod(int(hhmm), 100)
+    return hours * 60 + minutes
+
+
+def route_name(origin, destination):
+    """ The name of a route as used on the forms e.g. "LCY-IOM" """
+    return f"{origin}-{destination}"
+
+
+def route_airports(name):
+    """ The (origin, destination) of a route name e.g. "LCY-IOM" """
+    origin, _, destination = (name or "").upper().partition("-")
+    return (origin, destination)
+
+
+class Timetable:
+    """ The compiled Routes and Flights """
+
+    def __init__(self, version):
+        self.version = version
+        self.compiled_at = time.monotonic()
+        self.flights = {}
+        self.routes = {}
+        self.by_weekday = {}
+
+        for route in Route.objects.all():
+            self.routes[(route.origin, route.destination)] = []
+
+        for flight in (Flight.objects.select_related("route")
+                       .order_by("std_minutes", "sta_minutes",
+                                 "flight_number")):
+            origin = flight.route.origin.strip().upper()
+            destination = flight.route.destination.strip().upper()
+            weekdays = {int(day) - 1 for day in flight.days_of_operation
+                        if day in "1234567"}
+            self.flights[flight.flight_number] = {
+                "flight_from": origin,
+                "flight_to": destination,
+                "flight_STD": format_hhmm(flight.std_minutes),
+                "flight_STA": format_hhmm(flight.sta_minutes),
+                "std": flight.std_minutes,
+                "sta": flight.sta_minutes,
+                # An STA earlier than the STD is the next day
+                "duration": ((flight.sta_minutes - flight.std_minutes)
+                             % MINUTES_PER_DAY),
+                "outbound": flight.outbound,
+                "capacity": flight.capacity,
+                "weekdays": weekdays,
+                "effective_from": flight.effective_from,
+                "effective_to": flight.effective_to,
+            }
+            self.routes.setdefault((origin, destination), []).append(
+                flight.flight_number)
+            for weekday in sorted(weekdays):
+                self.by_weekday.setdefault((origin, destination, weekday),
+                                           []).append(flight.flight_number)
+
+    def in_effect(self, flight_number, flight_date):
+        """ Whether the flight's effective dates include 'flight_date' """
+        info = self.flights[flight_number]
+        return ((info["effective_from"] is None or
+                 info["effective_from"] <= flight_date) and
+                (info["effective_to"] is None or
+                 flight_date <= info["effective_to"]))
+
+    def operates(self, flight_number, flight_date):
+        """ Whether the flight operates on 'flight_date' """
+        info = self.flights.get(flight_number)
+        return (info is not None and
+                flight_date.weekday() in info["weekdays"] and
+                self.in_effect(flight_number, flight_date))
+
+    def route_flights(self, origin, destination):
+        """ Every flight of the route, operating or not, by STD """
+        return self.routes.get((origin, destination), [])
+
+    def flights_on(self, origin, destination, flight_date):
+        """ The flights of the route operating on 'flight_date' by STD """
+        return [flight_number for flight_number in
+                self.by_weekday.get((origin, destination,
+                                     flight_date.weekday()), [])
+                if self.in_effect(flight_number, flight_date)]
+
+    def flight_at(self, origin, destination, flight_date, departure_time):
+        """
+        The flight of the route operating on 'flight_date' which departs
+        at 'departure_time' ("HHMM") or None if there is none
+        """
+        for flight_number in self.flights_on(origin, destination,
+                                             flight_date):
+            if self.flights[flight_number]["flight_STD"] == departure_time:
+                return flight_number
+        return None
+
+    def arrival(self, flight_number):
+        """ The flight's arrival in minutes after midnight of its date """
+        info = self.flights[flight_number]
+        return info["std"] + info["duration"]
+
+
+_timetable = CompiledTable("timetable", Timetable, "TIMETABLE_MAX_AGE",
+                           (Route, Flight))
+
+
+def timetable():
+    """ The current Timetable, compiled if need be """
+    return _timetable.current()
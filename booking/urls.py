@@ -1,5 +1,9 @@
 from django.urls import path
 from . import views
+from . import api
+from . import asyncviews
+from . import metrics
+from . import profiling
 
 urlpatterns = [
     path('', views.homepage, name='home'),
@@ -7,10 +11,33 @@ urlpatterns = [
     path('confirm/', views.confirm_booking_form, name='confirm-booking-form'),
     path('booking/<id>/', views.view_booking, name='view-booking'),
     path('search/', views.search_bookings, name='search-bookings'),
+    path('archive/<id>/', views.view_archived_booking,
+         name='view-archived-booking'),
     path('delete/<id>/', views.delete_booking, name='delete-booking'),
     path('edit/<id>/', views.edit_booking, name='edit-booking'),
     path('details/', views.passenger_details_form,
          name='passenger-details-form'),
     path('changes/', views.confirm_changes_form, name='confirm-changes-form'),
-    path('logout_user', views.logout_user, name='logout_user')
+    path('departures/', views.departures, name='departures'),
+    path('logout_user', views.logout_user, name='logout_user'),
+    path('metrics', metrics.metrics, name='metrics'),
+    path('profiles/<name>', profiling.profile_report,
+         name='profile-report'),
+    path('api/bookings/', api.create_booking, name='api-create-booking'),
+    path('api/availability/', api.availability, name='api-availability'),
+    path('api/flexible-dates/', api.flexible_dates,
+         name='api-flexible-dates'),
+    path('api/itineraries/', api.itineraries, name='api-itineraries'),
+    path('api/quotes/', api.quotes, name='api-quotes'),
+    path('api/cheapest-days/', api.cheapest_days, name='api-cheapest-days'),
+    path('api/sales/', api.sales, name='api-sales'),
+    path('api/seat-analytics/', api.seat_analytics,
+         name='api-seat-analytics'),
+    # Asynchronous versions of the read-heavy views - see asyncviews.py
+    path('async/booking/<id>/', asyncviews.view_booking,
+         name='async-view-booking'),
+    path('async/search/', asyncviews.search_bookings,
+         name='async-search-bookings'),
+    path('async/api/availability/', asyncviews.availability,
+         name='async-api-availability'),
 ]
@@ -3,6 +3,7 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.http import HttpResponseRedirect
 from django.urls import reverse
+from django.db import transaction
 from django.db.models import Q, OuterRef, Subquery
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.contrib import messages
@@ -12,17 +13,25 @@ from django.forms import formset_factory
 from django.core.validators import validate_email
 
 from .models import Booking, Passenger
+from .models import ArchivedBooking, ArchivedPassenger
 
 from .forms import BookingForm, CreateBookingForm
 from .forms import AdultsForm, MinorsForm
 from .forms import HiddenForm
 from .forms import BagsRemarks
 
+from . import admission
 from . import bookinghelper as m
+from . import idempotency
+from . import loads
+from . import metrics
 import datetime
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from .common import Common
+from manxairlines.routers import replica_read
+from .logs import event, forms_log
+from logging import DEBUG, INFO
 
 # Display the Home Page
 
@@ -62,55 +71,19 @@ def is_booking_form_valid(form, request):
     # Check Dates and Flight Availability
     cleaned_data = form.cleaned_data
 
-    if (cleaned_data["return_option"] == "Y" and
-            cleaned_data["returning_date"] == cleaned_data["departing_date"]):
-        # Same Day Travel - Is there enough time between journey times?
-        depart_time = cleaned_data["departing_time"]
-        return_time = cleaned_data["returning_time"]
-        time_diff = m.calc_time_difference(return_time, depart_time)
-        if time_diff < 0:
-            message_error("Returning Time - The time of the return flight "
-                          "cannot be in the past.",
-                          request)
-            return (False, None)
-
-        if time_diff < 90:
-            message_error(
-                "Returning Time - The interval between flights cannot be "
-                "less than 90 minutes.", request)
-            return (False, None)
-
-    if (cleaned_data["departing_date"] == datetime.now().date()):
-        # User has selected today's date - check the time HH:MM
-        timenow = datetime.now().strftime("%H%M")
-        depart_time = cleaned_data["departing_time"]
-        time_diff = m.calc_time_difference(depart_time, timenow)
-        if time_diff < 0:
-            message_error("Departing Time - The time of the outbound flight "
-                          "cannot be in the past.",
-                          request)
-            return (False, None)
+    error_message = m.journey_times_error(cleaned_data)
+    if error_message:
+        message_error(error_message, request)
+        return (False, None)
 
     # The Form's contents has passed all validation checks!
     # Save the information for later processing
-    save_data = {"return_option": cleaned_data["return_option"]}
-    if cleaned_data["return_option"] == "Y":
-        # Return Flight - Determine both flight numbers
-        thetime = cleaned_data["departing_time"]
-        depart_pos = Common.OUTBOUND_TIME_OPTIONS1.index(thetime)
-        save_data["depart_pos"] = depart_pos
-        outbound_flightno = Common.outbound_listof_flights[depart_pos]
-        thetime = cleaned_data["returning_time"]
-        return_pos = Common.INBOUND_TIME_OPTIONS1.index(thetime)
-        save_data["return_pos"] = return_pos
-
-    else:
-
-        # One-way: Note the position of the departure flight
-        thetime = cleaned_data["departing_time"]
-        depart_pos = Common.OUTBOUND_TIME_OPTIONS1.index(thetime)
-        save_data["depart_pos"] = depart_pos
-        outbound_flightno = Common.outbound_listof_flights[depart_pos]
+    # The Form has found the flights chosen (see forms.py)
+    outbound_flightno = cleaned_data["outbound_flightno"]
+    inbound_flightno = cleaned_data["inbound_flightno"]
+    save_data = {"return_option": cleaned_data["return_option"],
+                 "outbound_flightno": outbound_flightno,
+                 "inbound_flightno": inbound_flightno}
 
     # Check Availability regarding the Selected Journeys
     # Outbound Flight
@@ -121,12 +94,9 @@ def is_booking_form_valid(form, request):
     if return_option == "Y":
         # Return Flight - Check Availability
         inbound_time = cleaned_data["returning_time"]
-        return_pos = Common.INBOUND_TIME_OPTIONS1.index(inbound_time)
-        inbound_flightno = Common.inbound_listof_flights[return_pos]
         inbound_date = cleaned_data["returning_date"]
     else:
         inbound_time = None
-        inbound_flightno = None
         inbound_date = None
 
     check_avail = m.check_availability(request,
@@ -149,6 +119,8 @@ def is_booking_form_valid(form, request):
 
 
 @login_required
+@admission.rate_limited("allocate", methods=("POST",))
+@admission.seat_allocation()
 def create_booking_form(request):
     """ The Handling of the Create Bookings Form """
 
@@ -156,16 +128,16 @@ def create_booking_form(request):
     if not Common.initialised:
         Common.initialisation()
 
-    form = CreateBookingForm(request.POST or None)
+    # '?route=' - the route whose flights are offered
+    form = CreateBookingForm(request.POST or None,
+                             initial={"route": request.GET.get("route")})
 
     if request.method == "POST":
         # create a form instance and populate it with data from the request:
         # check whether it is valid:
-        print(164)
         is_form_valid, saved_data = is_booking_form_valid(form, request)
-        print(166, is_form_valid)
-        print(167, saved_data)
-        print(168, is_form_valid)
+        event(forms_log, DEBUG, "create booking form",
+              valid=is_form_valid, saved_data=saved_data)
         if is_form_valid:
             context = {"booking": form.cleaned_data}
             # Update dict 'context' with the contents of dict 'saved_data'
@@ -176,8 +148,8 @@ def create_booking_form(request):
             # with the contents of dict 'saved_data'
             # TODO
             # Heroku fix
-            Common.the_depart_pos = saved_data["depart_pos"]
-            Common.the_return_pos = saved_data["return_pos"]
+            Common.the_outbound_flightno = saved_data["outbound_flightno"]
+            Common.the_inbound_flightno = saved_data["inbound_flightno"]
             Common.the_return_option = saved_data["return_option"]
             
             # ADULTS
@@ -222,8 +194,6 @@ def create_booking_form(request):
             # Save a copy in order to fetch any values as and when needed
             Common.save_context = context
 
-            print("CD1", Common.save_context)
-
             return render(request, "booking/passenger-details-form.html",
                           context)
 
@@ -254,22 +224,14 @@ def passenger_details_form(request):
 
     If Validation failed, Continue viewing the Passengers' Details
     """
-    # TODO
-    messages.add_message(request, messages.ERROR,
-                         "EDITMODE>" + str(Common.paxdetails_editmode))
-    messages.add_message(request, messages.ERROR,
-                         "EDITMODE2>" + str(Common.heroku_editmode))
     m.heroku_editmode_fix(request) ## TODO
-    print("ED5", Common.paxdetails_editmode, Common.heroku_editmode)
-    if request.session.pop("editmode", None):
-        print("YES EDIT MODE ON")
-        messages.add_message(request, messages.ERROR,
-                         "EDITMODE ON" + str(Common.paxdetails_editmode))
+    session_editmode = request.session.pop("editmode", None)
+    event(forms_log, DEBUG, "passenger details form",
+          editmode=Common.paxdetails_editmode,
+          heroku_editmode=Common.heroku_editmode,
+          session_editmode=session_editmode)
+    if session_editmode:
         Common.paxdetails_editmode = True ## TODO
-    else:
-        print("NO EDIT MODE OFF")
-        messages.add_message(request, messages.ERROR,
-                         "EDITMODE OFF" + str(Common.paxdetails_editmode))
 
     (adults_formset, children_formset, infants_formset,
      children_included, infants_included,
@@ -289,12 +251,16 @@ def passenger_details_form(request):
                                            bags_remarks_form)
         is_valid, context = result
         if is_valid:
-            print("EDITMODE", Common.paxdetails_editmode)
-            print("ED6", Common.paxdetails_editmode, Common.heroku_editmode)
+            # The confirmation can only be submitted once
+            # (see idempotency.py)
             if not Common.paxdetails_editmode:
+                context[idempotency.FIELD_NAME] = idempotency.issue(
+                    request.user.username, idempotency.CONFIRM)
                 return render(request, "booking/confirm-booking-form.html",
                               context)
             else:
+                context[idempotency.FIELD_NAME] = idempotency.issue(
+                    request.user.username, idempotency.AMEND)
                 return render(request, "booking/confirm-changes-form.html",
                               context)
 
@@ -306,7 +272,30 @@ def passenger_details_form(request):
     return render(request, "booking/passenger-details-form.html", context)
 
 
+def report_replay(request, key, done):
+    """
+    A confirmation form has been submitted again e.g. a double-click
+    Nothing is written - the user is shown the original outcome
+    'done' - what happened to the Booking e.g. "Created"
+    """
+
+    outcome = idempotency.result(key) if key is not None else None
+    event(forms_log, INFO, "confirmation replayed",
+          key=key.key if key is not None else "", outcome=outcome)
+    if key is None:
+        message_error("This confirmation has expired. "
+                      "Please start the Booking again.", request)
+    elif outcome and outcome.get("pnr"):
+        messages.add_message(request, messages.SUCCESS,
+                             "Booking {0} {1} Successfully"
+                             .format(outcome["pnr"], done))
+    else:
+        message_error("This confirmation has already been submitted.",
+                      request)
+
+
 @login_required
+@admission.seat_allocation()
 def confirm_booking_form(request):
     """ Confirm whether the passenger wants to go ahead with the Booking? """
 
@@ -318,7 +307,16 @@ def confirm_booking_form(request):
             # Create new record Booking/Passenger Records
             # Create new Transaction Record
             # Update Schedule Database
-            m.create_new_records(request)
+            # Unless this is the form submitted again
+            with transaction.atomic():
+                claimed, key = idempotency.claim(
+                    request.POST.get(idempotency.FIELD_NAME, ""),
+                    request.user.username, idempotency.CONFIRM)
+                if claimed:
+                    pnr = m.create_new_records(request)
+                    idempotency.complete(key, {"pnr": pnr})
+            if not claimed:
+                report_replay(request, key, "Created")
             # Then show home page
             return HttpResponseRedirect(reverse("home"))
 
@@ -343,16 +341,33 @@ def confirm_changes_form(request):
             # Home Page
             return HttpResponseRedirect(reverse("home"))
         else:
-            m.update_pax_details(request)
+            with transaction.atomic():
+                claimed, key = idempotency.claim(
+                    request.POST.get(idempotency.FIELD_NAME, ""),
+                    request.user.username, idempotency.AMEND)
+                if claimed:
+                    pnr = m.update_pax_details(request)
+                    idempotency.complete(key, {"pnr": pnr})
+            if not claimed:
+                report_replay(request, key, "Updated")
             # Then show home page
             return HttpResponseRedirect(reverse("home"))
 
     return render(request, "booking/confirm-changes-form.html", context)
 
 
+@replica_read
 @login_required
 def view_booking(request, id):
     """ View The Booking """
+    return render_booking(request, id)
+
+
+def render_booking(request, id):
+    """
+    Render the Booking together with its Passengers
+    This is shared by both the synchronous and asynchronous views
+    """
     booking = get_object_or_404(Booking, pk=id)
     queryset = Passenger.objects.filter(pnr_id=id).order_by("pax_number")
 
@@ -384,6 +399,19 @@ def view_booking(request, id):
         # Dummy nonnull value
         Common.the_inbound_date = display["outbound_date"]
 
+    passenger_list = display_passengers(queryset)
+
+    context = {"booking": booking, "passengers": passenger_list,
+               "display": display}
+    # Keep a Copy for 'Edit Passengers' functionality
+    Common.save_context = context
+    Common.context_2ndcopy = context
+    return render(request, "booking/view-booking.html", context)
+
+
+def display_passengers(queryset):
+    """ The Passengers' details with the Dates of Birth formatted """
+
     passenger_list = queryset.values()
     count = 0
     for each_record in passenger_list:
@@ -394,17 +422,33 @@ def view_booking(request, id):
                     passenger_list[count]["date_of_birth"]
                     .strftime("%d%b%y").upper())
         count += 1
+    return passenger_list
 
-    context = {"booking": booking, "passengers": passenger_list,
-               "display": display}
-    # Keep a Copy for 'Edit Passengers' functionality
-    Common.save_context = context
-    Common.context_2ndcopy = context
-    print("CC1",context)
+
+@replica_read
+@login_required
+def view_archived_booking(request, id):
+    """ View an Archived Booking - it can no longer be changed """
+
+    booking = get_object_or_404(ArchivedBooking, pk=id)
+    queryset = (ArchivedPassenger.objects.filter(pnr_id=id)
+                .order_by("pax_number"))
+
+    display = dict(created_at=booking.created_at.strftime("%d%b%y").upper(),
+                   outbound_date=(booking.outbound_date.strftime("%d%b%y")
+                                  .upper()))
+    if booking.return_flight:
+        display["inbound_date"] = (booking.inbound_date.strftime("%d%b%y")
+                                   .upper())
+
+    context = {"booking": booking, "passengers": display_passengers(queryset),
+               "display": display, "archived": True}
     return render(request, "booking/view-booking.html", context)
 
 
+@replica_read
 @login_required
+@admission.rate_limited("search", cost=admission.search_cost)
 def search_bookings(request):
     """
     Search for the Booking using either
@@ -413,11 +457,20 @@ def search_bookings(request):
     3) The Principal Pax (Adult 1)'s Last Name
     """
 
-    query = request.GET.get("query").strip()
+    query = request.GET.get("query", "").strip()
     # Blank Search
     if not query:
         return HttpResponseRedirect(reverse("home"))
 
+    return render_search_results(request, query)
+
+
+def search_bookings_queryset(query, archived=False):
+    """
+    The Bookings matching the search 'query'
+    'archived' - search the Archived Bookings instead
+    """
+
     # Each Booking must has one Principal Passenger
     # That Passenger must be the first mentioned (pax_number=1)
     # and an Adult (pax_type="A")
@@ -425,48 +478,63 @@ def search_bookings(request):
     # Every Booking has 'one' Principal Passenger
     # Adult 1 - query that Passenger i.e.
     # pax_type == "A" and pax_number == 1
-    adult1_qs = Passenger.objects.filter(pnr=OuterRef("id"),
-                                         pax_number=1)
+    booking_model, passenger_model = ((ArchivedBooking, ArchivedPassenger)
+                                      if archived else (Booking, Passenger))
+    adult1_qs = passenger_model.objects.filter(pnr=OuterRef("id"),
+                                               pax_number=1)
 
     # Case Insensitive Search - in 3 parts
 
-    queryset = (Booking.objects.filter(
-                # 1) Matching PNR
-                Q(pnr__icontains=query) | (
+    return (booking_model.objects.filter(
+            # 1) Matching PNR
+            Q(pnr__icontains=query) | (
 
-                 # 2) Or Matching Principal Passenger's First Name
-                 Q(passenger__first_name__icontains=query) &
-                 Q(passenger__pax_number=1)) | (
+             # 2) Or Matching Principal Passenger's First Name
+             Q(passenger__first_name__icontains=query) &
+             Q(passenger__pax_number=1)) | (
 
-                 # 3) Or Matching Principal Passenger's Last Name
-                 Q(passenger__last_name__icontains=query) &
-                 Q(passenger__pax_number=1)))
+             # 3) Or Matching Principal Passenger's Last Name
+             Q(passenger__last_name__icontains=query) &
+             Q(passenger__pax_number=1)))
 
-                # Sort the Query Result by the PNR
-                .distinct().order_by("pnr")
+            # Sort the Query Result by the PNR
+            .distinct().order_by("pnr")
 
-                # Include the name of the Principal Passenger
-                .annotate(first_name=Subquery(
-                         adult1_qs.values("first_name")[:1]),
-                          last_name=Subquery(
-                         adult1_qs.values("last_name")[:1])))
+            # Include the name of the Principal Passenger
+            .annotate(first_name=Subquery(
+                     adult1_qs.values("first_name")[:1]),
+                      last_name=Subquery(
+                     adult1_qs.values("last_name")[:1])))
 
-    if queryset.count() == 0:
-        # No Matching Bookings Found
-        message_string = f"No Bookings found that matched '{query }'"
-        messages.add_message(request, messages.ERROR,
-                             message_string)
-        return HttpResponseRedirect(reverse("home"))
 
-    for element in queryset:
-        qs = Passenger.objects.filter(pnr=element.id,
-                                      pax_number=1)
+@metrics.timed("search_bookings")
+def render_search_results(request, query):
+    """
+    Render the page of Bookings matching the search 'query'
+    This is shared by both the synchronous and asynchronous views
+    """
+
+    queryset = search_bookings_queryset(query)
 
     # Pagination as demonstrated in
     # https://testdriven.io/blog/django-pagination/
 
     # 3 records per page
     paginator = Paginator(queryset, 3)
+    archived = False
+    if paginator.count == 0:
+        # Only search the Archive when there are no live Bookings
+        queryset = search_bookings_queryset(query, archived=True)
+        paginator = Paginator(queryset, 3)
+        archived = True
+
+    if paginator.count == 0:
+        # No Matching Bookings Found
+        message_string = f"No Bookings found that matched '{query }'"
+        messages.add_message(request, messages.ERROR,
+                             message_string)
+        return HttpResponseRedirect(reverse("home"))
+
     page_number = request.GET.get("page", 1)
 
     try:
@@ -479,7 +547,8 @@ def search_bookings(request):
         page_object = paginator.page(paginator.num_pages)
 
     context = {"queryset": queryset, "query": query,
-               "page_object": page_object}
+               "total_results": paginator.count,
+               "page_object": page_object, "archived": archived}
     return render(request, "booking/search-bookings.html", context)
 
 
@@ -490,11 +559,12 @@ def delete_booking(request, id):
     context = {"booking": booking}
 
     if request.method == "POST":
-        # Update the Schedule Data base first by free up the seats
-        # of the passengers belong to this Booking
-        m.realloc_seats_first(request, id, booking)
-        # Delete the Booking
-        booking.delete()
+        with transaction.atomic():
+            # Update the Schedule Data base first by free up the seats
+            # of the passengers belong to this Booking
+            m.realloc_seats_first(request, id, booking)
+            # Delete the Booking
+            booking.delete()
         messages.add_message(request, messages.SUCCESS,
                              "Booking Deleted Successfully")
         return HttpResponseRedirect(reverse("home"))
@@ -515,29 +585,46 @@ def edit_booking(request, id):
     Common.paxdetails_editmode = True
     Common.heroku_editmode = True
 
-    # TODO
-    messages.add_message(request, messages.ERROR,
-                         "7A" + str(Common.paxdetails_editmode))
-
     if request.method == "POST":
         return HttpResponseRedirect(reverse("view-booking",
                                             kwargs={"id": booking.pk}))
 
     else:
-        # TODO
-        messages.add_message(request, messages.ERROR,
-                         "7BPOST" + str(Common.paxdetails_editmode))
-        print("ED7b", Common.paxdetails_editmode, Common.heroku_editmode)
         Common.paxdetails_editmode = True # TODO
         # Heroku fix
         Common.heroku_editmode = True
-        print("ED8", Common.paxdetails_editmode, Common.heroku_editmode)
+        event(forms_log, DEBUG, "edit booking", pnr=booking.pnr)
         context = m.handle_editpax_GET(request, id, booking)
         request.session["editmode"] = True
 
     return render(request, "booking/edit-booking.html", context)
 
 
+DEPARTURE_DAYS = 14
+MAXIMUM_DEPARTURE_DAYS = 60
+
+
+@replica_read
+@login_required
+def departures(request):
+    """
+    How full each flight is over the next '?days=' days (default 14)
+    Read from the Departure Loads - see loads.py
+    """
+
+    try:
+        days = int(request.GET.get("days", DEPARTURE_DAYS))
+    except ValueError:
+        days = DEPARTURE_DAYS
+    days = min(max(days, 1), MAXIMUM_DEPARTURE_DAYS)
+
+    start = datetime.now().date()
+    end = start + timedelta(days=days - 1)
+    context = {"departures": loads.upcoming_departures(start, end),
+               "days": days, "start": start, "end": end}
+    return render(request, "booking/departures.html", context)
+
+
 @login_required
 def logout_user(request):
     """ Handle the Log Out of the User """
@@ -0,0 +1,30 @@
+# gunicorn settings - read by gunicorn from the project directory
+# (see Procfile and Procfile.asgi)
+#
+# Each worker process keeps its own metrics (see booking/metrics.py)
+# so they are written to files in PROMETHEUS_MULTIPROC_DIR, which
+# /metrics adds up whichever worker it is served by.
+# The directory is emptied as gunicorn starts so that the figures of
+# an earlier run are not counted, and the files of a worker which
+# exits are marked dead.
+
+import os
+import shutil
+import tempfile
+
+# prometheus_client decides where to keep the figures as it is
+# imported so the directory must be set first
+metrics_dir = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR",
+    os.path.join(tempfile.gettempdir(), "manxairlines-metrics"))
+
+from prometheus_client import multiprocess  # noqa: E402
+
+
+def on_starting(server):
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    multiprocess.mark_process_dead(worker.pid)
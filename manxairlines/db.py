@@ -0,0 +1,188 @@
+"""
+Database connection management for the manxairlines project
+
+Opening a new PostgreSQL connection for every request costs far more than
+the short queries of most of the views. So connections are kept open
+between requests (CONN_MAX_AGE) and are checked before they are reused
+in case the server or a pooler such as PgBouncer has dropped them.
+
+The settings come from a per-environment profile which can be
+overridden by individual environment variables:
+
+    DB_ENVIRONMENT            development | production (the default)
+    DB_CONN_MAX_AGE           seconds to keep a connection open,
+                              0 = close it after each request,
+                              blank = keep it open for ever
+    DB_HEALTH_CHECK_INTERVAL  seconds between checks of a reused
+                              connection, blank = no checks
+    DB_POOL_MODE              blank, 'session' or 'transaction' i.e.
+                              the pool mode of the PgBouncer in front
+                              of the database
+    DB_CONNECT_TIMEOUT        seconds to wait for a new connection
+
+A request's queries may be run on other threads than the one which
+received it: the reader threads of the asynchronous views and, under
+ASGI, the thread on which Django runs the synchronous views. Each
+thread has its own connections, so the middleware which watches the
+queries (see booking/metrics.py and booking/slowqueries.py) wraps them
+with 'wrap_queries', which follows the request to whichever thread
+runs them.
+"""
+
+import contextvars
+import os
+import time
+from contextlib import contextmanager
+from functools import partial
+
+import dj_database_url
+from asgiref.sync import sync_to_async
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from .middleware import AsyncCapableMiddleware
+
+CONNECTION_PROFILES = {
+    "development": {"conn_max_age": 0,
+                    "health_check_interval": None,
+                    "connect_timeout": 10},
+    "production": {"conn_max_age": 600,
+                   "health_check_interval": 30,
+                   "connect_timeout": 5},
+}
+
+POOL_MODES = ("", "session", "transaction")
+
+
+def environment_setting(name, default):
+    """
+    Fetch an integer setting from the environment
+    A blank value means 'None'
+    """
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    value = value.strip()
+    return int(value) if value else None
+
+
+def database_config(url, environment=None):
+    """
+    Build the DATABASES entry for the database at 'url'
+    according to the profile of the environment
+    """
+
+    environment = environment or os.environ.get("DB_ENVIRONMENT",
+                                                "production")
+    profile = CONNECTION_PROFILES[environment]
+
+    conn_max_age = environment_setting("DB_CONN_MAX_AGE",
+                                       profile["conn_max_age"])
+    # None (a blank DB_CONN_MAX_AGE) is Django's unlimited persistence
+    config = dj_database_url.parse(url, conn_max_age=conn_max_age)
+    config["HEALTH_CHECK_INTERVAL"] = environment_setting(
+                                        "DB_HEALTH_CHECK_INTERVAL",
+                                        profile["health_check_interval"])
+
+    pool_mode = os.environ.get("DB_POOL_MODE", "").strip().lower()
+    if pool_mode not in POOL_MODES:
+        raise ValueError(f"DB_POOL_MODE must be one of {POOL_MODES}")
+
+    if pool_mode == "transaction":
+        # In transaction pooling a connection to the database is only ours
+        # for the duration of a transaction. Server-side cursors outlive
+        # the transaction and therefore cannot be used
+        config["DISABLE_SERVER_SIDE_CURSORS"] = True
+
+    if "postgresql" in config.get("ENGINE", ""):
+        connect_timeout = environment_setting("DB_CONNECT_TIMEOUT",
+                                              profile["connect_timeout"])
+        if connect_timeout:
+            config.setdefault("OPTIONS", {})
+            config["OPTIONS"]["connect_timeout"] = connect_timeout
+
+    return config
+
+
+def check_connection_health(connection):
+    """
+    Close a persistent connection which is no longer usable
+    so that Django opens a new one instead of raising an error
+    when the next query is made
+    The check is made at most once every HEALTH_CHECK_INTERVAL seconds
+    """
+
+    interval = connection.settings_dict.get("HEALTH_CHECK_INTERVAL")
+    if (interval is None or connection.connection is None or
+            connection.in_atomic_block):
+        return
+
+    now = time.monotonic()
+    last_checked = getattr(connection, "health_checked_at", None)
+    if last_checked is not None and now - last_checked < interval:
+        return
+
+    if not connection.is_usable():
+        connection.close()
+    connection.health_checked_at = now
+
+
+def check_all_connections():
+    """ Check the health of this thread's connections to each database """
+    for connection in connections.all():
+        check_connection_health(connection)
+
+
+class ConnectionHealthCheckMiddleware(AsyncCapableMiddleware):
+    """
+    Check the persistent database connections
+    before the view gets to use them
+    Under ASGI those of the thread on which Django runs the synchronous
+    code - the reader threads check their own (see booking/asyncviews.py)
+    """
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        check_all_connections()
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        await sync_to_async(check_all_connections)()
+        return await self.get_response(request)
+
+
+# The execute wrappers of the current request, outermost first
+# A context variable is copied to the threads of 'sync_to_async'
+_query_wrappers = contextvars.ContextVar("query_wrappers", default=())
+
+
+def run_query_wrappers(execute, sql, params, many, context):
+    """ Run a query through the current request's execute wrappers """
+    call = execute
+    for wrapper in reversed(_query_wrappers.get()):
+        call = partial(wrapper, call)
+    return call(sql, params, many, context)
+
+
+def install_query_wrappers(sender, connection, **kwargs):
+    # First so that the 'execute_wrapper()' entered before the connection
+    # was opened still removes its own wrapper (the last) on leaving
+    if run_query_wrappers not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, run_query_wrappers)
+
+
+connection_created.connect(install_query_wrappers)
+
+
+@contextmanager
+def wrap_queries(wrapper):
+    """
+    Pass every query made within this block, on this thread or on any
+    thread it hands work to, through the execute wrapper 'wrapper'
+    """
+    token = _query_wrappers.set(_query_wrappers.get() + (wrapper,))
+    try:
+        yield
+    finally:
+        _query_wrappers.reset(token)
@@ -0,0 +1,62 @@
+"""
+Middleware which serves both WSGI and ASGI
+
+Under ASGI Django runs the whole of a request on its single thread for
+synchronous code as soon as one middleware can only be called
+synchronously, so that the asynchronous views (booking/asyncviews.py)
+would handle one request at a time. Each of the project's middleware is
+therefore built on AsyncCapableMiddleware: called with an asynchronous
+'get_response' it is itself a coroutine function and awaits it.
+Django's own middleware is already capable of both.
+"""
+
+from asgiref.sync import (iscoroutinefunction, markcoroutinefunction,
+                          sync_to_async)
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+class AsyncCapableMiddleware:
+    """
+    'get_response' is kept and 'is_async' says which kind it is
+    A subclass's __call__ returns 'self.__acall__(request)' when
+    'is_async', the coroutine doing the same work asynchronously
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise (which is only synchronous) in front of the asynchronous
+    views. The static files are served from a thread of their own
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, **kwargs):
+        super().__init__(get_response, **kwargs)
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        # With 'autorefresh' (DEBUG) the files are looked for on disk
+        if self.autorefresh or request.path_info in self.files:
+            response = await sync_to_async(
+                self.process_request, thread_sensitive=False)(request)
+            if response is not None:
+                return response
+        return await self.get_response(request)
@@ -0,0 +1,143 @@
+"""
+Read-replica routing for the manxairlines project
+
+When REPLICA_DATABASE_URL is set, the read-only views (those decorated
+with 'replica_read') and the admin's list pages read the Booking App's
+tables from the 'replica' database instead of the primary.
+Everything else, including every write, goes to the primary.
+
+An agent must always see their own changes, so once a session has
+written to the Booking tables its reads stick to the primary for
+REPLICA_STICKY_SECONDS, which should exceed the replication lag.
+
+To try this locally with two SQLite databases:
+    export DATABASE_URL=sqlite:////tmp/primary.db
+    export REPLICA_DATABASE_URL=sqlite:////tmp/replica.db
+    python manage.py migrate && python manage.py migrate --database replica
+(There is no replication between them, so new bookings only show
+up on the replica once copied across e.g. with 'dumpdata'/'loaddata')
+"""
+
+import contextvars
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .middleware import AsyncCapableMiddleware
+
+REPLICA = "replica"
+PRIMARY = "default"
+
+# Only these Apps' models are read from the replica
+# Sessions and users must always be up to date
+REPLICA_APPS = {"booking"}
+
+SESSION_KEY = "db_last_write"
+
+# The routing state of the current request
+# A mutable dict so that a write made on another thread
+# (see booking/asyncviews.py) is still seen by the request
+_routing_state = contextvars.ContextVar("routing_state", default=None)
+
+
+def replica_read(view):
+    """ Mark a view as read-only so that it may read from the replica """
+    view.replica_read = True
+    return view
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+class ReplicaRouter:
+    """ Send the reads of the read-only views to the replica """
+
+    def db_for_read(self, model, **hints):
+        state = _routing_state.get()
+        if (state and state["use_replica"] and not state["wrote"] and
+                model._meta.app_label in REPLICA_APPS):
+            return REPLICA
+        return PRIMARY
+
+    def db_for_write(self, model, **hints):
+        state = _routing_state.get()
+        if state is not None and model._meta.app_label in REPLICA_APPS:
+            # Any further reads of this request go to the primary
+            state["wrote"] = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both databases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
+
+
+def remember_write(request):
+    """ Keep the session's reads on the primary for a while """
+    if hasattr(request, "session"):
+        request.session[SESSION_KEY] = time.time()
+
+
+def is_admin_list_page(request):
+    match = request.resolver_match
+    return (match is not None and match.namespace == "admin" and
+            (match.url_name or "").endswith("_changelist"))
+
+
+class ReplicaRoutingMiddleware(AsyncCapableMiddleware):
+    """
+    Decide for each request whether its reads may go to the replica
+    and remember when a session last wrote to the primary
+    """
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        state = {"use_replica": False, "wrote": False}
+        token = _routing_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _routing_state.reset(token)
+
+        if state["wrote"]:
+            remember_write(request)
+        return response
+
+    async def __acall__(self, request):
+        state = {"use_replica": False, "wrote": False}
+        token = _routing_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _routing_state.reset(token)
+
+        if state["wrote"]:
+            # The session may have to be read from the database
+            await sync_to_async(remember_write)(request)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _routing_state.get()
+        if state is None or not replica_configured():
+            return None
+
+        if request.method not in ("GET", "HEAD"):
+            return None
+
+        if not (getattr(view_func, "replica_read", False) or
+                is_admin_list_page(request)):
+            return None
+
+        last_write = (request.session.get(SESSION_KEY, 0)
+                      if hasattr(request, "session") else 0)
+        if time.time() - last_write < settings.REPLICA_STICKY_SECONDS:
+            # This session has recently made changes
+            return None
+
+        state["use_replica"] = True
+        return None
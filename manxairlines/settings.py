@@ -12,8 +12,9 @@ https://docs.djangoproject.com/en/3.2/ref/settings/
 
 from pathlib import Path
 import os
-import dj_database_url
+import tempfile
 from django.contrib.messages import constants as messages
+from .db import database_config
 if os.path.isfile('env.py'):
     import env
 
@@ -63,14 +64,19 @@ MESSAGE_TAGS = {
 }
 
 MIDDLEWARE = [
+    'booking.slowqueries.SlowQueryMiddleware',
+    'booking.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'manxairlines.db.ConnectionHealthCheckMiddleware',
+    'manxairlines.middleware.AsyncWhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'manxairlines.routers.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'booking.profiling.ProfilingMiddleware',
 ]
 
 LOGIN_REDIRECT_URL = '/'
@@ -96,9 +102,203 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'manxairlines.wsgi.application'
+ASGI_APPLICATION = 'manxairlines.asgi.application'
+
+# The number of threads which the asynchronous views of booking/asyncviews.py
+# use for their database reads. Each thread holds its own DB connection
+ASYNC_READ_THREADS = int(os.environ.get('ASYNC_READ_THREADS', '8'))
+
+# Seconds after which each process recompiles its table of Fares
+# even if it has not been told of any change - see booking/fares.py
+FARE_TABLE_MAX_AGE = int(os.environ.get('FARE_TABLE_MAX_AGE', '300'))
+
+# Seconds after which each process compiles its Timetable again
+# even if it has not been told of any change - see booking/timetable.py
+TIMETABLE_MAX_AGE = int(os.environ.get('TIMETABLE_MAX_AGE', '300'))
+
+# Bookings whose flights all departed more than this many days ago
+# are moved to the archive by 'manage.py archive_bookings'
+# - see booking/archive.py
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', '90'))
+
+# The cache, shared by all of the processes so that, for example, seats
+# freed by one gunicorn worker are seen at once by the others
+# 'database' (the default - its table is created by the migrations,
+# see booking/migrations/0022_cache_table.py) or 'local' (each process
+# on its own, e.g. for a single development server)
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'database')
+CACHES = {
+    'default': {
+        'database': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'booking_cache',
+        },
+        'local': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+    }[CACHE_BACKEND],
+}
+
+# Seconds for which the number of free seats of a flight is cached
+# - see booking/freeseats.py
+FREE_SEATS_TTL = int(os.environ.get('FREE_SEATS_TTL', '60'))
+
+# Seconds for which a flexible dates search is cached
+# - see booking/flexdates.py
+FLEXIBLE_SEARCH_TTL = int(os.environ.get('FLEXIBLE_SEARCH_TTL', '30'))
+
+# Seconds for which a connecting itinerary search is cached
+# - see booking/itineraries.py
+ITINERARY_SEARCH_TTL = int(os.environ.get('ITINERARY_SEARCH_TTL', '30'))
+
+# Seconds for which the idempotency keys of the confirmation forms
+# and the API are honoured before 'manage.py sweep_idempotency_keys'
+# deletes them - see booking/idempotency.py
+IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', '86400'))
+
+# Seconds a seat event must have been in the log before
+# 'manage.py compact_seat_events' folds it into the seatmap snapshot
+# - see booking/seatlog.py
+SEAT_EVENT_COMPACTION_LAG = int(
+    os.environ.get('SEAT_EVENT_COMPACTION_LAG', '60'))
+
+# How a party's seats are picked: recursive, first_fit or best_fit
+# - see booking/allocators.py and 'manage.py simulate_allocators'
+SEAT_ALLOCATOR = os.environ.get('SEAT_ALLOCATOR', 'recursive')
+
+# Admission control - see booking/admission.py
+# Where the token buckets and allocation slots are counted:
+# 'local' (each process on its own), 'cache' (shared by the workers
+# through the cache) or 'off'
+RATE_LIMIT_STORE = os.environ.get('RATE_LIMIT_STORE', 'local')
+
+# The token buckets of each expensive endpoint, for each user and
+# shared by all users: (tokens added per second, most tokens held)
+RATE_LIMITS = {
+    'search': {'user': (2, 20), 'all': (50, 200)},
+    'allocate': {'user': (1, 10), 'all': (20, 60)},
+}
 
+# The most requests allocating seats at once
+SEAT_ALLOCATION_CONCURRENCY = int(
+    os.environ.get('SEAT_ALLOCATION_CONCURRENCY', '8'))
+
+# The bearer token which Prometheus sends to scrape /metrics
+# Without one only logged-in staff may see them - see booking/metrics.py
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Seconds for which a successful Basic Authentication of the API is
+# remembered, so that the password is not hashed on every call
+# (0 - every call) - see booking/api.py
+API_AUTH_CACHE_SECONDS = int(os.environ.get('API_AUTH_CACHE_SECONDS', '300'))
+
+# Profile one in PROFILE_SAMPLE_RATE requests (0 - only those which
+# staff ask for), keeping the newest PROFILE_KEEP reports in PROFILE_DIR
+# See booking/profiling.py
+PROFILE_SAMPLE_RATE = int(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_DIR = os.environ.get(
+    'PROFILE_DIR', os.path.join(tempfile.gettempdir(),
+                                'manxairlines-profiles'))
+PROFILE_KEEP = int(os.environ.get('PROFILE_KEEP', '200'))
+
+# Queries taking SLOW_QUERY_MS or longer (0 - off) are written with their
+# query plans to SLOW_QUERY_LOG, one file for each process with its id
+# added to the name. SLOW_QUERY_ANALYZE runs EXPLAIN ANALYZE,
+# which repeats each SELECT, so is for test databases only
+# See booking/slowqueries.py and 'manage.py slow_queries'
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '200'))
+SLOW_QUERY_ANALYZE = os.environ.get('SLOW_QUERY_ANALYZE', '') == '1'
+SLOW_QUERY_EXPLAIN_INTERVAL = int(
+    os.environ.get('SLOW_QUERY_EXPLAIN_INTERVAL', '60'))
+SLOW_QUERY_LOG = os.environ.get(
+    'SLOW_QUERY_LOG', os.path.join(tempfile.gettempdir(),
+                                   'manxairlines-slow-queries.jsonl'))
+SLOW_QUERY_LOG_BYTES = int(
+    os.environ.get('SLOW_QUERY_LOG_BYTES', str(10 * 1024 * 1024)))
+SLOW_QUERY_LOG_BACKUPS = int(os.environ.get('SLOW_QUERY_LOG_BACKUPS', '5'))
+
+# Persistent connections, health checks and pooler support
+# are configured per environment - see manxairlines/db.py
 DATABASES = {
-     'default': dj_database_url.parse(os.environ.get("DATABASE_URL"))
+     'default': database_config(os.environ.get("DATABASE_URL"))
+}
+
+# Optional Read Replica - see manxairlines/routers.py
+if os.environ.get("REPLICA_DATABASE_URL"):
+    DATABASES['replica'] = database_config(
+                            os.environ.get("REPLICA_DATABASE_URL"))
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+    DATABASE_ROUTERS = ['manxairlines.routers.ReplicaRouter']
+
+# Seconds for which a session's reads stick to the primary after it writes
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', '30'))
+
+# Logging
+# The Booking App logs structured events - see booking/logs.py
+# Each subsystem's level can be set on its own e.g.
+#   BOOKING_LOG_LEVEL=INFO BOOKING_PRICING_LOG_LEVEL=DEBUG
+BOOKING_LOG_LEVEL = os.environ.get('BOOKING_LOG_LEVEL', 'INFO')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        # The fraction of debug events which are written
+        'sample': {
+            '()': 'booking.logs.SampleFilter',
+            'rate': float(os.environ.get('BOOKING_LOG_SAMPLE_RATE', '1.0')),
+        },
+        # The most events of each kind written per second, 0 = no limit
+        'rate_limit': {
+            '()': 'booking.logs.RateLimitFilter',
+            'per_second': int(os.environ.get('BOOKING_LOG_RATE_LIMIT',
+                                             '50')),
+        },
+    },
+    'formatters': {
+        'structured': {
+            '()': 'booking.logs.StructuredFormatter',
+            'json_lines': os.environ.get('BOOKING_LOG_FORMAT') == 'json',
+        },
+        'json_lines': {
+            '()': 'booking.logs.StructuredFormatter',
+            'json_lines': True,
+        },
+    },
+    'handlers': {
+        'booking': {
+            'class': 'logging.StreamHandler',
+            'formatter': 'structured',
+            'filters': ['sample', 'rate_limit'],
+        },
+        'slow_queries': {
+            # A file for each process e.g. slow-queries.<pid>.jsonl
+            'class': 'booking.logs.ProcessFileHandler',
+            'filename': SLOW_QUERY_LOG,
+            'maxBytes': SLOW_QUERY_LOG_BYTES,
+            'backupCount': SLOW_QUERY_LOG_BACKUPS,
+            'formatter': 'json_lines',
+            'filters': ['rate_limit'],
+        },
+    },
+    'loggers': {
+        'booking': {
+            'handlers': ['booking'],
+            'level': BOOKING_LOG_LEVEL,
+            'propagate': False,
+        },
+        **{f'booking.{subsystem}': {
+               'level': os.environ.get(
+                            f'BOOKING_{subsystem.upper()}_LOG_LEVEL',
+                            BOOKING_LOG_LEVEL)}
+           for subsystem in ('allocation', 'pricing',
+                             'persistence', 'forms')},
+        'booking.queries': {
+            'handlers': ['slow_queries'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
 }
 
 # Password validation